@@ -3,23 +3,34 @@
 
 
 import datetime
+import hashlib
 import re
 
 from urllib.parse import urlencode
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist, ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
 import debug                            # pyflakes:ignore
 
 import tastypie
 import tastypie.resources
 from tastypie.api import Api
+from tastypie import http
 from tastypie.bundle import Bundle
-from tastypie.exceptions import ApiFieldError
+from tastypie.cache import SimpleCache
+from tastypie.exceptions import ApiFieldError, BadRequest, ImmediateHttpResponse
+from tastypie.resources import convert_post_to_put
+from tastypie.utils.mime import build_content_type
 from tastypie.serializers import Serializer # pyflakes:ignore (we're re-exporting this)
 from tastypie.fields import ApiField
 
+from ietf.api.serializer import model_cache_generation
+
 _api_list = []
 
 for _app in settings.INSTALLED_APPS:
@@ -55,18 +66,249 @@ def autodiscover():
             if module_has_submodule(mod, "resources"):
                 raise
 
+def get_resource(path):
+    """
+    Get the registered resource for an 'api_name/resource_name' path, such
+    as 'doc/docevent'.  Raises KeyError if there is no such resource.
+    """
+    autodiscover()
+    try:
+        api_name, resource_name = path.strip('/').split('/')
+        return dict(_api_list)[api_name]._registry[resource_name]
+    except ValueError:
+        raise KeyError(path)
+
+def resource_cache_stats_key(api_name, resource_name, outcome):
+    return "api:cache-stats:%s:%s:%s" % (api_name, resource_name, outcome)
+
 class ModelResource(tastypie.resources.ModelResource):
+    """
+    A tastypie ModelResource whose list and detail responses are cached, if
+    the resource has a SimpleCache.  The cache keys include the cache
+    generation of the resource's model, which is bumped on writes to the
+    model (see ietf.api.serializer), and the generations of the related
+    models which the request filters or orders on, or which are rendered
+    in full, so that writes to any of those give a new response.  Data
+    which a resource derives in other ways is only refreshed when the
+    cached response times out.  Responses carry an ETag, and conditional
+    requests are answered with 304 Not Modified.
+
+    List requests with a ``cursor`` argument are paged on the primary key
+    instead of with offsets: ``?cursor=`` gets the first page, and each
+    page's meta gives the cursor and url of the next one.  A page costs the
+    same at the end of a table as at its start, and its objects are
+    serialized to the response one by one as they are read, rather than
+    all at once when the page is complete.  Cursor pages are only available
+    as JSON, and aren't cached.
+    """
     def generate_cache_key(self, *args, **kwargs):
         """
         Creates a unique-enough cache key.
 
-        This is based off the current api_name/resource_name/args/kwargs.
+        This is based off the current api_name/resource_name/args/kwargs,
+        and the cache generation of the resource's model.
         """
         #smooshed = ["%s=%s" % (key, value) for key, value in kwargs.items()]
         smooshed = urlencode(kwargs)
 
         # Use a list plus a ``.join()`` because it's faster than concatenation.
-        return "%s:%s:%s:%s" % (self._meta.api_name, self._meta.resource_name, ':'.join(args), smooshed)
+        return "%s:%s:%s:%s:%s" % (self._meta.api_name, self._meta.resource_name,
+                                   model_cache_generation(self._meta.object_class), ':'.join(args), smooshed)
+
+    def dispatch(self, request_type, request, **kwargs):
+        # Copied from tastypie 0.14.3, except that streaming responses are
+        # passed through instead of being replaced by 204 No Content.
+        allowed_methods = getattr(self._meta, "%s_allowed_methods" % request_type, None)
+
+        if 'HTTP_X_HTTP_METHOD_OVERRIDE' in request.META:
+            request.method = request.META['HTTP_X_HTTP_METHOD_OVERRIDE']
+
+        request_method = self.method_check(request, allowed=allowed_methods)
+        method = getattr(self, "%s_%s" % (request_method, request_type), None)
+
+        if method is None:
+            raise ImmediateHttpResponse(response=http.HttpNotImplemented())
+
+        self.is_authenticated(request)
+        self.throttle_check(request)
+
+        request = convert_post_to_put(request)
+        response = method(request, **kwargs)
+
+        self.log_throttled_access(request)
+
+        if not isinstance(response, (HttpResponse, StreamingHttpResponse)):
+            return http.HttpNoContent()
+
+        return response
+
+    def get_list(self, request, **kwargs):
+        if 'cursor' in request.GET:
+            return self.get_cursor_list(request, **kwargs)
+        return self.cached_response(request, 'list', super(ModelResource, self).get_list, **kwargs)
+
+    def get_cursor_list(self, request, **kwargs):
+        """
+        Returns a page of resources following the primary key given as the
+        cursor, as a streaming JSON response.
+        """
+        if 'order_by' in request.GET:
+            raise BadRequest("Cursor pages are ordered by primary key, and can't be combined with order_by.")
+        if self.determine_format(request) != 'application/json':
+            raise BadRequest("Cursor pages are only available in JSON format.")
+
+        base_bundle = self.build_bundle(request=request)
+        objects = self.obj_get_list(bundle=base_bundle, **self.remove_api_resource_names(kwargs))
+        cursor = self.parse_cursor(request.GET['cursor'])
+        paginator = self._meta.paginator_class(request.GET, objects, resource_uri=self.get_resource_uri(),
+                                               limit=self._meta.limit, max_limit=self._meta.max_limit)
+        limit = paginator.get_limit()
+
+        return StreamingHttpResponse(self.stream_cursor_page(request, objects, cursor, limit),
+                                     content_type=build_content_type('application/json'))
+
+    def parse_cursor(self, cursor):
+        if cursor == '':
+            return None
+        try:
+            return self._meta.object_class._meta.pk.to_python(cursor)
+        except ValidationError:
+            raise BadRequest("Invalid cursor '%s' provided." % cursor)
+
+    def iter_cursor_objects(self, objects, cursor=None, limit=0, batch_size=None):
+        """
+        Yields the objects with primary keys following cursor in key order,
+        up to limit of them (0 for no limit).  Objects are read in batches,
+        each with a query which starts at the last key read, so memory use
+        doesn't grow with the number of objects.
+        """
+        batch_size = batch_size or limit or self._meta.max_limit or 1000
+        yielded = 0
+        objects = objects.order_by('pk')
+        while True:
+            batch = objects if cursor is None else objects.filter(pk__gt=cursor)
+            if limit:
+                batch_size = min(batch_size, limit - yielded)
+            count = 0
+            for obj in batch[:batch_size]:
+                count += 1
+                cursor = obj.pk
+                yield obj
+            yielded += count
+            if count < batch_size or (limit and yielded >= limit):
+                return
+
+    def serialize_cursor_object(self, request, obj):
+        bundle = self.full_dehydrate(self.build_bundle(obj=obj, request=request), for_list=True)
+        return self._meta.serializer.to_json(bundle)
+
+    def stream_cursor_page(self, request, objects, cursor, limit):
+        separator = ''
+        count = 0
+        yield '{"objects": ['
+        # ask for one more object than fits in the page, to find out
+        # whether there is a next page
+        for obj in self.iter_cursor_objects(objects, cursor, limit + 1 if limit else 0):
+            if limit and count == limit:
+                break
+            yield separator + self.serialize_cursor_object(request, obj)
+            separator = ', '
+            last = obj.pk
+            count += 1
+        else:
+            last = None
+
+        meta = {'limit': limit, 'cursor': request.GET['cursor'], 'next_cursor': None, 'next': None}
+        if last is not None:
+            args = request.GET.copy()
+            args['cursor'] = str(last)
+            meta['next_cursor'] = str(last)
+            meta['next'] = '%s?%s' % (self.get_resource_uri(), args.urlencode())
+        yield '], "meta": %s}' % self._meta.serializer.to_json(meta)
+
+    def get_detail(self, request, **kwargs):
+        return self.cached_response(request, 'detail', super(ModelResource, self).get_detail, **kwargs)
+
+    def cached_response(self, request, view, get_response, **kwargs):
+        if not isinstance(self._meta.cache, SimpleCache):
+            return get_response(request, **kwargs)
+
+        # the response depends on the query arguments, whatever their
+        # order, and on the format asked for, also through Accept
+        query = urlencode(sorted(request.GET.lists()), doseq=True)
+        desired_format = self.determine_format(request)
+        # and on the data of the related models it filters on or renders
+        generations = ','.join('%s=%s' % (model._meta.label_lower, model_cache_generation(model))
+                               for model in sorted(self.related_cache_models(request), key=lambda m: m._meta.label_lower))
+        response_key = hashlib.md5(("%s|%s|%s" % (query, desired_format, generations)).encode('utf-8')).hexdigest()
+        cache_key = self.generate_cache_key('response', view, response_key, **self.remove_api_resource_names(kwargs))
+
+        # SimpleCache binds to a cache backend instance when the resource is
+        # defined, use the default cache as configured at request time
+        cached = cache.get(cache_key)
+        if cached is None:
+            self.count_cache_access('miss')
+            response = get_response(request, **kwargs)
+            if response.status_code != 200:
+                return response
+            etag = quote_etag(hashlib.sha1(response.content).hexdigest())
+            cached = (response.content, response['Content-Type'], etag)
+            cache.set(cache_key, cached, self._meta.cache.timeout)
+        else:
+            self.count_cache_access('hit')
+
+        content, content_type, etag = cached
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        return response
+
+    def related_cache_models(self, request):
+        """Get the models other than the resource's own which a response to
+        request is made from: those which the query arguments filter or
+        order on across relations, and those of the related resources
+        rendered in full"""
+        models = set(self.full_related_models())
+        for key, values in request.GET.lists():
+            for path in (values if key == 'order_by' else [ key ]):
+                models.update(self.lookup_models(path.lstrip('-')))
+        models.discard(self._meta.object_class)
+        return models
+
+    def lookup_models(self, path):
+        """Get the models which a field lookup path such as group__parent__acronym
+        goes through"""
+        model = self._meta.object_class
+        for name in path.split('__'):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation or field.related_model is None:
+                break
+            model = field.related_model
+            yield model
+
+    def full_related_models(self, seen=None):
+        seen = set() if seen is None else seen
+        for field in self.fields.values():
+            if isinstance(field, tastypie.fields.RelatedField) and field.full:
+                resource = field.to_class()
+                model = resource._meta.object_class
+                if model not in seen:
+                    seen.add(model)
+                    yield model
+                    if isinstance(resource, ModelResource):
+                        yield from resource.full_related_models(seen)
+
+    def count_cache_access(self, outcome):
+        key = resource_cache_stats_key(self._meta.api_name, self._meta.resource_name, outcome)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, None):
+                cache.incr(key)
 
 
 TIMEDELTA_REGEX = re.compile(r'^(?P<days>\d+d)?\s?(?P<hours>\d+h)?\s?(?P<minutes>\d+m)?\s?(?P<seconds>\d+s?)$')
@@ -31,3 +31,4 @@ class ToOneField(tastypie.fields.ToOneField): ...
 class TimedeltaField(tastypie.fields.ApiField): ...
 
 def autodiscover() -> None: ...
+def get_resource(path: str) -> ModelResource: ...
@@ -0,0 +1,72 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures the time taken to export a whole API resource page by page, as a
+# mirror would, once following the offset pagination links and once
+# following the cursor pagination links.  The cache generation of the
+# resource's model is bumped before each run, so that no page is served
+# from the response cache.
+
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+import debug                            # pyflakes:ignore
+
+from ietf.api import get_resource
+from ietf.api.serializer import invalidate_model_caches
+
+
+class Command(BaseCommand):
+    help = 'Benchmark exporting an API resource, such as doc/docevent, with offset and with cursor pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', help="the resource to export, as 'api_name/resource_name'")
+        parser.add_argument('-l', '--limit', type=int, default=100,
+                            help='number of objects per page (default 100)')
+        parser.add_argument('-p', '--pages', type=int, default=0,
+                            help='stop after PAGES pages (default: export the whole resource)')
+
+    def handle(self, resource, limit, pages, *args, **options):
+        try:
+            self.resource = get_resource(resource)
+        except KeyError:
+            raise CommandError("There is no API resource '%s'" % resource)
+        self.view = self.resource.wrap_view('dispatch_list')
+        self.factory = RequestFactory()
+
+        for label, first_query in (('offset', {'limit': limit, 'offset': 0}),
+                                   ('cursor', {'limit': limit, 'cursor': ''})):
+            invalidate_model_caches(self.resource._meta.object_class)
+            count, times = self.run(first_query, pages)
+            elapsed = sum(times)
+            self.stdout.write('%s: %7d objects in %5d pages, %8.2f s, %8.1f objects/s, first page %7.1f ms, last page %7.1f ms' % (
+                label, count, len(times), elapsed, count / elapsed if elapsed else 0,
+                times[0] * 1000 if times else 0, times[-1] * 1000 if times else 0))
+
+    def run(self, query, pages):
+        count = 0
+        times = []
+        while query is not None and (not pages or len(times) < pages):
+            request = self.factory.get(self.resource.get_resource_uri(), query, HTTP_ACCEPT='application/json')
+            request.user = AnonymousUser()
+            start = time.time()
+            response = self.view(request)
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+            times.append(time.time() - start)
+            if response.status_code != 200:
+                raise CommandError('Request for %s failed with status %s: %s' % (query, response.status_code, content))
+            data = json.loads(content)
+            count += len(data['objects'])
+            meta = data['meta']
+            if 'cursor' in query:
+                query = dict(query, cursor=meta['next_cursor']) if meta['next_cursor'] else None
+            else:
+                query = dict(query, offset=meta['offset'] + meta['limit']) if meta['next'] else None
+        return count, times
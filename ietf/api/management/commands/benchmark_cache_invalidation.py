@@ -0,0 +1,120 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures the write throughput of the RFC index sync with the cache
+# invalidation signal handlers which deleted the cache flag of every model
+# written to, one cache call per write, and with the current handlers which
+# collect the models written to and remove their cache generations once.
+# Each run is rolled back, so both see the same database.
+
+import datetime
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+import debug                            # pyflakes:ignore
+
+from ietf.api import serializer
+from ietf.api.serializer import model_top_level_cache_key
+from ietf.sync.rfceditor import parse_index, update_docs_from_rfc_index
+
+
+class CountingCache(object):
+    """Proxy for a cache which counts the calls made to it"""
+    def __init__(self, cache):
+        self.cache = cache
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.cache, name)
+        if not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+        return call
+
+def legacy_clear_top_level_cache(sender, instance, *args, **kwargs):
+    serializer.cache.delete(model_top_level_cache_key(instance))
+
+def legacy_clear_top_level_cache_m2m(sender, instance, action, reverse, model, *args, **kwargs):
+    serializer.cache.delete_many((
+        model_top_level_cache_key(instance),
+        model_top_level_cache_key(model),
+        model_top_level_cache_key(sender),
+    ))
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the RFC index sync with the old and the new API cache invalidation handlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('index', help='path to a copy of rfc-index.xml')
+        parser.add_argument('errata', nargs='?', help='path to a copy of the errata JSON (default no errata)')
+        parser.add_argument('--days', type=int, default=365,
+                            help='skip RFCs published more than DAYS days ago (default 365)')
+
+    def handle(self, index, errata, days, *args, **options):
+        with io.open(index, encoding='utf-8') as f:
+            index_data = parse_index(f)
+        errata_data = []
+        if errata:
+            with io.open(errata, encoding='utf-8') as f:
+                errata_data = json.load(f)
+        if not index_data:
+            raise CommandError('No entries found in %s' % index)
+        skip_date = datetime.date.today() - datetime.timedelta(days=days)
+
+        for label, legacy in (('old handlers', True), ('new handlers', False)):
+            writes, calls, elapsed = self.run(index_data, errata_data, skip_date, legacy)
+            self.stdout.write('%-13s %6d writes in %7.2f s, %8.1f writes/s, %6d cache calls' % (
+                label + ':', writes, elapsed, writes / elapsed if elapsed else 0, calls))
+
+    def run(self, index_data, errata_data, skip_date, legacy):
+        writes = [0]
+        def count_write(sender, **kwargs):
+            if not kwargs.get('action', 'post_').startswith('pre_'):
+                writes[0] += 1
+        post_save.connect(count_write, dispatch_uid='benchmark_count_write')
+        post_delete.connect(count_write, dispatch_uid='benchmark_count_write')
+        m2m_changed.connect(count_write, dispatch_uid='benchmark_count_write')
+        if legacy:
+            for signal in (post_save, post_delete, m2m_changed):
+                signal.disconnect(dispatch_uid='clear_top_level_cache')
+            post_save.connect(legacy_clear_top_level_cache, dispatch_uid='legacy_clear_top_level_cache')
+            post_delete.connect(legacy_clear_top_level_cache, dispatch_uid='legacy_clear_top_level_cache')
+            m2m_changed.connect(legacy_clear_top_level_cache_m2m, dispatch_uid='legacy_clear_top_level_cache')
+
+        real_cache = serializer.cache
+        serializer.cache = CountingCache(real_cache)
+        try:
+            start = time.time()
+            with transaction.atomic():
+                for __ in update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=skip_date):
+                    pass
+                # the transaction is rolled back below, so do what would
+                # otherwise have been done on commit
+                serializer.flush_cache_invalidations()
+                elapsed = time.time() - start
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            calls = serializer.cache.calls
+            serializer.cache = real_cache
+            for signal in (post_save, post_delete, m2m_changed):
+                signal.disconnect(dispatch_uid='benchmark_count_write')
+            if legacy:
+                for signal in (post_save, post_delete, m2m_changed):
+                    signal.disconnect(dispatch_uid='legacy_clear_top_level_cache')
+                post_save.connect(serializer.clear_top_level_cache, dispatch_uid='clear_top_level_cache')
+                post_delete.connect(serializer.clear_top_level_cache, dispatch_uid='clear_top_level_cache')
+                m2m_changed.connect(serializer.clear_top_level_cache_m2m, dispatch_uid='clear_top_level_cache')
+        return writes[0], calls, elapsed
@@ -0,0 +1,67 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+import io
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from tastypie.exceptions import BadRequest
+
+import debug                            # pyflakes:ignore
+
+from ietf.api import get_resource
+
+
+class Command(BaseCommand):
+    help = ('Write all objects of an API resource, such as doc/docevent, to a file with one JSON '
+            'object per line, as they would be served by the API.  The objects are read in '
+            'primary key order, a batch at a time, so the memory used stays the same however '
+            'large the resource is.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', help="the resource to mirror, as 'api_name/resource_name'")
+        parser.add_argument('output', help="the file to write to, or '-' for stdout")
+        parser.add_argument('filters', nargs='*', metavar='field=value',
+                            help='API filters to apply, for instance type=new_revision')
+        parser.add_argument('--cursor', help='only write objects with primary keys after CURSOR, '
+                            'appending to the output file')
+        parser.add_argument('-b', '--batch-size', type=int, default=1000,
+                            help='number of objects to read per query (default 1000)')
+
+    def handle(self, resource, output, filters, cursor, batch_size, *args, **options):
+        try:
+            api_resource = get_resource(resource)
+        except KeyError:
+            raise CommandError("There is no API resource '%s'" % resource)
+        try:
+            query = dict(f.split('=', 1) for f in filters)
+        except ValueError:
+            raise CommandError("Filters must be given as field=value")
+
+        request = RequestFactory().get(api_resource.get_resource_uri(), query)
+        request.user = AnonymousUser()
+        try:
+            objects = api_resource.obj_get_list(bundle=api_resource.build_bundle(request=request))
+            if cursor is not None:
+                cursor = api_resource.parse_cursor(cursor)
+        except BadRequest as e:
+            raise CommandError(str(e))
+
+        if output == '-':
+            file = self.stdout
+        else:
+            file = io.open(output, 'a' if cursor is not None else 'w', encoding='utf-8')
+        count = 0
+        try:
+            for obj in api_resource.iter_cursor_objects(objects, cursor, batch_size=batch_size):
+                file.write(api_resource.serialize_cursor_object(request, obj) + '\n')
+                count += 1
+                last = obj.pk
+        finally:
+            if file is not self.stdout:
+                file.close()
+
+        if options['verbosity'] > 0:
+            self.stderr.write('Wrote %d objects%s' % (count, ', the last with key %s' % last if count else ''))
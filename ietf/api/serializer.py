@@ -4,18 +4,24 @@
 
 import hashlib
 import json
+import threading
+
+from contextlib import contextmanager
 
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist, FieldError
 from django.core.serializers.json import Serializer
 from django.http import HttpResponse
 from django.utils.encoding import smart_text
+from django.db import transaction
 from django.db.models import Field
 from django.db.models.query import QuerySet
 from django.db.models.signals import post_save, post_delete, m2m_changed
 
 import debug                            # pyflakes:ignore
 
+from ietf.utils.cache import generation_cache_key, get_generation
+
 
 def filter_from_queryargs(request):
     #@debug.trace
@@ -56,16 +62,68 @@ def cached_get(key, calculate_value, timeout=None):
 def model_top_level_cache_key(model):
     return model.__module__ + '.' + model._meta.model.__name__
 
+# Values cached for a model are keyed on a generation number for the model
+# (see ietf.utils.cache), and writes to the model invalidate them by removing
+# the generation.  The models written to are collected in memory, and the
+# generations removed with a single delete_many() when the transaction
+# commits, or when the outermost batched_cache_invalidation() block exits.
+# The generations only exist in the cache for models which have had values
+# cached, so the removal is a no-op for all other models.
+
+_invalidation = threading.local()
+
+def _pending_invalidations():
+    if not hasattr(_invalidation, 'pending'):
+        _invalidation.pending = set()
+        _invalidation.batch_depth = 0
+    return _invalidation.pending
+
+def model_cache_generation(model):
+    """Get the current cache generation for model"""
+    return get_generation(model_top_level_cache_key(model))
+
+def flush_cache_invalidations():
+    pending = _pending_invalidations()
+    if pending:
+        keys = [ generation_cache_key(name) for name in pending ]
+        pending.clear()
+        cache.delete_many(keys)
+
+def _schedule_flush():
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        flush_cache_invalidations()
+    elif not any(func is flush_cache_invalidations for __, func in connection.run_on_commit):
+        transaction.on_commit(flush_cache_invalidations)
+
+def invalidate_model_caches(*models):
+    """Invalidate the values cached for the given models, once the current
+    transaction or invalidation batch is done"""
+    _pending_invalidations().update(model_top_level_cache_key(model) for model in models)
+    if not _invalidation.batch_depth:
+        _schedule_flush()
+
+@contextmanager
+def batched_cache_invalidation():
+    """Collect the cache invalidations of the writes done in the block, also
+    outside transactions, and carry them out together at the end of it"""
+    _pending_invalidations()
+    _invalidation.batch_depth += 1
+    try:
+        yield
+    finally:
+        _invalidation.batch_depth -= 1
+        if not _invalidation.batch_depth:
+            _schedule_flush()
+
 def clear_top_level_cache(sender, instance, *args, **kwargs):
-    cache.delete(model_top_level_cache_key(instance))
+    invalidate_model_caches(sender)
 
 def clear_top_level_cache_m2m(sender, instance, action, reverse, model, *args, **kwargs):
+    if not action.startswith('post_'):
+        return
     # Purge cache for both models affected and the potentially custom 'through' model
-    cache.delete_many((
-        model_top_level_cache_key(instance),
-        model_top_level_cache_key(model),
-        model_top_level_cache_key(sender),
-    ))
+    invalidate_model_caches(instance.__class__, model, sender)
 
 post_save.connect(clear_top_level_cache, dispatch_uid='clear_top_level_cache')
 post_delete.connect(clear_top_level_cache, dispatch_uid='clear_top_level_cache')
@@ -96,15 +154,8 @@ class AdminJsonSerializer(Serializer):
         qi = options.get('query_info', '').encode('utf-8')
         if len(list(queryset)) == 1:
             obj = queryset[0]
-            key = 'json:%s:%s' % (hashlib.md5(qi).hexdigest(), unique_obj_name(obj))
-            is_cached = cache.get(model_top_level_cache_key(obj)) is True
-            if is_cached:
-                value = cached_get(key, lambda: super(AdminJsonSerializer, self).serialize(queryset, **options))
-            else:
-               value = super(AdminJsonSerializer, self).serialize(queryset, **options)
-               cache.set(key, value)
-               cache.set(model_top_level_cache_key(obj), True)
-            return value
+            key = 'json:%s:%s:%s' % (hashlib.md5(qi).hexdigest(), model_cache_generation(obj), unique_obj_name(obj))
+            return cached_get(key, lambda: super(AdminJsonSerializer, self).serialize(queryset, **options))
         else:
             return super(AdminJsonSerializer, self).serialize(queryset, **options)
 
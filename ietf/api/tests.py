@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 
+import io
 import json
 import html
 import os
@@ -12,7 +13,9 @@ from mock import patch
 
 from django.apps import apps
 from django.conf import settings
-from django.test import Client
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, override_settings
 from django.urls import reverse as urlreverse
 from django.utils import timezone
 
@@ -21,12 +24,16 @@ from tastypie.test import ResourceTestCaseMixin
 import debug                            # pyflakes:ignore
 
 import ietf
+from ietf.api.serializer import ( AdminJsonSerializer, batched_cache_invalidation, flush_cache_invalidations,
+    model_top_level_cache_key )
+from ietf.doc.factories import WgDraftFactory
 from ietf.group.factories import RoleFactory
 from ietf.meeting.factories import MeetingFactory, SessionFactory
 from ietf.meeting.test_data import make_meeting_test_data
 from ietf.person.factories import PersonFactory, random_faker
-from ietf.person.models import PersonalApiKey
+from ietf.person.models import Email, Person, PersonalApiKey
 from ietf.stats.models import MeetingRegistration
+from ietf.utils.cache import generation_cache_key
 from ietf.utils.mail import outbox, get_payload_text
 from ietf.utils.test_utils import TestCase, login_testing_unauthorized
 
@@ -247,6 +254,42 @@ class CustomApiTests(TestCase):
         self.assertEqual(data['ascii'], person.ascii)
         self.assertEqual(data['user']['email'], person.user.email)
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_serializer_cache_invalidation(self):
+        cache.clear()
+        person = PersonFactory(name='Alice Example')
+        other = PersonFactory()
+        def serialized_name(p):
+            return json.loads(AdminJsonSerializer().serialize([p]))[0]['name']
+
+        self.assertEqual(serialized_name(person), 'Alice Example')
+        # not a signalled write, so the cached value is served
+        Person.objects.filter(pk=person.pk).update(name='Bob Example')
+        self.assertEqual(serialized_name(Person.objects.get(pk=person.pk)), 'Alice Example')
+
+        # writes are collected, and only invalidate the cache at commit
+        other.save()
+        other.save()
+        self.assertEqual(serialized_name(Person.objects.get(pk=person.pk)), 'Alice Example')
+        with patch.object(cache, 'delete_many', wraps=cache.delete_many) as delete_many:
+            flush_cache_invalidations()
+            flush_cache_invalidations()
+        self.assertEqual(delete_many.call_count, 1)
+        self.assertEqual(serialized_name(Person.objects.get(pk=person.pk)), 'Bob Example')
+
+        # batched blocks collect writes to several models
+        with patch.object(cache, 'delete_many', wraps=cache.delete_many) as delete_many:
+            with batched_cache_invalidation():
+                with batched_cache_invalidation():
+                    person.save()
+                other.email_set.first().save()
+                self.assertEqual(delete_many.call_count, 0)
+            flush_cache_invalidations()
+        self.assertEqual(delete_many.call_count, 1)
+        keys = delete_many.call_args[0][0]
+        self.assertIn(generation_cache_key(model_top_level_cache_key(Person)), keys)
+        self.assertIn(generation_cache_key(model_top_level_cache_key(Email)), keys)
+
     def test_api_v2_person_export_view(self):
         url = urlreverse('ietf.api.views.ApiV2PersonExportView')
         robot = PersonFactory(user__is_staff=True)
@@ -405,6 +448,112 @@ class TastypieApiTestCase(ResourceTestCaseMixin, TestCase):
             self.assertIn(name, resource_list,
                         "Expected a REST API resource for %s, but didn't find one" % name)
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_api_response_cache(self):
+        cache.clear()
+        person = PersonFactory(name='Alice Example')
+        client = Client(Accept='application/json')
+        url = '/api/v1/person/person/%s/' % person.pk
+
+        r = client.get(url)
+        self.assertValidJSONResponse(r)
+        etag = r['ETag']
+        r = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r['ETag'], etag)
+
+        # the response is cached until the model is written to
+        Person.objects.filter(pk=person.pk).update(name='Bob Example')
+        r = client.get(url)
+        self.assertEqual(r.json()['name'], 'Alice Example')
+        person.name = 'Bob Example'
+        person.save()
+        flush_cache_invalidations()     # done on commit outside of tests
+        r = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['name'], 'Bob Example')
+        self.assertNotEqual(r['ETag'], etag)
+
+        # list responses are shared by requests with the same arguments
+        r1 = client.get('/api/v1/person/person/', {'name': 'Bob Example', 'limit': 5})
+        r2 = client.get('/api/v1/person/person/?limit=5&name=Bob+Example')
+        self.assertValidJSONResponse(r2)
+        self.assertEqual(r1['ETag'], r2['ETag'])
+        self.assertEqual(r2.json()['objects'][0]['name'], 'Bob Example')
+
+        stats_url = urlreverse('ietf.api.views.cache_stats')
+        secretary = RoleFactory(name_id='secr', group__acronym='secretariat').person
+        login_testing_unauthorized(self, secretary.user.username, stats_url)
+        r = self.client.get(stats_url)
+        self.assertEqual(r.json()['person/person'], {'hit': 3, 'miss': 3})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_api_response_cache_related_filter(self):
+        cache.clear()
+        draft = WgDraftFactory(group__acronym='mars')
+        client = Client(Accept='application/json')
+        url = '/api/v1/doc/document/'
+
+        r = client.get(url, {'group__acronym': 'mars'})
+        self.assertEqual([ d['name'] for d in r.json()['objects'] ], [draft.name])
+        r = client.get(url, {'group__acronym': 'venus'})
+        self.assertEqual(r.json()['objects'], [])
+
+        # a write to the group the documents are filtered on gives new responses
+        group = draft.group
+        group.acronym = 'venus'
+        group.save()
+        flush_cache_invalidations()     # done on commit outside of tests
+        r = client.get(url, {'group__acronym': 'mars'})
+        self.assertEqual(r.json()['objects'], [])
+        r = client.get(url, {'group__acronym': 'venus'})
+        self.assertEqual([ d['name'] for d in r.json()['objects'] ], [draft.name])
+
+    def test_api_cursor_pagination(self):
+        PersonFactory.create_batch(5)
+        client = Client(Accept='application/json')
+        url = '/api/v1/person/person/'
+
+        objects = []
+        query = {'cursor': '', 'limit': 2}
+        pages = 0
+        while query:
+            r = client.get(url, query)
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.streaming)
+            data = json.loads(b''.join(r.streaming_content))
+            self.assertLessEqual(len(data['objects']), 2)
+            objects.extend(data['objects'])
+            pages += 1
+            next_cursor = data['meta']['next_cursor']
+            query = {'cursor': next_cursor, 'limit': 2} if next_cursor else None
+        ids = list(Person.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertEqual([o['id'] for o in objects], ids)
+        self.assertEqual(pages, (len(ids) + 1) // 2)
+
+        # the objects are the same as in offset pages
+        r = client.get(url, {'limit': 2, 'order_by': 'id'})
+        self.assertEqual(r.json()['objects'], objects[:2])
+
+        # filters apply, and the next url carries them on
+        r = client.get(url, {'cursor': ids[0], 'limit': 1, 'id__in': ','.join(str(i) for i in ids[-2:])})
+        data = json.loads(b''.join(r.streaming_content))
+        self.assertEqual([o['id'] for o in data['objects']], ids[-2:-1])
+        self.assertIn('id__in=', data['meta']['next'])
+
+        r = client.get(url, {'cursor': '', 'order_by': 'name'})
+        self.assertEqual(r.status_code, 400)
+        r = client.get(url, {'cursor': 'abc'})
+        self.assertEqual(r.status_code, 400)
+
+        # the mirror command writes the same objects
+        out = io.StringIO()
+        call_command('mirror_api_resource', 'person/person', '-', '--batch-size', '2', stdout=out, verbosity=0)
+        self.assertEqual([json.loads(l) for l in out.getvalue().splitlines()], objects)
+        out = io.StringIO()
+        call_command('mirror_api_resource', 'person/person', '-', 'id__in=%s' % ids[-1], '--cursor', str(ids[0]), stdout=out, verbosity=0)
+        self.assertEqual([json.loads(l)['id'] for l in out.getvalue().splitlines()], ids[-1:])
+
     def test_all_model_resources_exist(self):
         client = Client(Accept='application/json')
         r = client.get("/api/v1")
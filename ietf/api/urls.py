@@ -21,6 +21,8 @@ urlpatterns = [
     url(r'^v2/person/person', api_views.ApiV2PersonExportView.as_view()),
     #
     # --- Custom API endpoints, sorted alphabetically ---
+    # Hit and miss counts of the v1 API response caches, requires secretariat role
+    url(r'^cache/stats/?$', api_views.cache_stats),
     # GPRD: export of personal information for the logged-in person
     url(r'^export/personal-information/$', api_views.PersonalInformationExportView.as_view()),
     # Let IESG members set positions programmatically
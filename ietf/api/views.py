@@ -10,6 +10,7 @@ from jwcrypto.jwk import JWK
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.http import HttpResponse
@@ -29,7 +30,7 @@ import debug                            # pyflakes:ignore
 
 import ietf
 from ietf.person.models import Person, Email
-from ietf.api import _api_list
+from ietf.api import _api_list, resource_cache_stats_key
 from ietf.api.serializer import JsonExportMixin
 from ietf.ietfauth.views import send_account_creation_email
 from ietf.ietfauth.utils import role_required
@@ -213,6 +214,23 @@ def version(request):
             )
     
 
+@role_required('Secretariat')
+def cache_stats(request):
+    """Hit and miss counts of the tastypie response caches, per resource"""
+    keys = {}
+    for api_name, api in _api_list:
+        for resource_name in api._registry:
+            for outcome in ('hit', 'miss'):
+                keys[resource_cache_stats_key(api_name, resource_name, outcome)] = (api_name, resource_name, outcome)
+    counts = cache.get_many(list(keys))
+    stats = {}
+    for key, (api_name, resource_name, outcome) in keys.items():
+        if key in counts:
+            resource_stats = stats.setdefault('%s/%s' % (api_name, resource_name), {'hit': 0, 'miss': 0})
+            resource_stats[outcome] = counts[key]
+    return HttpResponse(json.dumps(stats, sort_keys=True, indent=3), content_type='application/json')
+
+
 @require_api_key
 @csrf_exempt
 def app_auth(request):
@@ -0,0 +1,72 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Compares matching draft names against name_contains rules one rule at a
+# time, as was done for each new draft, with the combined NameContainsMatcher.
+# The rules are generated from group acronyms and words in draft names, and
+# are not saved.
+
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+import debug                            # pyflakes:ignore
+
+from ietf.community.models import SearchRule
+from ietf.community.utils import NameContainsMatcher
+from ietf.doc.models import DocAlias
+from ietf.group.models import Group
+
+
+class Command(BaseCommand):
+    help = 'Benchmark matching draft names against many name_contains rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-r', '--rules', type=int, default=3000,
+                            help='number of name_contains rules to generate (default 3000)')
+        parser.add_argument('-n', '--names', type=int, default=0,
+                            help='number of draft names to match (default all)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed for generating the rules')
+
+    def handle(self, rules, names, seed, *args, **options):
+        random.seed(seed)
+        corpus = list(DocAlias.objects.filter(name__startswith='draft-').values_list('name', flat=True))
+        if not corpus:
+            raise CommandError('There are no draft names to match')
+        if names:
+            corpus = random.sample(corpus, min(names, len(corpus)))
+        acronyms = list(Group.objects.values_list('acronym', flat=True)) or ['ietf']
+        words = sorted(set(w for name in random.sample(corpus, min(2000, len(corpus))) for w in name.split('-')[2:] if w.isalpha()))
+        words = words or acronyms
+
+        templates = [
+            lambda: 'draft-ietf-%s-' % random.choice(acronyms),
+            lambda: 'draft-.*-%s' % random.choice(acronyms),
+            lambda: random.choice(words),
+            lambda: '%s.*%s' % (random.choice(words), random.choice(words)),
+            lambda: '-(%s|%s)-' % (random.choice(words), random.choice(words)),
+        ]
+        search_rules = [ SearchRule(pk=i+1, rule_type='name_contains', text=random.choice(templates)())
+                         for i in range(rules) ]
+        self.stdout.write('%d rules, %d draft names' % (len(search_rules), len(corpus)))
+
+        start = time.time()
+        compiled = [ (re.compile(r.text), r.pk) for r in search_rules ]
+        expected = [ set(pk for regex, pk in compiled if regex.search(name)) for name in corpus ]
+        elapsed = time.time() - start
+        self.stdout.write('One rule at a time: %8.1f names/s' % (len(corpus) / elapsed))
+
+        start = time.time()
+        matcher = NameContainsMatcher(search_rules)
+        setup = time.time() - start
+        start = time.time()
+        matched = [ matcher.match(name) for name in corpus ]
+        elapsed = time.time() - start
+        self.stdout.write('Combined matcher:   %8.1f names/s (%.2f s to compile)' % (len(corpus) / elapsed, setup))
+
+        mismatches = sum(1 for a, b in zip(expected, matched) if a != b)
+        if mismatches:
+            raise CommandError('%d names matched different rules' % mismatches)
@@ -0,0 +1,70 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+
+# Generated by Django 2.2.28 on 2022-06-02 09:41
+
+from django.db import migrations, models
+from django.db.models import Q
+import django.db.models.deletion
+import ietf.utils.models
+
+
+def forward(apps, schema_editor):
+    # Fill in the documents tracked by the existing lists, as the list views
+    # and the notifications use the index as soon as it exists.  This does
+    # what reset_tracked_documents_for_community_list() does, with the
+    # models of this migration.
+    CommunityList = apps.get_model('community', 'CommunityList')
+    SearchRule = apps.get_model('community', 'SearchRule')
+    TrackedDocument = apps.get_model('community', 'TrackedDocument')
+    Document = apps.get_model('doc', 'Document')
+
+    def docs_matching_rule(rule):
+        docs = Document.objects.all()
+        if rule.rule_type in ['group', 'area', 'group_rfc', 'area_rfc']:
+            return docs.filter(Q(group=rule.group_id) | Q(group__parent=rule.group_id), states=rule.state_id)
+        elif rule.rule_type.startswith("state_"):
+            return docs.filter(states=rule.state_id)
+        elif rule.rule_type in ["author", "author_rfc"]:
+            return docs.filter(states=rule.state_id, documentauthor__person=rule.person_id)
+        elif rule.rule_type == "ad":
+            return docs.filter(states=rule.state_id, ad=rule.person_id)
+        elif rule.rule_type == "shepherd":
+            return docs.filter(states=rule.state_id, shepherd__person=rule.person_id)
+        elif rule.rule_type == "name_contains":
+            return docs.filter(states=rule.state_id, searchrule=rule)
+        return docs.none()
+
+    for clist in CommunityList.objects.all():
+        doc_ids = set(clist.added_docs.values_list("pk", flat=True))
+        for rule in SearchRule.objects.filter(community_list=clist):
+            doc_ids |= set(docs_matching_rule(rule).values_list("pk", flat=True))
+        TrackedDocument.objects.bulk_create(
+            [ TrackedDocument(community_list=clist, document_id=doc_id) for doc_id in doc_ids ]
+        )
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_remove_docs2_m2m'),
+        ('doc', '0044_procmaterials_states'),
+        ('person', '0022_auto_20220513_1456'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackedDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('community_list', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='community.CommunityList')),
+                ('document', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='doc.Document')),
+            ],
+            options={
+                'unique_together': {('community_list', 'document')},
+            },
+        ),
+        migrations.RunPython(forward, reverse),
+    ]
@@ -7,9 +7,10 @@ from django.db import models
 from django.db.models import signals
 from django.urls import reverse as urlreverse
 
-from ietf.doc.models import Document, DocEvent, State
+from ietf.doc.models import Document, DocEvent, DocumentAuthor, State
 from ietf.group.models import Group
 from ietf.person.models import Person, Email
+from ietf.utils.cache import bump_generation
 from ietf.utils.models import ForeignKey
 
 class CommunityList(models.Model):
@@ -82,6 +83,20 @@ class SearchRule(models.Model):
     def __str__(self):
         return "%s %s %s/%s/%s/%s" % (self.community_list, self.rule_type, self.state, self.group, self.person, self.text)
 
+class TrackedDocument(models.Model):
+    """Materialized view of the documents tracked by a community list, either
+    added explicitly or matched by one of its search rules.  It is updated
+    incrementally by the signal handlers below, and can be rebuilt with the
+    update_community_list_index management command."""
+    community_list = ForeignKey(CommunityList)
+    document = ForeignKey(Document)
+
+    def __str__(self):
+        return "%s tracks %s" % (self.community_list, self.document.name)
+
+    class Meta:
+        unique_together = [('community_list', 'document')]
+
 class EmailSubscription(models.Model):
     community_list = ForeignKey(CommunityList)
     email = ForeignKey(Email)
@@ -111,3 +126,90 @@ def notify_events(sender, instance, **kwargs):
 
 
 signals.post_save.connect(notify_events)
+
+
+# The document fields the search rules look at; the states, authors and
+# name_contains index have signal handlers of their own
+RULE_DOCUMENT_FIELDS = ('group_id', 'ad_id', 'shepherd_id')
+
+def remember_rule_fields_of_document(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._community_rule_fields = Document.objects.filter(pk=instance.pk).values_list(*RULE_DOCUMENT_FIELDS).first()
+
+def update_tracked_documents_for_document(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    from ietf.community.utils import update_tracked_documents_for_doc
+    if isinstance(instance, Document):
+        old_fields = instance.__dict__.pop('_community_rule_fields', None)
+        if not created and old_fields == tuple(getattr(instance, f) for f in RULE_DOCUMENT_FIELDS):
+            return
+    elif isinstance(instance, DocumentAuthor):
+        instance = Document.objects.filter(pk=instance.document_id).first()
+        if instance is None:
+            return
+    update_tracked_documents_for_doc(instance)
+
+def remember_parent_of_group(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._community_old_parent_id = Group.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first()
+
+def update_tracked_documents_for_group(sender, instance, raw=False, created=False, **kwargs):
+    """Bring the lists with rules for the old or new parent of a group up to
+    date, as the group and area rules also match the documents of the
+    subgroups"""
+    if raw:
+        return
+    old_parent_id = instance.__dict__.pop('_community_old_parent_id', None)
+    if created or old_parent_id == instance.parent_id:
+        return
+    from ietf.community.utils import reset_tracked_documents_for_community_list
+    parent_ids = [ pk for pk in (old_parent_id, instance.parent_id) if pk ]
+    for clist in CommunityList.objects.filter(searchrule__rule_type__in=['group', 'area', 'group_rfc', 'area_rfc'],
+                                              searchrule__group__in=parent_ids).distinct():
+        reset_tracked_documents_for_community_list(clist)
+
+def update_tracked_documents_for_rule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from ietf.community.utils import reset_tracked_documents_for_community_list
+    clist = CommunityList.objects.filter(pk=instance.community_list_id).first()
+    if clist:
+        reset_tracked_documents_for_community_list(clist)
+
+def invalidate_name_contains_matcher(sender, instance, **kwargs):
+    if instance.rule_type == "name_contains":
+        from ietf.community.utils import NAME_CONTAINS_RULES_GENERATION
+        bump_generation(NAME_CONTAINS_RULES_GENERATION)
+
+def update_tracked_documents_for_m2m(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from ietf.community.utils import update_tracked_documents_for_doc, reset_tracked_documents_for_community_list
+    if isinstance(instance, Document):
+        update_tracked_documents_for_doc(instance)
+    elif isinstance(instance, (CommunityList, SearchRule)) and (pk_set is None or len(pk_set) > 20):
+        clist = instance.community_list if isinstance(instance, SearchRule) else instance
+        reset_tracked_documents_for_community_list(clist)
+    else:
+        # pk_set holds the pks of the changed documents
+        for doc in Document.objects.filter(pk__in=pk_set or []):
+            update_tracked_documents_for_doc(doc)
+
+# Document changes which can change the community lists tracking it
+signals.pre_save.connect(remember_rule_fields_of_document, sender=Document)
+signals.post_save.connect(update_tracked_documents_for_document, sender=Document)
+signals.m2m_changed.connect(update_tracked_documents_for_m2m, sender=Document.states.through)
+signals.post_save.connect(update_tracked_documents_for_document, sender=DocumentAuthor)
+signals.post_delete.connect(update_tracked_documents_for_document, sender=DocumentAuthor)
+signals.pre_save.connect(remember_parent_of_group, sender=Group)
+signals.post_save.connect(update_tracked_documents_for_group, sender=Group)
+# Community list changes
+signals.m2m_changed.connect(update_tracked_documents_for_m2m, sender=CommunityList.added_docs.through)
+signals.m2m_changed.connect(update_tracked_documents_for_m2m, sender=SearchRule.name_contains_index.through)
+signals.post_save.connect(update_tracked_documents_for_rule, sender=SearchRule)
+signals.post_save.connect(invalidate_name_contains_matcher, sender=SearchRule)
+signals.post_delete.connect(invalidate_name_contains_matcher, sender=SearchRule)
+signals.post_delete.connect(update_tracked_documents_for_rule, sender=SearchRule)
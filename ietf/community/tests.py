@@ -1,9 +1,12 @@
 # Copyright The IETF Trust 2016-2020, All Rights Reserved
 # -*- coding: utf-8 -*-
 
+import re
 
 from pyquery import PyQuery
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse as urlreverse
 from django.contrib.auth.models import User
 
@@ -13,7 +16,9 @@ import debug                            # pyflakes:ignore
 
 from ietf.community.models import CommunityList, SearchRule, EmailSubscription
 from ietf.community.utils import docs_matching_community_list_rule, community_list_rules_matching_doc
-from ietf.community.utils import reset_name_contains_index_for_rule
+from ietf.community.utils import reset_name_contains_index_for_rule, reset_name_contains_indexes, reset_tracked_documents_for_community_list
+from ietf.community.utils import docs_tracked_by_community_list, community_lists_tracking_doc
+from ietf.community.utils import NameContainsMatcher, required_literals, update_name_contains_indexes_with_new_doc
 import ietf.community.views
 from ietf.group.models import Group
 from ietf.group.utils import setup_default_community_list_for_group
@@ -76,6 +81,127 @@ class CommunityListTests(WebTest):
         self.assertTrue(draft in list(docs_matching_community_list_rule(rule_shepherd)))
         self.assertTrue(draft in list(docs_matching_community_list_rule(rule_name_contains)))
 
+    def test_tracked_documents_index(self):
+        ad = Person.objects.get(user__username='ad')
+        draft = WgDraftFactory(states=[('draft','active')])
+        other = WgDraftFactory(states=[('draft','active')], authors=[ad])
+        clist = CommunityList.objects.create(user=PersonFactory(user__username='plain').user)
+        active = State.objects.get(type="draft", slug="active")
+
+        def tracked():
+            return set(docs_tracked_by_community_list(clist))
+
+        SearchRule.objects.create(rule_type="ad", state=active, person=ad, community_list=clist)
+        SearchRule.objects.create(rule_type="author", state=active, person=ad, community_list=clist)
+        self.assertEqual(tracked(), set([other]))
+        self.assertEqual(list(community_lists_tracking_doc(other)), [clist])
+
+        # document changes
+        draft.ad = ad
+        draft.save()
+        self.assertEqual(tracked(), set([draft, other]))
+        draft.set_state(State.objects.get(type="draft", slug="expired"))
+        self.assertEqual(tracked(), set([other]))
+        other.documentauthor_set.all().delete()
+        self.assertEqual(tracked(), set())
+
+        # list changes
+        clist.added_docs.add(other)
+        self.assertEqual(tracked(), set([other]))
+        clist.searchrule_set.filter(rule_type="ad").update(state=State.objects.get(type="draft", slug="expired"))
+        reset_tracked_documents_for_community_list(clist)
+        self.assertEqual(tracked(), set([draft, other]))
+        clist.searchrule_set.filter(rule_type="ad").delete()
+        self.assertEqual(tracked(), set([other]))
+        clist.added_docs.remove(other)
+        self.assertEqual(tracked(), set())
+        self.assertEqual(list(community_lists_tracking_doc(other)), [])
+
+    def test_tracked_documents_for_unchanged_document(self):
+        draft = WgDraftFactory(states=[('draft','active')])
+        clist = CommunityList.objects.create(user=PersonFactory(user__username='plain').user)
+        SearchRule.objects.create(rule_type="group", group=draft.group, state=State.objects.get(type="draft", slug="active"), community_list=clist)
+        self.assertEqual(list(community_lists_tracking_doc(draft)), [clist])
+
+        # a save which doesn't change what the rules look at doesn't look at the rules
+        draft.title = "A new title"
+        with CaptureQueriesContext(connection) as queries:
+            draft.save()
+        self.assertFalse([ q for q in queries.captured_queries if 'community_searchrule' in q['sql'] ])
+
+    def test_tracked_documents_for_group_parent_change(self):
+        draft = WgDraftFactory(states=[('draft','active')])
+        area = GroupFactory(type_id='area')
+        clist = CommunityList.objects.create(user=PersonFactory(user__username='plain').user)
+        SearchRule.objects.create(rule_type="area", group=area, state=State.objects.get(type="draft", slug="active"), community_list=clist)
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), set())
+
+        group = draft.group
+        old_parent = group.parent
+        group.parent = area
+        group.save()
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), set([draft]))
+
+        group.parent = old_parent
+        group.save()
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), set())
+
+    def test_name_contains_matcher(self):
+        patterns = ['mars', '^draft-ietf-', '-(foo|bar)-', 'tls$', 'quic|sec', r'draft-.*-ma.?rs\b', '[a-c]{2}-x+', '(?i)x']
+        rules = [ SearchRule(pk=i+1, rule_type="name_contains", text=p) for i, p in enumerate(patterns) ]
+        matcher = NameContainsMatcher(rules)
+        for name in ['draft-ietf-mars-foo-tls', 'draft-sec-quic', 'draft-ab-xxx-mrs', 'draft-ietf-marsx']:
+            self.assertEqual(matcher.match(name), set(r.pk for r in rules if re.search(r.text, name)), name)
+
+    def test_required_literals(self):
+        self.assertEqual(required_literals(r'draft-ietf-quic'), [['draft-ietf-quic']])
+        self.assertEqual(required_literals(r'quic|sec'), [['quic'], ['sec']])
+        self.assertEqual(required_literals(r'draft-.*-ma.?rs\b'), [['draft-', '-ma', 'rs']])
+        self.assertEqual(required_literals(r'(?i)quic'), [[]])
+        # escapes are literals with their whole argument
+        for pattern in [r'draft-ietf-\x71uic', r'draft-ietf-\u0071uic', r'draft-ietf-\U00000071uic',
+                        r'draft-ietf-\161uic', r'draft-ietf-\N{LATIN SMALL LETTER Q}uic']:
+            self.assertEqual(required_literals(pattern), [['draft-ietf-quic']], pattern)
+        self.assertEqual(required_literals(r'draft-\d+-quic'), [['draft-', '-quic']])
+
+        patterns = [r'draft-ietf-\x71uic', r'draft-ietf-\161uic', r'\.\x2dhttp']
+        rules = [ SearchRule(pk=i+1, rule_type="name_contains", text=p) for i, p in enumerate(patterns) ]
+        matcher = NameContainsMatcher(rules)
+        self.assertEqual(matcher.match('draft-ietf-quic-http'), set([1, 2]))
+        self.assertEqual(matcher.match('draft-ietf-quic.-http'), set([1, 2, 3]))
+
+    def test_update_name_contains_indexes_with_new_doc(self):
+        clist = CommunityList.objects.create(user=PersonFactory(user__username='plain').user)
+        active = State.objects.get(type="draft", slug="active")
+        rule = SearchRule.objects.create(rule_type="name_contains", text="draft-.*-mars", state=active, community_list=clist)
+        other_rule = SearchRule.objects.create(rule_type="name_contains", text="venus", state=active, community_list=clist)
+
+        draft = WgDraftFactory(name='draft-ietf-mars-test', states=[('draft','active')])
+        update_name_contains_indexes_with_new_doc(draft)
+        self.assertEqual(list(rule.name_contains_index.all()), [draft])
+        self.assertEqual(list(other_rule.name_contains_index.all()), [])
+        self.assertEqual(list(docs_tracked_by_community_list(clist)), [draft])
+
+        # already indexed documents are left alone
+        update_name_contains_indexes_with_new_doc(draft)
+        self.assertEqual(list(rule.name_contains_index.all()), [draft])
+
+    def test_reset_name_contains_indexes(self):
+        clist = CommunityList.objects.create(user=PersonFactory(user__username='plain').user)
+        active = State.objects.get(type="draft", slug="active")
+        rule = SearchRule.objects.create(rule_type="name_contains", text="draft-.*-mars", state=active, community_list=clist)
+        other_rule = SearchRule.objects.create(rule_type="name_contains", text="venus", state=active, community_list=clist)
+        draft = WgDraftFactory(name='draft-ietf-mars-test', states=[('draft','active')])
+        WgDraftFactory(name='draft-ietf-earth-test', states=[('draft','active')])
+
+        # the single rule reset matches in the database, and agrees with the bulk reset
+        reset_name_contains_index_for_rule(rule)
+        self.assertEqual(list(rule.name_contains_index.all()), [draft])
+        rule.name_contains_index.clear()
+        reset_name_contains_indexes([rule, other_rule])
+        self.assertEqual(list(rule.name_contains_index.all()), [draft])
+        self.assertEqual(list(other_rule.name_contains_index.all()), [])
+
     def test_view_list(self):
         PersonFactory(user__username='plain')
         draft = WgDraftFactory()
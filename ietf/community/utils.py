@@ -4,19 +4,28 @@
 
 import re
 
+from collections import defaultdict
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse    # Python 3.11 and later
+except ImportError:
+    import sre_constants, sre_parse
+
 from django.db.models import Q
 from django.conf import settings
 
 import debug                            # pyflakes:ignore
 
-from ietf.community.models import CommunityList, EmailSubscription, SearchRule
-from ietf.doc.models import Document, State
+from ietf.community.models import CommunityList, EmailSubscription, SearchRule, TrackedDocument
+from ietf.doc.models import Document, DocAlias, State
 from ietf.group.models import Role, Group
 from ietf.person.models import Person
 from ietf.ietfauth.utils import has_role
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 
+from ietf.utils import log
+from ietf.utils.cache import get_generation
 from ietf.utils.mail import send_mail
 
 def states_of_significant_change():
@@ -56,6 +65,143 @@ def can_manage_community_list(user, clist):
 
     return False
 
+def _sequence_literals(items, literals, literal=''):
+    # Collect the literal strings of a parsed sequence, continuing literal;
+    # returns the literal in progress at the end
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            literal += chr(av)
+            continue
+        if op is sre_constants.SUBPATTERN:
+            group, add_flags, del_flags, subpattern = av
+            if not add_flags & sre_constants.SRE_FLAG_IGNORECASE and not any(o is sre_constants.BRANCH for o, a in subpattern):
+                # a group which must match is part of the sequence
+                literal = _sequence_literals(subpattern, literals, literal)
+                continue
+        if literal:
+            literals.append(literal)
+        literal = ''
+    return literal
+
+def required_literals(pattern):
+    """Get strings which any match of the regular expression pattern must
+    contain, from the literal characters of the pattern which aren't
+    optional, repeated or in alternatives below the top level.
+
+    Returns a list of such lists, one for each alternative at the top level
+    of the pattern.  An alternative without literals, or a pattern which
+    isn't valid or ignores case, gives an empty list.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, OverflowError, RecursionError):
+        return [[]]
+    if parsed.state.flags & sre_constants.SRE_FLAG_IGNORECASE:
+        return [[]]
+    if len(parsed) == 1 and parsed[0][0] is sre_constants.BRANCH:
+        branches = parsed[0][1][1]
+    else:
+        branches = [ parsed ]
+    alternatives = []
+    for branch in branches:
+        literals = []
+        literal = _sequence_literals(branch, literals)
+        if literal:
+            literals.append(literal)
+        alternatives.append(literals)
+    return alternatives
+
+class NameContainsMatcher(object):
+    """Matches names against the regular expressions of many name_contains
+    rules at once.
+
+    Each alternative of a rule's pattern is keyed on a short piece of a
+    literal string which every match of it must contain, preferring pieces few
+    other rules share.  A single pass over the short substrings of a name then finds
+    the few candidate rules, and only their regular expressions are run.
+    Rules with an alternative without a usable literal are always candidates.
+    """
+    MIN_KEY_LENGTH = 3
+    MAX_KEY_LENGTH = 6
+    global_flags_re = re.compile(r'^\(\?[aiLmsux]+\)')
+
+    def __init__(self, rules):
+        self.regexes = {}
+        self.keyed = defaultdict(list)  # key -> rule pks
+        self.unkeyed = []               # rule pks
+        literals = {}                   # rule pk -> key candidates for each alternative
+        for rule in rules:
+            try:
+                self.regexes[rule.pk] = re.compile(rule.text)
+            except re.error:
+                log.log("Skipping name_contains rule %s with invalid regex %r" % (rule.pk, rule.text))
+                continue
+            if self.global_flags_re.match(rule.text):
+                literals[rule.pk] = [set()]
+            else:
+                literals[rule.pk] = [ self._key_candidates(alternative) for alternative in required_literals(rule.text) ]
+        sharing = defaultdict(int)
+        for pk in literals:
+            for key in set(k for alternative in literals[pk] for k in alternative):
+                sharing[key] += 1
+        for pk in literals:
+            if all(literals[pk]):
+                keys = set(min(alternative, key=lambda k: (sharing[k], -len(k))) for alternative in literals[pk])
+                for key in keys:
+                    self.keyed[key].append(pk)
+            else:
+                self.unkeyed.append(pk)
+        self.key_lengths = sorted(set(len(key) for key in self.keyed))
+
+    def _key_candidates(self, literals):
+        candidates = set()
+        for literal in literals:
+            length = min(len(literal), self.MAX_KEY_LENGTH)
+            if length >= self.MIN_KEY_LENGTH:
+                candidates.update(literal[i:i+length] for i in range(len(literal) - length + 1))
+        return candidates
+
+    def match(self, name):
+        """Get the set of pks of the rules which match name"""
+        candidates = set(self.unkeyed)
+        for length in self.key_lengths:
+            for i in range(len(name) - length + 1):
+                pks = self.keyed.get(name[i:i+length])
+                if pks:
+                    candidates.update(pks)
+        return set(pk for pk in candidates if self.regexes[pk].search(name))
+
+NAME_CONTAINS_RULES_GENERATION = 'community:name_contains_rules'
+
+_name_contains_matcher = (None, None)   # (generation, matcher)
+
+def get_name_contains_matcher():
+    """Get a NameContainsMatcher for all name_contains rules.  It is kept
+    between calls, until the rules change."""
+    global _name_contains_matcher
+    generation = get_generation(NAME_CONTAINS_RULES_GENERATION)
+    cached_generation, matcher = _name_contains_matcher
+    if matcher is None or cached_generation != generation:
+        matcher = NameContainsMatcher(SearchRule.objects.filter(rule_type="name_contains").only("pk", "text"))
+        _name_contains_matcher = (generation, matcher)
+    return matcher
+
+def reset_name_contains_indexes(rules):
+    """Rebuild the name index of the given name_contains rules, with one pass
+    over all document aliases.  For a single rule, the database regex match of
+    reset_name_contains_index_for_rule() is cheaper."""
+    rules = [ r for r in rules if r.rule_type == "name_contains" ]
+    if not rules:
+        return
+    matcher = NameContainsMatcher(rules)
+    matches = defaultdict(set)
+    for name, doc_id in DocAlias.objects.values_list("name", "docs").iterator():
+        if doc_id is not None:
+            for pk in matcher.match(name):
+                matches[pk].add(doc_id)
+    for rule in rules:
+        rule.name_contains_index.set(matches[rule.pk])
+
 def reset_name_contains_index_for_rule(rule):
     if not rule.rule_type == "name_contains":
         return
@@ -63,13 +209,18 @@ def reset_name_contains_index_for_rule(rule):
     rule.name_contains_index.set(Document.objects.filter(docalias__name__regex=rule.text))
 
 def update_name_contains_indexes_with_new_doc(doc):
-    for r in SearchRule.objects.filter(rule_type="name_contains"):
-        # in theory we could use the database to do this query, but
-        # Django doesn't support a reversed regex operator, and regexp
-        # support needs backend-specific code so custom SQL is a bit
-        # cumbersome too
-        if re.search(r.text, doc.name) and not doc in r.name_contains_index.all():
-            r.name_contains_index.add(doc)
+    # in theory we could use the database to do this query, but
+    # Django doesn't support a reversed regex operator, and regexp
+    # support needs backend-specific code so custom SQL is a bit
+    # cumbersome too
+    rule_ids = get_name_contains_matcher().match(doc.name)
+    if not rule_ids:
+        return
+    through = SearchRule.name_contains_index.through
+    rule_ids -= set(through.objects.filter(document=doc, searchrule__in=rule_ids).values_list("searchrule", flat=True))
+    through.objects.bulk_create([ through(searchrule_id=pk, document=doc) for pk in rule_ids ])
+    # bulk_create doesn't send m2m_changed
+    update_tracked_documents_for_doc(doc)
 
 def docs_matching_community_list_rule(rule):
     docs = Document.objects.all()
@@ -137,21 +288,46 @@ def community_list_rules_matching_doc(doc):
     return rules
 
 
-def docs_tracked_by_community_list(clist):
-    if clist.pk is None:
-        return Document.objects.none()
-
+def compute_docs_tracked_by_community_list(clist):
+    """Get the pks of the documents tracked by clist from its added
+    documents and search rules, without using the TrackedDocument index"""
     # in theory, we could use an OR query, but databases seem to have
     # trouble with OR queries and complicated joins so do the OR'ing
     # manually
     doc_ids = set(clist.added_docs.values_list("pk", flat=True))
     for rule in clist.searchrule_set.all():
         doc_ids = doc_ids | set(docs_matching_community_list_rule(rule).values_list("pk", flat=True))
+    return doc_ids
+
+def reset_tracked_documents_for_community_list(clist):
+    """Rebuild the TrackedDocument index for clist"""
+    doc_ids = compute_docs_tracked_by_community_list(clist)
+    existing = set(TrackedDocument.objects.filter(community_list=clist).values_list("document", flat=True))
+    if existing - doc_ids:
+        TrackedDocument.objects.filter(community_list=clist, document__in=existing - doc_ids).delete()
+    TrackedDocument.objects.bulk_create(
+        [ TrackedDocument(community_list=clist, document_id=doc_id) for doc_id in doc_ids - existing ]
+    )
+
+def update_tracked_documents_for_doc(doc):
+    """Bring the TrackedDocument index up to date for the lists tracking doc"""
+    clist_ids = set(CommunityList.objects.filter(added_docs=doc).values_list("pk", flat=True))
+    clist_ids |= set(community_list_rules_matching_doc(doc).values_list("community_list", flat=True))
+    existing = set(TrackedDocument.objects.filter(document=doc).values_list("community_list", flat=True))
+    if existing - clist_ids:
+        TrackedDocument.objects.filter(document=doc, community_list__in=existing - clist_ids).delete()
+    TrackedDocument.objects.bulk_create(
+        [ TrackedDocument(community_list_id=clist_id, document=doc) for clist_id in clist_ids - existing ]
+    )
+
+def docs_tracked_by_community_list(clist):
+    if clist.pk is None:
+        return Document.objects.none()
 
-    return Document.objects.filter(pk__in=doc_ids)
+    return Document.objects.filter(pk__in=TrackedDocument.objects.filter(community_list=clist).values("document"))
 
 def community_lists_tracking_doc(doc):
-    return CommunityList.objects.filter(Q(added_docs=doc) | Q(searchrule__in=community_list_rules_matching_doc(doc)))
+    return CommunityList.objects.filter(pk__in=TrackedDocument.objects.filter(document=doc).values("community_list"))
 
 
 def notify_event_to_subscribers(event):
@@ -0,0 +1,73 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Compares the latency of document name, title and author searches using
+# icontains filters with the same searches using the document search index.
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import Document, DocumentAuthor
+from ietf.doc.search_index import filter_by_search_index
+
+
+class Command(BaseCommand):
+    help = 'Benchmark document searches with icontains filters against the search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-q', '--queries', type=int, default=50,
+                            help='number of queries of each kind to run (default 50)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed for picking the queries')
+
+    def handle(self, queries, seed, *args, **options):
+        random.seed(seed)
+        drafts = list(Document.objects.filter(type='draft').values_list('pk', flat=True))
+        if not drafts:
+            raise CommandError('There are no drafts to search for')
+        sample = Document.objects.filter(pk__in=random.sample(drafts, min(queries, len(drafts))))
+
+        name_queries = [ '-'.join(d.name.split('-')[1:3]) for d in sample ]
+        title_queries = [ d.title.split()[0] for d in sample if d.title.split() ]
+        author_queries = [
+            a.person.name_parts()[3] for a in
+            DocumentAuthor.objects.filter(document__in=sample).select_related('person')
+        ][:queries]
+
+        docs = Document.objects.filter(type='draft')
+        self._compare('name', name_queries,
+            lambda q: docs.filter(Q(docalias__name__icontains=q) | Q(title__icontains=q)).distinct(),
+            lambda q: filter_by_search_index(docs, q, ['name', 'alias', 'title']))
+        self._compare('title', title_queries,
+            lambda q: docs.filter(Q(docalias__name__icontains=q) | Q(title__icontains=q)).distinct(),
+            lambda q: filter_by_search_index(docs, q, ['name', 'alias', 'title']))
+        self._compare('author', author_queries,
+            lambda q: docs.filter(Q(documentauthor__person__alias__name__icontains=q) |
+                                  Q(documentauthor__person__email__address__icontains=q)).distinct(),
+            lambda q: filter_by_search_index(docs, q, ['author']))
+
+    def _compare(self, label, queries, orm_search, index_search):
+        if not queries:
+            self.stdout.write('%-8s no queries' % label)
+            return
+        orm_times, orm_results = self._run(queries, orm_search)
+        index_times, index_results = self._run(queries, index_search)
+        agree = sum(1 for a, b in zip(orm_results, index_results) if a == b)
+        self.stdout.write('%-8s icontains: median %8.2f ms, mean %8.2f ms' % (
+            label, statistics.median(orm_times), statistics.mean(orm_times)))
+        self.stdout.write('%-8s index:     median %8.2f ms, mean %8.2f ms, same results for %d of %d queries' % (
+            label, statistics.median(index_times), statistics.mean(index_times), agree, len(queries)))
+
+    def _run(self, queries, search):
+        times, results = [], []
+        for q in queries:
+            start = time.time()
+            results.append(set(search(q).values_list('pk', flat=True)))
+            times.append((time.time() - start) * 1000)
+        return times, results
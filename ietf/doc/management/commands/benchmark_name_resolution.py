@@ -0,0 +1,67 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Compares the latency of resolving the kinds of names typed into /doc/<name>
+# URLs (exact names, prefixes, names without their prefix and names with a
+# revision) with the DocAlias query chain and with the in-memory document
+# name index.
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import DocAlias
+from ietf.doc.name_index import build_name_index, clear_name_index, get_name_index, find_unique_name
+
+
+class Command(BaseCommand):
+    help = 'Benchmark document name resolution with DocAlias queries against the name index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-q', '--queries', type=int, default=50,
+                            help='number of names of each kind to resolve (default 50)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed for picking the names')
+
+    def handle(self, queries, seed, *args, **options):
+        random.seed(seed)
+        names = list(DocAlias.objects.filter(name__startswith='draft-').values_list('name', flat=True))
+        if not names:
+            raise CommandError('There are no draft names to resolve')
+        sample = random.sample(names, min(queries, len(names)))
+
+        clear_name_index()
+        start = time.time()
+        index = build_name_index()
+        if index is None:
+            raise CommandError('The name index doesn\'t fit the memory limit')
+        self.stdout.write('index:    %d names built in %.2f s, about %.1f MB' % (
+            len(index), time.time() - start, index.memory_size() / 1e6))
+        # make it the index of this process
+        get_name_index()
+
+        self._compare('exact', sample, find_unique_name)
+        self._compare('prefix', [ n[:-(len(n.split('-')[-1]) + 1)] for n in sample ], find_unique_name)
+        self._compare('contains', [ '-'.join(n.split('-')[1:]) for n in sample ], find_unique_name)
+        self._compare('revision', [ n + '-00' for n in sample ], find_unique_name)
+
+    def _compare(self, label, queries, find):
+        query_times, query_results = self._run(queries, lambda q: find(q, use_index=False))
+        index_times, index_results = self._run(queries, find)
+        agree = sum(1 for a, b in zip(query_results, index_results) if a == b)
+        self.stdout.write('%-8s queries: median %8.3f ms, mean %8.3f ms' % (
+            label, statistics.median(query_times), statistics.mean(query_times)))
+        self.stdout.write('%-8s index:   median %8.3f ms, mean %8.3f ms, same result for %d of %d names' % (
+            label, statistics.median(index_times), statistics.mean(index_times), agree, len(queries)))
+
+    def _run(self, queries, find):
+        times, results = [], []
+        for q in queries:
+            start = time.time()
+            results.append(find(q))
+            times.append((time.time() - start) * 1000)
+        return times, results
@@ -0,0 +1,84 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+import datetime
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import Document, DocEvent, NewRevisionDocEvent
+from ietf.doc.rendering import document_rendering_job, render_document_artifacts_job
+
+DEFAULT_DAYS = 2
+
+class Command(BaseCommand):
+    help = ('Render the htmlized and pdfized versions of draft revisions and RFCs, placing '
+            'them in the directory configured in settings.RENDERED_DOCUMENT_PATH: %s.  '
+            'By default, render the missing versions for new draft revisions and RFCs '
+            'published in the last %s days.' % (settings.RENDERED_DOCUMENT_PATH, DEFAULT_DAYS))
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', default=False, help="Process all documents, not only recent submissions")
+        parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="Look at submissions from the last DAYS days, instead of %s" % DEFAULT_DAYS)
+        parser.add_argument('--force', action='store_true', default=False, help="Render again even if the rendered versions exist")
+        parser.add_argument('-p', '--processes', type=int, default=1, help="Number of worker processes to render with (default 1)")
+
+    def note(self, msg):
+        if self.verbosity > 1:
+            self.stdout.write(msg)
+
+    def jobs(self, process_all, days, force):
+        revisions = NewRevisionDocEvent.objects.filter(type='new_revision', doc__type_id='draft')
+        if not process_all:
+            start = datetime.datetime.now() - datetime.timedelta(days=days)
+            revisions = revisions.filter(time__gte=start)
+            published = DocEvent.objects.filter(type='published_rfc', doc__type_id='draft', time__gte=start)
+
+        for name, rev in revisions.order_by().values_list('doc__name', 'rev').distinct():
+            key = '%s-%s' % (name, rev)
+            # new revisions are in the repository before they reach the archive
+            path = os.path.join(settings.INTERNET_DRAFT_PATH, key + '.txt')
+            if not os.path.exists(path):
+                path = os.path.join(settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR, key + '.txt')
+            yield key, path, force
+
+        rfcs = Document.objects.filter(type='draft', states__type='draft', states__slug='rfc')
+        if not process_all:
+            rfcs = rfcs.filter(pk__in=published.values('doc'))
+        for doc in rfcs:
+            job = document_rendering_job(doc)
+            if job:
+                yield job + (force,)
+
+    def handle(self, *args, **options):
+        self.verbosity = options.get("verbosity", 1)
+        jobs = list(self.jobs(options['all'], options['days'], options['force']))
+        processes = max(1, options['processes'])
+
+        if processes > 1:
+            # the workers don't use the database, and mustn't share our connection
+            connections.close_all()
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.imap_unordered(render_document_artifacts_job, jobs, chunksize=4)
+                rendered = self.report(results)
+        else:
+            rendered = self.report(map(render_document_artifacts_job, jobs))
+
+        if self.verbosity > 0:
+            self.stdout.write('Rendered %d artifacts for %d documents' % (rendered, len(jobs)))
+
+    def report(self, results):
+        rendered = 0
+        for key, result in results:
+            if isinstance(result, Exception):
+                self.stderr.write('%s: %s' % (key, result))
+            elif result:
+                rendered += len(result)
+                self.note('%s: %s' % (key, ', '.join(result)))
+        return rendered
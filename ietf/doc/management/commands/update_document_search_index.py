@@ -0,0 +1,27 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+from django.core.management.base import BaseCommand
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import Document
+from ietf.doc.search_index import rebuild_search_index
+
+class Command(BaseCommand):
+    help = ("""
+        Rebuild the document search index from the names, aliases, titles,
+        abstracts and authors of documents.
+        """)
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', metavar='NAME',
+            help="Only rebuild the index for the named documents")
+        parser.add_argument('-b', '--batch-size', type=int, default=500,
+            help="Number of documents to index per transaction (default 500)")
+
+    def handle(self, names, batch_size, *args, **options):
+        documents = Document.objects.filter(name__in=names) if names else Document.objects.all()
+        count = rebuild_search_index(documents, batch_size=batch_size)
+        if int(options['verbosity']) > 0:
+            self.stdout.write("Indexed %d documents\n" % count)
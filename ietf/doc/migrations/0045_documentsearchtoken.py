@@ -0,0 +1,83 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+
+# Generated by Django 2.2.28 on 2022-06-01 10:12
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+from ietf.doc.search_index import tokenize
+
+
+def forward(apps, schema_editor):
+    # Fill in the index of the existing documents, as the searches use it
+    # as soon as it exists.  This does what rebuild_search_index() does,
+    # with the models of this migration.
+    Document = apps.get_model('doc', 'Document')
+    DocAlias = apps.get_model('doc', 'DocAlias')
+    DocumentAuthor = apps.get_model('doc', 'DocumentAuthor')
+    DocumentSearchToken = apps.get_model('doc', 'DocumentSearchToken')
+    Alias = apps.get_model('person', 'Alias')
+    Email = apps.get_model('person', 'Email')
+
+    documents = Document.objects.order_by('pk').only('pk', 'name', 'title', 'abstract')
+    last_pk = None
+    while True:
+        batch = documents if last_pk is None else documents.filter(pk__gt=last_pk)
+        batch = list(batch[:1000])
+        if not batch:
+            break
+        doc_ids = [ d.pk for d in batch ]
+        entries = { d.pk: set() for d in batch }
+        for d in batch:
+            for kind in ('name', 'title', 'abstract'):
+                entries[d.pk].update((kind, token) for token in tokenize(getattr(d, kind)))
+        for doc_id, name in DocAlias.objects.filter(docs__in=doc_ids).values_list('docs', 'name'):
+            entries[doc_id].update(('alias', token) for token in tokenize(name))
+        authors = list(DocumentAuthor.objects.filter(document__in=doc_ids).values_list('document', 'person'))
+        person_tokens = defaultdict(set)
+        person_ids = set(person_id for __, person_id in authors)
+        for person_id, name in Alias.objects.filter(person__in=person_ids).values_list('person', 'name'):
+            person_tokens[person_id] |= tokenize(name)
+        for person_id, address in Email.objects.filter(person__in=person_ids).values_list('person', 'address'):
+            person_tokens[person_id] |= tokenize(address)
+        for doc_id, person_id in authors:
+            entries[doc_id].update(('author', token) for token in person_tokens[person_id])
+        DocumentSearchToken.objects.bulk_create(
+            DocumentSearchToken(document_id=doc_id, kind=kind, token=token)
+            for doc_id, doc_entries in entries.items() for kind, token in doc_entries
+        )
+        last_pk = batch[-1].pk
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0044_procmaterials_states'),
+        ('person', '0022_auto_20220513_1456'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('name', 'Name'), ('alias', 'Alias'), ('title', 'Title'), ('abstract', 'Abstract'), ('author', 'Author name or email')], max_length=8)),
+                ('token', models.CharField(max_length=64)),
+                ('document', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='searchtokens', to='doc.Document')),
+            ],
+            options={
+                'unique_together': {('document', 'kind', 'token')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='documentsearchtoken',
+            index=models.Index(fields=['token', 'kind'], name='doc_documen_token_4a4259_idx'),
+        ),
+        migrations.RunPython(forward, reverse),
+    ]
@@ -6,15 +6,12 @@ import datetime
 import logging
 import io
 import os
-import rfc2html
 import time
 
 from typing import Optional, TYPE_CHECKING
-from weasyprint import HTML as wpHTML
 
 from django.db import models
 from django.core import checks
-from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator, RegexValidator
 from django.urls import reverse as urlreverse
@@ -25,6 +22,7 @@ from django.utils.html import mark_safe # type:ignore
 
 import debug                            # pyflakes:ignore
 
+from ietf.doc.rendering import document_rendering_job, stored_artifact, queue_document_rendering
 from ietf.group.models import Group
 from ietf.name.models import ( DocTypeName, DocTagName, StreamName, IntendedStdLevelName, StdLevelName,
     DocRelationshipName, DocReminderTypeName, BallotPositionName, ReviewRequestStateName, ReviewAssignmentStateName, FormalLanguageName,
@@ -33,6 +31,7 @@ from ietf.person.models import Email, Person
 from ietf.person.utils import get_active_balloters
 from ietf.utils import log
 from ietf.utils.admin import admin_link
+from ietf.utils.cache import bump_generation
 from ietf.utils.decorators import memoize
 from ietf.utils.validators import validate_no_control_chars
 from ietf.utils.mail import formataddr
@@ -370,7 +369,7 @@ class DocumentInfo(models.Model):
 
     def is_rfc(self):
         if not hasattr(self, '_cached_is_rfc'):
-            self._cached_is_rfc = self.pk and self.type_id == 'draft' and self.states.filter(type='draft',slug='rfc').exists()
+            self._cached_is_rfc = self.pk and self.type_id == 'draft' and self.get_state_slug('draft') == 'rfc'
         return self._cached_is_rfc
 
     def rfc_number(self):
@@ -546,47 +545,34 @@ class DocumentInfo(models.Model):
         return self.text() or "Error; cannot read '%s'"%self.get_base_name()
 
     def htmlized(self):
+        """Get the stored htmlized rendering of a plain-text document.  If it
+        hasn't been rendered yet, queue the rendering and return None."""
         name = self.get_base_name()
-        text = self.text()
         if name.endswith('.html'):
-            return text
+            return self.text()
         if not name.endswith('.txt'):
             return None
-        html = ""
-        if text:
-            cache = caches['htmlized']
-            cache_key = name.split('.')[0]
-            try:
-                html = cache.get(cache_key)
-            except EOFError:
-                html = None
-            if not html:
-                # The path here has to match the urlpattern for htmlized
-                # documents in order to produce correct intra-document links
-                html = rfc2html.markup(text, path=settings.HTMLIZER_URL_PREFIX)
-                if html:
-                    cache.set(cache_key, html, settings.HTMLIZER_CACHE_TIME)
-        return html
+        return self._rendered_artifact('htmlized')
 
     def pdfized(self):
-        name = self.get_base_name()
-        text = self.text()
-        cache = caches['pdfized']
-        cache_key = name.split('.')[0]
-        try:
-            pdf = cache.get(cache_key)
-        except EOFError:
-            pdf = None
-        if not pdf:
-            html = rfc2html.markup(text, path=settings.PDFIZER_URL_PREFIX)
-            try:
-                pdf = wpHTML(string=html.replace('\xad','')).write_pdf(stylesheets=[io.BytesIO(b'html { font-size: 94%;}')])
-            except AssertionError:
-                log.log(f'weasyprint failed with an assert on {self.name}')
-                pdf = None
-            if pdf:
-                cache.set(cache_key, pdf, settings.PDFIZER_CACHE_TIME)
-        return pdf
+        """Get the stored pdfized rendering of a plain-text document.  If it
+        hasn't been rendered yet, queue the rendering and return None."""
+        return self._rendered_artifact('pdfized')
+
+    def rendering_failed(self, kind):
+        """Whether the rendering of the given kind of a plain-text document
+        has failed for its current text"""
+        job = document_rendering_job(self)
+        return job is not None and stored_artifact(*job, kind)[1]
+
+    def _rendered_artifact(self, kind):
+        job = document_rendering_job(self)
+        if job is None:
+            return None
+        artifact, failed = stored_artifact(*job, kind)
+        if artifact is None and not failed:
+            queue_document_rendering(self)
+        return artifact
 
     def references(self):
         return self.relations_that_doc(('refnorm','refinfo','refunk','refold'))
@@ -730,11 +716,30 @@ validate_docname = RegexValidator(
     'invalid'
 )
 
+# The fields of documents whose values as loaded from the database are
+# kept, for the post_save handlers which only act on changes to some of
+# them, see document_fields_changed()
+TRACKED_DOCUMENT_FIELDS = set()
+
+def document_fields_changed(instance, fields, created=False):
+    """Whether the save of a document which sent post_save may have changed
+    any of fields, which must be in TRACKED_DOCUMENT_FIELDS"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if created or loaded is None:
+        return True
+    return any(f not in loaded or loaded[f] != getattr(instance, f) for f in fields)
+
 class Document(DocumentInfo):
     name = models.CharField(max_length=255, validators=[validate_docname,], unique=True)           # immutable
     
     action_holders = models.ManyToManyField(Person, through=DocumentActionHolder, blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Document, cls).from_db(db, field_names, values)
+        instance._loaded_values = dict( (f, v) for f, v in zip(field_names, values) if f in TRACKED_DOCUMENT_FIELDS )
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -782,6 +787,10 @@ class Document(DocumentInfo):
         while d.latest_event(WriteupDocEvent, type="xyz") returns a
         WriteupDocEvent event."""
         model = args[0] if args else DocEvent
+        # the events may have been loaded in bulk, see ietf.doc.page_loader
+        index = getattr(self, '_event_index', None)
+        if index is not None and index.covers(model, filter_args):
+            return index.latest(model, filter_args)
         e = model.objects.filter(doc=self).filter(**filter_args).order_by('-time', '-id').first()
         return e
 
@@ -789,9 +798,14 @@ class Document(DocumentInfo):
         if not hasattr(self, '_canonical_name'):
             name = self.name
             if self.type_id == "draft" and self.get_state_slug() == "rfc":
-                a = self.docalias.filter(name__startswith="rfc").order_by('-name').first()
-                if a:
-                    name = a.name
+                if 'docalias' in getattr(self, '_prefetched_objects_cache', {}):
+                    rfc_names = [ a.name for a in self.docalias.all() if a.name.startswith("rfc") ]
+                    if rfc_names:
+                        name = max(rfc_names)
+                else:
+                    a = self.docalias.filter(name__startswith="rfc").order_by('-name').first()
+                    if a:
+                        name = a.name
             elif self.type_id == "charter":
                 from ietf.doc.utils_charter import charter_name_for_group # Imported locally to avoid circular imports
                 try:
@@ -915,7 +929,7 @@ class Document(DocumentInfo):
     def future_presentations(self):
         """ returns related SessionPresentation objects for meetings that
             have not yet ended. This implementation allows for 2 week meetings """
-        candidate_presentations = self.sessionpresentation_set.filter(session__meeting__date__gte=datetime.date.today()-datetime.timedelta(days=15))
+        candidate_presentations = self.sessionpresentation_set.filter(session__meeting__date__gte=datetime.date.today()-datetime.timedelta(days=15)).select_related('session__meeting')
         return sorted([pres for pres in candidate_presentations if pres.session.meeting.end_date()>=datetime.date.today()], key=lambda x:x.session.meeting.date)
 
     def last_presented(self):
@@ -1117,6 +1131,9 @@ class DocAlias(models.Model):
 
     @property
     def document(self):
+        if 'docs' in getattr(self, '_prefetched_objects_cache', {}):
+            docs = self.docs.all()
+            return min(docs, key=lambda d: d.pk) if docs else None
         return self.docs.first()
 
     def __str__(self):
@@ -1126,6 +1143,31 @@ class DocAlias(models.Model):
         verbose_name = "document alias"
         verbose_name_plural = "document aliases"
 
+class DocumentSearchToken(models.Model):
+    """A token from the name, aliases, title, abstract or authors of a
+    document, for indexed prefix search instead of substring scans.  Kept up
+    to date by the signal handlers at the end of this file, see
+    ietf.doc.search_index."""
+    KIND_CHOICES = [
+        ("name", "Name"),
+        ("alias", "Alias"),
+        ("title", "Title"),
+        ("abstract", "Abstract"),
+        ("author", "Author name or email"),
+    ]
+    document = ForeignKey(Document, related_name='searchtokens')
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    token = models.CharField(max_length=64)
+
+    def __str__(self):
+        return "%s %s %s" % (self.document.name, self.kind, self.token)
+
+    class Meta:
+        unique_together = [('document', 'kind', 'token')]
+        indexes = [
+            models.Index(fields=['token', 'kind']),
+        ]
+
 class DocReminder(models.Model):
     event = ForeignKey('DocEvent')
     type = ForeignKey(DocReminderTypeName)
@@ -1421,4 +1463,94 @@ class BofreqEditorDocEvent(DocEvent):
 
 class BofreqResponsibleDocEvent(DocEvent):
     """ Capture the responsible leadership (IAB and IESG members) for a BOF Request """
-    responsible = models.ManyToManyField('person.Person', blank=True)
\ No newline at end of file
+    responsible = models.ManyToManyField('person.Person', blank=True)
+
+
+def update_search_index_for_document(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from ietf.doc.search_index import update_document_search_index
+    update_document_search_index(instance, kinds=['name', 'title', 'abstract'])
+
+def update_search_index_for_author(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from ietf.doc.search_index import update_document_search_index
+    document = Document.objects.filter(pk=instance.document_id).first()
+    if document:
+        update_document_search_index(document, kinds=['author'])
+
+def update_search_index_for_aliases(documents):
+    from ietf.doc.search_index import update_document_search_index
+    for document in documents:
+        update_document_search_index(document, kinds=['alias'])
+
+def remember_docalias_documents(sender, instance, **kwargs):
+    # The documents of an alias are gone when post_clear or post_delete fires
+    instance._search_index_document_ids = list(instance.docs.values_list('pk', flat=True))
+
+def update_search_index_for_docalias(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    document_ids = set(getattr(instance, '_search_index_document_ids', []))
+    if instance.pk:
+        document_ids.update(instance.docs.values_list('pk', flat=True))
+    update_search_index_for_aliases(Document.objects.filter(pk__in=document_ids))
+
+def update_search_index_for_docalias_docs(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        remember_docalias_documents(sender, instance)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance is a Document
+        update_search_index_for_aliases([instance])
+    elif action == 'post_clear':
+        update_search_index_for_docalias(sender, instance)
+    else:
+        update_search_index_for_aliases(Document.objects.filter(pk__in=pk_set or []))
+
+models.signals.post_save.connect(update_search_index_for_document, sender=Document)
+models.signals.post_save.connect(update_search_index_for_author, sender=DocumentAuthor)
+models.signals.post_delete.connect(update_search_index_for_author, sender=DocumentAuthor)
+models.signals.post_save.connect(update_search_index_for_docalias, sender=DocAlias)
+models.signals.pre_delete.connect(remember_docalias_documents, sender=DocAlias)
+models.signals.post_delete.connect(update_search_index_for_docalias, sender=DocAlias)
+models.signals.m2m_changed.connect(update_search_index_for_docalias_docs, sender=DocAlias.docs.through)
+
+
+# Cached document search results are tagged with this generation, see
+# ietf.doc.views_search.search
+SEARCH_RESULTS_GENERATION = 'doc:search'
+
+# The fields of a document which the searches filter on
+SEARCH_DOCUMENT_FIELDS = ('name', 'title', 'type_id', 'group_id', 'ad_id', 'stream_id')
+TRACKED_DOCUMENT_FIELDS.update(SEARCH_DOCUMENT_FIELDS)
+
+def invalidate_search_results(sender, instance, raw=False, action=None, created=False, **kwargs):
+    if raw or (action and not action.startswith('post_')):
+        return
+    if sender is Document and not document_fields_changed(instance, SEARCH_DOCUMENT_FIELDS, created):
+        return
+    bump_generation(SEARCH_RESULTS_GENERATION)
+
+models.signals.post_save.connect(invalidate_search_results, sender=Document)
+models.signals.post_save.connect(invalidate_search_results, sender=DocumentAuthor)
+models.signals.post_delete.connect(invalidate_search_results, sender=DocumentAuthor)
+models.signals.m2m_changed.connect(invalidate_search_results, sender=Document.states.through)
+models.signals.m2m_changed.connect(invalidate_search_results, sender=Document.tags.through)
+models.signals.m2m_changed.connect(invalidate_search_results, sender=DocAlias.docs.through)
+
+
+# The document name index of each process is built again when this
+# generation changes, see ietf.doc.name_index
+DOC_NAME_INDEX_GENERATION = 'doc:names'
+
+def invalidate_name_index(sender, instance, raw=False, action=None, **kwargs):
+    if raw or (action and not action.startswith('post_')):
+        return
+    bump_generation(DOC_NAME_INDEX_GENERATION)
+
+models.signals.post_save.connect(invalidate_name_index, sender=DocAlias)
+models.signals.post_delete.connect(invalidate_name_index, sender=DocAlias)
+models.signals.m2m_changed.connect(invalidate_name_index, sender=DocAlias.docs.through)
@@ -0,0 +1,373 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+In-memory index of document names.
+
+Resolving a name typed into a /doc/<name> URL took several DocAlias queries,
+ending in a contains search, for every name which isn't exact.  The index
+holds all document alias names, with the revisions in the document history,
+and answers exact, prefix and contains lookups without going to the
+database.
+
+The names are kept in a sorted list, which is walked as a trie: the names
+starting with a prefix are a range of the list found by bisection.  The
+contains lookups match at the start of a word of a name, like the
+filter_by_search_index() match they replace, and use a sorted array of
+(name, offset) positions.
+
+The index is built in each process on first use, in a background thread so
+that requests don't wait for it, and is built again when it is older than
+settings.DOC_NAME_INDEX_MAX_AGE.  In between, when aliases have been added
+(see the signal handlers in ietf.doc.models), the aliases with a higher pk
+than the index has seen are fetched and added to a small sorted list next
+to the index.  Removed aliases and revisions newer than the index are
+handled by the database lookups the callers fall back to.  If the index
+grows beyond settings.DOC_NAME_INDEX_MEMORY_LIMIT, it isn't kept, and the
+names are resolved with database queries instead.
+"""
+
+import re
+import sys
+import threading
+import time
+
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import DocAlias, DocHistory, Document, DOC_NAME_INDEX_GENERATION
+from ietf.doc.search_index import filter_by_search_index
+from ietf.utils.cache import get_generation
+from ietf.utils.log import log
+
+
+word_start_re = re.compile(r'\d+|[^\W\d_]+')
+
+rev_re = re.compile(r'^[0-9]{2}$')
+
+# the most alias names the database lookups look through for the ones
+# containing a name
+MAX_CANDIDATES = 100
+
+# the offset of a contains position is kept in the low bits
+OFFSET_BITS = 8
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def _prefix_end(prefix):
+    # the smallest string greater than all strings starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class DocNameIndex(object):
+    """Sorted document alias names, with the revisions of each, and
+    whether they name a draft"""
+
+    def __init__(self, names, drafts, revisions, max_alias_id=0):
+        self.names = names                    # sorted alias names
+        self.drafts = drafts                  # bytearray, 1 for aliases of drafts
+        self.revisions = revisions            # dict from name position to bitmask of revs
+        self.max_alias_id = max_alias_id      # the highest DocAlias pk seen
+        self.added = ()                       # sorted names added since the index was built
+        self.added_drafts = frozenset()
+        self.positions = self._build_positions(names)
+        self.built = time.time()
+
+    def _build_positions(self, names):
+        # Sorting all the positions by their suffix at once would hold a
+        # suffix string for each of them, several times the size of the
+        # index.  The positions are grouped by the first two characters of
+        # their suffix instead, and the groups sorted one at a time.
+        groups = {}
+        for i, name in enumerate(names):
+            for match in word_start_re.finditer(name):
+                start = match.start()
+                if 0 < start <= OFFSET_MASK:
+                    key = name[start:start + 2]
+                    if key not in groups:
+                        groups[key] = array('Q')
+                    groups[key].append((i << OFFSET_BITS) | start)
+        positions = array('Q')
+        for key in sorted(groups):
+            positions.extend(sorted(groups.pop(key), key=self._suffix))
+        return positions
+
+    def _suffix(self, position):
+        return self.names[position >> OFFSET_BITS][position & OFFSET_MASK:]
+
+    def __len__(self):
+        return len(self.names) + len(self.added)
+
+    def memory_size(self):
+        """Approximate number of bytes held by the index"""
+        return (sys.getsizeof(self.names) + sum(sys.getsizeof(n) for n in self.names)
+                + sys.getsizeof(self.drafts) + sys.getsizeof(self.positions)
+                + sys.getsizeof(self.revisions)
+                + sum(sys.getsizeof(i) + sys.getsizeof(r) for i, r in self.revisions.items())
+                + sys.getsizeof(self.added) + sum(sys.getsizeof(n) for n in self.added)
+                + sys.getsizeof(self.added_drafts))
+
+    def add(self, aliases):
+        """Add the aliases, as (pk, name, document type) tuples, which are
+        newer than the index"""
+        added = set(self.added)
+        drafts = set(self.added_drafts)
+        max_alias_id = self.max_alias_id
+        for pk, name, type_id in aliases:
+            max_alias_id = max(max_alias_id, pk)
+            if self._position(name) is None:
+                added.add(name)
+                if type_id == 'draft':
+                    drafts.add(name)
+        # replace rather than change the lists, for the threads reading them
+        self.added, self.added_drafts = tuple(sorted(added)), frozenset(drafts)
+        self.max_alias_id = max_alias_id
+
+    def _position(self, name):
+        i = bisect_left(self.names, name)
+        return i if i < len(self.names) and self.names[i] == name else None
+
+    def exact(self, name):
+        """Get the alias name equal to name, ignoring case, or None"""
+        name = name.lower()
+        i = self._position(name)
+        if i is not None:
+            return self.names[i]
+        return name if _in_sorted(self.added, name) else None
+
+    def is_draft(self, name):
+        name = name.lower()
+        i = self._position(name)
+        return (i is not None and bool(self.drafts[i])) or name in self.added_drafts
+
+    def has_rev(self, name, rev):
+        """Whether the history of the document with this alias has the
+        revision rev.  None if the index doesn't know about it, which may
+        be because the revision is newer than the index."""
+        i = self._position(name.lower())
+        if i is None or not rev_re.match(rev):
+            return None
+        return True if self.revisions.get(i, 0) & (1 << int(rev)) else None
+
+    def prefix(self, prefix, limit=None):
+        """Get the alias names starting with prefix"""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        names = _sorted_range(self.names, prefix, limit)
+        if self.added:
+            names = sorted(names + _sorted_range(self.added, prefix, limit))[:limit]
+        return names
+
+    def _positions_start(self, text):
+        # bisect over the suffixes at the contains positions
+        lo, hi = 0, len(self.positions)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._suffix(self.positions[mid]) < text:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def containing(self, text, limit=None):
+        """Get the alias names which contain text, starting at the start of
+        a word"""
+        text = text.lower()
+        if not text:
+            return []
+        names = self.prefix(text, limit)
+        i = self._positions_start(text)
+        while i < len(self.positions) and (limit is None or len(names) < limit):
+            position = self.positions[i]
+            if not self._suffix(position).startswith(text):
+                break
+            name = self.names[position >> OFFSET_BITS]
+            if name not in names:
+                names.append(name)
+            i += 1
+        for name in self.added:
+            if limit is not None and len(names) >= limit:
+                break
+            if name not in names and any(name.startswith(text, m.start()) for m in word_start_re.finditer(name)):
+                names.append(name)
+        return names
+
+def _in_sorted(names, name):
+    i = bisect_left(names, name)
+    return i < len(names) and names[i] == name
+
+def _sorted_range(names, prefix, limit):
+    start = bisect_left(names, prefix)
+    end = bisect_left(names, _prefix_end(prefix), start)
+    if limit is not None:
+        end = min(end, start + limit)
+    return list(names[start:end])
+
+
+def build_name_index(limit=None):
+    """Build the index of document alias names from the database.  Returns
+    None if it would use more than limit bytes."""
+    if limit is None:
+        limit = settings.DOC_NAME_INDEX_MEMORY_LIMIT
+    # aliases created while the index is built are added afterwards
+    max_alias_id = DocAlias.objects.aggregate(Max('pk'))['pk__max'] or 0
+    doc_revs = {}
+    for doc_id, rev in DocHistory.objects.values_list('doc_id', 'rev').distinct().iterator():
+        if rev and rev_re.match(rev):
+            doc_revs[doc_id] = doc_revs.get(doc_id, 0) | (1 << int(rev))
+    names = set()
+    draft_names = set()
+    name_revs = {}
+    size = 0
+    for name, doc_id, type_id in DocAlias.objects.values_list('name', 'docs__id', 'docs__type_id').iterator():
+        if name not in names:
+            names.add(name)
+            # the name, its list slot and at least one contains position
+            size += sys.getsizeof(name) + 8 + 8 + 1
+            if size > limit:
+                log('Document name index would use more than %d bytes, not building it' % limit)
+                return None
+        if type_id == 'draft':
+            draft_names.add(name)
+        if doc_id in doc_revs:
+            name_revs[name] = name_revs.get(name, 0) | doc_revs[doc_id]
+    del doc_revs
+    names = sorted(names)
+    drafts = bytearray(n in draft_names for n in names)
+    revisions = dict( (i, name_revs[n]) for i, n in enumerate(names) if n in name_revs )
+    del draft_names, name_revs
+    index = DocNameIndex(names, drafts, revisions, max_alias_id)
+    if index.memory_size() > limit:
+        log('Document name index uses %d bytes, more than %d, not keeping it' % (index.memory_size(), limit))
+        return None
+    return index
+
+
+_index = None
+_index_generation = None
+_index_failed = None
+_refreshing = False
+_index_lock = threading.Lock()
+
+def _refresh_name_index(generation):
+    global _index, _index_generation, _index_failed, _refreshing
+    try:
+        index = build_name_index()
+    except Exception as e:
+        log('Building the document name index failed: %s' % e)
+        index = None
+    with _index_lock:
+        if index is not None:
+            _index, _index_failed = index, None
+            _index_generation = generation
+        else:
+            # keep answering from the old index, if any, until it's time to try again
+            _index_failed = time.time()
+        _refreshing = False
+
+def _refresh_name_index_in_background(generation):
+    try:
+        _refresh_name_index(generation)
+    finally:
+        connection.close()
+
+def _update_name_index(index):
+    """Add the aliases created since the index was built or last updated"""
+    index.add(DocAlias.objects.filter(pk__gt=index.max_alias_id).values_list('pk', 'name', 'docs__type_id'))
+
+def get_name_index():
+    """Get the index of document alias names of this process.  The aliases
+    added since the index was built are added to it.  An index which is
+    missing or too old is built again in a background thread, and the index
+    it replaces (or None, at first) is returned meanwhile; the callers look
+    up the names which aren't in it in the database.  With
+    settings.DOC_NAME_INDEX_REFRESH_IN_BACKGROUND False, the index is built
+    in the calling thread instead.  None if the index doesn't fit the memory
+    limit."""
+    global _index_generation, _refreshing
+    generation = get_generation(DOC_NAME_INDEX_GENERATION)
+    now = time.time()
+    with _index_lock:
+        index = _index
+        if index is not None and _index_generation != generation:
+            _update_name_index(index)
+            _index_generation = generation
+        if _refreshing:
+            return index
+        if index is not None and now - index.built < settings.DOC_NAME_INDEX_MAX_AGE:
+            return index
+        if _index_failed is not None and now - _index_failed < settings.DOC_NAME_INDEX_MAX_AGE:
+            # don't try building an index which was too large again until it's time to refresh
+            return index
+        _refreshing = True
+    if settings.DOC_NAME_INDEX_REFRESH_IN_BACKGROUND:
+        threading.Thread(target=_refresh_name_index_in_background, args=(generation, ),
+                         name='refresh_name_index', daemon=True).start()
+        return index
+    _refresh_name_index(generation)
+    return _index
+
+def clear_name_index():
+    global _index, _index_failed
+    with _index_lock:
+        _index = None
+        _index_failed = None
+
+
+def find_unique_name(name, use_index=True):
+    """Get the alias name which name uniquely identifies, by exact match,
+    prefix or contained words, or None"""
+    index = get_name_index() if use_index else None
+    if index is not None:
+        exact = index.exact(name)
+        if exact:
+            return exact
+        # the alias may be newer than the index
+        exact = DocAlias.objects.filter(name=name).first()
+        if exact:
+            return exact.name
+        names = index.prefix(name, limit=2)
+        if len(names) == 1:
+            return names[0]
+        names = index.containing(name, limit=2)
+        if len(names) == 1:
+            return names[0]
+        return None
+
+    exact = DocAlias.objects.filter(name=name).first()
+    if exact:
+        return exact.name
+
+    aliases = DocAlias.objects.filter(name__startswith=name)[:2]
+    if len(aliases) == 1:
+        return aliases[0].name
+
+    # the search index finds the documents with words starting like those of
+    # name, and the aliases of those which contain name are picked here
+    candidates = list(filter_by_search_index(DocAlias.objects.all(), name, ['name', 'alias'], field='docs')
+                      .values_list('name', flat=True).distinct()[:MAX_CANDIDATES + 1])
+    names = [ n for n in candidates if name.lower() in n ]
+    if len(names) == 1 and len(candidates) <= MAX_CANDIDATES:
+        return names[0]
+
+    return None
+
+def name_has_rev(name, rev, use_index=True):
+    """Whether the document with alias name has revision rev in its history"""
+    index = get_name_index() if use_index else None
+    if index is not None and index.has_rev(name, rev):
+        return True
+    return DocHistory.objects.filter(doc__docalias__name=name, rev=rev).exists()
+
+def is_draft_name(name, use_index=True):
+    """Whether name is an alias of a draft"""
+    index = get_name_index() if use_index else None
+    if index is not None and index.is_draft(name):
+        return True
+    return Document.objects.filter(docalias__name=name, type_id='draft').exists()
@@ -0,0 +1,168 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Bulk loading of the data shown on the document main page.
+
+The document main page asked for the latest event of a dozen kinds, one
+query each, from the view, the document methods and the helpers it calls,
+walked the document history twice and followed the relations, states and
+aliases of each related document one query at a time.  The loader fetches
+the events of the document in one ordered query and keeps them in an index
+which Document.latest_event() answers from, and prefetches the states,
+tags, aliases, authors and relations, so that the number of queries
+doesn't grow with the length of the document history.
+
+The index is only attached to the document instance the view works on,
+and isn't updated when events are added, so it is only meant for views
+which don't change the document.
+"""
+
+import datetime
+
+from django.core.exceptions import ObjectDoesNotExist
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import ( Document, DocHistory, DocEvent, NewRevisionDocEvent, IanaExpertDocEvent,
+    ConsensusDocEvent, BallotDocEvent, IRSGBallotDocEvent, WriteupDocEvent, LastCallDocEvent,
+    TelechatDocEvent, RelatedDocument, RelatedDocHistory, STATUSCHANGE_RELATIONS )
+
+
+# The event models whose latest events are answered from the index, with
+# the path from DocEvent to each
+INDEXED_EVENT_MODELS = {
+    NewRevisionDocEvent: 'newrevisiondocevent',
+    IanaExpertDocEvent: 'ianaexpertdocevent',
+    ConsensusDocEvent: 'consensusdocevent',
+    BallotDocEvent: 'ballotdocevent',
+    IRSGBallotDocEvent: 'ballotdocevent__irsgballotdocevent',
+    WriteupDocEvent: 'writeupdocevent',
+    LastCallDocEvent: 'lastcalldocevent',
+    TelechatDocEvent: 'telechatdocevent',
+}
+
+# Ballot positions are most of the events of a busy draft, and are fetched
+# per ballot, so they are left out of the index
+UNINDEXED_EVENT_TYPES = ('changed_ballot_position', )
+
+INTERESTING_RELATIONS_THAT = STATUSCHANGE_RELATIONS + ('conflrev', 'replaces', 'possibly_replaces', 'updates', 'obs')
+INTERESTING_RELATIONS_THAT_DOC = ('replaces', 'possibly_replaces', 'updates', 'obs')
+
+
+class DocEventIndex(object):
+    """The events of a document, newest first, answering the latest_event()
+    lookups of the document main page without queries"""
+
+    def __init__(self, doc):
+        self.events = list(DocEvent.objects.filter(doc=doc).exclude(type__in=UNINDEXED_EVENT_TYPES)
+                           .select_related('by', 'ballotdocevent__ballot_type', *INDEXED_EVENT_MODELS.values())
+                           .order_by('-time', '-id'))
+
+    def covers(self, model, filter_args):
+        """Whether latest() can answer the lookup"""
+        if model is not DocEvent and model not in INDEXED_EVENT_MODELS:
+            return False
+        types = None
+        for arg, value in filter_args.items():
+            if arg == 'type':
+                types = [ value ]
+            elif arg == 'type__in':
+                types = list(value)
+            elif arg.startswith('ballot_type__slug'):
+                if not issubclass(model, BallotDocEvent) or arg not in ('ballot_type__slug', 'ballot_type__slug__in'):
+                    return False
+            elif arg in ('time__lt', 'time__lte'):
+                # the database also compares times with dates
+                if not isinstance(value, datetime.datetime):
+                    return False
+            else:
+                return False
+        if types is None:
+            # events of the unindexed types are only DocEvents
+            return model is not DocEvent
+        return not any(t in UNINDEXED_EVENT_TYPES for t in types)
+
+    def _specific(self, e, model):
+        if model is DocEvent:
+            return e
+        for attr in INDEXED_EVENT_MODELS[model].split('__'):
+            try:
+                e = getattr(e, attr)
+            except ObjectDoesNotExist:
+                return None
+        return e
+
+    def _matches(self, e, arg, value):
+        if arg == 'type':
+            return e.type == value
+        elif arg == 'type__in':
+            return e.type in value
+        elif arg == 'ballot_type__slug':
+            return e.ballot_type.slug == value
+        elif arg == 'ballot_type__slug__in':
+            return e.ballot_type.slug in value
+        elif arg == 'time__lt':
+            return e.time < value
+        elif arg == 'time__lte':
+            return e.time <= value
+
+    def latest(self, model, filter_args):
+        for e in self.events:
+            e = self._specific(e, model)
+            if e is not None and all(self._matches(e, arg, value) for arg, value in filter_args.items()):
+                return e
+        return None
+
+
+def document_main_queryset():
+    """Documents with the states, tags, aliases and authors shown on the
+    document main page"""
+    return Document.objects.select_related().prefetch_related(
+        'states', 'tags', 'docalias', 'documentauthor_set__person', 'documentauthor_set__email')
+
+def load_document_events(doc):
+    """Load the events of doc in bulk, for its latest_event() lookups"""
+    doc._event_index = DocEventIndex(doc)
+    return doc._event_index
+
+def load_revisions(doc, rev=None):
+    """Get the revisions in the history of doc, oldest first, and the
+    history entry of revision rev (None if rev isn't given or found)"""
+    revisions = []
+    snapshot_id = None
+    for pk, r in doc.history_set.order_by('time', 'id').values_list('pk', 'rev'):
+        if r and r not in revisions:
+            revisions.append(r)
+        if rev is not None and r == rev:
+            snapshot_id = pk
+    if doc.rev not in revisions:
+        revisions.append(doc.rev)
+
+    snapshot = None
+    if snapshot_id is not None:
+        snapshot = DocHistory.objects.select_related().prefetch_related(
+            'states', 'tags', 'documentauthor_set__person', 'documentauthor_set__email').get(pk=snapshot_id)
+        # the history entry asks the document for its events
+        snapshot.doc = doc
+    return revisions, snapshot
+
+def load_interesting_relations(doc):
+    """Get the relations shown on the document main page, as lists of the
+    relations pointing to doc and the relations from doc, with the related
+    documents, their states and aliases loaded"""
+    if isinstance(doc, Document):
+        cls = RelatedDocument
+        target = doc
+        source_related = ('source__states', 'source__docalias')
+    elif isinstance(doc, DocHistory):
+        cls = RelatedDocHistory
+        target = doc.doc
+        source_related = ('source__states', )
+    else:
+        raise TypeError("Expected this method to be called with a Document or DocHistory object")
+
+    relations_that = list(cls.objects.filter(target__docs=target, relationship__in=INTERESTING_RELATIONS_THAT)
+                          .select_related('source').prefetch_related(*source_related))
+    relations_that_doc = list(cls.objects.filter(source=doc, relationship__in=INTERESTING_RELATIONS_THAT_DOC)
+                              .prefetch_related('target__docs__states', 'target__docs__docalias'))
+    return relations_that, relations_that_doc
@@ -0,0 +1,211 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Stored htmlized and pdfized renderings of plain-text documents.
+
+Rendering a document to html with rfc2html, and from there to pdf with
+WeasyPrint, can take several seconds, so it isn't done in the request
+thread.  The artifacts are rendered in the background when a new draft
+revision is posted or an RFC is published, by the render_document_artifacts
+management command run every 15 minutes from bin/every15m, and on demand
+when a view finds one missing.  Each process renders at most
+MAX_PENDING_RENDERINGS documents in the background at a time; others are
+left for the cron job, so that a crawler walking the pdfized pages can't
+queue up renderings without end.
+
+The artifacts are stored as files under settings.RENDERED_DOCUMENT_PATH,
+named after the base name of the document they were rendered from and a
+digest of its text and settings.HTMLIZER_VERSION, so that a document is
+rendered again when its text or the rendering code changes.  A rendering
+which fails is recorded in the same way, so that it isn't tried again for
+every view of the document.
+
+The rendering functions only work on file names and text, so that they can
+run in worker processes and threads without database access.
+"""
+
+import glob
+import hashlib
+import io
+import os
+import threading
+import rfc2html
+
+from concurrent.futures import ThreadPoolExecutor
+from weasyprint import HTML as wpHTML
+
+from django.conf import settings
+from django.db import transaction
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils import log
+
+
+RENDERED_KINDS = ('htmlized', 'pdfized')
+
+ARTIFACT_EXTENSIONS = {
+    'htmlized': '.html',
+    'pdfized': '.pdf',
+}
+
+FAILURE_EXTENSION = '.failed'
+
+
+def text_digest(text):
+    """Identify the text of a document and the version of the renderers"""
+    return hashlib.sha256(('%s\n%s' % (settings.HTMLIZER_VERSION, text)).encode('utf-8')).hexdigest()[:16]
+
+def artifact_path(key, digest, kind, failed=False):
+    name = '%s.%s%s' % (key, digest, FAILURE_EXTENSION if failed else ARTIFACT_EXTENSIONS[kind])
+    return os.path.join(settings.RENDERED_DOCUMENT_PATH, kind, name)
+
+def read_artifact(key, digest, kind):
+    """Get the stored artifact of the given kind for key, or None if it
+    hasn't been rendered yet"""
+    try:
+        with io.open(artifact_path(key, digest, kind), 'rb') as file:
+            content = file.read()
+    except IOError:
+        return None
+    return content.decode('utf-8') if kind == 'htmlized' else content
+
+def write_artifact(key, digest, kind, content, failed=False):
+    path = artifact_path(key, digest, kind, failed=failed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    # write to a temporary file and rename it, so that a view never serves
+    # a partially written artifact
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    with io.open(tmp_path, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+    # drop the renderings of earlier texts of the document, and earlier
+    # failures
+    for old_path in glob.glob(os.path.join(glob.escape(os.path.dirname(path)), glob.escape(key) + '.*')):
+        if old_path != path and not old_path.endswith('.tmp'):
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+def read_text(path):
+    try:
+        with io.open(path, 'rb') as file:
+            raw = file.read()
+    except IOError:
+        return None
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+def render_htmlized(text):
+    # The path here has to match the urlpattern for htmlized
+    # documents in order to produce correct intra-document links
+    return rfc2html.markup(text, path=settings.HTMLIZER_URL_PREFIX)
+
+def render_pdfized(text):
+    html = rfc2html.markup(text, path=settings.PDFIZER_URL_PREFIX)
+    return wpHTML(string=html.replace('\xad','')).write_pdf(stylesheets=[io.BytesIO(b'html { font-size: 94%;}')])
+
+def document_rendering_job(doc):
+    """Get the (key, path) pair identifying the rendering job for a document
+    or document history object, or None if it isn't a plain-text document"""
+    name = doc.get_base_name()
+    if not name.endswith('.txt'):
+        return None
+    path = doc.get_file_name()
+    root, ext = os.path.splitext(path)
+    if ext != '.txt':
+        path = root + '.txt'
+    return os.path.splitext(name)[0], path
+
+def is_rendered(key, digest, kind):
+    """Whether the artifact of the given kind for key has been rendered, or
+    has failed to render"""
+    return any(os.path.exists(artifact_path(key, digest, kind, failed=failed)) for failed in (False, True))
+
+def stored_artifact(key, path, kind):
+    """Get the stored artifact of the given kind for the text document at
+    path, as a (content, failed) pair.  The content is None if the artifact
+    hasn't been rendered, and failed is True if it can't be."""
+    text = read_text(path)
+    if not text:
+        return None, True
+    digest = text_digest(text)
+    content = read_artifact(key, digest, kind)
+    if content is None and os.path.exists(artifact_path(key, digest, kind, failed=True)):
+        return None, True
+    return content, False
+
+def render_document_artifacts(key, path, force=False):
+    """Render the missing artifacts (or, with force, all artifacts) for the
+    text document at path.  Returns the list of kinds rendered."""
+    text = read_text(path)
+    if not text:
+        return []
+    digest = text_digest(text)
+    rendered = []
+    for kind in RENDERED_KINDS:
+        if not force and is_rendered(key, digest, kind):
+            continue
+        try:
+            content = render_htmlized(text) if kind == 'htmlized' else render_pdfized(text)
+            error = None if content else 'empty rendering'
+        except Exception as e:
+            content, error = None, str(e) or e.__class__.__name__
+        if error:
+            log.log(f'{kind} rendering of {key} failed: {error}')
+            write_artifact(key, digest, kind, error, failed=True)
+        else:
+            write_artifact(key, digest, kind, content)
+            rendered.append(kind)
+    return rendered
+
+def render_document_artifacts_job(job):
+    """Process pool entry point, returns (key, kinds rendered or exception)"""
+    key, path, force = job
+    try:
+        return key, render_document_artifacts(key, path, force=force)
+    except Exception as e:
+        return key, e
+
+
+# The most documents a process renders or holds in its rendering queue
+MAX_PENDING_RENDERINGS = 4
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+def _render_in_background(key, path):
+    try:
+        render_document_artifacts(key, path)
+    except Exception as e:
+        log.log(f'rendering of {key} failed: {e}')
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+def queue_rendering(key, path):
+    """Render the missing artifacts for the text document at path in a
+    background thread, once the current transaction (if any) has been
+    committed.  Nothing is done if the document is already queued, or if
+    the queue is full."""
+    def submit():
+        global _executor
+        with _pending_lock:
+            if key in _pending or len(_pending) >= MAX_PENDING_RENDERINGS:
+                return
+            _pending.add(key)
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render_document')
+        _executor.submit(_render_in_background, key, path)
+    transaction.on_commit(submit)
+
+def queue_document_rendering(doc):
+    job = document_rendering_job(doc)
+    if job is not None:
+        queue_rendering(*job)
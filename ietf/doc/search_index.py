@@ -0,0 +1,138 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Search index for documents.
+
+The names, aliases, titles, abstracts and author names and email addresses of
+documents are split into lowercase tokens and stored as DocumentSearchToken
+rows.  A search matches the documents which, for every token of the query,
+have an index token which starts with it.  This is an indexed range lookup,
+rather than the full table scans of an icontains filter.
+
+The index is updated from the Document, DocAlias and DocumentAuthor signal
+handlers in ietf.doc.models, and can be rebuilt with the
+update_document_search_index management command.
+"""
+
+import re
+
+from collections import defaultdict
+
+from django.db import transaction
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import Document, DocAlias, DocumentAuthor, DocumentSearchToken
+from ietf.person.models import Alias, Email
+
+
+INDEX_KINDS = [ kind for kind, __ in DocumentSearchToken.KIND_CHOICES ]
+
+TOKEN_MAX_LENGTH = DocumentSearchToken._meta.get_field('token').max_length
+
+word_re = re.compile(r'[^\W_]+')
+word_part_re = re.compile(r'\d+|[^\W\d_]+')
+
+
+def tokenize(text):
+    """Get the set of index tokens for text.
+
+    Words are also split where letters and digits meet, so that 'rfc6666' can
+    be found both as 'rfc66' and as '6666'.
+    """
+    tokens = set()
+    for word in word_re.findall((text or '').lower()):
+        tokens.add(word[:TOKEN_MAX_LENGTH])
+        parts = word_part_re.findall(word)
+        if len(parts) > 1:
+            tokens.update(part[:TOKEN_MAX_LENGTH] for part in parts)
+    return tokens
+
+def query_tokens(text):
+    """Get the tokens of a search query, in order and without duplicates"""
+    tokens = []
+    for word in word_re.findall((text or '').lower()):
+        word = word[:TOKEN_MAX_LENGTH]
+        if word not in tokens:
+            tokens.append(word)
+    return tokens
+
+def filter_by_search_index(queryset, text, kinds, field='pk'):
+    """Restrict queryset to the documents which match the search text
+
+    Each token in text must be the start of an index token of one of the
+    given kinds.  For querysets of models other than Document, field names
+    the relation to Document.
+    """
+    tokens = query_tokens(text)
+    if not tokens:
+        return queryset.none()
+    for token in tokens:
+        matches = DocumentSearchToken.objects.filter(kind__in=kinds, token__startswith=token)
+        queryset = queryset.filter(**{ '%s__in' % field: matches.values('document_id') })
+    return queryset
+
+def _author_tokens(person_ids):
+    tokens = defaultdict(set)
+    for person_id, name in Alias.objects.filter(person__in=person_ids).values_list('person', 'name'):
+        tokens[person_id] |= tokenize(name)
+    for person_id, address in Email.objects.filter(person__in=person_ids).values_list('person', 'address'):
+        tokens[person_id] |= tokenize(address)
+    return tokens
+
+def _index_entries(documents, kinds):
+    """Get a dictionary from document pk to the set of (kind, token) entries
+    of the given kinds for the documents"""
+    doc_ids = [ d.pk for d in documents ]
+    entries = { d.pk: set() for d in documents }
+    for d in documents:
+        for kind in ('name', 'title', 'abstract'):
+            if kind in kinds:
+                entries[d.pk].update((kind, token) for token in tokenize(getattr(d, kind)))
+    if 'alias' in kinds:
+        for doc_id, name in DocAlias.objects.filter(docs__in=doc_ids).values_list('docs', 'name'):
+            entries[doc_id].update(('alias', token) for token in tokenize(name))
+    if 'author' in kinds:
+        authors = list(DocumentAuthor.objects.filter(document__in=doc_ids).values_list('document', 'person'))
+        person_tokens = _author_tokens(set(person_id for __, person_id in authors))
+        for doc_id, person_id in authors:
+            entries[doc_id].update(('author', token) for token in person_tokens[person_id])
+    return entries
+
+def update_document_search_index(document, kinds=INDEX_KINDS):
+    """Bring the index entries of the given kinds for document up to date"""
+    wanted = _index_entries([document], kinds)[document.pk]
+    existing = set(DocumentSearchToken.objects.filter(document=document, kind__in=kinds).values_list('kind', 'token'))
+    stale = defaultdict(list)
+    for kind, token in existing - wanted:
+        stale[kind].append(token)
+    with transaction.atomic():
+        for kind, tokens in stale.items():
+            DocumentSearchToken.objects.filter(document=document, kind=kind, token__in=tokens).delete()
+        DocumentSearchToken.objects.bulk_create(
+            DocumentSearchToken(document=document, kind=kind, token=token) for kind, token in wanted - existing
+        )
+
+def rebuild_search_index(documents=None, batch_size=500):
+    """Rebuild the index entries for documents (default all), in batches.
+    Returns the number of documents indexed."""
+    if documents is None:
+        documents = Document.objects.all()
+    documents = documents.order_by('pk').only('pk', 'name', 'title', 'abstract')
+    count = 0
+    last_pk = None
+    while True:
+        batch = documents if last_pk is None else documents.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        entries = _index_entries(batch, INDEX_KINDS)
+        with transaction.atomic():
+            DocumentSearchToken.objects.filter(document__in=batch).delete()
+            DocumentSearchToken.objects.bulk_create(
+                DocumentSearchToken(document_id=doc_id, kind=kind, token=token)
+                for doc_id, doc_entries in entries.items() for kind, token in doc_entries
+            )
+        count += len(batch)
+        last_pk = batch[-1].pk
+    return count
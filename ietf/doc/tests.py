@@ -17,12 +17,16 @@ from pyquery import PyQuery
 from urllib.parse import urlparse, parse_qs
 from tempfile import NamedTemporaryFile
 
+from django.core.cache import cache
 from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse as urlreverse
 from django.conf import settings
 from django.forms import Form
 from django.utils.html import escape
+from django.http import QueryDict
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.text import slugify
 
 from tastypie.test import ResourceTestCaseMixin
@@ -31,14 +35,18 @@ import debug                            # pyflakes:ignore
 
 from ietf.doc.models import ( Document, DocAlias, DocRelationshipName, RelatedDocument, State,
     DocEvent, BallotPositionDocEvent, LastCallDocEvent, WriteupDocEvent, NewRevisionDocEvent, BallotType,
-    EditedAuthorsDocEvent )
+    EditedAuthorsDocEvent, DocumentAuthor, SEARCH_RESULTS_GENERATION )
 from ietf.doc.factories import ( DocumentFactory, DocEventFactory, CharterFactory, 
     ConflictReviewFactory, WgDraftFactory, IndividualDraftFactory, WgRfcFactory, 
     IndividualRfcFactory, StateDocEventFactory, BallotPositionDocEventFactory, 
     BallotDocEventFactory, DocumentAuthorFactory, NewRevisionDocEventFactory,
     StatusChangeFactory)
 from ietf.doc.fields import SearchableDocumentsField
-from ietf.doc.utils import create_ballot_if_not_open, uppercase_std_abbreviated_name
+from ietf.doc.name_index import clear_name_index, get_name_index, find_unique_name, _refresh_name_index
+from ietf.doc.rendering import ( MAX_PENDING_RENDERINGS, document_rendering_job, queue_rendering,
+    render_document_artifacts, stored_artifact )
+from ietf.doc.search_index import filter_by_search_index, rebuild_search_index
+from ietf.doc.utils import create_ballot_if_not_open, uppercase_std_abbreviated_name, get_search_cache_key
 from ietf.group.models import Group
 from ietf.group.factories import GroupFactory, RoleFactory
 from ietf.ipr.factories import HolderIprDisclosureFactory
@@ -49,6 +57,7 @@ from ietf.meeting.factories import ( MeetingFactory, SessionFactory, SessionPres
 from ietf.name.models import SessionStatusName, BallotPositionName, DocTypeName
 from ietf.person.models import Person
 from ietf.person.factories import PersonFactory, EmailFactory
+from ietf.utils.cache import get_generation
 from ietf.utils.mail import outbox
 from ietf.utils.test_utils import login_testing_unauthorized, unicontent, reload_db_objects
 from ietf.utils.test_utils import TestCase
@@ -223,6 +232,152 @@ class SearchTests(TestCase):
         self.assertEqual(parsed.path, urlreverse('ietf.doc.views_search.search'))
         self.assertEqual(parse_qs(parsed.query)["name"][0], "draft-ietf-doesnotexist-42")
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_search_results_cache(self):
+        draft = IndividualDraftFactory(name='draft-foo-mars-test')
+        IndividualDraftFactory(name='draft-foo-venus-test')
+        url = urlreverse('ietf.doc.views_search.search') + "?activedrafts=on&olddrafts=on&name=foo"
+
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "draft-foo-mars-test")
+        self.assertContains(r, "draft-foo-venus-test")
+        cached = cache.get(get_search_cache_key(QueryDict("activedrafts=on&olddrafts=on&name=foo")))
+        self.assertEqual(sorted(cached[1]), sorted(Document.objects.filter(name__startswith='draft-foo-').values_list('pk', flat=True)))
+
+        # a hit doesn't repeat the search, so only shows the cached documents
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(any('doc_documentsearchtoken' in q['sql'] for q in queries.captured_queries))
+
+        # state changes invalidate the cached results
+        draft.set_state(State.objects.get(type="draft", slug="rfc"))
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotContains(r, "draft-foo-mars-test")
+        self.assertContains(r, "draft-foo-venus-test")
+
+        # saves which don't change the fields searched on keep the cached results
+        generation = get_generation(SEARCH_RESULTS_GENERATION)
+        draft = Document.objects.get(pk=draft.pk)
+        draft.note = 'A new note'
+        draft.save()
+        self.assertEqual(get_generation(SEARCH_RESULTS_GENERATION), generation)
+        draft.title = 'A new title'
+        draft.save()
+        self.assertNotEqual(get_generation(SEARCH_RESULTS_GENERATION), generation)
+
+        # only the results shown are cached
+        r = self.client.get(url + "&rfcs=on")
+        self.assertEqual(len(cache.get(get_search_cache_key(QueryDict("activedrafts=on&olddrafts=on&name=foo&rfcs=on")))[1]), 2)
+        cache.clear()
+        with mock.patch('ietf.doc.views_search.MAX_SEARCH_RESULTS', 1):
+            r = self.client.get(url + "&rfcs=on")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(cache.get(get_search_cache_key(QueryDict("activedrafts=on&olddrafts=on&name=foo&rfcs=on")))[1]), 1)
+
+    def test_search_index(self):
+        draft = IndividualDraftFactory(name='draft-foo-quux-bar', title='Optimizing Martian Network Topologies', authors=[PersonFactory(name='Zebulon Quimby')])
+        self.assertIn(('name', 'quux'), set(draft.searchtokens.values_list('kind', 'token')))
+        self.assertIn(('author', 'quimby'), set(draft.searchtokens.values_list('kind', 'token')))
+
+        def search(text, kinds):
+            return list(filter_by_search_index(Document.objects.all(), text, kinds))
+
+        self.assertEqual(search('foo-qu', ['name']), [draft])
+        self.assertEqual(search('martian optim', ['title']), [draft])
+        self.assertEqual(search('zebulon', ['author']), [draft])
+        self.assertEqual(search('artian', ['title']), [])
+        self.assertEqual(search('zebulon', ['title']), [])
+
+        # the index follows changes to the document, its aliases and authors
+        draft.title = 'Venusian Network Topologies'
+        draft.save()
+        self.assertEqual(search('martian', ['title']), [])
+        self.assertEqual(search('venus', ['title']), [draft])
+
+        DocAlias.objects.create(name='rfc6666').docs.add(draft)
+        self.assertEqual(search('6666', ['alias']), [draft])
+        self.assertEqual(search('rfc66', ['alias']), [draft])
+        DocAlias.objects.filter(name='rfc6666').delete()
+        self.assertEqual(search('6666', ['alias']), [])
+
+        draft.documentauthor_set.all().delete()
+        self.assertEqual(search('zebulon', ['author']), [])
+        DocumentAuthor.objects.create(document=draft, person=PersonFactory(name='Yolanda Xerxes'))
+        self.assertEqual(search('xerx', ['author']), [draft])
+
+        # a rebuild gives the same index
+        entries = set(draft.searchtokens.values_list('kind', 'token'))
+        draft.searchtokens.all().delete()
+        rebuild_search_index(Document.objects.filter(pk=draft.pk))
+        self.assertEqual(set(draft.searchtokens.values_list('kind', 'token')), entries)
+
+    def test_name_index(self):
+        draft = IndividualDraftFactory(name='draft-foo-quux-bar')
+        DocAlias.objects.create(name='rfc6666').docs.add(draft)
+        charter = CharterFactory(name='charter-ietf-quuxwg')
+        draft.save_with_history([DocEvent.objects.create(doc=draft, rev=draft.rev, type="changed_document", by=PersonFactory(), desc="Test")])
+
+        clear_name_index()
+        index = get_name_index()
+        self.assertEqual(index.exact('DRAFT-FOO-QUUX-BAR'), 'draft-foo-quux-bar')
+        self.assertTrue(index.is_draft('rfc6666'))
+        self.assertFalse(index.is_draft(charter.name))
+        self.assertTrue(index.has_rev(draft.name, draft.rev))
+        self.assertIsNone(index.has_rev(draft.name, '42'))
+        self.assertEqual(index.prefix('draft-foo-qu'), ['draft-foo-quux-bar'])
+        self.assertEqual(index.containing('quux-b'), ['draft-foo-quux-bar'])
+        self.assertEqual(index.containing('6666'), ['rfc6666'])
+        self.assertEqual(index.containing('uux'), [])
+
+        self.assertEqual(find_unique_name('foo-quux'), 'draft-foo-quux-bar')
+        self.assertEqual(find_unique_name('foo-quux', use_index=False), 'draft-foo-quux-bar')
+        # without the index, the contains match is done with the search index
+        # rather than a substring scan of the aliases
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(find_unique_name('QUUX-BAR', use_index=False), 'draft-foo-quux-bar')
+        self.assertEqual(len(queries), 3)
+        self.assertFalse([ q for q in queries.captured_queries if "'%quux" in q['sql'].lower() ])
+
+        # new aliases are added to the index, without building it again
+        with mock.patch('ietf.doc.name_index.build_name_index') as build_name_index:
+            DocAlias.objects.create(name='draft-foo-quux-baz').docs.add(draft)
+            index = get_name_index()
+            self.assertFalse(build_name_index.called)
+        self.assertEqual(index.prefix('draft-foo-quux-'), ['draft-foo-quux-bar', 'draft-foo-quux-baz'])
+        self.assertEqual(index.containing('quux-baz'), ['draft-foo-quux-baz'])
+        self.assertEqual(index.exact('draft-foo-quux-baz'), 'draft-foo-quux-baz')
+        self.assertTrue(index.is_draft('draft-foo-quux-baz'))
+        self.assertIsNone(find_unique_name('foo-quux'))
+
+        # in the background, an index which is too old is built again in a
+        # thread, and the old one is used meanwhile
+        with override_settings(DOC_NAME_INDEX_REFRESH_IN_BACKGROUND=True):
+            with mock.patch('ietf.doc.name_index.threading.Thread') as thread:
+                self.assertIs(get_name_index(), index)
+                self.assertFalse(thread.called)
+                index.built -= settings.DOC_NAME_INDEX_MAX_AGE
+                self.assertIs(get_name_index(), index)
+                self.assertEqual(thread.call_count, 1)
+                # requests don't wait for the refresh
+                DocAlias.objects.create(name='draft-foo-quux-qux').docs.add(draft)
+                self.assertIs(get_name_index(), index)
+                self.assertEqual(thread.call_count, 1)
+                self.assertEqual(find_unique_name('draft-foo-quux-qux'), 'draft-foo-quux-qux')
+            _refresh_name_index(*thread.call_args[1]['args'])
+            self.assertIsNot(get_name_index(), index)
+            self.assertEqual(get_name_index().prefix('draft-foo-quux-'),
+                             ['draft-foo-quux-bar', 'draft-foo-quux-baz', 'draft-foo-quux-qux'])
+
+        # an index over the memory limit isn't kept, and the database is used instead
+        clear_name_index()
+        with override_settings(DOC_NAME_INDEX_MEMORY_LIMIT=100):
+            self.assertIsNone(get_name_index())
+            self.assertEqual(find_unique_name('charter-ietf-quux'), charter.name)
+        clear_name_index()
+
     def test_frontpage(self):
         r = self.client.get("/")
         self.assertEqual(r.status_code, 200)
@@ -685,6 +840,11 @@ Man                    Expires September 22, 2015               [Page 3]
         r = self.client.get(urlreverse("ietf.doc.views_doc.document_html", kwargs=dict(name=draft.name)))
         self.assertEqual(r.status_code, 200)
         self.assertContains(r, "Versions:")
+        self.assertContains(r, "is being generated")
+
+        render_document_artifacts(*document_rendering_job(draft))
+        r = self.client.get(urlreverse("ietf.doc.views_doc.document_html", kwargs=dict(name=draft.name)))
+        self.assertEqual(r.status_code, 200)
         self.assertContains(r, "Deimos street")
         q = PyQuery(r.content)
         self.assertEqual(q('title').text(), 'draft-ietf-mars-test-01')
@@ -797,6 +957,37 @@ Man                    Expires September 22, 2015               [Page 3]
             msg_prefix='WG-like group %s (%s) should include group type in link' % (group.acronym, group.type),
         )
 
+    def test_document_draft_query_count(self):
+        def add_history(draft, revisions):
+            for i in range(revisions):
+                draft.rev = '%02d' % (int(draft.rev) + 1)
+                draft.save_with_history([
+                    NewRevisionDocEventFactory(doc=draft, rev=draft.rev),
+                    DocEventFactory(doc=draft),
+                    WriteupDocEvent.objects.create(doc=draft, rev=draft.rev, type='changed_protocol_writeup',
+                        by=Person.objects.get(user__username='secretary'), desc='Changed writeup', text='Writeup %d' % i),
+                ])
+
+        def count_queries(draft):
+            url = urlreverse("ietf.doc.views_doc.document_main", kwargs=dict(name=draft.name))
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertContains(r, draft.rev)
+            return len(queries)
+
+        short = WgDraftFactory()
+        add_history(short, 1)
+        long = WgDraftFactory(group=short.group)
+        add_history(long, 30)
+
+        count_queries(short)
+        few = count_queries(short)
+        many = count_queries(long)
+        # the queries don't grow with the length of the history
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 100)
+
     def test_draft_status_changes(self):
         draft = WgRfcFactory()
         status_change_doc = StatusChangeFactory(
@@ -2835,6 +3026,12 @@ class PdfizedTests(TestCase):
         r = self.client.get(url)
         self.assertEqual(r.status_code, 404)
 
+    def should_be_pending(self, argdict):
+        url = urlreverse(self.view, kwargs=argdict)
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.get('Retry-After'), '60')
+
     def test_pdfized(self):
         rfc = WgRfcFactory(create_revisions=range(0,2))
 
@@ -2846,6 +3043,12 @@ class PdfizedTests(TestCase):
             with (Path(dir) / f'{rfc.name}-{r:02d}.txt').open('w') as f:
                 f.write('text content')
 
+        # nothing has been rendered yet
+        self.should_be_pending(dict(name=rfc.canonical_name()))
+        self.should_be_pending(dict(name=rfc.name,rev='01'))
+
+        call_command('render_document_artifacts', '--all', verbosity=0)
+
         self.should_succeed(dict(name=rfc.canonical_name()))
         self.should_succeed(dict(name=rfc.name))
         for r in range(0,2):
@@ -2853,3 +3056,63 @@ class PdfizedTests(TestCase):
             for ext in ('pdf','txt','html','anythingatall'):
                 self.should_succeed(dict(name=rfc.name,rev=f'{r:02d}',ext=ext))
         self.should_404(dict(name=rfc.name,rev='02'))
+
+    def test_pdfized_failure(self):
+        draft = WgDraftFactory()
+        def write_text(text):
+            # the view renders the revision from the archive
+            for dir in (settings.INTERNET_DRAFT_PATH, settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR):
+                (Path(dir) / f'{draft.name}-{draft.rev}.txt').write_text(text)
+        write_text('text content')
+        key, path = document_rendering_job(draft)
+
+        with mock.patch('ietf.doc.rendering.render_pdfized', side_effect=AssertionError) as render_pdfized:
+            self.assertEqual(render_document_artifacts(key, path), ['htmlized'])
+            # the failure is recorded, and not tried again
+            self.assertEqual(render_document_artifacts(key, path), [])
+            self.assertEqual(render_pdfized.call_count, 1)
+        self.assertEqual(stored_artifact(key, path, 'pdfized'), (None, True))
+        self.assertTrue(draft.rendering_failed('pdfized'))
+        self.should_404(dict(name=draft.name))
+
+        # a new text is tried again
+        write_text('other text content')
+        self.assertFalse(draft.rendering_failed('pdfized'))
+        self.assertEqual(render_document_artifacts(key, path), ['htmlized', 'pdfized'])
+        self.should_succeed(dict(name=draft.name))
+
+    def test_queue_rendering(self):
+        draft = WgDraftFactory()
+        key, path = document_rendering_job(draft)
+        with mock.patch('ietf.doc.rendering.transaction.on_commit', side_effect=lambda func: func()), \
+             mock.patch('ietf.doc.rendering._pending', set()), \
+             mock.patch('ietf.doc.rendering._executor') as executor:
+            for i in range(MAX_PENDING_RENDERINGS + 2):
+                queue_rendering('%s-%d' % (key, i), path)
+            # documents already queued aren't queued again, and the ones
+            # beyond the limit are left for the cron job
+            queue_rendering('%s-0' % key, path)
+            self.assertEqual(executor.submit.call_count, MAX_PENDING_RENDERINGS)
+
+    def test_render_document_artifacts(self):
+        draft = WgDraftFactory()
+        (Path(settings.INTERNET_DRAFT_PATH) / f'{draft.name}-{draft.rev}.txt').write_text('text content')
+        key, path = document_rendering_job(draft)
+        self.assertEqual(key, f'{draft.name}-{draft.rev}')
+        self.assertEqual(stored_artifact(key, path, 'htmlized'), (None, False))
+
+        self.assertEqual(render_document_artifacts(key, path), ['htmlized', 'pdfized'])
+        self.assertIn('text content', stored_artifact(key, path, 'htmlized')[0])
+        self.assertTrue(stored_artifact(key, path, 'pdfized')[0].startswith(b'%PDF'))
+        self.assertEqual(draft.pdfized(), stored_artifact(key, path, 'pdfized')[0])
+        # existing artifacts are only rendered again when forced
+        self.assertEqual(render_document_artifacts(key, path), [])
+        self.assertEqual(render_document_artifacts(key, path, force=True), ['htmlized', 'pdfized'])
+        # or when the text changes, which replaces the old artifacts
+        Path(path).write_text('other text content')
+        self.assertEqual(stored_artifact(key, path, 'htmlized'), (None, False))
+        self.assertEqual(render_document_artifacts(key, path), ['htmlized', 'pdfized'])
+        self.assertIn('other text content', stored_artifact(key, path, 'htmlized')[0])
+        self.assertEqual(len(list((Path(settings.RENDERED_DOCUMENT_PATH) / 'htmlized').glob(key + '.*'))), 1)
+        # a missing source is not an error
+        self.assertEqual(render_document_artifacts('draft-no-such-thing-00', path + '.missing'), [])
@@ -30,6 +30,7 @@ from ietf.doc.models import Document, DocHistory, State, DocumentAuthor, DocHist
 from ietf.doc.models import DocAlias, RelatedDocument, RelatedDocHistory, BallotType, DocReminder
 from ietf.doc.models import DocEvent, ConsensusDocEvent, BallotDocEvent, IRSGBallotDocEvent, NewRevisionDocEvent, StateDocEvent
 from ietf.doc.models import TelechatDocEvent, DocumentActionHolder, EditedAuthorsDocEvent
+from ietf.doc.name_index import is_draft_name
 from ietf.name.models import DocReminderTypeName, DocRelationshipName
 from ietf.group.models import Role, Group
 from ietf.ietfauth.utils import has_role, is_authorized_in_doc_stream, is_individual_draft_author, is_bofreq_editor
@@ -1319,12 +1320,12 @@ def fuzzy_find_documents(name, rev=None):
 
     # see if we can find a document using this name
     docs = Document.objects.filter(docalias__name=name, type_id='draft')
-    if rev and not docs.exists():
+    if rev and not is_draft_name(name):
         # No document found, see if the name/rev split has been misidentified.
         # Handles some special cases, like draft-ietf-tsvwg-ieee-802-11.
         name = '%s-%s' % (name, rev)
         docs = Document.objects.filter(docalias__name=name, type_id='draft')
-        if docs.exists():
+        if is_draft_name(name):
             rev = None  # found a doc by name with rev = None, so update that
 
     FoundDocuments = namedtuple('FoundDocuments', 'documents matched_name matched_rev')
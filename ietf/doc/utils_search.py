@@ -156,20 +156,29 @@ def augment_docs_with_related_docs_info(docs):
             originalDoc = d.related_that_doc('conflrev')[0].document
             d.pages = originalDoc.pages
             
+def document_table_queryset(docs):
+    # fill in attribute results when evaluating, to decrease the number of queries
+    docs = docs.select_related("ad", "std_level", "intended_std_level", "group", "stream", "shepherd", )
+    return docs.prefetch_related("states__type", "tags", "groupmilestone_set__group", "reviewrequest_set__team",
+                                 "ad__email_set", "docalias__iprdocrel_set")
+
 def prepare_document_table(request, docs, query=None, max_results=200):
-    """Take a queryset of documents and a QueryDict with sorting info
-    and return list of documents with attributes filled in for
-    displaying a full table of information about the documents, plus
-    dict with information about the columns."""
+    """Take a queryset or list of documents, or a list of document pks, and a
+    QueryDict with sorting info and return list of documents with attributes
+    filled in for displaying a full table of information about the documents,
+    plus dict with information about the columns.  Of a list of pks, only the
+    documents which are displayed are fetched."""
 
     if not isinstance(docs, list):
         # evaluate and fill in attribute results immediately to decrease
         # the number of queries
-        docs = docs.select_related("ad", "std_level", "intended_std_level", "group", "stream", "shepherd", )
-        docs = docs.prefetch_related("states__type", "tags", "groupmilestone_set__group", "reviewrequest_set__team",
-                                     "ad__email_set", "docalias__iprdocrel_set")
+        docs = document_table_queryset(docs)
         docs = docs[:max_results] # <- that is still a queryset, but with a LIMIT now
         docs = list(docs)
+    elif docs and not isinstance(docs[0], Document):
+        pks = docs[:max_results]
+        doc_dict = document_table_queryset(Document.objects.all()).in_bulk(pks)
+        docs = [ doc_dict[pk] for pk in pks if pk in doc_dict ]
     else:
         docs = docs[:max_results]
 
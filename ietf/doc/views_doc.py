@@ -53,10 +53,9 @@ from django import forms
 
 import debug                            # pyflakes:ignore
 
-from ietf.doc.models import ( Document, DocAlias, DocHistory, DocEvent, BallotDocEvent, BallotType,
+from ietf.doc.models import ( Document, DocHistory, DocEvent, BallotDocEvent, BallotType,
     ConsensusDocEvent, NewRevisionDocEvent, TelechatDocEvent, WriteupDocEvent, IanaExpertDocEvent,
-    IESG_BALLOT_ACTIVE_STATES, STATUSCHANGE_RELATIONS, DocumentActionHolder, DocumentAuthor,
-    RelatedDocument, RelatedDocHistory)
+    IESG_BALLOT_ACTIVE_STATES, STATUSCHANGE_RELATIONS, DocumentActionHolder, DocumentAuthor)
 from ietf.doc.utils import (add_links_in_new_revision_events, augment_events_with_revision,
     can_adopt_draft, can_unadopt_draft, get_chartering_type, get_tags_for_stream_id,
     needed_ballot_positions, nice_consensus, prettify_std_name, update_telechat, has_same_ballot,
@@ -64,6 +63,8 @@ from ietf.doc.utils import (add_links_in_new_revision_events, augment_events_wit
     add_events_message_info, get_unicode_document_content, build_doc_meta_block,
     augment_docs_and_user_with_user_info, irsg_needed_ballot_positions, add_action_holder_change_event,
     build_doc_supermeta_block, build_file_urls, update_documentauthors, fuzzy_find_documents)
+from ietf.doc.page_loader import ( document_main_queryset, load_document_events, load_revisions,
+    load_interesting_relations )
 from ietf.doc.utils_bofreq import bofreq_editors, bofreq_responsible
 from ietf.group.models import Role, Group
 from ietf.group.utils import can_manage_all_groups_of_type, can_manage_materials, group_features_role_filter
@@ -118,57 +119,31 @@ def render_document_top(request, doc, tab, name):
                                  selected=tab,
                                  name=name))
 
-def interesting_doc_relations(doc):
-
-    if isinstance(doc, Document):
-        cls = RelatedDocument
-        target = doc
-    elif isinstance(doc, DocHistory):
-        cls = RelatedDocHistory
-        target = doc.doc
-    else:
-        raise TypeError("Expected this method to be called with a Document or DocHistory object")
-
-    that_relationships = STATUSCHANGE_RELATIONS + ('conflrev', 'replaces', 'possibly_replaces', 'updates', 'obs') 
-
-    that_doc_relationships = ('replaces', 'possibly_replaces', 'updates', 'obs')
-
-    interesting_relations_that = cls.objects.filter(target__docs=target, relationship__in=that_relationships).select_related('source')
-    interesting_relations_that_doc = cls.objects.filter(source=doc, relationship__in=that_doc_relationships).prefetch_related('target__docs')
-
-    return interesting_relations_that, interesting_relations_that_doc
-
 def document_main(request, name, rev=None):
-    doc = get_object_or_404(Document.objects.select_related(), docalias__name=name)
+    doc = get_object_or_404(document_main_queryset(), docalias__name=name)
 
     # take care of possible redirections
-    aliases = DocAlias.objects.filter(docs=doc).values_list("name", flat=True)
+    aliases = [ a.name for a in doc.docalias.all() ]
     if rev==None and doc.type_id == "draft" and not name.startswith("rfc"):
         for a in aliases:
             if a.startswith("rfc"):
                 return redirect("ietf.doc.views_doc.document_main", name=a)
-    
-    revisions = []
-    for h in doc.history_set.order_by("time", "id"):
-        if h.rev and not h.rev in revisions:
-            revisions.append(h.rev)
-    if not doc.rev in revisions:
-        revisions.append(doc.rev)
+
+    # the latest_event() lookups below, and in the functions called from
+    # here, are answered from the events loaded in bulk
+    load_document_events(doc)
+
+    revisions, history = load_revisions(doc, rev)
     latest_rev = doc.rev
 
     snapshot = False
 
     gh = None
     if rev != None:
-        # find the entry in the history
-        for h in doc.history_set.order_by("-time"):
-            if rev == h.rev:
-                snapshot = True
-                doc = h
-                break
-
-        if not snapshot:
+        if history is None:
             return redirect('ietf.doc.views_doc.document_main', name=name)
+        snapshot = True
+        doc = history
 
         if doc.type_id == "charter":
             # find old group, too
@@ -198,7 +173,11 @@ def document_main(request, name, rev=None):
         else:
             pass
 
-        interesting_relations_that, interesting_relations_that_doc = interesting_doc_relations(doc)
+        relations_that, relations_that_doc = load_interesting_relations(doc)
+        def related_that(*relationships):
+            return [ r for r in relations_that if r.relationship_id in relationships ]
+        def related_that_doc(*relationships):
+            return [ r for r in relations_that_doc if r.relationship_id in relationships ]
 
         iesg_state = doc.get_state("draft-iesg")
         if isinstance(doc, Document):
@@ -224,7 +203,7 @@ def document_main(request, name, rev=None):
 
         can_edit_replaces = has_role(request.user, ("Area Director", "Secretariat", "IRTF Chair", "WG Chair", "RG Chair", "WG Secretary", "RG Secretary"))
 
-        is_author = request.user.is_authenticated and doc.documentauthor_set.filter(person__user=request.user).exists()
+        is_author = request.user.is_authenticated and any(a.person.user_id == request.user.pk for a in doc.documentauthor_set.all())
         can_view_possibly_replaces = can_edit_replaces or is_author
 
         rfc_number = name[3:] if name.startswith("") else None
@@ -308,7 +287,8 @@ def document_main(request, name, rev=None):
         if doc.stream:
             stream_state_type_slug = "draft-stream-%s" % doc.stream_id
             stream_state = doc.get_state(stream_state_type_slug)
-        stream_tags = doc.tags.filter(slug__in=get_tags_for_stream_id(doc.stream_id))
+        stream_tag_slugs = get_tags_for_stream_id(doc.stream_id)
+        stream_tags = [ t for t in doc.tags.all() if t.slug in stream_tag_slugs ]
 
         shepherd_writeup = doc.latest_event(WriteupDocEvent, type="changed_protocol_writeup")
 
@@ -346,12 +326,12 @@ def document_main(request, name, rev=None):
         search_archive = quote(search_archive, safe="~")
 
         # conflict reviews
-        conflict_reviews = [r.source.name for r in interesting_relations_that.filter(relationship="conflrev")]
+        conflict_reviews = [r.source.name for r in related_that("conflrev")]
 
         # status changes
         status_changes = []
         proposed_status_changes = []
-        for r in interesting_relations_that.filter(relationship__in=STATUSCHANGE_RELATIONS):
+        for r in related_that(*STATUSCHANGE_RELATIONS):
             state_slug = r.source.get_state_slug()
             if state_slug in ('appr-sent', 'appr-pend'):
                 status_changes.append(r)
@@ -480,19 +460,19 @@ def document_main(request, name, rev=None):
                                        submission=submission,
                                        resurrected_by=resurrected_by,
 
-                                       replaces=interesting_relations_that_doc.filter(relationship="replaces"),
-                                       replaced_by=interesting_relations_that.filter(relationship="replaces"),
-                                       possibly_replaces=interesting_relations_that_doc.filter(relationship="possibly_replaces"),
-                                       possibly_replaced_by=interesting_relations_that.filter(relationship="possibly_replaces"),
-                                       updates=interesting_relations_that_doc.filter(relationship="updates"),
-                                       updated_by=interesting_relations_that.filter(relationship="updates"),
-                                       obsoletes=interesting_relations_that_doc.filter(relationship="obs"),
-                                       obsoleted_by=interesting_relations_that.filter(relationship="obs"),
+                                       replaces=related_that_doc("replaces"),
+                                       replaced_by=related_that("replaces"),
+                                       possibly_replaces=related_that_doc("possibly_replaces"),
+                                       possibly_replaced_by=related_that("possibly_replaces"),
+                                       updates=related_that_doc("updates"),
+                                       updated_by=related_that("updates"),
+                                       obsoletes=related_that_doc("obs"),
+                                       obsoleted_by=related_that("obs"),
                                        conflict_reviews=conflict_reviews,
                                        status_changes=status_changes,
                                        proposed_status_changes=proposed_status_changes,
                                        rfc_aliases=rfc_aliases,
-                                       has_errata=doc.tags.filter(slug="errata"),
+                                       has_errata=any(t.slug == "errata" for t in doc.tags.all()),
                                        published=published,
                                        file_urls=file_urls,
                                        additional_urls=additional_urls,
@@ -811,7 +791,9 @@ def document_html(request, name, rev=None):
         else:
             doccolor = 'bgred' # Draft
 
-    return render(request, "doc/document_html.html", {"doc":doc, "doccolor":doccolor })
+    htmlized_failed = doc.get_base_name().endswith('.txt') and doc.rendering_failed('htmlized')
+
+    return render(request, "doc/document_html.html", {"doc":doc, "doccolor":doccolor, "htmlized_failed":htmlized_failed })
 
 def document_pdfized(request, name, rev=None, ext=None):
 
@@ -840,8 +822,14 @@ def document_pdfized(request, name, rev=None, ext=None):
     pdf = doc.pdfized()
     if pdf:
         return HttpResponse(pdf,content_type='application/pdf;charset=utf-8')
+    elif doc.rendering_failed('pdfized'):
+        raise Http404("The PDF version of %s could not be generated" % doc.get_base_name())
     else:
-        raise Http404
+        # the pdf is rendered in the background, ask the client to come back
+        response = HttpResponse("The PDF version of %s is being generated. Please try again in a minute.\n" % doc.get_base_name(),
+                                content_type='text/plain;charset=utf-8', status=503)
+        response['Retry-After'] = '60'
+        return response
 
 def check_doc_email_aliases():
     pattern = re.compile(r'^expand-(.*?)(\..*?)?@.*? +(.*)$')
@@ -50,17 +50,20 @@ from django.utils.cache import _generate_cache_key # type: ignore
 
 import debug                            # pyflakes:ignore
 
-from ietf.doc.models import ( Document, DocHistory, DocAlias, State,
+from ietf.doc.models import ( Document, DocAlias, State,
     LastCallDocEvent, NewRevisionDocEvent, IESG_SUBSTATE_TAGS,
     IESG_BALLOT_ACTIVE_STATES, IESG_STATCHG_CONFLREV_ACTIVE_STATES,
-    IESG_CHARTER_ACTIVE_STATES )
+    IESG_CHARTER_ACTIVE_STATES, SEARCH_RESULTS_GENERATION )
 from ietf.doc.fields import select2_id_doc_name_json
+from ietf.doc.name_index import find_unique_name, name_has_rev
+from ietf.doc.search_index import filter_by_search_index
 from ietf.doc.utils import get_search_cache_key, augment_events_with_revision
 from ietf.group.models import Group
 from ietf.idindex.index import active_drafts_index_by_group
 from ietf.name.models import DocTagName, DocTypeName, StreamName
 from ietf.person.models import Person
 from ietf.person.utils import get_active_ads
+from ietf.utils.cache import generation_cache_key, get_generation
 from ietf.utils.draft_search import normalize_draftname
 from ietf.doc.utils_search import prepare_document_table
 
@@ -162,8 +165,7 @@ def retrieve_search_results(form, all_types=False):
 
     # name
     if query["name"]:
-        docs = docs.filter(Q(docalias__name__icontains=query["name"]) |
-                           Q(title__icontains=query["name"])).distinct()
+        docs = filter_by_search_index(docs, query["name"], ['name', 'alias', 'title'])
 
     # rfc/active/old check buttons
     allowed_draft_states = []
@@ -180,10 +182,7 @@ def retrieve_search_results(form, all_types=False):
     # radio choices
     by = query["by"]
     if by == "author":
-        docs = docs.filter(
-            Q(documentauthor__person__alias__name__icontains=query["author"]) |
-            Q(documentauthor__person__email__address__icontains=query["author"])
-        )
+        docs = filter_by_search_index(docs, query["author"], ['author'])
     elif by == "group":
         docs = docs.filter(group__acronym=query["group"])
     elif by == "area":
@@ -203,6 +202,9 @@ def retrieve_search_results(form, all_types=False):
 
     return docs
 
+# The most search results shown
+MAX_SEARCH_RESULTS = 200
+
 def search(request):
     if request.GET:
         # backwards compatibility
@@ -218,13 +220,20 @@ def search(request):
         if not form.is_valid():
             return HttpResponseBadRequest("form not valid: %s" % form.errors)
 
+        # The cache holds the pks of the results, tagged with the generation
+        # of search results they belong to; get both in one round trip
         cache_key = get_search_cache_key(get_params)
-        results = cache.get(cache_key)
-        if not results:
-            results = retrieve_search_results(form)
+        generation_key = generation_cache_key(SEARCH_RESULTS_GENERATION)
+        cached = cache.get_many([cache_key, generation_key])
+        generation = cached.get(generation_key) or get_generation(SEARCH_RESULTS_GENERATION)
+        results = cached.get(cache_key)
+        if results is None or results[0] != generation:
+            # only as many as the table shows
+            pks = retrieve_search_results(form).values_list('pk', flat=True)[:MAX_SEARCH_RESULTS]
+            results = (generation, list(dict.fromkeys(pks)))
             cache.set(cache_key, results)
 
-        results, meta = prepare_document_table(request, results, get_params)
+        results, meta = prepare_document_table(request, results[1], get_params, max_results=MAX_SEARCH_RESULTS)
         meta['searching'] = True
     else:
         form = SearchForm()
@@ -241,21 +250,6 @@ def frontpage(request):
     return render(request, 'doc/frontpage.html', {'form':form})
 
 def search_for_name(request, name):
-    def find_unique(n):
-        exact = DocAlias.objects.filter(name=n).first()
-        if exact:
-            return exact.name
-
-        aliases = DocAlias.objects.filter(name__startswith=n)[:2]
-        if len(aliases) == 1:
-            return aliases[0].name
-
-        aliases = DocAlias.objects.filter(name__contains=n)[:2]
-        if len(aliases) == 1:
-            return aliases[0].name
-
-        return None
-
     def cached_redirect(cache_key, url):
         cache.set(cache_key, url, settings.CACHE_MIDDLEWARE_SECONDS)
         return HttpResponseRedirect(url)
@@ -273,7 +267,7 @@ def search_for_name(request, name):
     if extension_split:
         n = extension_split.group(1)
 
-    redirect_to = find_unique(name)
+    redirect_to = find_unique_name(name)
     if redirect_to:
         return cached_redirect(cache_key, urlreverse("ietf.doc.views_doc.document_main", kwargs={ "name": redirect_to }))
     else:
@@ -281,11 +275,11 @@ def search_for_name(request, name):
         # chop it off if we don't find a match
         rev_split = re.search("^(.+)-([0-9]{2})$", n)
         if rev_split:
-            redirect_to = find_unique(rev_split.group(1))
+            redirect_to = find_unique_name(rev_split.group(1))
             if redirect_to:
                 rev = rev_split.group(2)
                 # check if we can redirect directly to the rev
-                if DocHistory.objects.filter(doc__docalias__name=redirect_to, rev=rev).exists():
+                if name_has_rev(redirect_to, rev):
                     return cached_redirect(cache_key, urlreverse("ietf.doc.views_doc.document_main", kwargs={ "name": redirect_to, "rev": rev }))
                 else:
                     return cached_redirect(cache_key, urlreverse("ietf.doc.views_doc.document_main", kwargs={ "name": redirect_to }))
@@ -583,8 +577,13 @@ def ajax_select2_search_docs(request, model_name, doc_type):
         elif model == DocAlias:
             qs = qs.filter(docs__type=doc_type)
 
-        for t in q:
-            qs = qs.filter(name__icontains=t)
+        if model == Document:
+            qs = filter_by_search_index(qs, " ".join(q), ['name'])
+        else:
+            qs = filter_by_search_index(qs, " ".join(q), ['alias'], field='docs')
+            # an alias matches only if its own name matches
+            for t in q:
+                qs = qs.filter(name__icontains=t)
 
         objs = qs.distinct().order_by("name")[:20]
 
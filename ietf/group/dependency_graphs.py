@@ -0,0 +1,120 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Stored pdf and svg renderings of group document dependency graphs.
+
+Laying out a dependency graph with unflatten and dot takes seconds for the
+larger working groups, and the graphs are fetched by crawlers, so a graph
+is only rendered when its dot source has changed.  The renderings are
+stored as files under settings.DEPENDENCY_GRAPH_PATH, named after the
+group acronym and a hash of the dot source they were rendered from, and
+the render_dependency_graphs management command, run hourly from
+bin/hourly, renders the graphs of all active groups ahead of the views.
+
+The rendering functions only work on the dot source, so that they can run
+in worker processes without database access.
+"""
+
+import hashlib
+import io
+import os
+import re
+import subprocess
+import threading
+
+from django.conf import settings
+
+import debug                            # pyflakes:ignore
+
+from ietf.group.dot import make_dot
+
+
+GRAPH_TYPES = ('pdf', 'svg')
+
+GRAPH_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'svg': 'image/svg+xml',
+}
+
+# seconds to wait for unflatten or dot before giving up on a graph
+GRAPHVIZ_TIMEOUT = 300
+
+
+def dot_digest(dot):
+    return hashlib.sha256(dot.encode('utf-8')).hexdigest()[:16]
+
+def graph_path(acronym, output_type, digest):
+    return os.path.join(settings.DEPENDENCY_GRAPH_PATH, output_type, '%s-%s.%s' % (acronym, digest, output_type))
+
+class GraphRenderingError(Exception):
+    pass
+
+def _run_graphviz(command, input):
+    try:
+        return subprocess.run(command, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=GRAPHVIZ_TIMEOUT, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise GraphRenderingError('%s failed with exit code %s: %s' % (
+            command[0], e.returncode, (e.stderr or b'').decode('utf-8', 'replace').strip()))
+    except subprocess.TimeoutExpired:
+        raise GraphRenderingError('%s timed out after %s seconds' % (command[0], GRAPHVIZ_TIMEOUT))
+
+def render_graph(dot, output_type):
+    """Lay out the dot source and render it as output_type, without
+    temporary files.  Raises GraphRenderingError if unflatten or dot fails
+    or times out."""
+    unflattened = _run_graphviz([settings.UNFLATTEN_BINARY, '-f', '-l', '10'], dot.encode('utf-8'))
+    return _run_graphviz([settings.DOT_BINARY, '-T%s' % output_type], unflattened)
+
+def write_graph(acronym, output_type, digest, content):
+    path = graph_path(acronym, output_type, digest)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # write to a temporary file and rename it, so that a view never serves
+    # a partially written graph
+    tmp_path = '%s.%s.%s.tmp' % (path, os.getpid(), threading.get_ident())
+    with io.open(tmp_path, 'wb') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+    # remove the renderings of earlier versions of the graph
+    stale = re.compile(r'^%s-[0-9a-f]{16}\.%s$' % (re.escape(acronym), output_type))
+    for name in os.listdir(directory):
+        if stale.match(name) and os.path.join(directory, name) != path:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+def render_dependency_graphs(acronym, dot, force=False):
+    """Render the graphs of the dot source which haven't been stored yet
+    (or, with force, all of them).  Returns the list of types rendered."""
+    digest = dot_digest(dot)
+    rendered = []
+    for output_type in GRAPH_TYPES:
+        if force or not os.path.exists(graph_path(acronym, output_type, digest)):
+            write_graph(acronym, output_type, digest, render_graph(dot, output_type))
+            rendered.append(output_type)
+    return rendered
+
+def render_dependency_graphs_job(job):
+    """Process pool entry point, returns (acronym, types rendered or exception)"""
+    acronym, dot, force = job
+    try:
+        return acronym, render_dependency_graphs(acronym, dot, force=force)
+    except Exception as e:
+        return acronym, e
+
+def open_dependency_graph(group, output_type):
+    """Get a file object with the dependency graph of group rendered as
+    output_type, rendering and storing it if the current graph hasn't been
+    rendered yet.  A graph which fails to render raises GraphRenderingError,
+    and isn't stored."""
+    dot = make_dot(group)
+    digest = dot_digest(dot)
+    try:
+        return io.open(graph_path(group.acronym, output_type, digest), 'rb')
+    except IOError:
+        pass
+    content = render_graph(dot, output_type)
+    write_graph(group.acronym, output_type, digest, content)
+    return io.BytesIO(content)
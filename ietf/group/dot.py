@@ -126,6 +126,10 @@ def make_dot(group):
         node.nodename = nodename(node.name)
         node.styles = get_node_styles(node, group)
 
+    # sorted, so that the same graph always has the same dot source
+    nodes = sorted(nodes, key=lambda n: n.name)
+    edges = sorted(edges, key=lambda e: (e.sourcename(), e.targetname(), e.relateddocument.relationship.slug))
+
     return render_to_string('group/dot.txt',
                              dict( nodes=nodes, edges=edges )
                             )
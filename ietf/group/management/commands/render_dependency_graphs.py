@@ -0,0 +1,63 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import debug                            # pyflakes:ignore
+
+from ietf.group.dependency_graphs import render_dependency_graphs_job
+from ietf.group.dot import make_dot
+from ietf.group.models import Group
+
+
+class Command(BaseCommand):
+    help = ('Render the pdf and svg document dependency graphs of the active groups which have documents, '
+            'placing them in the directory configured in settings.DEPENDENCY_GRAPH_PATH: %s.  Graphs '
+            'whose dot source hasn\'t changed since they were last rendered are skipped.' % settings.DEPENDENCY_GRAPH_PATH)
+
+    def add_arguments(self, parser):
+        parser.add_argument('groups', nargs='*', metavar='ACRONYM', help="Render the graphs of these groups only")
+        parser.add_argument('--force', action='store_true', default=False, help="Render again even if the rendered graphs exist")
+        parser.add_argument('-p', '--processes', type=int, default=1, help="Number of worker processes to render with (default 1)")
+
+    def note(self, msg):
+        if self.verbosity > 1:
+            self.stdout.write(msg)
+
+    def jobs(self, acronyms, force):
+        groups = Group.objects.filter(state='active', type__features__has_documents=True).order_by('acronym')
+        if acronyms:
+            groups = groups.filter(acronym__in=acronyms)
+        for group in groups:
+            yield group.acronym, make_dot(group), force
+
+    def handle(self, *args, **options):
+        self.verbosity = options.get("verbosity", 1)
+        jobs = list(self.jobs(options['groups'], options['force']))
+        processes = max(1, options['processes'])
+
+        if processes > 1:
+            # the workers don't use the database, and mustn't share our connection
+            connections.close_all()
+            with multiprocessing.Pool(processes) as pool:
+                rendered = self.report(pool.imap_unordered(render_dependency_graphs_job, jobs))
+        else:
+            rendered = self.report(map(render_dependency_graphs_job, jobs))
+
+        if self.verbosity > 0:
+            self.stdout.write('Rendered %d graphs for %d groups' % (rendered, len(jobs)))
+
+    def report(self, results):
+        rendered = 0
+        for acronym, result in results:
+            if isinstance(result, Exception):
+                self.stderr.write('%s: %s' % (acronym, result))
+            elif result:
+                rendered += len(result)
+                self.note('%s: %s' % (acronym, ', '.join(result)))
+        return rendered
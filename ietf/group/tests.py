@@ -4,8 +4,9 @@
 import io
 import os
 import datetime
+import subprocess
 
-from unittest import skipIf
+from unittest import mock, skipIf
 from tempfile import NamedTemporaryFile
 
 from django.core.management import call_command
@@ -17,7 +18,9 @@ from django.test import Client
 import debug                             # pyflakes:ignore
 
 from ietf.doc.factories import DocumentFactory, WgDraftFactory
-from ietf.doc.models import DocEvent, RelatedDocument
+from ietf.doc.models import DocEvent, Document, RelatedDocument
+from ietf.group.dependency_graphs import GRAPH_TYPES, dot_digest, graph_path
+from ietf.group.dot import make_dot
 from ietf.group.models import Role, Group
 from ietf.group.utils import get_group_role_emails, get_child_group_role_emails, get_group_ad_emails
 from ietf.group.factories import GroupFactory, RoleFactory
@@ -121,7 +124,52 @@ class GroupDocDependencyGraphTests(TestCase):
                     "a svg dependency graph for group: %s"%group.acronym)
                 self.assertGreater(len(r.content), 0, "svg dependency graph for group "
                     "%s has no content"%group.acronym)
-            
+
+    def test_stored_dependency_graphs(self):
+        group = Document.objects.filter(type='draft').first().group
+        dot = make_dot(group)
+        digest = dot_digest(dot)
+        self.assertEqual(make_dot(group), dot)
+
+        call_command('render_dependency_graphs', group.acronym, verbosity=0)
+        for output_type in GRAPH_TYPES:
+            self.assertTrue(os.path.exists(graph_path(group.acronym, output_type, digest)))
+
+        # the view streams the stored graph without rendering it again
+        url = urlreverse("ietf.group.views.dependencies", kwargs=dict(acronym=group.acronym, output_type="svg"))
+        with mock.patch('ietf.group.dependency_graphs.render_graph') as render_graph:
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r['Content-Type'], 'image/svg+xml')
+            self.assertIn(b'<svg', b''.join(r.streaming_content))
+            self.assertFalse(render_graph.called)
+
+        # a changed graph is rendered, and replaces the stored one
+        RelatedDocument.objects.create(source=WgDraftFactory(group=group), target=WgDraftFactory().docalias.first(), relationship_id='refinfo')
+        new_digest = dot_digest(make_dot(group))
+        self.assertNotEqual(new_digest, digest)
+        call_command('render_dependency_graphs', group.acronym, verbosity=0)
+        for output_type in GRAPH_TYPES:
+            self.assertTrue(os.path.exists(graph_path(group.acronym, output_type, new_digest)))
+            self.assertFalse(os.path.exists(graph_path(group.acronym, output_type, digest)))
+
+    def test_dependency_graph_rendering_failure(self):
+        group = Document.objects.filter(type='draft').first().group
+        digest = dot_digest(make_dot(group))
+        url = urlreverse("ietf.group.views.dependencies", kwargs=dict(acronym=group.acronym, output_type="pdf"))
+        for error in [ subprocess.CalledProcessError(1, settings.DOT_BINARY, stderr=b'syntax error'),
+                       subprocess.TimeoutExpired(settings.DOT_BINARY, 300) ]:
+            with mock.patch('ietf.group.dependency_graphs.subprocess.run', side_effect=error):
+                r = self.client.get(url)
+            self.assertEqual(r.status_code, 500)
+            self.assertEqual(r['Content-Type'], 'text/plain; charset=UTF-8')
+            self.assertFalse(os.path.exists(graph_path(group.acronym, 'pdf', digest)))
+
+        # the failure isn't cached, so the graph is rendered once dot works again
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(os.path.exists(graph_path(group.acronym, 'pdf', digest)))
+
 
 class GenerateGroupAliasesTests(TestCase):
     def setUp(self):
@@ -43,6 +43,6 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
 import django
 django.setup()
 
-from ietf.idindex.index import all_id2_txt
+from ietf.idindex.index import all_id2_txt_lines
 
-sys.stdout.write(all_id2_txt())
+sys.stdout.writelines(all_id2_txt_lines())
@@ -41,6 +41,6 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
 import django
 django.setup()
 
-from ietf.idindex.index import all_id_txt
+from ietf.idindex.index import all_id_txt_lines
 
-sys.stdout.write(all_id_txt())
+sys.stdout.writelines(all_id_txt_lines())
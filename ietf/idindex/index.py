@@ -21,7 +21,27 @@ from ietf.doc.templatetags.ietf_filters import clean_whitespace
 from ietf.group.models import Group
 from ietf.person.models import Person, Email
 
-def all_id_txt():
+def _draft_states(drafts):
+    """Return a dict from draft pk to a dict from state type to State, for the
+    draft and draft-iesg states of the drafts."""
+    states = dict((s.pk, s) for s in State.objects.filter(type__in=["draft", "draft-iesg"]))
+    doc_states = {}
+    for doc_id, state_id in Document.states.through.objects.filter(document__in=drafts, state__in=list(states)).order_by("state__type", "state__order", "state__name").values_list("document_id", "state_id"):
+        s = states[state_id]
+        doc_states.setdefault(doc_id, {})[s.type_id] = s
+    return doc_states
+
+def _iesg_substate_tags(drafts):
+    """Return a dict from draft pk to the list of names of its IESG substate tags."""
+    tags = {}
+    for doc_id, name in Document.tags.through.objects.filter(document__in=drafts, doctagname__in=IESG_SUBSTATE_TAGS).order_by("doctagname__order", "doctagname__name").values_list("document_id", "doctagname__name"):
+        tags.setdefault(doc_id, []).append(name)
+    return tags
+
+def all_id_txt_lines():
+    """Generate the lines of all_id.txt, with line endings, without running
+    any per-draft queries.  Suitable for writing directly to a file or as the
+    content of a StreamingHttpResponse."""
     # this returns a lot of data so try to be efficient
 
     # precalculations
@@ -37,42 +57,40 @@ def all_id_txt():
     replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
                                                        relationship="replaces").values_list("target__name", "source__name"))
 
+    all_ids = Document.objects.filter(type="draft").exclude(name__startswith="rfc")
+    doc_states = _draft_states(all_ids)
+    tags = _iesg_substate_tags(all_ids)
 
-    # we need a distinct to prevent the queries below from multiplying the result
-    all_ids = Document.objects.filter(type="draft").order_by('name').exclude(name__startswith="rfc").distinct()
-
-    res = ["\nInternet-Drafts Status Summary\n"]
-
-    def add_line(f1, f2, f3, f4):
+    def line(f1, f2, f3, f4):
         # each line must have exactly 4 tab-separated fields
-        res.append(f1 + "\t" + f2 + "\t" + f3 + "\t" + f4)
+        return f1 + "\t" + f2 + "\t" + f3 + "\t" + f4 + "\n"
 
+    yield "\nInternet-Drafts Status Summary\n\n"
 
     inactive_states = ["idexists", "pub", "watching", "dead"]
 
-    excludes = list(State.objects.filter(type="draft", slug__in=["rfc","repl"]))
-    includes = list(State.objects.filter(type="draft-iesg").exclude(slug__in=inactive_states))
-    in_iesg_process = all_ids.exclude(states__in=excludes).filter(states__in=includes).only("name", "rev")
-
-    # handle those actively in the IESG process
-    for d in in_iesg_process:
-        state = d.get_state("draft-iesg").name
-        tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
-        if tags:
-            state += "::" + "::".join(tags)
-        add_line(d.name + "-" + d.rev,
-                 formatted_rev_date(d.name),
-                 "In IESG processing - ID Tracker state <" + state + ">",
-                 "",
-                 )
-
-
-    # handle the rest
-
-    not_in_process = all_ids.exclude(pk__in=[d.pk for d in in_iesg_process])
+    # those actively in the IESG process are listed first, the rest
+    # afterwards, grouped by draft state
+    not_in_process = {}
+    for pk, name, rev in all_ids.order_by('name').values_list("pk", "name", "rev"):
+        states = doc_states.get(pk, {})
+        draft_state = states.get("draft")
+        iesg_state = states.get("draft-iesg")
+
+        if iesg_state and iesg_state.slug not in inactive_states and not (draft_state and draft_state.slug in ["rfc", "repl"]):
+            state = iesg_state.name
+            if pk in tags:
+                state += "::" + "::".join(tags[pk])
+            yield line(name + "-" + rev,
+                       formatted_rev_date(name),
+                       "In IESG processing - ID Tracker state <" + state + ">",
+                       "",
+                      )
+        elif draft_state:
+            not_in_process.setdefault(draft_state.pk, []).append((name, rev))
 
     for s in State.objects.filter(type="draft").order_by("order"):
-        for name, rev in not_in_process.filter(states=s).values_list("name", "rev"):
+        for name, rev in not_in_process.get(s.pk, []):
             state = s.name
             last_field = ""
 
@@ -83,13 +101,14 @@ def all_id_txt():
             elif s.slug == "repl":
                 state += " replaced by " + replacements.get(name, "0")
 
-            add_line(name + "-" + rev,
-                     formatted_rev_date(name),
-                     state,
-                     last_field,
-                    )
+            yield line(name + "-" + rev,
+                       formatted_rev_date(name),
+                       state,
+                       last_field,
+                      )
 
-    return "\n".join(res) + "\n"
+def all_id_txt():
+    return "".join(all_id_txt_lines())
 
 def file_types_for_drafts():
     """Look in the draft directory and return file types found as dict (name + rev -> [t1, t2, ...])."""
@@ -105,12 +124,14 @@ def file_types_for_drafts():
 
     return file_types
 
-def all_id2_txt():
+def all_id2_txt_lines():
+    """Generate the content of all_id2.txt in pieces, without running any
+    per-draft queries.  Suitable for writing directly to a file or as the
+    content of a StreamingHttpResponse."""
     # this returns a lot of data so try to be efficient
 
     drafts = Document.objects.filter(type="draft").exclude(name__startswith="rfc").order_by('name')
     drafts = drafts.select_related('group', 'group__parent', 'ad', 'intended_std_level', 'shepherd', )
-    drafts = drafts.prefetch_related("states")
 
     rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
                                                docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
@@ -122,12 +143,19 @@ def all_id2_txt():
 
     file_types = file_types_for_drafts()
 
+    doc_states = _draft_states(drafts)
+    tags = _iesg_substate_tags(drafts)
+
+    lc_expires_dates = dict(LastCallDocEvent.objects.filter(type="sent_last_call", doc__in=drafts,
+                                                            doc__states__type="draft-iesg", doc__states__slug="lc"
+                                                           ).order_by("time", "id").values_list("doc", "expires"))
+
     authors = {}
     for a in DocumentAuthor.objects.filter(document__name__startswith="draft-").order_by("order").select_related("email", "person").iterator():
-        if a.document.name not in authors:
-            l = authors[a.document.name] = []
+        if a.document_id not in authors:
+            l = authors[a.document_id] = []
         else:
-            l = authors[a.document.name]
+            l = authors[a.document_id]
         if a.email:
             l.append('%s <%s>' % (a.person.plain_name().replace("@", ""), a.email.address.replace(",", "")))
         else:
@@ -138,10 +166,18 @@ def all_id2_txt():
     ads = dict((p.pk, p.formatted_ascii_email().replace('"', ''))
                for p in Person.objects.filter(ad_document_set__type="draft").distinct())
 
-    res = []
-    for d in drafts:
-        state = d.get_state_slug()
-        iesg_state = d.get_state("draft-iesg")
+    # the drafts are rendered in place of a marker in the template, so the
+    # lines can be generated one by one between the two halves of it
+    marker = "\x00"
+    head, tail = render_to_string("idindex/all_id2.txt", {'data': marker }).split(marker)
+
+    yield head
+    separator = ""
+    for d in drafts.iterator():
+        states = doc_states.get(d.pk, {})
+        draft_state = states.get("draft")
+        state = draft_state.slug if draft_state else None
+        iesg_state = states.get("draft-iesg")
 
         fields = []
         # 0
@@ -149,15 +185,14 @@ def all_id2_txt():
         # 1
         fields.append("-1") # used to be internal numeric identifier, we don't have that anymore
         # 2
-        fields.append(d.get_state().name if state else "")
+        fields.append(draft_state.name if state else "")
         # 3
         if state == "active":
             s = "I-D Exists"
             if iesg_state:
                 s = iesg_state.name
-                tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
-                if tags:
-                    s += "::" + "::".join(tags)
+                if d.pk in tags:
+                    s += "::" + "::".join(tags[d.pk])
             fields.append(s)
         else:
             fields.append("")
@@ -196,9 +231,8 @@ def all_id2_txt():
         # 11
         lc_expires = ""
         if iesg_state and iesg_state.slug == "lc":
-            e = d.latest_event(LastCallDocEvent, type="sent_last_call")
-            if e:
-                lc_expires = e.expires.strftime("%Y-%m-%d")
+            if d.pk in lc_expires_dates:
+                lc_expires = lc_expires_dates[d.pk].strftime("%Y-%m-%d")
         fields.append(lc_expires)
         # 12
         doc_file_types = file_types.get(d.name + "-" + d.rev, [])
@@ -207,16 +241,20 @@ def all_id2_txt():
         # 13
         fields.append(clean_whitespace(d.title)) # FIXME: we should make sure this is okay in the database and in submit
         # 14
-        fields.append(", ".join(authors.get(d.name, [])))
+        fields.append(", ".join(authors.get(d.pk, [])))
         # 15
         fields.append(shepherds.get(d.shepherd_id, ""))
         # 16 Responsible AD name and email
         fields.append(ads.get(d.ad_id, ""))
 
         #
-        res.append("\t".join(fields))
+        yield separator + "\t".join(fields)
+        separator = "\n"
+
+    yield tail
 
-    return render_to_string("idindex/all_id2.txt", {'data': "\n".join(res) })
+def all_id2_txt():
+    return "".join(all_id2_txt_lines())
 
 def active_drafts_index_by_group(extra_values=()):
     """Return active drafts grouped into their corresponding
@@ -10,14 +10,210 @@ from django.conf import settings
 
 import debug    # pyflakes:ignore
 
-from ietf.doc.factories import WgDraftFactory
-from ietf.doc.models import Document, DocAlias, RelatedDocument, State, LastCallDocEvent, NewRevisionDocEvent
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+
+from ietf.doc.factories import WgDraftFactory, IndividualDraftFactory
+from ietf.doc.models import Document, DocEvent, DocumentAuthor, DocAlias, RelatedDocument, State, LastCallDocEvent, NewRevisionDocEvent
+from ietf.doc.models import IESG_SUBSTATE_TAGS
+from ietf.doc.templatetags.ietf_filters import clean_whitespace
 from ietf.group.factories import GroupFactory
 from ietf.name.models import DocRelationshipName
-from ietf.idindex.index import all_id_txt, all_id2_txt, id_index_txt
+from ietf.idindex.index import all_id_txt, all_id2_txt, id_index_txt, file_types_for_drafts
 from ietf.person.factories import PersonFactory, EmailFactory
+from ietf.person.models import Person, Email
 from ietf.utils.test_utils import TestCase
 
+
+# The implementation of all_id.txt and all_id2.txt from before they were
+# generated in a single pass; the output of the current implementation must
+# stay identical to it.
+
+def legacy_all_id_txt():
+    # this returns a lot of data so try to be efficient
+
+    # precalculations
+    revision_time = dict(NewRevisionDocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time').values_list("doc__name", "time"))
+
+    def formatted_rev_date(name):
+        t = revision_time.get(name)
+        return t.strftime("%Y-%m-%d") if t else ""
+
+    rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
+                                               docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
+
+    replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
+                                                       relationship="replaces").values_list("target__name", "source__name"))
+
+
+    # we need a distinct to prevent the queries below from multiplying the result
+    all_ids = Document.objects.filter(type="draft").order_by('name').exclude(name__startswith="rfc").distinct()
+
+    res = ["\nInternet-Drafts Status Summary\n"]
+
+    def add_line(f1, f2, f3, f4):
+        # each line must have exactly 4 tab-separated fields
+        res.append(f1 + "\t" + f2 + "\t" + f3 + "\t" + f4)
+
+
+    inactive_states = ["idexists", "pub", "watching", "dead"]
+
+    excludes = list(State.objects.filter(type="draft", slug__in=["rfc","repl"]))
+    includes = list(State.objects.filter(type="draft-iesg").exclude(slug__in=inactive_states))
+    in_iesg_process = all_ids.exclude(states__in=excludes).filter(states__in=includes).only("name", "rev")
+
+    # handle those actively in the IESG process
+    for d in in_iesg_process:
+        state = d.get_state("draft-iesg").name
+        tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
+        if tags:
+            state += "::" + "::".join(tags)
+        add_line(d.name + "-" + d.rev,
+                 formatted_rev_date(d.name),
+                 "In IESG processing - ID Tracker state <" + state + ">",
+                 "",
+                 )
+
+
+    # handle the rest
+
+    not_in_process = all_ids.exclude(pk__in=[d.pk for d in in_iesg_process])
+
+    for s in State.objects.filter(type="draft").order_by("order"):
+        for name, rev in not_in_process.filter(states=s).values_list("name", "rev"):
+            state = s.name
+            last_field = ""
+
+            if s.slug == "rfc":
+                a = rfc_aliases.get(name)
+                if a:
+                    last_field = a[3:]
+            elif s.slug == "repl":
+                state += " replaced by " + replacements.get(name, "0")
+
+            add_line(name + "-" + rev,
+                     formatted_rev_date(name),
+                     state,
+                     last_field,
+                    )
+
+    return "\n".join(res) + "\n"
+
+def legacy_all_id2_txt():
+    # this returns a lot of data so try to be efficient
+
+    drafts = Document.objects.filter(type="draft").exclude(name__startswith="rfc").order_by('name')
+    drafts = drafts.select_related('group', 'group__parent', 'ad', 'intended_std_level', 'shepherd', )
+    drafts = drafts.prefetch_related("states")
+
+    rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
+                                               docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
+
+    replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
+                                                       relationship="replaces").values_list("target__name", "source__name"))
+
+    revision_time = dict(DocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time').values_list("doc__name", "time"))
+
+    file_types = file_types_for_drafts()
+
+    authors = {}
+    for a in DocumentAuthor.objects.filter(document__name__startswith="draft-").order_by("order").select_related("email", "person").iterator():
+        if a.document.name not in authors:
+            l = authors[a.document.name] = []
+        else:
+            l = authors[a.document.name]
+        if a.email:
+            l.append('%s <%s>' % (a.person.plain_name().replace("@", ""), a.email.address.replace(",", "")))
+        else:
+            l.append(a.person.plain_name())
+
+    shepherds = dict((e.pk, e.formatted_ascii_email().replace('"', ''))
+                     for e in Email.objects.filter(shepherd_document_set__type="draft").select_related("person").distinct())
+    ads = dict((p.pk, p.formatted_ascii_email().replace('"', ''))
+               for p in Person.objects.filter(ad_document_set__type="draft").distinct())
+
+    res = []
+    for d in drafts:
+        state = d.get_state_slug()
+        iesg_state = d.get_state("draft-iesg")
+
+        fields = []
+        # 0
+        fields.append(d.name + "-" + d.rev)
+        # 1
+        fields.append("-1") # used to be internal numeric identifier, we don't have that anymore
+        # 2
+        fields.append(d.get_state().name if state else "")
+        # 3
+        if state == "active":
+            s = "I-D Exists"
+            if iesg_state:
+                s = iesg_state.name
+                tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
+                if tags:
+                    s += "::" + "::".join(tags)
+            fields.append(s)
+        else:
+            fields.append("")
+        # 4
+        rfc_number = ""
+        if state == "rfc":
+            a = rfc_aliases.get(d.name)
+            if a:
+                rfc_number = a[3:]
+        fields.append(rfc_number)
+        # 5
+        repl = ""
+        if state == "repl":
+            repl = replacements.get(d.name, "")
+        fields.append(repl)
+        # 6
+        t = revision_time.get(d.name)
+        fields.append(t.strftime("%Y-%m-%d") if t else "")
+        # 7
+        group_acronym = ""
+        if d.group and d.group.type_id != "area" and d.group.acronym != "none":
+            group_acronym = d.group.acronym
+        fields.append(group_acronym)
+        # 8
+        area = ""
+        if d.group:
+            if d.group.type_id == "area":
+                area = d.group.acronym
+            elif d.group.type_id == "wg" and d.group.parent and d.group.parent.type_id == "area":
+                area = d.group.parent.acronym
+        fields.append(area)
+        # 9 responsible AD name
+        fields.append(str(d.ad) if d.ad else "")
+        # 10
+        fields.append(d.intended_std_level.name if d.intended_std_level else "")
+        # 11
+        lc_expires = ""
+        if iesg_state and iesg_state.slug == "lc":
+            e = d.latest_event(LastCallDocEvent, type="sent_last_call")
+            if e:
+                lc_expires = e.expires.strftime("%Y-%m-%d")
+        fields.append(lc_expires)
+        # 12
+        doc_file_types = file_types.get(d.name + "-" + d.rev, [])
+        doc_file_types.sort()           # make the order consistent (and the result testable)
+        fields.append(",".join(doc_file_types) if state == "active" else "")
+        # 13
+        fields.append(clean_whitespace(d.title)) # FIXME: we should make sure this is okay in the database and in submit
+        # 14
+        fields.append(", ".join(authors.get(d.name, [])))
+        # 15
+        fields.append(shepherds.get(d.shepherd_id, ""))
+        # 16 Responsible AD name and email
+        fields.append(ads.get(d.ad_id, ""))
+
+        #
+        res.append("\t".join(fields))
+
+    return render_to_string("idindex/all_id2.txt", {'data': "\n".join(res) })
+
+
 class IndexTests(TestCase):
     def write_draft_file(self, name, size):
         with (Path(settings.INTERNET_DRAFT_PATH) / name).open('w') as f:
@@ -126,6 +322,56 @@ class IndexTests(TestCase):
         self.assertEqual(t[11], e.expires.strftime("%Y-%m-%d"))
 
 
+    def test_all_id_txt_same_as_legacy(self):
+        ad = PersonFactory()
+        lc = WgDraftFactory(states=[('draft','active'),('draft-iesg','lc')], ad=ad, authors=[PersonFactory(), PersonFactory()])
+        lc.tags.add('need-rev', 'ad-f-up')
+        LastCallDocEvent.objects.create(doc=lc, rev=lc.rev, type="sent_last_call", expires=datetime.datetime.now() + datetime.timedelta(days=14), by=ad)
+        WgDraftFactory(states=[('draft','active'),('draft-iesg','iesg-eva')], ad=ad,
+                       shepherd=EmailFactory(address='shepherd@example.com', person__name='Draft δραφτυ Shepherd'))
+        active = IndividualDraftFactory(authors=[PersonFactory()])
+        WgDraftFactory(states=[('draft','expired')], group__parent=GroupFactory(type_id='area'))
+        replaced = WgDraftFactory(states=[('draft','repl')])
+        RelatedDocument.objects.create(
+            relationship=DocRelationshipName.objects.get(slug="replaces"),
+            source=Document.objects.create(type_id="draft", rev="00", name="draft-test-replacement"),
+            target=replaced.docalias.get(name__startswith="draft"))
+        WgDraftFactory(states=[('draft','repl')])
+        rfc = WgDraftFactory(states=[('draft','rfc'),('draft-iesg','pub')])
+        DocAlias.objects.create(name="rfc1234").docs.add(rfc)
+        for d in Document.objects.filter(type="draft"):
+            NewRevisionDocEvent.objects.create(doc=d, rev=d.rev, type="new_revision", by=ad)
+        self.write_draft_file("%s-%s.txt" % (active.name, active.rev), 5000)
+        self.write_draft_file("%s-%s.xml" % (active.name, active.rev), 5000)
+
+        def without_timestamp(txt):
+            return "\n".join(l for l in txt.splitlines() if not l.startswith("# generated:"))
+
+        with CaptureQueriesContext(connection) as context:
+            txt = all_id_txt()
+        queries = len(context.captured_queries)
+        self.assertEqual(txt, legacy_all_id_txt())
+        self.assertIn("Expired", txt)
+        self.assertIn("In IESG processing - ID Tracker state <In Last Call::", txt)
+
+        with CaptureQueriesContext(connection) as context:
+            txt2 = all_id2_txt()
+        queries2 = len(context.captured_queries)
+        self.assertEqual(without_timestamp(txt2), without_timestamp(legacy_all_id2_txt()))
+        self.assertTrue(txt2.endswith("\n# end"))
+
+        # the number of queries doesn't grow with the number of drafts
+        for i in range(3):
+            IndividualDraftFactory(authors=[PersonFactory()])
+        with CaptureQueriesContext(connection) as context:
+            txt = all_id_txt()
+        self.assertEqual(len(context.captured_queries), queries)
+        self.assertEqual(txt, legacy_all_id_txt())
+        with CaptureQueriesContext(connection) as context:
+            txt2 = all_id2_txt()
+        self.assertEqual(len(context.captured_queries), queries2)
+        self.assertEqual(without_timestamp(txt2), without_timestamp(legacy_all_id2_txt()))
+
     def test_id_index_txt(self):
         draft = WgDraftFactory(states=[('draft','active')],abstract='a'*20,authors=[PersonFactory()])
 
@@ -9,14 +9,16 @@ import datetime
 from collections import OrderedDict
 
 from django.conf import settings
+from django.core.cache import cache
 from django.http import Http404
 
 import debug                            # pyflakes:ignore
 
 from ietf.doc.models import Document, LastCallDocEvent, ConsensusDocEvent
 from ietf.doc.utils_search import fill_in_telechat_date
-from ietf.iesg.models import TelechatDate, TelechatAgendaItem
+from ietf.iesg.models import TelechatDate, TelechatAgendaItem, telechat_agenda_generation_name
 from ietf.review.utils import review_assignments_to_list_for_docs
+from ietf.utils.cache import get_generation
 
 def get_agenda_date(date=None):
     if not date:
@@ -156,7 +158,7 @@ def fill_in_agenda_administrivia(date, sections):
 def fill_in_agenda_docs(date, sections, docs=None):
     if not docs:
         docs = Document.objects.filter(docevent__telechatdocevent__telechat_date=date)
-        docs = docs.select_related("stream", "group").distinct()
+        docs = docs.select_related("ad", "std_level", "intended_std_level", "group__parent", "stream", "shepherd").distinct()
         fill_in_telechat_date(docs)
 
     review_assignments_for_docs = review_assignments_to_list_for_docs(docs)
@@ -169,8 +171,11 @@ def fill_in_agenda_docs(date, sections, docs=None):
             e = doc.latest_event(type="started_iesg_process")
             doc.balloting_started = e.time if e else datetime.datetime.min
 
+        doc.defer_event = doc.active_defer_event()
+
         if doc.type_id == "draft":
             s = doc.get_state("draft-iana-review")
+            doc.iana_review_state_slug = s.slug if s else None
             if s: # and s.slug in ("not-ok", "changed", "need-rev"):
                 doc.iana_review_state = str(s)
 
@@ -179,17 +184,31 @@ def fill_in_agenda_docs(date, sections, docs=None):
                 if e:
                     doc.lastcall_expires = e.expires
 
+            doc.consensus_event = doc.latest_event(ConsensusDocEvent, type="changed_consensus")
             if doc.stream_id in ("ietf", "irtf", "iab"):
                 doc.consensus = "Unknown"
-                e = doc.latest_event(ConsensusDocEvent, type="changed_consensus")
+                e = doc.consensus_event
                 if e and (e.consensus != None):
                     doc.consensus = "Yes" if e.consensus else "No"
 
             doc.review_assignments = review_assignments_for_docs.get(doc.name, [])
         elif doc.type_id == "conflrev":
-            doc.conflictdoc = doc.relateddocument_set.get(relationship__slug='conflrev').target.document
+            conflictdoc = doc.relateddocument_set.get(relationship__slug='conflrev').target.document
+            conflictdoc.ipr_list = list(conflictdoc.ipr().select_related("disclosure"))
+            # looked up here, so that they are kept with the cached agenda
+            conflictdoc.canonical_name()
+            conflictdoc.stream, conflictdoc.intended_std_level
+            doc.conflictdoc = conflictdoc
         elif doc.type_id == "charter":
-            pass
+            doc.group_ad_role = doc.group.ad_role()
+
+        if doc.type_id in ("draft", "statchg"):
+            doc.rfc_editor_note = doc.has_rfc_editor_note()
+            doc.ipr_list = list(doc.ipr().select_related("disclosure"))
+        doc.downrefs = [rel for rel in doc.relateddocument_set.all() if rel.is_downref() and not rel.is_approved_downref()]
+        # looked up here, so that they are kept with the cached agenda
+        doc.canonical_name()
+        doc.rfc_number()
 
         number = get_doc_section(doc)
         if number: #  and num in sections
@@ -211,13 +230,58 @@ def fill_in_agenda_management_issues(date, sections):
     for i, item in enumerate(TelechatAgendaItem.objects.filter(type=3).order_by('id'), start=1):
         sections[s % i] = { "title": item.title, "text": item.text }
 
+
+TELECHAT_AGENDA_VERSION = 1     # increase when the contents of TelechatAgenda change
+TELECHAT_AGENDA_TIMEOUT = 60 * 60
+
+class TelechatAgenda:
+    """The documents on the agenda of a telechat, by section, and their page counts
+
+    Use get_telechat_agenda() to get one.  The sections are the document
+    sections of agenda_sections(), with the documents annotated by
+    fill_in_agenda_docs(), and docs is all documents on the agenda.
+    """
+    def __init__(self, date, sections, page_count):
+        self.date = date
+        self.sections = sections
+        self.page_count = page_count
+
+    @property
+    def docs(self):
+        return [ doc for section in self.sections.values() for doc in section.get("docs", []) ]
+
+def get_telechat_agenda(date):
+    """Get the agenda for the telechat on date, building it if it's not cached
+
+    The cache key includes the agenda generation of the date, which is bumped
+    whenever a document on the agenda, its states, its telechat events or
+    the ballot positions on it change (see ietf.iesg.models).  Each call
+    returns its own copy, which callers may annotate.
+    """
+    cache_key = 'iesg:telechat-agenda:%s:%s:%s' % (
+        TELECHAT_AGENDA_VERSION,
+        date.isoformat(),
+        get_generation(telechat_agenda_generation_name(date)),
+    )
+    agenda = cache.get(cache_key)
+    if agenda is None:
+        # imported here, as ietf.iesg.utils uses this module
+        from ietf.iesg.utils import telechat_page_count
+        sections = agenda_sections()
+        fill_in_agenda_docs(date, sections)
+        agenda = TelechatAgenda(date, sections, None)
+        agenda.page_count = telechat_page_count(docs=agenda.docs)
+        cache.set(cache_key, agenda, TELECHAT_AGENDA_TIMEOUT)
+    return agenda
+
+
 def agenda_data(date=None):
     """Return a dict with the different IESG telechat agenda components."""
     date = get_agenda_date(date)
-    sections = agenda_sections()
+    agenda = get_telechat_agenda(date)
+    sections = agenda.sections
 
     fill_in_agenda_administrivia(date, sections)
-    fill_in_agenda_docs(date, sections)
     fill_in_agenda_management_issues(date, sections)
 
-    return { 'date': date.isoformat(), 'sections': sections }
\ No newline at end of file
+    return { 'date': date.isoformat(), 'sections': sections, 'page_count': agenda.page_count }
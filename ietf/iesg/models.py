@@ -36,7 +36,14 @@
 
 import datetime
 
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+
+from ietf.doc.models import ( Document, TelechatDocEvent, BallotPositionDocEvent, WriteupDocEvent, RelatedDocument,
+    LastCallDocEvent, ConsensusDocEvent )
+from ietf.ipr.models import IprDisclosureBase, IprDocRel
+from ietf.review.models import ReviewAssignment, ReviewRequest
+from ietf.utils.cache import bump_generation
 
 class TelechatAgendaItem(models.Model):
     TYPE_CHOICES = (
@@ -91,3 +98,90 @@ class TelechatDate(models.Model):
         indexes = [
             models.Index(fields=['-date',]),
         ]
+
+
+# === Telechat agenda invalidation =============================================
+
+def telechat_agenda_generation_name(date):
+    """Name of the generation counter for the cached agenda of a telechat, see ietf.utils.cache"""
+    return 'iesg:agenda:%s' % date.isoformat()
+
+# The upcoming telechat dates each document has been scheduled for, kept in
+# the cache so that saving a document which isn't on an agenda doesn't look
+# for it in the TelechatDocEvents
+SCHEDULED_DOCUMENTS_CACHE_KEY = 'iesg:agenda:scheduled-documents'
+
+def forget_scheduled_documents():
+    cache.delete(SCHEDULED_DOCUMENTS_CACHE_KEY)
+    # and again once the new schedule can be seen by others
+    transaction.on_commit(lambda: cache.delete(SCHEDULED_DOCUMENTS_CACHE_KEY))
+
+def scheduled_telechat_dates(doc_ids):
+    """Get the upcoming telechat dates the documents are on the agendas of,
+    or have been moved from"""
+    scheduled = cache.get(SCHEDULED_DOCUMENTS_CACHE_KEY)
+    if scheduled is None:
+        scheduled = {}
+        for doc_id, date in TelechatDocEvent.objects.filter(type="scheduled_for_telechat",
+                                                            telechat_date__gte=datetime.date.today()
+                                                        ).values_list('doc_id', 'telechat_date').distinct():
+            scheduled.setdefault(doc_id, set()).add(date)
+        # dates which have passed don't matter, so it can be kept for a day
+        cache.set(SCHEDULED_DOCUMENTS_CACHE_KEY, scheduled, 24 * 60 * 60)
+    dates = set()
+    for doc_id in doc_ids:
+        dates.update(scheduled.get(doc_id, ()))
+    return dates
+
+def invalidate_telechat_agendas(sender, instance, raw=False, action=None, reverse=False, pk_set=None, **kwargs):
+    if raw or (action and not action.startswith('post_')):
+        return
+    dates = set()
+    if isinstance(instance, TelechatDocEvent):
+        forget_scheduled_documents()
+        doc_ids = [instance.doc_id]
+        if instance.telechat_date:
+            dates.add(instance.telechat_date)
+    elif isinstance(instance, (BallotPositionDocEvent, WriteupDocEvent, LastCallDocEvent, ConsensusDocEvent,
+                               ReviewRequest)):
+        doc_ids = [instance.doc_id]
+    elif isinstance(instance, ReviewAssignment):
+        doc_ids = [instance.review_request.doc_id]
+    elif isinstance(instance, RelatedDocument):
+        doc_ids = [instance.source_id]
+    elif isinstance(instance, (IprDocRel, IprDisclosureBase)):
+        if isinstance(instance, IprDocRel):
+            alias_ids = [instance.document_id]
+        else:
+            alias_ids = list(IprDocRel.objects.filter(disclosure=instance.pk).values_list('document', flat=True))
+        # the documents with the disclosures, and the conflict reviews of
+        # those, which show them
+        doc_ids = set(Document.objects.filter(docalias__in=alias_ids).values_list('pk', flat=True))
+        doc_ids.update(RelatedDocument.objects.filter(relationship='conflrev', target__docs__in=doc_ids).values_list('source', flat=True))
+    elif reverse:
+        # the documents of a state were changed
+        doc_ids = list(pk_set or [])
+    else:
+        doc_ids = [instance.pk]
+    if doc_ids:
+        dates.update(scheduled_telechat_dates(doc_ids))
+    for date in dates:
+        bump_generation(telechat_agenda_generation_name(date))
+
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=Document)
+models.signals.m2m_changed.connect(invalidate_telechat_agendas, sender=Document.states.through)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=TelechatDocEvent)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=BallotPositionDocEvent)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=WriteupDocEvent)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=LastCallDocEvent)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=ConsensusDocEvent)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=ReviewRequest)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=ReviewAssignment)
+models.signals.post_delete.connect(invalidate_telechat_agendas, sender=ReviewAssignment)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=RelatedDocument)
+models.signals.post_delete.connect(invalidate_telechat_agendas, sender=RelatedDocument)
+models.signals.post_save.connect(invalidate_telechat_agendas, sender=IprDocRel)
+models.signals.post_delete.connect(invalidate_telechat_agendas, sender=IprDocRel)
+# disclosures are saved as one of the subclasses, which is the signal sender
+for disclosure_model in [IprDisclosureBase] + IprDisclosureBase.__subclasses__():
+    models.signals.post_save.connect(invalidate_telechat_agendas, sender=disclosure_model)
@@ -10,27 +10,58 @@ from pathlib import Path
 from pyquery import PyQuery
 
 from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse as urlreverse
 from django.utils.encoding import force_bytes
 from django.utils.html import escape
 
 import debug                            # pyflakes:ignore
 
-from ietf.doc.models import DocEvent, BallotPositionDocEvent, TelechatDocEvent
+from ietf.doc.models import DocEvent, BallotPositionDocEvent, TelechatDocEvent, WriteupDocEvent, ConsensusDocEvent
 from ietf.doc.models import Document, DocAlias, State, RelatedDocument
 from ietf.doc.factories import WgDraftFactory, IndividualDraftFactory, ConflictReviewFactory, BaseDocumentFactory, CharterFactory, WgRfcFactory, IndividualRfcFactory
 from ietf.doc.utils import create_ballot_if_not_open
 from ietf.group.factories import RoleFactory, GroupFactory
 from ietf.group.models import Group, GroupMilestone, Role
-from ietf.iesg.agenda import get_agenda_date, agenda_data
+from ietf.iesg.agenda import get_agenda_date, agenda_data, get_telechat_agenda
 from ietf.iesg.models import TelechatDate
+from ietf.iesg.utils import telechat_page_count
 from ietf.name.models import StreamName
 from ietf.person.models import Person
 from ietf.utils.test_utils import TestCase, login_testing_unauthorized, unicontent
 from ietf.iesg.factories import IESGMgmtItemFactory
+from ietf.ipr.factories import HolderIprDisclosureFactory
+from ietf.review.factories import ReviewAssignmentFactory
 
 
 class IESGTests(TestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cached_agenda_shows_reviews_and_consensus(self):
+        draft = self.telechat_docs["ietf_draft"]
+        date = get_agenda_date()
+        def agenda_doc():
+            return [ d for d in get_telechat_agenda(date).docs if d == draft ][0]
+
+        self.assertEqual(agenda_doc().review_assignments, [])
+        assignment = ReviewAssignmentFactory(review_request__doc=draft)
+        self.assertEqual(len(agenda_doc().review_assignments), 1)
+        assignment.state_id = 'rejected'
+        assignment.save()
+        self.assertEqual(agenda_doc().review_assignments, [])
+
+        self.assertEqual(agenda_doc().consensus, "Unknown")
+        ConsensusDocEvent.objects.create(type="changed_consensus", doc=draft, rev=draft.rev,
+                                         by=Person.objects.get(name="Areað Irector"), consensus=True)
+        self.assertEqual(agenda_doc().consensus, "Yes")
+
+        # saving a document which is not on any agenda doesn't look for telechat events
+        other = IndividualDraftFactory()
+        with CaptureQueriesContext(connection) as queries:
+            other.save()
+        self.assertFalse([ q for q in queries if 'doc_telechatdocevent' in q['sql'] ])
+
     def test_feed(self):
         draft = WgDraftFactory(states=[('draft','active'),('draft-iesg','iesg-eva')],ad=Person.objects.get(user__username='ad'))
 
@@ -307,6 +338,60 @@ class IESGAgendaTests(TestCase):
             s = "6." + str(i)
             self.assertEqual(mi.title, agenda_data(date_str)["sections"][s]['title'])
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cached_agenda(self):
+        draft = self.telechat_docs["ietf_draft"]
+        date = get_agenda_date()
+        self.assertIn(draft, get_telechat_agenda(date).sections["2.1.3"]["docs"])
+
+        with CaptureQueriesContext(connection) as queries:
+            agenda = get_telechat_agenda(date)
+        self.assertEqual(len(queries), 0)
+        self.assertIn(draft, agenda.docs)
+        self.assertEqual(agenda.page_count, telechat_page_count(docs=agenda.docs))
+
+        # a state change moves the document to another section
+        draft.set_state(State.objects.get(type="draft-iesg", slug="iesg-eva"))
+        agenda = get_telechat_agenda(date)
+        self.assertNotIn("2.1.3", agenda.sections)
+        self.assertIn(draft, agenda.sections["2.1.2"]["docs"])
+
+        # rescheduling moves it to the agenda of the other date
+        later = TelechatDate.objects.active().order_by('date')[1].date
+        TelechatDocEvent.objects.create(type="scheduled_for_telechat", doc=draft, rev=draft.rev,
+                                        by=Person.objects.get(name="Areað Irector"), telechat_date=later)
+        self.assertNotIn(draft, get_telechat_agenda(date).docs)
+        self.assertIn(draft, get_telechat_agenda(later).sections["2.1.1"]["docs"])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cached_agenda_shows_notes_ipr_and_relations(self):
+        draft = self.telechat_docs["ietf_draft"]
+        date = get_agenda_date()
+        def agenda_doc():
+            return [ d for d in get_telechat_agenda(date).docs if d == draft ][0]
+
+        self.assertFalse(agenda_doc().rfc_editor_note)
+        WriteupDocEvent.objects.create(type="changed_rfc_editor_note_text", doc=draft, rev=draft.rev,
+                                       by=Person.objects.get(name="Areað Irector"), text="A note")
+        self.assertTrue(agenda_doc().rfc_editor_note)
+
+        self.assertEqual(agenda_doc().ipr_list, [])
+        disclosure = HolderIprDisclosureFactory(docs=[draft])
+        self.assertEqual(len(agenda_doc().ipr_list), 1)
+        disclosure.state_id = 'rejected'
+        disclosure.save()
+        self.assertEqual(agenda_doc().ipr_list, [])
+
+        draft.intended_std_level_id = 'ps'
+        draft.save_with_history([DocEvent.objects.create(doc=draft, rev=draft.rev, type="changed_document",
+                                                         by=Person.objects.get(name="Areað Irector"), desc="Test")])
+        rfc = IndividualRfcFactory(std_level_id='inf')
+        self.assertEqual(agenda_doc().downrefs, [])
+        relation = RelatedDocument.objects.create(source=draft, target=rfc.docalias.first(), relationship_id='refnorm')
+        self.assertEqual(agenda_doc().downrefs, [relation])
+        relation.delete()
+        self.assertEqual(agenda_doc().downrefs, [])
+
     def test_feed(self):
         r = self.client.get("/feed/iesg-agenda/")
         self.assertEqual(r.status_code, 200)
@@ -2,9 +2,8 @@ from collections import namedtuple
 
 import debug                            # pyflakes:ignore
 
-from ietf.doc.models import Document, STATUSCHANGE_RELATIONS
-from ietf.doc.utils_search import fill_in_telechat_date
-from ietf.iesg.agenda import get_doc_section
+from ietf.doc.models import STATUSCHANGE_RELATIONS
+from ietf.iesg.agenda import get_doc_section, get_telechat_agenda
 
 
 TelechatPageCount = namedtuple('TelechatPageCount',['for_approval','for_action','related'])
@@ -14,9 +13,8 @@ def telechat_page_count(date=None, docs=None):
         return TelechatPageCount(0, 0, 0)
 
     if not docs:
-        candidates = Document.objects.filter(docevent__telechatdocevent__telechat_date=date).distinct() 
-        fill_in_telechat_date(candidates)
-        docs = [ doc for doc in candidates if doc.telechat_date()==date ]
+        # counted when the agenda is built
+        return get_telechat_agenda(date).page_count
 
     for_action =[d for d in docs if get_doc_section(d).endswith('.3')]
 
@@ -36,7 +36,6 @@
 
 import datetime
 import io
-import itertools
 import json
 import os
 import tarfile
@@ -54,15 +53,14 @@ from django.utils.encoding import force_bytes
 
 import debug               # pyflakes:ignore
 
-from ietf.doc.models import Document, State, LastCallDocEvent, ConsensusDocEvent, DocEvent, IESG_BALLOT_ACTIVE_STATES
+from ietf.doc.models import Document, State, DocEvent, IESG_BALLOT_ACTIVE_STATES
 from ietf.doc.utils import update_telechat, augment_events_with_revision
 from ietf.group.models import GroupMilestone, Role
-from ietf.iesg.agenda import agenda_data, agenda_sections, fill_in_agenda_docs, get_agenda_date
+from ietf.iesg.agenda import agenda_data, get_agenda_date, get_telechat_agenda
 from ietf.iesg.models import TelechatDate
-from ietf.iesg.utils import telechat_page_count
 from ietf.ietfauth.utils import has_role, role_required, user_is_person
 from ietf.person.models import Person
-from ietf.doc.utils_search import fill_in_document_table_attributes, fill_in_telechat_date
+from ietf.doc.utils_search import fill_in_document_table_attributes
 
 def review_decisions(request, year=None):
     events = DocEvent.objects.filter(type__in=("iesg_disapproved", "iesg_approved"))
@@ -97,7 +95,7 @@ def agenda_json(request, date=None):
     res = {
         "telechat-date": str(data["date"]),
         "as-of": str(datetime.datetime.utcnow()),
-        "page-counts": telechat_page_count(date=get_agenda_date(date))._asdict(),
+        "page-counts": data["page_count"]._asdict(),
         "sections": {},
         }
 
@@ -121,7 +119,7 @@ def agenda_json(request, date=None):
                     'rev': doc.rev,
                     'wgname': doc.group.name,
                     'acronym': doc.group.acronym,
-                    'ad': doc.group.ad_role().person.name if doc.group.ad_role() else None,
+                    'ad': doc.group_ad_role.person.name if doc.group_ad_role else None,
                     }
 
                 # consider moving the charters to "docs" like the other documents
@@ -139,7 +137,7 @@ def agenda_json(request, date=None):
 
                 if doc.note:
                     docinfo['note'] = doc.note
-                defer = doc.active_defer_event()
+                defer = doc.defer_event
                 if defer:
                     docinfo['defer-by'] = defer.by.name
                     docinfo['defer-at'] = str(defer.time)
@@ -149,25 +147,22 @@ def agenda_json(request, date=None):
                     if doc.rfc_number():
                         docinfo['rfc-number'] = doc.rfc_number()
 
-                    iana_state = doc.get_state("draft-iana-review")
-                    if iana_state and iana_state.slug in ("not-ok", "changed", "need-rev"):
-                        docinfo['iana-review-state'] = str(iana_state)
+                    if doc.iana_review_state_slug in ("not-ok", "changed", "need-rev"):
+                        docinfo['iana-review-state'] = doc.iana_review_state
 
-                    if doc.get_state_slug("draft-iesg") == "lc":
-                        e = doc.latest_event(LastCallDocEvent, type="sent_last_call")
-                        if e:
-                            docinfo['lastcall-expires'] = e.expires.strftime("%Y-%m-%d")
+                    if getattr(doc, 'lastcall_expires', None):
+                        docinfo['lastcall-expires'] = doc.lastcall_expires.strftime("%Y-%m-%d")
 
                     docinfo['consensus'] = None
-                    e = doc.latest_event(ConsensusDocEvent, type="changed_consensus")
+                    e = doc.consensus_event
                     if e:
                         docinfo['consensus'] = e.consensus
 
-                    docinfo['rfc-ed-note'] = doc.has_rfc_editor_note()
+                    docinfo['rfc-ed-note'] = doc.rfc_editor_note
 
                 elif doc.type_id == 'conflrev':
                     docinfo['rev'] = doc.rev
-                    td = doc.relateddocument_set.get(relationship__slug='conflrev').target.document
+                    td = doc.conflictdoc
                     docinfo['target-docname'] = td.canonical_name()
                     docinfo['target-title'] = td.title
                     docinfo['target-rev'] = td.rev
@@ -244,11 +239,10 @@ def agenda_moderator_package(request, date=None):
     for num, s in sections:
         if "2" <= num < "5" and "docs" in s and s["docs"]:
             for i, d in enumerate(s["docs"], start=1):
-                downrefs = [rel for rel in d.relateddocument_set.all() if rel.is_downref() and not rel.is_approved_downref()]
                 flattened_sections.append((num, {
                             "title": s["title"] + " (%s of %s)" % (i, len(s["docs"])),
                             "doc": d,
-                            "downrefs": downrefs,
+                            "downrefs": d.downrefs,
                             "parents": s["parents"],
                             }))
         else:
@@ -281,16 +275,11 @@ def agenda_package(request, date=None):
 def agenda_documents_txt(request):
     dates = list(TelechatDate.objects.active().order_by('date').values_list("date", flat=True)[:4])
 
-    all_docs = Document.objects.filter(docevent__telechatdocevent__telechat_date__in=dates).distinct()
     docs = []
-    fill_in_telechat_date(all_docs)
-
-    for d in all_docs:
-        date = d.telechat_date()
-        if date in dates:
+    for date in dates:
+        for d in get_telechat_agenda(date).docs:
             d.computed_telechat_date = date
             docs.append(d)
-    docs.sort(key=lambda d: d.computed_telechat_date)
 
     # output table
     rows = []
@@ -353,39 +342,31 @@ def handle_reschedule_form(request, doc, dates, status):
 def agenda_documents(request):
     dates = list(TelechatDate.objects.active().order_by('date').values_list("date", flat=True)[:4])
 
-    docs_by_date = dict((d, []) for d in dates)
-    docs = Document.objects.filter(docevent__telechatdocevent__telechat_date__in=dates).distinct()
-    docs = docs.select_related("ad", "std_level", "intended_std_level", "group", "stream", "shepherd", )
-    # No prefetch-related -- turns out not to be worth it
-
-    fill_in_telechat_date(docs)
-    for doc in docs:
-        d = doc.telechat_date()
-        if d in docs_by_date:
-            docs_by_date[d].append(doc)
+    agendas = [ get_telechat_agenda(date) for date in dates ]
 
     reschedule_status = { "changed": False }
 
-    for i in itertools.chain(*list(docs_by_date.values())):
-        i.reschedule_form = handle_reschedule_form(request, i, dates, reschedule_status)
+    # the documents of the agendas are cached copies, reschedule the ones
+    # in the database
+    docs = Document.objects.in_bulk([ d.pk for a in agendas for d in a.docs ]) if request.method == 'POST' else {}
+    for agenda in agendas:
+        for i in agenda.docs:
+            i.reschedule_form = handle_reschedule_form(request, docs.get(i.pk, i), dates, reschedule_status)
 
     if reschedule_status["changed"]:
         # if any were changed, redirect so the browser history is preserved
         return redirect("ietf.iesg.views.agenda_documents")
 
     telechats = []
-    for date in dates:
-        sections = agenda_sections()
+    for agenda in agendas:
         # augment the docs with the search attributes, since we're using
         # the search_result_row view to display them (which expects them)
-        fill_in_document_table_attributes(docs_by_date[date], have_telechat_date=True)
-        fill_in_agenda_docs(date, sections, docs_by_date[date])
-        pages = telechat_page_count(docs=docs_by_date[date]).for_approval
+        fill_in_document_table_attributes(agenda.docs, have_telechat_date=True)
 
         telechats.append({
-                "date":     date,
-                "pages":    pages,
-                "sections": sorted((num, section) for num, section in sections.items()
+                "date":     agenda.date,
+                "pages":    agenda.page_count.for_approval,
+                "sections": sorted((num, section) for num, section in agenda.sections.items()
                                    if "2" <= num < "5")
                 })
     request.session['ballot_edit_return_point'] = request.path_info
@@ -430,12 +411,7 @@ def past_documents(request):
 def telechat_docs_tarfile(request, date):
     date = get_agenda_date(date)
 
-    all_docs = Document.objects.filter(docevent__telechatdocevent__telechat_date=date).distinct()
-    fill_in_telechat_date(all_docs)
-    docs = []
-    for d in all_docs:
-        if d.telechat_date() == date:
-            docs.append(d)
+    docs = get_telechat_agenda(date).docs
 
     response = HttpResponse(content_type='application/octet-stream')
     response['Content-Disposition'] = 'attachment; filename=telechat-%s-docs.tgz' % date.isoformat()
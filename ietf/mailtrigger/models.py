@@ -5,13 +5,19 @@
 from django.db import models
 from django.template import Template, Context
 
+import threading
+
+from contextlib import contextmanager
 from email.utils import parseaddr
+from functools import lru_cache
 
 from ietf.doc.utils_bofreq import bofreq_editors, bofreq_responsible
+from ietf.mailtrigger.registry import get_recipient, MAILTRIGGER_REGISTRY_GENERATION
 from ietf.utils.mail import formataddr, get_email_addresses_from_text
 from ietf.group.models import Group
 from ietf.person.models import Email, Alias
 from ietf.review.models import ReviewTeamSettings
+from ietf.utils.cache import bump_generation
 
 import debug                            # pyflakes:ignore
 
@@ -33,6 +39,39 @@ def clean_duplicates(addrlist):
             addresses.append(addr)
     return addresses
 
+@lru_cache(maxsize=256)
+def compile_recipient_template(template):
+    return Template('{%% autoescape off %%}%s{%% endautoescape %%}'%template)
+
+_gathering = threading.local()
+
+@contextmanager
+def gathering():
+    """Share the role lookups of the address gathering done in this block,
+    which can ask for the roles of the same group many times"""
+    outer = getattr(_gathering, 'lookups', None)
+    if outer is None:
+        _gathering.lookups = {}
+    try:
+        yield
+    finally:
+        if outer is None:
+            _gathering.lookups = None
+
+def group_role_addresses(group, role_name):
+    """The email addresses of the group's roles of this name.  The roles of
+    all names are fetched with one query, once per gathering()."""
+    lookups = getattr(_gathering, 'lookups', None)
+    key = ('roles', group.pk)
+    if lookups is None or key not in lookups:
+        roles = {}
+        for name_id, address in group.role_set.values_list('name_id', 'email__address'):
+            roles.setdefault(name_id, []).append(address)
+        if lookups is None:
+            return roles.get(role_name, [])
+        lookups[key] = roles
+    return list(lookups[key].get(role_name, []))
+
 class MailTrigger(models.Model):
     slug = models.CharField(max_length=64, primary_key=True)
     desc = models.TextField(blank=True)
@@ -58,10 +97,11 @@ class Recipient(models.Model):
 
     def gather(self, **kwargs):
         retval = []
-        if hasattr(self,'gather_%s'%self.slug):
-            retval.extend(eval('self.gather_%s(**kwargs)'%self.slug))
+        gather = getattr(self, 'gather_%s'%self.slug, None)
+        if gather:
+            retval.extend(gather(**kwargs))
         if self.template:
-            rendering = Template('{%% autoescape off %%}%s{%% endautoescape %%}'%self.template).render(Context(kwargs))
+            rendering = compile_recipient_template(self.template).render(Context(kwargs))
             if rendering:
                 retval.extend( get_email_addresses_from_text(rendering) )
 
@@ -80,7 +120,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             doc=kwargs['doc']
             if doc.group and doc.group.features.acts_like_wg:
-                addrs.extend(doc.group.role_set.filter(name='delegate').values_list('email__address',flat=True))
+                addrs.extend(group_role_addresses(doc.group, 'delegate'))
         return addrs
 
     def gather_doc_group_mail_list(self, **kwargs):
@@ -96,28 +136,28 @@ class Recipient(models.Model):
         addrs = []
         if 'doc' in kwargs:
             for reldoc in kwargs['doc'].related_that_doc(('conflrev','tohist','tois','tops')):
-                addrs.extend(Recipient.objects.get(slug='doc_authors').gather(**{'doc':reldoc.document}))
+                addrs.extend(get_recipient('doc_authors').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_doc_affecteddoc_group_chairs(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
             for reldoc in kwargs['doc'].related_that_doc(('conflrev','tohist','tois','tops')):
-                addrs.extend(Recipient.objects.get(slug='doc_group_chairs').gather(**{'doc':reldoc.document}))
+                addrs.extend(get_recipient('doc_group_chairs').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_doc_affecteddoc_notify(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
             for reldoc in kwargs['doc'].related_that_doc(('conflrev','tohist','tois','tops')):
-                addrs.extend(Recipient.objects.get(slug='doc_notify').gather(**{'doc':reldoc.document}))
+                addrs.extend(get_recipient('doc_notify').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_conflict_review_stream_manager(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
             for reldoc in kwargs['doc'].related_that_doc(('conflrev',)):
-                addrs.extend(Recipient.objects.get(slug='doc_stream_manager').gather(**{'doc':reldoc.document}))
+                addrs.extend(get_recipient('doc_stream_manager').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_conflict_review_steering_group(self,**kwargs):
@@ -150,7 +190,7 @@ class Recipient(models.Model):
     def gather_doc_stream_manager(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
-            addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':[kwargs['doc'].stream_id]}))
+            addrs.extend(get_recipient('stream_managers').gather(**{'streams':[kwargs['doc'].stream_id]}))
         return addrs
 
     def gather_doc_non_ietf_stream_manager(self, **kwargs):
@@ -158,7 +198,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             doc = kwargs['doc']
             if doc.stream_id and doc.stream_id != 'ietf':
-                addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':[doc.stream_id,]}))
+                addrs.extend(get_recipient('stream_managers').gather(**{'streams':[doc.stream_id,]}))
         return addrs
 
     def gather_group_responsible_directors(self, **kwargs):
@@ -166,11 +206,11 @@ class Recipient(models.Model):
         if 'group' in kwargs:
             group = kwargs['group']
             if not group.acronym=='none':
-                addrs.extend(group.role_set.filter(name='ad').values_list('email__address',flat=True))
+                addrs.extend(group_role_addresses(group, 'ad'))
             if group.type_id=='rg':
-                addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':['irtf']}))
+                addrs.extend(get_recipient('stream_managers').gather(**{'streams':['irtf']}))
             elif group.type_id=='program':
-                addrs.extend(Recipient.objects.get(slug='iab').gather(**{}))
+                addrs.extend(get_recipient('iab').gather(**{}))
         return addrs
 
     def gather_group_secretaries(self, **kwargs):
@@ -182,8 +222,7 @@ class Recipient(models.Model):
                 if rts and rts.secr_mail_alias and len(rts.secr_mail_alias) > 1:
                     addrs = get_email_addresses_from_text(rts.secr_mail_alias)
                 else:
-                    for role in group.role_set.filter(name='secr'):
-                        addrs.append(role.email.address)
+                    addrs.extend(group_role_addresses(group, 'secr'))
         return addrs
     
     def gather_review_req_reviewers(self, **kwargs):
@@ -204,7 +243,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             group = kwargs['doc'].group
             if group and not group.acronym=='none':
-                addrs.extend(Recipient.objects.get(slug='group_responsible_directors').gather(**{'group':group}))
+                addrs.extend(get_recipient('group_responsible_directors').gather(**{'group':group}))
         return addrs
 
     def gather_submission_authors(self, **kwargs):
@@ -241,7 +280,7 @@ class Recipient(models.Model):
         if 'submission' in kwargs: 
             submission = kwargs['submission']
             if submission.group: 
-                addrs.extend(Recipient.objects.get(slug='group_chairs').gather(**{'group':submission.group}))
+                addrs.extend(get_recipient('group_chairs').gather(**{'group':submission.group}))
         return addrs
 
     def gather_sub_group_parent_directors(self, **kwargs):
@@ -250,8 +289,7 @@ class Recipient(models.Model):
             submission = kwargs['submission']
             if submission.group and submission.group.parent:
                 addrs.extend(
-                    Recipient.objects.get(
-                        slug='group_responsible_directors').gather(group=submission.group.parent)
+                    get_recipient('group_responsible_directors').gather(group=submission.group.parent)
                 )
         return addrs
 
@@ -260,8 +298,7 @@ class Recipient(models.Model):
         doc = kwargs.get('doc')
         if doc and doc.group and doc.group.parent:
             addrs.extend(
-                Recipient.objects.get(
-                    slug='group_responsible_directors').gather(group=doc.group.parent)
+                get_recipient('group_responsible_directors').gather(group=doc.group.parent)
             )
         return addrs
 
@@ -285,13 +322,13 @@ class Recipient(models.Model):
 
                 if doc.group and old_author_email_set != new_author_email_set:
                     if doc.group.features.acts_like_wg:
-                        addrs.extend(Recipient.objects.get(slug='group_chairs').gather(**{'group':doc.group}))
+                        addrs.extend(get_recipient('group_chairs').gather(**{'group':doc.group}))
                     elif doc.group.type_id in ['area']:
-                        addrs.extend(Recipient.objects.get(slug='group_responsible_directors').gather(**{'group':doc.group}))
+                        addrs.extend(get_recipient('group_responsible_directors').gather(**{'group':doc.group}))
                     else:
                         pass
                     if doc.stream_id and doc.stream_id not in ['ietf']:
-                        addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':[doc.stream_id]}))
+                        addrs.extend(get_recipient('stream_managers').gather(**{'streams':[doc.stream_id]}))
             else:
                 # This is a bit roundabout, but we do it to get consistent and unicode-compliant
                 # email names for known persons, without relying on the name parsed from the
@@ -308,7 +345,7 @@ class Recipient(models.Model):
         if 'submission' in kwargs:
             submission = kwargs['submission']
             if submission.group:  
-                addrs.extend(Recipient.objects.get(slug='group_mail_list').gather(**{'group':submission.group}))
+                addrs.extend(get_recipient('group_mail_list').gather(**{'group':submission.group}))
         return addrs
 
     def gather_rfc_editor_if_doc_in_queue(self, **kwargs):
@@ -316,7 +353,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             doc = kwargs['doc']
             if doc.get_state_slug("draft-rfceditor") is not None:
-                addrs.extend(Recipient.objects.get(slug='rfc_editor').gather(**{}))
+                addrs.extend(get_recipient('rfc_editor').gather(**{}))
         return addrs
 
     def gather_doc_discussing_ads(self, **kwargs):
@@ -359,18 +396,18 @@ class Recipient(models.Model):
             doc=kwargs['doc']
             if doc.group and doc.group.acronym == 'none':
                 if doc.ad and doc.get_state_slug('draft')=='active':
-                    addrs.extend(Recipient.objects.get(slug='doc_ad').gather(**kwargs))
+                    addrs.extend(get_recipient('doc_ad').gather(**kwargs))
                 else:
                     pass
             else:
-                addrs.extend(Recipient.objects.get(slug='doc_group_mail_list').gather(**kwargs)) 
+                addrs.extend(get_recipient('doc_group_mail_list').gather(**kwargs)) 
         return addrs
 
     def gather_liaison_manager(self, **kwargs):
         addrs=[]
         if 'group' in kwargs:
             group=kwargs['group']
-            addrs.extend(group.role_set.filter(name='liaiman').values_list('email__address',flat=True))
+            addrs.extend(group_role_addresses(group, 'liaiman'))
         return addrs
 
     def gather_session_requester(self, **kwargs):
@@ -388,8 +425,7 @@ class Recipient(models.Model):
         if 'review_req' in kwargs:
             review_req = kwargs['review_req']
             if review_req.team.parent:
-                for role in review_req.team.parent.role_set.filter(name='ad'):
-                    addrs.append(role.email.address)
+                addrs.extend(group_role_addresses(review_req.team.parent, 'ad'))
         return addrs
 
     def gather_yang_doctors_secretaries(self, **kwargs):
@@ -412,8 +448,8 @@ class Recipient(models.Model):
                 if responsible:
                     addrs.extend([leader.email_address() for leader in responsible])
                 else:
-                    addrs.extend(Recipient.objects.get(slug='iab').gather(**{}))
-                    addrs.extend(Recipient.objects.get(slug='iesg').gather(**{}))
+                    addrs.extend(get_recipient('iab').gather(**{}))
+                    addrs.extend(get_recipient('iesg').gather(**{}))
         return addrs
 
     def gather_bofreq_previous_responsible(self, **kwargs):
@@ -424,7 +460,19 @@ class Recipient(models.Model):
         if previous_responsible:
             addrs = [p.email_address() for p in previous_responsible]
         else:
-            addrs.extend(Recipient.objects.get(slug='iab').gather(**{}))
-            addrs.extend(Recipient.objects.get(slug='iesg').gather(**{}))
+            addrs.extend(get_recipient('iab').gather(**{}))
+            addrs.extend(get_recipient('iesg').gather(**{}))
         return addrs
 
+
+def invalidate_mailtrigger_registry(sender, instance, raw=False, action=None, **kwargs):
+    if raw or (action and not action.startswith('post_')):
+        return
+    bump_generation(MAILTRIGGER_REGISTRY_GENERATION)
+
+models.signals.post_save.connect(invalidate_mailtrigger_registry, sender=MailTrigger)
+models.signals.post_delete.connect(invalidate_mailtrigger_registry, sender=MailTrigger)
+models.signals.post_save.connect(invalidate_mailtrigger_registry, sender=Recipient)
+models.signals.post_delete.connect(invalidate_mailtrigger_registry, sender=Recipient)
+models.signals.m2m_changed.connect(invalidate_mailtrigger_registry, sender=MailTrigger.to.through)
+models.signals.m2m_changed.connect(invalidate_mailtrigger_registry, sender=MailTrigger.cc.through)
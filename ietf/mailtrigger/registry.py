@@ -0,0 +1,101 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+In-process registry of mail triggers and their recipients.
+
+Gathering the addresses for a mail trigger loaded the trigger and its to and
+cc recipients from the database every time, and the email expansions pages
+do that for dozens of triggers.  The registry holds all triggers, with their
+recipients, and is loaded with a handful of queries on first use in each
+process.
+
+It is loaded again when it is older than settings.MAILTRIGGER_REGISTRY_MAX_AGE
+or when a trigger or recipient has been changed since, for instance in the
+admin (see the signal handlers in ietf.mailtrigger.models).  A trigger which
+isn't in the registry is looked up in the database.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils.cache import get_generation
+
+
+# The registry of each process is loaded again when this generation changes
+MAILTRIGGER_REGISTRY_GENERATION = 'mailtrigger:registry'
+
+class MailTriggerRegistry(object):
+    """Mail triggers and recipients by slug, with the to and cc recipients
+    of each trigger"""
+
+    def __init__(self, mailtriggers, recipients, to, cc):
+        self.mailtriggers = mailtriggers      # dict from slug to MailTrigger
+        self.recipients = recipients          # dict from slug to Recipient
+        self.to = to                          # dict from trigger slug to list of Recipients
+        self.cc = cc
+        self.built = time.time()
+
+    def __len__(self):
+        return len(self.mailtriggers)
+
+    def starting_with(self, prefix):
+        """Get the slugs of the triggers starting with prefix"""
+        return [ slug for slug in self.mailtriggers if slug.startswith(prefix) ]
+
+
+def build_registry():
+    """Load the registry of mail triggers and recipients from the database"""
+    # imported here, as the models use the registry
+    from ietf.mailtrigger.models import MailTrigger, Recipient
+    recipients = dict( (r.slug, r) for r in Recipient.objects.all() )
+    mailtriggers = dict( (m.slug, m) for m in MailTrigger.objects.all() )
+    lists = []
+    for through in (MailTrigger.to.through, MailTrigger.cc.through):
+        members = dict( (slug, []) for slug in mailtriggers )
+        for mailtrigger_id, recipient_id in through.objects.order_by('recipient_id').values_list('mailtrigger_id', 'recipient_id'):
+            members[mailtrigger_id].append(recipients[recipient_id])
+        lists.append(members)
+    return MailTriggerRegistry(mailtriggers, recipients, *lists)
+
+
+_registry = None
+_registry_generation = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Get the mail trigger registry of this process, loading it if it is
+    missing or out of date"""
+    global _registry, _registry_generation
+    generation = get_generation(MAILTRIGGER_REGISTRY_GENERATION)
+    with _registry_lock:
+        registry = _registry
+        if registry is None or _registry_generation != generation or time.time() - registry.built > settings.MAILTRIGGER_REGISTRY_MAX_AGE:
+            registry = _registry = build_registry()
+            _registry_generation = generation
+    return registry
+
+def clear_registry():
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+
+def get_recipient(slug):
+    """Get the Recipient with this slug, from the registry if it is there"""
+    recipient = get_registry().recipients.get(slug)
+    if recipient is None:
+        from ietf.mailtrigger.models import Recipient
+        recipient = Recipient.objects.get(slug=slug)
+    return recipient
+
+def get_recipient_lists(slug):
+    """Get the to and cc Recipients of the mail trigger with this slug, or
+    None if it isn't in the registry"""
+    registry = get_registry()
+    if slug not in registry.mailtriggers:
+        return None
+    return registry.to[slug], registry.cc[slug]
@@ -2,9 +2,15 @@
 # -*- coding: utf-8 -*-
 
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from ietf.doc.factories import WgDraftFactory
-from ietf.mailtrigger.models import MailTrigger
-from .utils import gather_address_lists
+from ietf.group.factories import RoleFactory
+from ietf.mailtrigger.models import MailTrigger, Recipient
+from ietf.mailtrigger.registry import clear_registry, get_registry
+from ietf.person.factories import PersonFactory
+from .utils import gather_address_lists, gather_relevant_expansions
 from ietf.utils.test_utils import TestCase
 
 
@@ -14,6 +20,12 @@ class GatherAddressListsTests(TestCase):
         self.doc = WgDraftFactory(group__acronym='mars', rev='01')
         self.author_address = self.doc.name + '@ietf.org'
 
+    def tearDown(self):
+        # the registry may hold triggers and recipients which the test
+        # changed, and which are rolled back now
+        clear_registry()
+        super().tearDown()
+
     def test_regular_trigger(self):
         to, cc = gather_address_lists('doc_pulled_from_rfc_queue', doc=self.doc)
         # Despite its name, assertCountEqual also compares content, but does not care for ordering
@@ -42,3 +54,41 @@ class GatherAddressListsTests(TestCase):
                                         'mars-chairs@ietf.org', 'iesg-secretary@ietf.org'])
         new_trigger = MailTrigger.objects.get(slug=new_slug)
         self.assertEqual(new_trigger.desc, new_desc)
+
+    def test_registry_follows_changes(self):
+        registry = get_registry()
+        self.assertIs(get_registry(), registry)
+        self.assertIn('doc_pulled_from_rfc_queue', registry.starting_with('doc_pulled_'))
+
+        recipient = Recipient.objects.get(slug='rfc_editor')
+        recipient.template = '<rfc-editor-test@rfc-editor.org>'
+        recipient.save()
+        to, cc = gather_address_lists('doc_pulled_from_rfc_queue', doc=self.doc)
+        self.assertCountEqual(to, ['iana@iana.org', 'rfc-editor-test@rfc-editor.org'])
+
+        MailTrigger.objects.get(slug='doc_pulled_from_rfc_queue').to.remove('iana')
+        to, cc = gather_address_lists('doc_pulled_from_rfc_queue', doc=self.doc)
+        self.assertCountEqual(to, ['rfc-editor-test@rfc-editor.org'])
+        self.assertIsNot(get_registry(), registry)
+
+    def test_relevant_expansions_query_count(self):
+        def count_queries(doc):
+            get_registry()
+            with CaptureQueriesContext(connection) as queries:
+                expansions = gather_relevant_expansions(doc=doc)
+            return len(queries), expansions
+
+        group = self.doc.group
+        few, expansions = count_queries(WgDraftFactory(group=group, authors=[PersonFactory()]))
+        self.assertTrue(any(slug == 'doc_pulled_from_rfc_queue' for slug, desc, to, cc in expansions))
+
+        # more roles and authors don't take more queries
+        for name in ('chair', 'delegate', 'secr', 'ad'):
+            RoleFactory.create_batch(3, group=group, name_id=name)
+        doc = WgDraftFactory(group=group, authors=PersonFactory.create_batch(8))
+        many, expansions = count_queries(doc)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 60)
+        for slug, desc, to, cc in expansions:
+            if slug == 'doc_pulled_from_rfc_queue':
+                self.assertIn('%s-chairs@ietf.org' % group.acronym, cc)
@@ -2,9 +2,12 @@
 
 from collections import namedtuple
 
+from django.db.models import prefetch_related_objects
+
 import debug                            # pyflakes:ignore
 
-from ietf.mailtrigger.models import MailTrigger, Recipient
+from ietf.mailtrigger.models import MailTrigger, gathering
+from ietf.mailtrigger.registry import get_recipient, get_recipient_lists, get_registry
 from ietf.submit.models import Submission
 from ietf.utils.mail import excludeaddrs
 
@@ -23,23 +26,27 @@ class AddrLists(namedtuple('AddrLists',['to','cc'])):
 
 def gather_address_lists(slug, skipped_recipients=None, create_from_slug_if_not_exists=None, 
                          desc_if_not_exists=None, **kwargs):
-    mailtrigger = get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists)
-
-    to = set()
-    for recipient in mailtrigger.to.all():
-        to.update(recipient.gather(**kwargs))
-    to.discard('')
-    if skipped_recipients:
-        to = excludeaddrs(to, skipped_recipients)
-
-    cc = set()
-    for recipient in mailtrigger.cc.all():
-        cc.update(recipient.gather(**kwargs))
-    cc.discard('')
-    if skipped_recipients:
-        cc = excludeaddrs(cc, skipped_recipients)
-
-    return AddrLists(to=sorted(list(to)),cc=sorted(list(cc)))
+    recipient_lists = get_recipient_lists(slug)
+    if recipient_lists is None:
+        mailtrigger = get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists)
+        recipient_lists = (mailtrigger.to.all(), mailtrigger.cc.all())
+    return _gather_address_lists(recipient_lists, skipped_recipients, kwargs, {})
+
+def _gather_address_lists(recipient_lists, skipped_recipients, kwargs, gathered):
+    # gathered holds the addresses of each recipient for these kwargs
+    lists = []
+    with gathering():
+        for recipients in recipient_lists:
+            addrs = set()
+            for recipient in recipients:
+                if recipient.slug not in gathered:
+                    gathered[recipient.slug] = recipient.gather(**kwargs)
+                addrs.update(gathered[recipient.slug])
+            addrs.discard('')
+            if skipped_recipients:
+                addrs = excludeaddrs(addrs, skipped_recipients)
+            lists.append(sorted(list(addrs)))
+    return AddrLists(to=lists[0],cc=lists[1])
 
 def get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists):
     try:
@@ -59,14 +66,18 @@ def get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists):
 
 def gather_relevant_expansions(**kwargs):
 
+    registry = get_registry()
+
     def starts_with(prefix):
-        return MailTrigger.objects.filter(slug__startswith=prefix).values_list('slug',flat=True)
+        return registry.starting_with(prefix)
 
     relevant = set() 
     
     if 'doc' in kwargs:
 
         doc = kwargs['doc']
+        # several recipients list the authors
+        prefetch_related_objects([doc], 'documentauthor_set__email__person')
 
         relevant.add('doc_state_edited')
         
@@ -111,16 +122,21 @@ def gather_relevant_expansions(**kwargs):
         relevant.update(starts_with('sub_'))
 
     rule_list = []
-    for mailtrigger in MailTrigger.objects.filter(slug__in=relevant):
-        addrs = gather_address_lists(mailtrigger.slug,**kwargs)
-        if addrs.to or addrs.cc:
-            rule_list.append((mailtrigger.slug,mailtrigger.desc,addrs.to,addrs.cc))
+    gathered = {}
+    with gathering():
+        for slug in relevant:
+            mailtrigger = registry.mailtriggers.get(slug)
+            if mailtrigger is None:
+                continue
+            addrs = _gather_address_lists((registry.to[slug], registry.cc[slug]), None, kwargs, gathered)
+            if addrs.to or addrs.cc:
+                rule_list.append((mailtrigger.slug,mailtrigger.desc,addrs.to,addrs.cc))
     return sorted(rule_list)
 
 def get_base_submission_message_address():
-    return Recipient.objects.get(slug='submission_manualpost_handling').gather()[0]
+    return get_recipient('submission_manualpost_handling').gather()[0]
 
 def get_base_ipr_request_address():
-    return Recipient.objects.get(slug='ipr_requests').gather()[0]
+    return get_recipient('ipr_requests').gather()[0]
 
 
@@ -6,7 +6,9 @@ from collections import defaultdict
 import datetime
 import io
 import os
+import pickle
 import re
+import zlib
 from tempfile import mkstemp
 
 from django.http import Http404
@@ -14,6 +16,7 @@ from django.db.models import F, Prefetch
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
@@ -28,9 +31,11 @@ from ietf.liaisons.utils import get_person_for_user
 from ietf.mailtrigger.utils import gather_address_lists
 from ietf.person.models  import Person
 from ietf.meeting.models import Meeting, Schedule, TimeSlot, SchedTimeSessAssignment, ImportantDate, SchedulingEvent, Session
+from ietf.meeting.models import agenda_generation_name
 from ietf.meeting.utils import session_requested_by, add_event_info_to_session_qs
 from ietf.name.models import ImportantDateName, SessionPurposeName
 from ietf.utils import log, meetecho
+from ietf.utils.cache import get_generation
 from ietf.utils.history import find_history_replacements_active_at
 from ietf.utils.mail import send_mail
 from ietf.utils.pipe import pipe
@@ -174,6 +179,107 @@ def preprocess_assignments_for_agenda(assignments_queryset, meeting, extra_prefe
     return assignments
 
 
+def get_assignments_for_agenda(schedule):
+    """Get queryset containing assignments to show on the agenda"""
+    return SchedTimeSessAssignment.objects.filter(
+        schedule__in=[schedule, schedule.base],
+        session__on_agenda=True,
+    )
+
+
+AGENDA_SNAPSHOT_VERSION = 2     # increase when the contents of AgendaSnapshot change
+AGENDA_SNAPSHOT_TIMEOUT = 7 * 24 * 60 * 60
+AGENDA_SNAPSHOT_CHUNK_SIZE = 1000 * 1000    # below memcached's default item size limit of 1MB
+
+class AgendaSnapshot:
+    """Preprocessed and keyword-tagged agenda assignments of a schedule
+
+    Use get_agenda_snapshot() to get one. The assignments are the output of
+    preprocess_assignments_for_agenda(), tagged with filter_keywords and
+    session_keyword attributes by AgendaKeywordTagger.
+    """
+    def __init__(self, cache_key, updated, assignments, filter_categories, non_area_keywords):
+        self.cache_key = cache_key
+        self.updated = updated
+        self.assignments = assignments
+        self.filter_categories = filter_categories
+        self.non_area_keywords = non_area_keywords
+
+
+def agenda_snapshot_cache_key(meeting, schedule, updated=None):
+    """Get the cache key of the agenda snapshot for a schedule of meeting
+
+    This only reads the agenda generation and meeting.updated(), so views
+    which cache something made from the snapshot can look that up without
+    loading the snapshot.  Pass updated if meeting.updated() is at hand.
+    """
+    if updated is None:
+        updated = meeting.updated()
+    return 'meeting:agenda-snapshot:%s:%s:%s:%s:%s:%s' % (
+        AGENDA_SNAPSHOT_VERSION,
+        meeting.pk,
+        get_generation(agenda_generation_name(meeting.pk)),
+        schedule.pk,
+        schedule.base_id or '',
+        int(updated.timestamp()),
+    )
+
+
+def get_agenda_snapshot(meeting, schedule):
+    """Get the agenda snapshot for a schedule of meeting, building it if it's not cached
+
+    The cache key includes meeting.updated() and the meeting's agenda generation,
+    which is bumped whenever an assignment, session, timeslot or session material
+    of the meeting changes (see ietf.meeting.models), so a cached snapshot is
+    never stale.  Each call returns its own copy, which callers may annotate.
+    """
+    updated = meeting.updated()
+    cache_key = agenda_snapshot_cache_key(meeting, schedule, updated)
+    snapshot = get_cached_agenda_snapshot(cache_key)
+    if snapshot is None:
+        assignments = list(preprocess_assignments_for_agenda(get_assignments_for_agenda(schedule), meeting))
+        tagger = AgendaKeywordTagger(assignments=assignments)
+        tagger.apply()  # annotate assignments with filter_keywords attribute
+        tagger.apply_session_keywords()  # annotate assignments with session_keyword attribute
+        filter_organizer = AgendaFilterOrganizer(assignments=assignments)
+        snapshot = AgendaSnapshot(
+            cache_key,
+            updated,
+            assignments,
+            filter_organizer.get_filter_categories(),
+            filter_organizer.get_non_area_keywords(),
+        )
+        cache_agenda_snapshot(cache_key, snapshot)
+    return snapshot
+
+
+def cache_agenda_snapshot(cache_key, snapshot):
+    """Cache an agenda snapshot, compressed and split in chunks which fit in memcached
+
+    The snapshot holds model instances with their prefetched objects, which
+    for a large meeting pickle to more than a cache item can hold.
+    """
+    data = zlib.compress(pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+    chunks = [ data[i:i + AGENDA_SNAPSHOT_CHUNK_SIZE] for i in range(0, len(data), AGENDA_SNAPSHOT_CHUNK_SIZE) ]
+    if len(chunks) > 1:
+        log.log('Agenda snapshot %s is %d bytes compressed, caching it in %d chunks' % (cache_key, len(data), len(chunks)))
+    values = { '%s:%d' % (cache_key, i): chunk for i, chunk in enumerate(chunks) }
+    values[cache_key] = len(chunks)
+    cache.set_many(values, AGENDA_SNAPSHOT_TIMEOUT)
+
+
+def get_cached_agenda_snapshot(cache_key):
+    """Get an agenda snapshot cached by cache_agenda_snapshot(), or None if any part of it is missing"""
+    count = cache.get(cache_key)
+    if count is None:
+        return None
+    keys = [ '%s:%d' % (cache_key, i) for i in range(count) ]
+    chunks = cache.get_many(keys)
+    if len(chunks) != count:
+        return None
+    return pickle.loads(zlib.decompress(b''.join(chunks[key] for key in keys)))
+
+
 class AgendaKeywordTool:
     """Base class for agenda keyword-related organizers
 
@@ -0,0 +1,86 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Load test for the filtered agenda.ics view. Simulates a large population of
+# calendar clients, each polling with its own filter, first with an empty cache
+# and then again with the ETags returned by the first pass, and reports the
+# request rates and the share of 304 Not Modified responses.
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+import debug                            # pyflakes:ignore
+
+from ietf.meeting.helpers import get_meeting, get_schedule, get_agenda_snapshot
+from ietf.meeting.views import agenda_ical
+
+
+class Command(BaseCommand):
+    help = 'Load test the filtered iCalendar agenda view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-m', '--meeting', default='999',
+                            help='the number of the meeting to use (default 999, see create_dummy_meeting)')
+        parser.add_argument('-c', '--clients', type=int, default=5000,
+                            help='number of simulated calendar clients')
+        parser.add_argument('-f', '--filters', type=int, default=2000,
+                            help='number of distinct filters used by the clients')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed for the generated filters')
+
+    def handle(self, meeting, clients, filters, seed, *args, **options):
+        random.seed(seed)
+        meeting = get_meeting(meeting, type_in=None)
+        schedule = get_schedule(meeting)
+        if schedule is None:
+            raise CommandError('Meeting {} has no agenda'.format(meeting.number))
+        keywords = sorted(set(
+            kw for a in get_agenda_snapshot(meeting, schedule).assignments for kw in a.filter_keywords
+        ))
+        if not keywords:
+            raise CommandError('Meeting {} has no filter keywords'.format(meeting.number))
+
+        querystrings = [self._random_filter(keywords) for __ in range(filters)]
+        population = [random.choice(querystrings) for __ in range(clients)]
+        self.stdout.write('Meeting {}: {} keywords, {} clients, {} distinct filters'.format(
+            meeting.number, len(keywords), clients, len(set(population))))
+
+        factory = RequestFactory()
+        path = '/meeting/{}/agenda.ics'.format(meeting.number)
+        etags = {}
+        statuses = []
+        start = time.time()
+        for qs in population:
+            response = agenda_ical(factory.get(path + qs), num=meeting.number)
+            etags[qs] = response['ETag']
+            statuses.append(response.status_code)
+        elapsed = time.time() - start
+        self._report('Initial poll', statuses, elapsed)
+
+        statuses = []
+        start = time.time()
+        for qs in population:
+            response = agenda_ical(factory.get(path + qs, HTTP_IF_NONE_MATCH=etags[qs]), num=meeting.number)
+            statuses.append(response.status_code)
+        elapsed = time.time() - start
+        self._report('Repeat poll', statuses, elapsed)
+
+    def _random_filter(self, keywords):
+        # Clients write the same filter in different ways; the view should
+        # treat all of them as one
+        show = random.sample(keywords, random.randint(1, min(10, len(keywords))))
+        hide = random.sample(keywords, random.randint(0, min(2, len(keywords))))
+        params = ['show=' + ','.join(show)]
+        if hide:
+            params.append('hide=' + ','.join(hide))
+        random.shuffle(params)
+        return '?' + '&'.join(params)
+
+    def _report(self, label, statuses, elapsed):
+        not_modified = sum(1 for status in statuses if status == 304)
+        self.stdout.write('{:14} {:10.1f} requests/s, {} requests, {:.1%} not modified'.format(
+            label + ':', len(statuses) / elapsed if elapsed else 0, len(statuses),
+            not_modified / len(statuses) if statuses else 0))
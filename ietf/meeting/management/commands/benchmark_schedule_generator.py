@@ -0,0 +1,63 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures how fast the schedule generator evaluates session switches, with the
+# incremental DynamicCostModel and with a full recalculation of the schedule cost.
+# The default meeting is IETF 999, as created by the create_dummy_meeting command,
+# which has the size and complexity of a real IETF meeting.
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+import debug                            # pyflakes:ignore
+
+from ietf.meeting.management.commands.generate_schedule import ScheduleHandler, DynamicCostModel
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the evaluation of session switches by the schedule generator'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-m', '--meeting', default='999',
+                            help='the number of the meeting to use (default 999, see create_dummy_meeting)')
+        parser.add_argument('-s', '--switches', type=int, default=20000,
+                            help='number of switches to evaluate with the incremental cost model')
+        parser.add_argument('-f', '--full-switches', type=int, default=200,
+                            help='number of switches to evaluate with a full cost recalculation')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed for the initial schedule and the switches')
+
+    def handle(self, meeting, switches, full_switches, seed, *args, **options):
+        random.seed(seed)
+        schedule = ScheduleHandler(self.stdout, meeting, verbosity=0).schedule
+        schedule.fill_initial_schedule()
+        scheduled = [t for t, s in schedule.schedule.items() if not s.is_fixed]
+        free = list(schedule.free_timeslots)
+        if not scheduled:
+            raise CommandError('Meeting {} has no sessions to schedule'.format(meeting))
+        pairs = [(random.choice(scheduled), random.choice(free)) for __ in range(max(switches, full_switches))]
+        self.stdout.write('{}, evaluating switches'.format(schedule))
+
+        schedule._cost_model = None
+        full_costs, full_rate = self._evaluate(schedule, pairs[:full_switches])
+        self.stdout.write('Full recalculation:  {:10.1f} switches/s ({} switches)'.format(full_rate, full_switches))
+
+        schedule._cost_model = DynamicCostModel(schedule.timeslots, schedule.schedule, schedule.base_schedule)
+        costs, rate = self._evaluate(schedule, pairs[:switches])
+        schedule._cost_model = None
+        self.stdout.write('Incremental model:   {:10.1f} switches/s ({} switches)'.format(rate, switches))
+
+        if full_rate:
+            self.stdout.write('Speedup: {:.1f}x'.format(rate / full_rate))
+        mismatches = sum(1 for full, incremental in zip(full_costs, costs) if full != incremental)
+        if mismatches:
+            raise CommandError('{} switch costs differ between the full and incremental calculation'
+                               .format(mismatches))
+
+    def _evaluate(self, schedule, pairs):
+        start = time.time()
+        costs = [schedule._cost_for_switch(t1, t2) for t1, t2 in pairs]
+        elapsed = time.time() - start
+        return costs, (len(pairs) / elapsed if elapsed else 0)
@@ -4,16 +4,19 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import calendar
+import copy
 import datetime
 import math
+import multiprocessing
 import random
 import string
 import sys
 import time
 
-from collections import defaultdict
+from collections import ChainMap, defaultdict
 from functools import lru_cache
-from typing import NamedTuple, Optional
+from io import StringIO
+from typing import List, NamedTuple, Optional, Tuple
 
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.core.management.base import BaseCommand, CommandError
@@ -52,6 +55,14 @@ class ScheduleId(NamedTuple):
         return '/'.join(tok for tok in reversed(self) if tok is not None)
 
 
+class SearchResult(NamedTuple):
+    """Outcome of one seeded schedule search, with assignments as (timeslot pk, session pk)"""
+    seed: int
+    violations: List[str]
+    cost: float
+    assignments: List[Tuple[int, int]]
+
+
 class Command(BaseCommand):
     help = 'Create a meeting schedule'
 
@@ -71,18 +82,29 @@ class Command(BaseCommand):
                                 'Base schedule for generated schedule, specified as "[owner/]name"'
                                 ' (default is no base schedule; owner not required if name is unique)'
                             ))
+        parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='number of worker processes to run searches in')
+        parser.add_argument('-k', '--restarts', type=int, default=1,
+                            help='number of independent searches; the lowest cost schedule is saved')
+        parser.add_argument('-s', '--seed', type=int, default=None,
+                            help=('random seed; search number i uses seed + i, so any search can be'
+                                  ' reproduced with --restarts 1 and its seed (default is a random seed)'))
 
-    def handle(self, meeting, name, max_cycles, verbosity, base_id, *args, **kwargs):
-        ScheduleHandler(self.stdout, meeting, name, max_cycles, verbosity, base_id).run()
+    def handle(self, meeting, name, max_cycles, verbosity, base_id, workers, restarts, seed, *args, **kwargs):
+        ScheduleHandler(self.stdout, meeting, name, max_cycles, verbosity, base_id,
+                        workers=workers, restarts=restarts, seed=seed).run()
 
 
 class ScheduleHandler(object):
     def __init__(self, stdout, meeting_number, name=None, max_cycles=OPTIMISER_MAX_CYCLES,
-                 verbosity=1, base_id=None):
+                 verbosity=1, base_id=None, workers=1, restarts=1, seed=None):
         self.stdout = stdout
         self.verbosity = verbosity
         self.name = name
         self.max_cycles = max_cycles
+        self.workers = workers
+        self.restarts = restarts
+        self.seed = seed
         if meeting_number:
             try:
                 self.meeting = models.Meeting.objects.get(type="ietf", number=meeting_number)
@@ -116,6 +138,10 @@ class ScheduleHandler(object):
 
     def run(self):
         """Schedule all sessions"""
+        if self.workers > 1 or self.restarts > 1:
+            return self.run_searches()
+        if self.seed is not None:
+            random.seed(self.seed)
         beg_time = time.time()
         self.schedule.fill_initial_schedule()
         violations, cost = self.schedule.total_schedule_cost()
@@ -143,6 +169,59 @@ class ScheduleHandler(object):
 
         self._save_schedule(cost)
         return violations, cost
+
+    def run_searches(self):
+        """
+        Schedule all sessions by running independent seeded searches, in parallel
+        if there are multiple workers, and save the lowest cost schedule.
+
+        The meeting is only loaded once; each search fills and optimises its own
+        copy of the in-memory schedule, and only returns its assignments.
+        """
+        beg_time = time.time()
+        seed = self.seed if self.seed is not None else random.randrange(2 ** 32)
+        seeds = [seed + i for i in range(self.restarts)]
+        workers = min(self.workers, self.restarts)
+        if self.verbosity >= 1:
+            self.stdout.write('Running {} searches with {} worker{}, seeds {} to {}'
+                              .format(len(seeds), workers, '' if workers == 1 else 's', seeds[0], seeds[-1]))
+
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer=_init_search_pool, initargs=(self.schedule,)) as pool:
+                results = self._collect_search_results(pool.imap(_run_pool_search, seeds))
+        else:
+            results = self._collect_search_results(_run_seeded_search(self.schedule, s) for s in seeds)
+
+        best = min(results, key=lambda r: r.cost)
+        timeslot_lut = {t.timeslot_pk: t for t in self.schedule.timeslots}
+        session_lut = {s.session_pk: s for s in self.schedule.sessions}
+        self.schedule.schedule = {timeslot_lut[t]: session_lut[s] for t, s in best.assignments}
+        violations, cost = self.schedule.total_schedule_cost()
+        end_time = time.time()
+        tot_time = end_time - beg_time
+        if self.verbosity >= 1:
+            vc = len(violations)
+            self.stdout.write('Searches completed in %dm %.2fs, best schedule from seed %s with %s violation%s, cost %s'
+                               % (tot_time//60, tot_time%60, best.seed, vc, '' if vc==1 else 's', intcomma(cost)))
+        if self.verbosity >= 1 and violations:
+            self.stdout.write('Remaining violations:')
+            for v in violations:
+                self.stdout.write(v)
+
+        self.schedule.optimise_timeslot_capacity()
+
+        self._save_schedule(cost)
+        return violations, cost
+
+    def _collect_search_results(self, results):
+        collected = []
+        for result in results:
+            if self.verbosity >= 1:
+                vc = len(result.violations)
+                self.stdout.write('Search with seed %s completed with %s violation%s, cost %s'
+                                  % (result.seed, vc, '' if vc==1 else 's', intcomma(result.cost)))
+            collected.append(result)
+        return collected
     
     def _save_schedule(self, cost):
         if not self.name:
@@ -256,8 +335,9 @@ class Schedule(object):
     def __init__(self, stdout, timeslots, sessions, business_constraint_costs,
                  max_cycles, verbosity, base_schedule=None):
         self.stdout = stdout
-        self.timeslots = timeslots
-        self.sessions = sessions or []
+        # Ordered by pk, so that a search only depends on its random seed
+        self.timeslots = sorted(timeslots, key=lambda t: t.timeslot_pk)
+        self.sessions = sorted(sessions or [], key=lambda s: s.session_pk)
         self.business_constraint_costs = business_constraint_costs
         self.verbosity = verbosity
         self.schedule = dict()
@@ -267,6 +347,13 @@ class Schedule(object):
         self._fixed_violations = dict()  # key = type of cost
         self.max_cycles = max_cycles
         self.base_schedule = self._load_base_schedule(base_schedule) if base_schedule else None
+        self._cost_model = None  # DynamicCostModel, only kept while filling or optimising
+
+    def __getstate__(self):
+        # stdout can't be pickled or copied, see _run_seeded_search()
+        state = self.__dict__.copy()
+        state['stdout'] = None
+        return state
 
     def __str__(self):
         return 'Schedule ({} timeslots, {} sessions, {} scheduled, {} in base schedule)'.format(
@@ -450,15 +537,14 @@ class Schedule(object):
             self.stdout.write('== Initial scheduler starting, scheduling {} sessions in {} timeslots =='
                               .format(len(list(self.free_sessions)), len(list(self.free_timeslots))))
         sessions = sorted(self.free_sessions, key=lambda s: s.complexity, reverse=True)
+        self._cost_model = DynamicCostModel(self.timeslots, self.schedule, self.base_schedule)
 
         for session in sessions:
             possible_slots = [t for t in self.free_timeslots if t not in self.schedule.keys()]
             random.shuffle(possible_slots)
             
             def timeslot_preference(t):
-                proposed_schedule = self.schedule.copy()
-                proposed_schedule[t] = session
-                return self.calculate_dynamic_cost(proposed_schedule)[1], t.duration, t.capacity
+                return self._cost_model.cost_with_changes({t: session}), t.duration, t.capacity
 
             possible_slots.sort(key=timeslot_preference)
             self._schedule_session(session, possible_slots[0])
@@ -466,6 +552,7 @@ class Schedule(object):
                 self.stdout.write('Scheduled {} at {} in location {}'
                                   .format(session.group, possible_slots[0].start,
                                           possible_slots[0].location_pk))
+        self._cost_model = None
 
     def optimise_schedule(self):
         """
@@ -482,7 +569,11 @@ class Schedule(object):
          
         If the total schedule cost reaches 0 at any time, the schedule is perfect and the
         optimiser returns. 
+
+        While optimising, the dynamic cost is tracked by a DynamicCostModel, so that
+        evaluating a switch only recalculates the sessions affected by it.
         """
+        self._cost_model = DynamicCostModel(self.timeslots, self.schedule, self.base_schedule)
         last_run_violations = []
         best_cost = math.inf
         shuffle_next_run = False
@@ -506,13 +597,14 @@ class Schedule(object):
             for original_timeslot, session in items:
                 if session.is_fixed:
                     continue
-                best_cost = self.calculate_dynamic_cost()[1]
+                best_cost = self._cost_model.cost
                 if best_cost == 0:
                     if self.verbosity >= 1 and self.stdout.isatty():
                         sys.stderr.write('\n')
                     if self.verbosity >= 2:
                         self.stdout.write('Optimiser found an optimal schedule')
 
+                    self._cost_model = None
                     return run_count
                 best_timeslot = None
 
@@ -544,6 +636,7 @@ class Schedule(object):
             self.stdout.write('Optimiser did not find perfect schedule, using best schedule at dynamic cost {:,}'
                               .format(self.best_cost))
         self.schedule = self.best_schedule
+        self._cost_model = None
 
         return run_count
 
@@ -583,11 +676,12 @@ class Schedule(object):
         larger rooms. This does not change which sessions overlap, so it
         has no impact on the schedule cost. 
         """
+        self._cost_model = None
         optimised_timeslots = set()
         for timeslot in list(self.schedule.keys()):
             if timeslot in optimised_timeslots or timeslot.is_fixed:
                 continue
-            timeslot_overlaps = sorted(timeslot.full_overlaps, key=lambda t: t.capacity, reverse=True)
+            timeslot_overlaps = sorted(timeslot.full_overlaps, key=lambda t: (t.capacity, t.timeslot_pk), reverse=True)
             sessions_overlaps = [self.schedule.get(t) for t in timeslot_overlaps]
             sessions_overlaps.sort(key=lambda s: s.attendees if s else 0, reverse=True)
             assert len(timeslot_overlaps) == len(sessions_overlaps)
@@ -606,19 +700,23 @@ class Schedule(object):
 
     def _schedule_session(self, session, timeslot):
         self.schedule[timeslot] = session
+        if self._cost_model is not None:
+            self._cost_model.apply_changes({timeslot: session})
 
     def _cost_for_switch(self, timeslot1, timeslot2):
         """
         Calculate the total cost of self.schedule, if the sessions in timeslot1 and timeslot2 
         would be switched. Does not perform the switch, self.schedule remains unchanged.
         """
-        proposed_schedule = self.schedule.copy()
-        session1 = proposed_schedule.get(timeslot1)
-        session2 = proposed_schedule.get(timeslot2)
+        session1 = self.schedule.get(timeslot1)
+        session2 = self.schedule.get(timeslot2)
         if session1 and not session1.fits_in_timeslot(timeslot2):
             return math.inf
         if session2 and not session2.fits_in_timeslot(timeslot1):
             return math.inf
+        if self._cost_model is not None:
+            return self._cost_model.cost_with_changes({timeslot2: session1, timeslot1: session2})
+        proposed_schedule = self.schedule.copy()
         if session1:
             proposed_schedule[timeslot2] = session1
         elif session2:
@@ -650,6 +748,8 @@ class Schedule(object):
             self.schedule[timeslot1] = session2
         elif session1:
             del self.schedule[timeslot1]
+        if self._cost_model is not None:
+            self._cost_model.apply_changes({timeslot2: session1, timeslot1: session2})
         return session2
     
     def _save(self, cost):
@@ -658,6 +758,185 @@ class Schedule(object):
             self.best_schedule = self.schedule.copy()
 
 
+def _run_seeded_search(schedule, seed):
+    """
+    Fill and optimise a copy of schedule, using the given random seed.
+    Returns a SearchResult; the schedule itself is left unchanged.
+    """
+    schedule = copy.deepcopy(schedule)
+    schedule.stdout = StringIO()
+    schedule.verbosity = 0
+    schedule.schedule = dict()
+    schedule.best_cost = math.inf
+    schedule.best_schedule = None
+    random.seed(seed)
+    schedule.fill_initial_schedule()
+    schedule.optimise_schedule()
+    violations, cost = schedule.total_schedule_cost()
+    assignments = [(t.timeslot_pk, s.session_pk) for t, s in schedule.schedule.items()]
+    return SearchResult(seed, violations, cost, assignments)
+
+
+_pool_schedule = None
+
+def _init_search_pool(schedule):
+    """Process pool initializer, so that the schedule is sent to each worker only once"""
+    global _pool_schedule
+    _pool_schedule = schedule
+
+def _run_pool_search(seed):
+    return _run_seeded_search(_pool_schedule, seed)
+
+
+class DynamicCostModel(object):
+    """
+    Incrementally maintained dynamic cost of a schedule.
+
+    The cost contribution of every scheduled session is kept, together with
+    reverse lookups of overlapping and adjacent timeslots and the timeslots used
+    by each group. The cost of a proposed change then only requires recalculating
+    the sessions whose overlapping sessions, adjacent sessions or group sessions
+    change, instead of the whole schedule. Totals are identical to those of
+    Schedule.calculate_dynamic_cost().
+
+    Changes are given as a dict of timeslot to session, where a session of None
+    means the timeslot becomes empty.
+    """
+    def __init__(self, timeslots, schedule, base_schedule=None):
+        self.assignments = dict(schedule)
+        if base_schedule is not None:
+            self.assignments.update(base_schedule)
+
+        self._overlapped_by = defaultdict(set)
+        self._adjacent_to = defaultdict(set)
+        for timeslot in timeslots:
+            for other in timeslot.overlaps:
+                self._overlapped_by[other].add(timeslot)
+            for other in timeslot.adjacent:
+                self._adjacent_to[other].add(timeslot)
+
+        self._group_timeslots = defaultdict(set)
+        for timeslot, session in self.assignments.items():
+            self._group_timeslots[session.group].add(timeslot)
+
+        self._costs = dict()  # key = timeslot
+        self._finite_cost = 0
+        self._infinite_costs = 0
+        for timeslot in self.assignments:
+            self._add_cost(timeslot, self._session_cost(self.assignments, self._group_timeslots, timeslot))
+
+    @property
+    def cost(self):
+        """Dynamic cost of the current assignments"""
+        return math.inf if self._infinite_costs else self._finite_cost
+
+    def cost_with_changes(self, changes):
+        """Dynamic cost if changes were applied. Does not apply the changes."""
+        proposed = _ProposedAssignments(self.assignments, changes)
+        changed_groups = self._changed_group_timeslots(changes)
+        group_timeslots = ChainMap(changed_groups, self._group_timeslots)
+        finite_cost, infinite_costs = self._finite_cost, self._infinite_costs
+        for timeslot in self._affected_timeslots(changes, changed_groups):
+            old_cost = self._costs.get(timeslot)
+            if old_cost is None:
+                pass
+            elif old_cost == math.inf:
+                infinite_costs -= 1
+            else:
+                finite_cost -= old_cost
+            if timeslot in proposed:
+                new_cost = self._session_cost(proposed, group_timeslots, timeslot)
+                if new_cost == math.inf:
+                    infinite_costs += 1
+                else:
+                    finite_cost += new_cost
+        return math.inf if infinite_costs else finite_cost
+
+    def apply_changes(self, changes):
+        """Apply changes and update the costs of all affected sessions"""
+        changed_groups = self._changed_group_timeslots(changes)
+        affected = self._affected_timeslots(changes, changed_groups)
+        for timeslot, session in changes.items():
+            if session is None:
+                self.assignments.pop(timeslot, None)
+            else:
+                self.assignments[timeslot] = session
+        self._group_timeslots.update(changed_groups)
+        for timeslot in affected:
+            self._remove_cost(timeslot)
+            if timeslot in self.assignments:
+                self._add_cost(timeslot, self._session_cost(self.assignments, self._group_timeslots, timeslot))
+
+    def _add_cost(self, timeslot, cost):
+        self._costs[timeslot] = cost
+        if cost == math.inf:
+            self._infinite_costs += 1
+        else:
+            self._finite_cost += cost
+
+    def _remove_cost(self, timeslot):
+        cost = self._costs.pop(timeslot, None)
+        if cost is None:
+            return
+        if cost == math.inf:
+            self._infinite_costs -= 1
+        else:
+            self._finite_cost -= cost
+
+    def _changed_group_timeslots(self, changes):
+        """Timeslots in use by each group whose sessions are moved by changes"""
+        changed = dict()
+        for timeslot, session in changes.items():
+            old_session = self.assignments.get(timeslot)
+            if old_session is not None:
+                if old_session.group not in changed:
+                    changed[old_session.group] = set(self._group_timeslots[old_session.group])
+                changed[old_session.group].discard(timeslot)
+            if session is not None:
+                if session.group not in changed:
+                    changed[session.group] = set(self._group_timeslots[session.group])
+                changed[session.group].add(timeslot)
+        return changed
+
+    def _affected_timeslots(self, changes, changed_groups):
+        """Timeslots whose session cost may be changed by changes"""
+        affected = set(changes)
+        for timeslot in changes:
+            affected.update(self._overlapped_by[timeslot])
+            affected.update(self._adjacent_to[timeslot])
+        for group, timeslots in changed_groups.items():
+            affected.update(timeslots)
+            affected.update(self._group_timeslots[group])
+        return affected
+
+    @staticmethod
+    def _session_cost(assignments, group_timeslots, timeslot):
+        session = assignments[timeslot]
+        overlapping_sessions = {assignments[t] for t in timeslot.overlaps if t in assignments}
+        my_sessions = {(t, assignments[t]) for t in group_timeslots[session.group]}
+        return session.calculate_cost(assignments, timeslot, overlapping_sessions, my_sessions)[1]
+
+
+class _ProposedAssignments(object):
+    """Read-only view of assignments with changes applied, as used by DynamicCostModel"""
+    def __init__(self, assignments, changes):
+        self.assignments = assignments
+        self.changes = changes
+
+    def __contains__(self, timeslot):
+        if timeslot in self.changes:
+            return self.changes[timeslot] is not None
+        return timeslot in self.assignments
+
+    def __getitem__(self, timeslot):
+        if timeslot in self.changes:
+            session = self.changes[timeslot]
+            if session is None:
+                raise KeyError(timeslot)
+            return session
+        return self.assignments[timeslot]
+
+
 class TimeSlot(object):
     """
     This TimeSlot class is analogous to the TimeSlot class in the models,
@@ -809,6 +1088,11 @@ class Session(object):
                     self.conflict_people.intersection(other_session.conflict_people))
             ])
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['stdout'] = None
+        return state
+
     def fits_in_timeslot(self, timeslot):
         return self.attendees <= timeslot.capacity and self.requested_duration <= timeslot.duration
 
@@ -853,7 +1137,9 @@ class Session(object):
         violations += v
         cost += c
 
-        v, c = self._calculate_cost_my_other_sessions(tuple(my_sessions))
+        # Order by time, so that the order check compares the time order with the session order
+        my_sessions = tuple(sorted(my_sessions, key=lambda item: (item[0].start, item[0].timeslot_pk)))
+        v, c = self._calculate_cost_my_other_sessions(my_sessions)
         violations += v
         cost += c
 
@@ -37,6 +37,7 @@ from ietf.name.models import (
     SessionPurposeName,
 )
 from ietf.person.models import Person
+from ietf.utils.cache import bump_generation
 from ietf.utils.decorators import memoize
 from ietf.utils.storage import NoLocationMigrationFileSystemStorage
 from ietf.utils.text import xslugify
@@ -1379,4 +1380,39 @@ class MeetingHost(models.Model):
 
     class Meta:
         unique_together = (('meeting', 'name'),)
-        ordering = ('pk',)
\ No newline at end of file
+        ordering = ('pk',)
+
+
+# === Agenda snapshot invalidation =============================================
+
+def agenda_generation_name(meeting_id):
+    """Name of the generation counter for cached agenda data of a meeting, see ietf.utils.cache"""
+    return 'meeting:agenda:%s' % meeting_id
+
+def invalidate_agenda_snapshots(sender, instance, **kwargs):
+    """Invalidate the cached agenda snapshots of the meeting(s) a changed object appears on"""
+    if kwargs.get('raw'):
+        return
+    if isinstance(instance, SchedTimeSessAssignment):
+        meeting_ids = [instance.schedule.meeting_id]
+    elif isinstance(instance, (SchedulingEvent, SessionPresentation)):
+        meeting_ids = [instance.session.meeting_id]
+    elif isinstance(instance, Document):
+        # Drafts are saved far more often than they are session materials, so
+        # don't look up their sessions on every save
+        if instance.type_id == 'draft':
+            return
+        meeting_ids = set(Session.objects.filter(sessionpresentation__document=instance).values_list('meeting_id', flat=True))
+    elif isinstance(instance, Group):
+        # the agenda shows the groups of the sessions, and their parents
+        meeting_ids = set(Session.objects.filter(Q(group=instance) | Q(group__parent=instance)).values_list('meeting_id', flat=True))
+    else:
+        meeting_ids = [instance.meeting_id]
+    for meeting_id in meeting_ids:
+        bump_generation(agenda_generation_name(meeting_id))
+
+for agenda_model in (SchedTimeSessAssignment, Session, TimeSlot, Room, FloorPlan, SchedulingEvent, SessionPresentation):
+    models.signals.post_save.connect(invalidate_agenda_snapshots, sender=agenda_model)
+    models.signals.post_delete.connect(invalidate_agenda_snapshots, sender=agenda_model)
+models.signals.post_save.connect(invalidate_agenda_snapshots, sender=Document)
+models.signals.post_save.connect(invalidate_agenda_snapshots, sender=Group)
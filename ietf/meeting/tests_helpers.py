@@ -6,15 +6,20 @@ from unittest.mock import patch, Mock
 
 from django.conf import settings
 from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.db import connection
 from django.test import override_settings, RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from ietf.group.factories import GroupFactory
 from ietf.group.models import Group
-from ietf.meeting.factories import SessionFactory, MeetingFactory, TimeSlotFactory
+from ietf.meeting.factories import SessionFactory, MeetingFactory, TimeSlotFactory, FloorPlanFactory
 from ietf.meeting.helpers import (AgendaFilterOrganizer, AgendaKeywordTagger,
     delete_interim_session_conferences, sessions_post_save, sessions_post_cancel,
-    create_interim_session_conferences, get_ietf_meeting)
-from ietf.meeting.models import SchedTimeSessAssignment, Session
+    create_interim_session_conferences, get_ietf_meeting, get_agenda_snapshot, get_assignments_for_agenda,
+    agenda_snapshot_cache_key, get_cached_agenda_snapshot)
+from ietf.meeting.models import SchedTimeSessAssignment, Session, SchedulingEvent
+from ietf.person.models import Person
 from ietf.meeting.test_data import make_meeting_test_data
 from ietf.utils.meetecho import Conference
 from ietf.utils.test_utils import TestCase
@@ -632,3 +637,87 @@ class HelperTests(TestCase):
         ietf.date = datetime.date.today()
         ietf.save()
         self.assertEqual(get_ietf_meeting(), ietf, 'Return current meeting if there is one')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AgendaSnapshotTests(TestCase):
+    def test_get_agenda_snapshot(self):
+        meeting = make_meeting_test_data()
+        snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+        self.assertCountEqual(
+            [a.pk for a in snapshot.assignments],
+            get_assignments_for_agenda(meeting.schedule).values_list('pk', flat=True),
+        )
+        for a in snapshot.assignments:
+            self.assertTrue(hasattr(a, 'filter_keywords'))
+            self.assertTrue(hasattr(a.session, 'historic_group'))
+        self.assertIsNotNone(snapshot.filter_categories)
+
+        # a cached snapshot only costs the queries of meeting.updated()
+        with CaptureQueriesContext(connection) as queries:
+            cached = get_agenda_snapshot(meeting, meeting.schedule)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(cached.cache_key, snapshot.cache_key)
+        with CaptureQueriesContext(connection) as queries:
+            cache_key = agenda_snapshot_cache_key(meeting, meeting.schedule)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(cache_key, snapshot.cache_key)
+        self.assertEqual([a.pk for a in cached.assignments], [a.pk for a in snapshot.assignments])
+
+    def test_agenda_snapshot_chunks(self):
+        meeting = make_meeting_test_data()
+        with patch('ietf.meeting.helpers.AGENDA_SNAPSHOT_CHUNK_SIZE', 1000), patch('ietf.meeting.helpers.log.log') as log_mock:
+            snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+        self.assertTrue(log_mock.called)
+        count = cache.get(snapshot.cache_key)
+        self.assertGreater(count, 1)
+        cached = get_cached_agenda_snapshot(snapshot.cache_key)
+        self.assertEqual([a.pk for a in cached.assignments], [a.pk for a in snapshot.assignments])
+
+        # a snapshot with a missing chunk is rebuilt
+        cache.delete('%s:%d' % (snapshot.cache_key, count - 1))
+        self.assertIsNone(get_cached_agenda_snapshot(snapshot.cache_key))
+        rebuilt = get_agenda_snapshot(meeting, meeting.schedule)
+        self.assertEqual([a.pk for a in rebuilt.assignments], [a.pk for a in snapshot.assignments])
+        self.assertEqual(cache.get(snapshot.cache_key), 1)
+
+    def test_agenda_snapshot_invalidation(self):
+        meeting = make_meeting_test_data()
+        snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+        assignment = snapshot.assignments[0]
+        self.assertNotEqual(assignment.session.current_status, 'canceled')
+
+        SchedulingEvent.objects.create(
+            session_id=assignment.session.pk,
+            status_id='canceled',
+            by=Person.objects.get(name='(System)'),
+        )
+        updated_snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+        self.assertNotEqual(updated_snapshot.cache_key, snapshot.cache_key)
+        updated_assignment = [a for a in updated_snapshot.assignments if a.pk == assignment.pk][0]
+        self.assertEqual(updated_assignment.session.current_status, 'canceled')
+
+    def test_agenda_snapshot_invalidation_by_groups_and_floorplans(self):
+        meeting = make_meeting_test_data()
+        snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+        group = [a for a in snapshot.assignments if a.session.group.parent_id][0].session.group
+
+        def changed():
+            nonlocal snapshot
+            updated = get_agenda_snapshot(meeting, meeting.schedule)
+            result = updated.cache_key != snapshot.cache_key
+            snapshot = updated
+            return result
+
+        group.name = 'Renamed group'
+        group.save()
+        self.assertTrue(changed())
+        parent = group.parent
+        parent.acronym = 'renamedarea'
+        parent.save()
+        self.assertTrue(changed())
+        GroupFactory(acronym='unrelated')
+        self.assertFalse(changed())
+
+        FloorPlanFactory(meeting=meeting)
+        self.assertTrue(changed())
@@ -81,6 +81,29 @@ class ScheduleGeneratorTest(TestCase):
         schedule = self.meeting.schedule_set.get(name__startswith='Auto-')
         self.assertEqual(schedule.assignments.count(), 13)
 
+    def test_multiple_searches(self):
+        self._create_basic_sessions()
+        generator = generate_schedule.ScheduleHandler(self.stdout, self.meeting.number, verbosity=1,
+                                                      restarts=3, seed=10)
+        violations, cost = generator.run()
+        self.assertEqual(violations, self.fixed_violations)
+        self.assertEqual(cost, self.fixed_cost)
+
+        self.stdout.seek(0)
+        output = self.stdout.read()
+        self.assertIn('Running 3 searches with 1 worker, seeds 10 to 12', output)
+        for seed in (10, 11, 12):
+            self.assertIn('Search with seed {} completed'.format(seed), output)
+
+        schedule = self.meeting.schedule_set.get(name__startswith='auto-')
+        self.assertEqual(schedule.assignments.count(), 13)
+
+        # each search is reproducible from its seed
+        first = generate_schedule._run_seeded_search(generator.schedule, 11)
+        second = generate_schedule._run_seeded_search(generator.schedule, 11)
+        self.assertEqual(first.assignments, second.assignments)
+        self.assertEqual(first.cost, second.cost)
+
     def test_unresolvable_schedule(self):
         self._create_basic_sessions()
         for group in self.all_groups:
@@ -256,6 +279,33 @@ class ScheduleGeneratorTest(TestCase):
         )
 
 
+    def test_dynamic_cost_model(self):
+        """The incremental cost model should give the same costs as a full calculation"""
+        self._create_basic_sessions()
+        base_schedule = self._create_base_schedule()
+        handler = generate_schedule.ScheduleHandler(
+            self.stdout,
+            self.meeting.number,
+            verbosity=0,
+            base_id=generate_schedule.ScheduleId.from_schedule(base_schedule),
+        )
+        schedule = handler.schedule
+        schedule.fill_initial_schedule()
+
+        model = generate_schedule.DynamicCostModel(schedule.timeslots, schedule.schedule, schedule.base_schedule)
+        self.assertEqual(model.cost, schedule.calculate_dynamic_cost()[1])
+
+        for timeslot1 in list(schedule.schedule):
+            for timeslot2 in schedule.free_timeslots:
+                schedule._cost_model = None
+                expected_cost = schedule._cost_for_switch(timeslot1, timeslot2)
+                schedule._cost_model = model
+                self.assertEqual(schedule._cost_for_switch(timeslot1, timeslot2), expected_cost)
+
+        for timeslot1, timeslot2 in zip(list(schedule.schedule), schedule.free_timeslots):
+            schedule._switch_sessions(timeslot1, timeslot2)
+            self.assertEqual(model.cost, schedule.calculate_dynamic_cost()[1])
+
     def _create_basic_sessions(self):
         for group in self.all_groups:
             SessionFactory(meeting=self.meeting, group=group, add_to_schedule=False, attendees=5,
@@ -867,6 +867,40 @@ class MeetingTests(BaseMeetingTestCase):
             ]
         )
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_ical_conditional_get(self):
+        meeting = make_meeting_test_data()
+        url = urlreverse('ietf.meeting.views.agenda_ical', kwargs={'num':meeting.number})
+        r = self.client.get(url + '?show=plenary,ames&hide=admin')
+        self.assertEqual(r.status_code, 200)
+        etag = r['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', r)
+
+        # Equivalent filters share the cached calendar and its ETag
+        r = self.client.get(url + '?hide=ADMIN&show=ames,plenary,ames')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['ETag'], etag)
+        r = self.client.get(url + '?show=ames,plenary', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
+        # A cached calendar is served without loading the agenda snapshot
+        with patch('ietf.meeting.views.get_agenda_snapshot') as get_agenda_snapshot_mock:
+            r = self.client.get(url + '?show=ames,plenary&hide=admin', HTTP_IF_NONE_MATCH=etag)
+        self.assertFalse(get_agenda_snapshot_mock.called)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r['ETag'], etag)
+        self.assertEqual(r.content, b'')
+
+        # A change to the agenda gives a new calendar
+        session = meeting.session_set.get(group__acronym='ames')
+        SchedulingEvent.objects.create(session=session, status_id='canceled', by=Person.objects.get(name='(System)'))
+        r = self.client.get(url + '?show=ames,plenary&hide=admin', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+        self.assertContains(r, 'STATUS:CANCELLED')
+
     def build_session_setup(self):
         # This setup is intentionally unusual - the session has one draft attached as a session presentation,
         # but lists a different on in its agenda. The expectation is that the pdf and tgz views will return both.
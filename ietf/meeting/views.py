@@ -5,6 +5,7 @@
 import csv
 import datetime
 import glob
+import hashlib
 import io
 import itertools
 import json
@@ -14,6 +15,7 @@ import pytz
 import re
 import tarfile
 import tempfile
+import time
 
 from calendar import timegm
 from collections import OrderedDict, Counter, deque, defaultdict, namedtuple
@@ -29,6 +31,7 @@ from django.http import (HttpResponse, HttpResponseRedirect, HttpResponseForbidd
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
 from django.urls import reverse,reverse_lazy
@@ -36,8 +39,10 @@ from django.db.models import F, Max, Q
 from django.forms.models import modelform_factory, inlineformset_factory
 from django.template import TemplateDoesNotExist
 from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
 from django.utils.encoding import force_str
 from django.utils.functional import curry
+from django.utils.http import http_date
 from django.utils.text import slugify
 from django.utils.timezone import now
 from django.views.decorators.cache import cache_page
@@ -62,6 +67,7 @@ from ietf.meeting.helpers import get_meeting, get_ietf_meeting, get_current_ietf
 from ietf.meeting.helpers import get_schedule, schedule_permissions
 from ietf.meeting.helpers import preprocess_assignments_for_agenda, read_agenda_file
 from ietf.meeting.helpers import AgendaFilterOrganizer, AgendaKeywordTagger
+from ietf.meeting.helpers import get_agenda_snapshot, get_assignments_for_agenda, agenda_snapshot_cache_key, AGENDA_SNAPSHOT_TIMEOUT
 from ietf.meeting.helpers import convert_draft_to_pdf, get_earliest_session_date
 from ietf.meeting.helpers import can_view_interim_request, can_approve_interim_request
 from ietf.meeting.helpers import can_edit_interim_request
@@ -1493,14 +1499,6 @@ def session_materials(request, session_id):
     return render(request, 'meeting/session_materials.html', dict(item=assignment))
 
 
-def get_assignments_for_agenda(schedule):
-    """Get queryset containing assignments to show on the agenda"""
-    return SchedTimeSessAssignment.objects.filter(
-        schedule__in=[schedule, schedule.base],
-        session__on_agenda=True,
-    )
-
-
 @ensure_csrf_cookie
 def agenda(request, num=None, name=None, base=None, ext=None, owner=None, utc=""):
     base = base if base else 'agenda'
@@ -1536,30 +1534,23 @@ def agenda(request, num=None, name=None, base=None, ext=None, owner=None, utc=""
         base = base.replace("-utc", "")
         return render(request, "meeting/no-"+base+ext, {'meeting':meeting }, content_type=mimetype[ext])
 
-    updated = meeting.updated()
-
-    # Select and prepare sessions that should be included
-    filtered_assignments = preprocess_assignments_for_agenda(
-        get_assignments_for_agenda(schedule),
-        meeting
-    )
-    AgendaKeywordTagger(assignments=filtered_assignments).apply()
+    # Preprocessed and tagged sessions that should be included
+    snapshot = get_agenda_snapshot(meeting, schedule)
+    filtered_assignments = snapshot.assignments
 
     # Done processing for CSV output
     if ext == ".csv":
         return agenda_csv(schedule, filtered_assignments)
 
-    filter_organizer = AgendaFilterOrganizer(assignments=filtered_assignments)
-
     is_current_meeting = (num is None) or (num == get_current_ietf_meeting_num())
 
     rendered_page = render(request, "meeting/"+base+ext, {
         "personalize": False,
         "schedule": schedule,
         "filtered_assignments": filtered_assignments,
-        "updated": updated,
-        "filter_categories": filter_organizer.get_filter_categories(),
-        "non_area_keywords": filter_organizer.get_non_area_keywords(),
+        "updated": snapshot.updated,
+        "filter_categories": snapshot.filter_categories,
+        "non_area_keywords": snapshot.non_area_keywords,
         "now": datetime.datetime.now().astimezone(pytz.UTC),
         "timezone": meeting.time_zone,
         "is_current_meeting": is_current_meeting,
@@ -1710,17 +1701,8 @@ def agenda_personalize(request, num):
     if meeting is None or meeting.schedule is None:
         raise Http404('No such meeting')
 
-    # Select and prepare sessions that should be included
-    filtered_assignments = preprocess_assignments_for_agenda(
-        get_assignments_for_agenda(meeting.schedule),
-        meeting
-    )
-    tagger = AgendaKeywordTagger(assignments=filtered_assignments)
-    tagger.apply()  # annotate assignments with filter_keywords attribute
-    tagger.apply_session_keywords()  # annotate assignments with session_keyword attribute
-
-    # Now prep the filter UI
-    filter_organizer = AgendaFilterOrganizer(assignments=filtered_assignments)
+    # Preprocessed sessions, tagged with filter and session keywords, and the filter UI
+    snapshot = get_agenda_snapshot(meeting, meeting.schedule)
 
     is_current_meeting = (num is None) or (num == get_current_ietf_meeting_num())
 
@@ -1730,10 +1712,10 @@ def agenda_personalize(request, num):
         {
             'personalize': True,
             'schedule': meeting.schedule,
-            'updated': meeting.updated(),
-            'filtered_assignments': filtered_assignments,
-            'filter_categories': filter_organizer.get_filter_categories(),
-            'non_area_labels': filter_organizer.get_non_area_keywords(),
+            'updated': snapshot.updated,
+            'filtered_assignments': snapshot.assignments,
+            'filter_categories': snapshot.filter_categories,
+            'non_area_labels': snapshot.non_area_keywords,
             'timezone': meeting.time_zone,
             'is_current_meeting': is_current_meeting,
             'cache_time': 150 if is_current_meeting else 3600,
@@ -1939,6 +1921,23 @@ def parse_agenda_filter_params(querydict):
     return filt_params
 
 
+def agenda_filter_cache_key(filter_params, acronym=None, session_id=None):
+    """Get a canonical cache key component for an agenda filter
+
+    Filters which select the same assignments get the same key, regardless of
+    the order, case or repetition of the values in the query string.
+    """
+    if filter_params is None:
+        canonical = 'all'
+    else:
+        canonical = '&'.join(
+            '%s=%s' % (key, ','.join(sorted(filter_params[key])))
+            for key in ('show', 'hide', 'showtypes', 'hidetypes')
+        )
+    canonical += '|%s|%s' % (acronym or '', session_id or '')
+    return hashlib.md5(canonical.encode('utf-8')).hexdigest()
+
+
 def should_include_assignment(filter_params, assignment):
     """Decide whether to include an assignment
 
@@ -1966,66 +1965,100 @@ def agenda_ical(request, num=None, name=None, acronym=None, session_id=None):
     The showtypes and hidetypes parameters take a list of session types. 
 
     Hiding (by wg or type) takes priority over showing.
+
+    The calendar is cached per agenda snapshot and canonical filter, and is
+    served with ETag and Last-Modified headers, so that polling calendar
+    clients get a 304 response when nothing has changed.
     """
     meeting = get_meeting(num, type_in=None)
     schedule = get_schedule(meeting, name)
-    updated = meeting.updated()
 
     if schedule is None and acronym is None and session_id is None:
         raise Http404
 
-    assignments = SchedTimeSessAssignment.objects.filter(
-        schedule__in=[schedule, schedule.base],
-        session__on_agenda=True,
-    )
-    assignments = preprocess_assignments_for_agenda(assignments, meeting)
-    AgendaKeywordTagger(assignments=assignments).apply()
-
     try:
         filt_params = parse_agenda_filter_params(request.GET)
     except ValueError as e:
         return HttpResponseBadRequest(str(e))
 
-    if filt_params is not None:
-        # Apply the filter
-        assignments = [a for a in assignments if should_include_assignment(filt_params, a)]
-
-    if acronym:
-        assignments = [ a for a in assignments if a.session.historic_group and a.session.historic_group.acronym == acronym ]
-    elif session_id:
-        assignments = [ a for a in assignments if a.session_id == int(session_id) ]
-
-    for a in assignments:
-        if a.session:
-            a.session.ical_status = ical_session_status(a)
-
-    return render(request, "meeting/agenda.ics", {
-        "schedule": schedule,
-        "assignments": assignments,
-        "updated": updated
-    }, content_type="text/calendar")
+    cache_key = '%s:ical:%s' % (agenda_snapshot_cache_key(meeting, schedule), agenda_filter_cache_key(filt_params, acronym, session_id))
+    cached = cache.get(cache_key)
+    if cached is None:
+        snapshot = get_agenda_snapshot(meeting, schedule)
+        assignments = snapshot.assignments
+        if filt_params is not None:
+            # Apply the filter
+            assignments = [a for a in assignments if should_include_assignment(filt_params, a)]
+
+        if acronym:
+            assignments = [ a for a in assignments if a.session.historic_group and a.session.historic_group.acronym == acronym ]
+        elif session_id:
+            assignments = [ a for a in assignments if a.session_id == int(session_id) ]
+
+        for a in assignments:
+            if a.session:
+                a.session.ical_status = ical_session_status(a)
+
+        ical = render_to_string("meeting/agenda.ics", {
+            "schedule": schedule,
+            "assignments": assignments,
+            "updated": snapshot.updated,
+        }, request=request)
+        etag = '"%s"' % hashlib.sha1(ical.encode('utf-8')).hexdigest()
+        # meeting.updated() doesn't see all changes to the agenda, such as
+        # new scheduling events, so use the time the calendar was rendered
+        last_modified = max(timegm(snapshot.updated.utctimetuple()), int(time.time()))
+        cached = (ical, etag, last_modified)
+        cache.set(cache_key, cached, AGENDA_SNAPSHOT_TIMEOUT)
+    ical, etag, last_modified = cached
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(ical, content_type="text/calendar")
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
 
-@cache_page(15 * 60)
 def agenda_json(request, num=None):
     meeting = get_meeting(num, type_in=['ietf','interim'])
 
+    if meeting.schedule is None:
+        body, last_modified = agenda_json_body(num, [])
+    else:
+        # The JSON is cached for as long as the agenda snapshot of the schedule
+        cache_key = '%s:json:%s' % (agenda_snapshot_cache_key(meeting, meeting.schedule), num)
+        cached = cache.get(cache_key)
+        if cached is None:
+            assignments = get_assignments_for_agenda(meeting.schedule).exclude(session__type__in=['break', 'reg'])
+            # Update the assignments with historic information, i.e., valid at the
+            # time of the meeting
+            assignments = preprocess_assignments_for_agenda(assignments, meeting, extra_prefetches=[
+                "session__materials__docevent_set",
+                "session__sessionpresentation_set",
+                "timeslot__meeting"
+            ])
+            cached = agenda_json_body(num, assignments)
+            cache.set(cache_key, cached, AGENDA_SNAPSHOT_TIMEOUT)
+        body, last_modified = cached
+
+    response = HttpResponse(body, content_type='application/json;charset=%s'%settings.DEFAULT_CHARSET)
+    if last_modified:
+        tz = pytz.timezone(settings.PRODUCTION_TIMEZONE)
+        last_modified = tz.localize(last_modified).astimezone(pytz.utc)
+        response['Last-Modified'] = format_date_time(timegm(last_modified.timetuple()))
+    return response
+
+def agenda_json_body(num, assignments):
+    """Make the agenda JSON from preprocessed agenda assignments
+
+    Returns a tuple of the JSON text and the last modification time.
+    """
     sessions = []
     locations = set()
     parent_acronyms = set()
-    assignments = SchedTimeSessAssignment.objects.filter(
-        schedule__in=[meeting.schedule, meeting.schedule.base if meeting.schedule else None],
-        session__on_agenda=True,
-    ).exclude(
-        session__type__in=['break', 'reg']
-    )
-    # Update the assignments with historic information, i.e., valid at the
-    # time of the meeting
-    assignments = preprocess_assignments_for_agenda(assignments, meeting, extra_prefetches=[
-        "session__materials__docevent_set",
-        "session__sessionpresentation_set",
-        "timeslot__meeting"
-    ])
     for asgn in assignments:
+        if asgn.session.type_id in ['break', 'reg']:
+            continue
         sessdict = dict()
         sessdict['objtype'] = 'session'
         sessdict['id'] = asgn.pk
@@ -2129,11 +2162,7 @@ def agenda_json(request, num=None):
 
     data = {"%s"%num: meetinfo}
 
-    response = HttpResponse(json.dumps(data, indent=2, sort_keys=True), content_type='application/json;charset=%s'%settings.DEFAULT_CHARSET)
-    if last_modified:
-        last_modified = tz.localize(last_modified).astimezone(pytz.utc)
-        response['Last-Modified'] = format_date_time(timegm(last_modified.timetuple()))
-    return response
+    return json.dumps(data, indent=2, sort_keys=True), last_modified
 
 def meeting_requests(request, num=None):
     meeting = get_meeting(num)
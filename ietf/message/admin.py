@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from ietf.message.models import Message, MessageAttachment, SendQueue, AnnouncementFrom
+from ietf.message.models import Message, MessageAttachment, SendQueue, AnnouncementFrom, QueuedMail
 
 class MessageAdmin(admin.ModelAdmin):
     list_display = ["subject", "by", "time", "groups"]
@@ -25,6 +25,14 @@ class SendQueueAdmin(admin.ModelAdmin):
     ordering = ["-time"]
 admin.site.register(SendQueue, SendQueueAdmin)
 
+class QueuedMailAdmin(admin.ModelAdmin):
+    list_display = ["time", "subject", "state", "attempts", "next_attempt", "sent"]
+    list_filter = ["state", "time"]
+    search_fields = ["subject"]
+    raw_id_fields = ["message"]
+    ordering = ["-time"]
+admin.site.register(QueuedMail, QueuedMailAdmin)
+
 class AnnouncementFromAdmin(admin.ModelAdmin):
     list_display = ['name', 'group', 'address', ]
 admin.site.register(AnnouncementFrom, AnnouncementFromAdmin)
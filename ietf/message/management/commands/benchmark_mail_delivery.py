@@ -0,0 +1,74 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures how many messages per second reach an SMTP sink when each message
+# is sent over a new connection, as sending from the request used to do, and
+# when they are sent over pooled connections by several threads, as the
+# deliver_mail worker does.  The sink is the SMTP test server the test
+# runner uses, started on a local port, so no email leaves the machine.
+
+import socket
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+from django.core.management.base import BaseCommand, CommandError
+
+import debug                            # pyflakes:ignore
+
+import ietf.utils.mail
+from ietf.utils.mail import SMTPConnectionPool, send_smtp
+from ietf.utils.test_smtpserver import SMTPTestServerDriver
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def make_message(i, recipients):
+    msg = MIMEText('Benchmark message %d.\n' % i)
+    msg['From'] = 'Datatracker <noreply@example.com>'
+    msg['To'] = ', '.join('user%d@example.com' % r for r in range(recipients))
+    msg['Subject'] = 'Benchmark message %d' % i
+    return msg
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sending email to a local SMTP sink, with a connection per message and with pooled connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--messages', type=int, default=200, help='number of messages to send (default 200)')
+        parser.add_argument('-r', '--recipients', type=int, default=5, help='recipients per message (default 5)')
+        parser.add_argument('-c', '--connections', type=int, default=4, help='pooled connections and sending threads (default 4)')
+
+    def handle(self, messages, recipients, connections, *args, **options):
+        if messages < 1 or recipients < 1:
+            raise CommandError('Need at least one message and one recipient')
+        saved_addr, saved_test_mode = dict(ietf.utils.mail.SMTP_ADDR), ietf.utils.mail.test_mode
+        sink = SMTPTestServerDriver(('127.0.0.1', free_port()), None)
+        sink.start()
+        ietf.utils.mail.SMTP_ADDR.update(ip4=sink.localaddr[0], port=sink.localaddr[1])
+        ietf.utils.mail.test_mode = False
+        try:
+            self.run('connection per message', messages, lambda msgs: [ send_smtp(m) for m in msgs ], recipients, sink)
+            def pooled(msgs):
+                with SMTPConnectionPool(connections) as pool, ThreadPoolExecutor(connections) as executor:
+                    list(executor.map(lambda m: send_smtp(m, pool=pool), msgs))
+                    self.connects = pool.connects
+            self.run('pooled (%d connections)' % connections, messages, pooled, recipients, sink)
+        finally:
+            ietf.utils.mail.SMTP_ADDR.update(saved_addr)
+            ietf.utils.mail.test_mode = saved_test_mode
+            sink.stop()
+
+    def run(self, label, count, send, recipients, sink):
+        msgs = [ make_message(i, recipients) for i in range(count) ]
+        received = len(sink.inbox)
+        self.connects = count
+        start = time.time()
+        send(msgs)
+        elapsed = time.time() - start
+        self.stdout.write('%-26s %6d messages in %7.2f s, %8.1f messages/s, %4d connections, %d received' % (
+            label + ':', count, elapsed, count / elapsed if elapsed else 0, self.connects, len(sink.inbox) - received))
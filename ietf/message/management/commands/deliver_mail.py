@@ -0,0 +1,57 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+import datetime
+import os
+import socket
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+import debug                            # pyflakes:ignore
+
+from ietf.message.utils import claim_queued_mail, record_mail_delivery, requeue_stalled_mail, send_queued_mail
+from ietf.utils.mail import SMTPConnectionPool
+
+
+class Command(BaseCommand):
+    help = ('Send the email waiting in the outbound mail queue, over SMTP connections which are kept open '
+            'and shared by the sending threads.  Email which can\'t be sent because of a temporary error is '
+            'tried again later.  By default, keep polling the queue; with --once, stop when nothing is due.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', default=False, help="Exit when no email is due to be sent")
+        parser.add_argument('-c', '--connections', type=int, default=4, help="Number of SMTP connections to send over at a time (default 4)")
+        parser.add_argument('--batch', type=int, default=50, help="Number of emails to take from the queue at a time (default 50)")
+        parser.add_argument('--interval', type=float, default=2, help="Seconds to wait before looking at the queue again when nothing is due (default 2)")
+        parser.add_argument('--requeue-after', type=int, default=30, help="Put email which has been sending for more than this many minutes back in the queue (default 30)")
+
+    def handle(self, *args, **options):
+        self.verbosity = options.get("verbosity", 1)
+        requeued = requeue_stalled_mail(datetime.timedelta(minutes=options['requeue_after']))
+        if requeued and self.verbosity > 0:
+            self.stdout.write('Put %d stalled emails back in the queue' % requeued)
+
+        connections = max(1, options['connections'])
+        worker = '%s:%s' % (socket.gethostname(), os.getpid())
+        # the sending threads only talk SMTP, the database is updated from
+        # this thread
+        with SMTPConnectionPool(connections) as pool, ThreadPoolExecutor(connections, thread_name_prefix='deliver_mail') as executor:
+            while True:
+                batch = claim_queued_mail(worker, max(1, options['batch']))
+                if not batch:
+                    if options['once']:
+                        break
+                    # don't keep idle connections open while waiting
+                    pool.close()
+                    time.sleep(options['interval'])
+                    continue
+                errors = executor.map(lambda queued: send_queued_mail(queued, pool), batch)
+                for queued, error in zip(batch, errors):
+                    queued = record_mail_delivery(queued, error)
+                    if self.verbosity > 1 or (queued.state != 'sent' and self.verbosity > 0):
+                        self.stdout.write('%s: %s %s%s' % (queued.pk, queued.state, queued.subject,
+                                                           ' (%s)' % queued.error if queued.error else ''))
@@ -0,0 +1,40 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+
+# Generated by Django 2.2.28 on 2022-06-27 10:12
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message', '0011_auto_20201109_0439'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedMail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField(default=datetime.datetime.now)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('bcc', models.CharField(blank=True, max_length=255)),
+                ('raw', models.TextField(help_text='The email, as it is sent')),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=8)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=datetime.datetime.now)),
+                ('worker', models.CharField(blank=True, max_length=255)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('sent', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('message', ietf.utils.models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='message.Message')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='queuedmail',
+            index=models.Index(fields=['state', 'next_attempt'], name='message_que_state_40fa92_idx'),
+        ),
+    ]
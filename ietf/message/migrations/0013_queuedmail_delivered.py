@@ -0,0 +1,20 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+
+# Generated by Django 2.2.28 on 2022-06-29 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message', '0012_queuedmail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedmail',
+            name='delivered',
+            field=models.TextField(blank=True, help_text='The recipients which earlier attempts have sent the email to, one per line'),
+        ),
+    ]
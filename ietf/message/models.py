@@ -82,6 +82,38 @@ class SendQueue(models.Model):
         return "'%s' %s -> %s (sent at %s)" % (self.message.subject, self.message.frm, self.message.to, self.sent_at or "<not yet>")
 
 
+QUEUED_MAIL_STATES = (
+    ('queued', 'Queued'),
+    ('sending', 'Sending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
+
+class QueuedMail(models.Model):
+    """An email waiting for, or being sent by, the deliver_mail worker"""
+    time = models.DateTimeField(default=datetime.datetime.now)
+    message = ForeignKey(Message, null=True, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    bcc = models.CharField(max_length=255, blank=True)
+    raw = models.TextField(help_text="The email, as it is sent")
+    state = models.CharField(max_length=8, choices=QUEUED_MAIL_STATES, default='queued')
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=datetime.datetime.now)
+    worker = models.CharField(max_length=255, blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    delivered = models.TextField(blank=True, help_text="The recipients which earlier attempts have sent the email to, one per line")
+
+    def __str__(self):
+        return "'%s' %s" % (self.subject, self.state)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'next_attempt']),
+        ]
+
+
 class AnnouncementFrom(models.Model):
     name = ForeignKey(RoleName)
     group = ForeignKey(Group)
@@ -11,7 +11,7 @@ from tastypie.cache import SimpleCache
 
 from ietf import api
 
-from ietf.message.models import Message, SendQueue, MessageAttachment, AnnouncementFrom
+from ietf.message.models import Message, SendQueue, MessageAttachment, AnnouncementFrom, QueuedMail
 from ietf.person.resources import PersonResource
 from ietf.group.resources import GroupResource
 from ietf.doc.resources import DocumentResource
@@ -103,3 +103,31 @@ class AnnouncementFromResource(ModelResource):
             "group": ALL_WITH_RELATIONS,
         }
 api.message.register(AnnouncementFromResource())
+
+
+
+class QueuedMailResource(ModelResource):
+    message          = ToOneField(MessageResource, 'message', null=True)
+    class Meta:
+        queryset = QueuedMail.objects.none()
+        serializer = api.Serializer()
+        cache = SimpleCache()
+        #resource_name = 'queuedmail'
+        ordering = ['id', ]
+        filtering = { 
+            "id": ALL,
+            "time": ALL,
+            "subject": ALL,
+            "bcc": ALL,
+            "raw": ALL,
+            "state": ALL,
+            "attempts": ALL,
+            "next_attempt": ALL,
+            "worker": ALL,
+            "started": ALL,
+            "sent": ALL,
+            "error": ALL,
+            "delivered": ALL,
+            "message": ALL_WITH_RELATIONS,
+        }
+api.message.register(QueuedMailResource())
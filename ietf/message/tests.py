@@ -3,16 +3,23 @@
 
 
 import datetime
+import io
+import mock
+import smtplib
+import socket
 
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse as urlreverse
 
 import debug                            # pyflakes:ignore
 
 from ietf.group.factories import GroupFactory
-from ietf.message.models import Message, SendQueue
-from ietf.message.utils import send_scheduled_message_from_send_queue
+import ietf.utils.mail
+from ietf.message.models import Message, SendQueue, QueuedMail
+from ietf.message.utils import send_scheduled_message_from_send_queue, record_mail_delivery
 from ietf.person.models import Person
-from ietf.utils.mail import outbox, send_mail_text, send_mail_message, get_payload_text
+from ietf.utils.mail import outbox, send_mail_text, send_mail_message, get_payload_text, SMTPConnectionPool
 from ietf.utils.test_utils import TestCase
 
 class MessageTests(TestCase):
@@ -124,3 +131,102 @@ class SendScheduledAnnouncementsTests(TestCase):
         self.assertTrue("This is a test" in outbox[-1]["Subject"])
         self.assertTrue("--NextPart" in outbox[-1].as_string())
         self.assertTrue(SendQueue.objects.get(id=q.id).sent_at)
+
+
+@override_settings(EMAIL_QUEUE_OUTBOUND=True)
+class QueuedMailTests(TestCase):
+    def closed_port(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def deliver(self):
+        call_command('deliver_mail', '--once', stdout=io.StringIO())
+
+    def test_deliver_queued_mail(self):
+        mailbox_before = len(outbox)
+        send_mail_text(None, "to@example.com", None, "Queued subject", "Queued text", cc="cc@example.com", bcc="bcc@example.com")
+        self.assertEqual(len(outbox), mailbox_before)
+        queued = QueuedMail.objects.get()
+        message = Message.objects.get()
+        self.assertEqual(queued.message, message)
+        self.assertEqual(queued.state, 'queued')
+        self.assertIsNone(message.sent)
+
+        self.deliver()
+        self.assertEqual(len(outbox), mailbox_before + 1)
+        self.assertEqual(outbox[-1]['Subject'], 'Queued subject')
+        self.assertIn('Queued text', get_payload_text(outbox[-1]))
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.state, 'sent')
+        self.assertEqual(queued.attempts, 1)
+        self.assertIsNotNone(Message.objects.get().sent)
+
+    def test_retry_queued_mail(self):
+        send_mail_text(None, "to@example.com", None, "Queued subject", "Queued text")
+        with mock.patch.dict(ietf.utils.mail.SMTP_ADDR, port=self.closed_port()):
+            self.deliver()
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.state, 'queued')
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.next_attempt, datetime.datetime.now())
+        self.assertTrue(queued.error)
+
+        # not due yet
+        self.deliver()
+        self.assertEqual(QueuedMail.objects.get().attempts, 1)
+
+        QueuedMail.objects.update(next_attempt=datetime.datetime.now())
+        self.deliver()
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.state, 'sent')
+        self.assertEqual(queued.attempts, 2)
+
+    @override_settings(EMAIL_QUEUE_MAX_ATTEMPTS=1)
+    def test_give_up_queued_mail(self):
+        send_mail_text(None, "to@example.com", None, "Queued subject", "Queued text")
+        with mock.patch.dict(ietf.utils.mail.SMTP_ADDR, port=self.closed_port()):
+            self.deliver()
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.state, 'failed')
+        self.assertIsNone(Message.objects.get().sent)
+
+    def test_resend_to_remaining_recipients(self):
+        class Server(object):
+            def __init__(self, batches_taken=None):
+                self.batches, self.batches_taken = [], batches_taken
+            def sendmail(self, frm, to, data):
+                if self.batches_taken is not None and len(self.batches) >= self.batches_taken:
+                    raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+                self.batches.append(to)
+                return {}
+
+        to = [ 'to%d@example.com' % i for i in range(5) ]
+
+        # a pooled connection which the server closes after taking a batch
+        # sends the other batches over a new connection
+        stale, fresh = Server(batches_taken=1), Server()
+        pool = SMTPConnectionPool(max_recipients=2)
+        pool._checkin(stale, 1)
+        with mock.patch('ietf.utils.mail.smtp_connect', return_value=fresh), mock.patch('ietf.utils.mail.smtp_quit'):
+            self.assertEqual(pool.sendmail('from@example.com', to, b'data'), {})
+        self.assertEqual(stale.batches, [to[0:2]])
+        self.assertEqual(fresh.batches, [to[2:4], to[4:5]])
+
+        # a failed attempt tells which recipients it has sent to
+        pool = SMTPConnectionPool(max_recipients=2)
+        with mock.patch('ietf.utils.mail.smtp_connect', return_value=Server(batches_taken=2)), mock.patch('ietf.utils.mail.smtp_quit'):
+            with self.assertRaises(smtplib.SMTPServerDisconnected) as cm:
+                pool.sendmail('from@example.com', to, b'data')
+        self.assertEqual(cm.exception.delivered, to[0:4])
+
+        # and the next attempt leaves them out
+        send_mail_text(None, ', '.join(to), None, "Queued subject", "Queued text")
+        queued = record_mail_delivery(QueuedMail.objects.get(), cm.exception)
+        self.assertEqual(queued.state, 'queued')
+        self.assertEqual(queued.delivered.split(), to[0:4])
+        QueuedMail.objects.update(next_attempt=datetime.datetime.now())
+        with mock.patch.object(SMTPConnectionPool, 'sendmail', autospec=True, return_value={}) as sendmail:
+            self.deliver()
+        self.assertEqual(sendmail.call_args[0][2], to[4:5])
+        self.assertEqual(QueuedMail.objects.get().state, 'sent')
@@ -2,12 +2,15 @@
 # -*- coding: utf-8 -*-
 
 
-import re, datetime, email
+import re, datetime, email, smtplib
 
-from django.utils.encoding import force_str
+from django.conf import settings
+from django.utils.encoding import force_str, force_text
 
-from ietf.utils.mail import send_mail_text, send_mail_mime
-from ietf.message.models import Message
+from ietf.utils.log import log
+from ietf.utils.mail import ( send_mail_text, send_mail_mime, send_smtp, log_smtp_exception, send_error_email,
+    smtp_error_is_temporary, SMTPSomeRefusedRecipients )
+from ietf.message.models import Message, QueuedMail
 
 first_dot_on_line_re = re.compile(r'^\.', re.MULTILINE)
 
@@ -57,3 +60,72 @@ def send_scheduled_message_from_send_queue(queue_item):
 
     queue_item.message.sent = queue_item.sent_at
     queue_item.message.save()
+
+def queue_mail(msg, bcc=None, message=None):
+    """Put an email in the outbound queue, as it is to be sent"""
+    return QueuedMail.objects.create(
+        message=message,
+        subject=force_text(msg.get('Subject', ''))[:255],
+        bcc=bcc or '',
+        raw=force_text(msg.as_string()),
+    )
+
+def claim_queued_mail(worker, limit):
+    """Claim up to limit emails which are due to be sent, oldest first"""
+    now = datetime.datetime.now()
+    pks = list(QueuedMail.objects.filter(state='queued', next_attempt__lte=now)
+               .order_by('next_attempt', 'pk').values_list('pk', flat=True)[:limit])
+    if not pks:
+        return []
+    # other workers may have claimed some of them in the meantime
+    QueuedMail.objects.filter(pk__in=pks, state='queued').update(state='sending', worker=worker, started=now)
+    return list(QueuedMail.objects.filter(pk__in=pks, state='sending', worker=worker, started=now).order_by('next_attempt', 'pk'))
+
+def requeue_stalled_mail(timeout):
+    """Put emails which have been sending for longer than timeout, presumably
+    because their worker died, back in the queue"""
+    return QueuedMail.objects.filter(state='sending', started__lt=datetime.datetime.now() - timeout).update(
+        state='queued', worker='', started=None)
+
+def send_queued_mail(queued, pool):
+    """Send a queued email over a connection from pool.  Returns None, or the
+    SMTPException if sending failed.  Doesn't use the database, so that it
+    can be called from several threads."""
+    msg = email.message_from_string(queued.raw)
+    try:
+        send_smtp(msg, queued.bcc or None, pool=pool, delivered=queued.delivered.split())
+    except smtplib.SMTPException as e:
+        return e
+    return None
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt, doubled for each attempt"""
+    return settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+
+def record_mail_delivery(queued, error):
+    """Record the outcome of an attempt to send a queued email, scheduling
+    another attempt if the error may go away"""
+    now = datetime.datetime.now()
+    queued.attempts += 1
+    delivered = [ addr for addr in getattr(error, 'delivered', []) if addr not in queued.delivered.split() ]
+    if delivered:
+        # don't send the email to these again
+        queued.delivered += ''.join( '%s\n' % addr for addr in delivered )
+    if error is None or isinstance(error, SMTPSomeRefusedRecipients):
+        queued.state = 'sent'
+        queued.sent = now
+        if queued.message_id:
+            Message.objects.filter(pk=queued.message_id).update(sent=now)
+    elif smtp_error_is_temporary(error) and queued.attempts < settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        queued.state = 'queued'
+        queued.next_attempt = now + datetime.timedelta(seconds=retry_delay(queued.attempts))
+        log("Sending QueuedMail[%s] failed, trying again at %s: %s" % (queued.pk, queued.next_attempt, error))
+    else:
+        queued.state = 'failed'
+    if error is not None:
+        queued.error = str(error)
+        if queued.state != 'queued':
+            log_smtp_exception(error)
+            send_error_email(error)
+    queued.save()
+    return queued
@@ -0,0 +1,215 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Decryption of the S/MIME encrypted NomCom feedback.
+
+Feedback comments are encrypted with ``openssl smime -encrypt`` to the
+NomCom's public key, and decrypted with the private key a NomCom member has
+entered for their session.  Starting an openssl process for each comment
+shown makes the feedback pages slow, so comments are decrypted in process
+with the cryptography package, falling back to openssl for anything it
+can't handle.  The comments of a page are decrypted in a batch by the view,
+and the plaintexts are kept on the request object for the template tags to
+pick up; they are never stored anywhere else.
+"""
+
+import email
+import os
+import tempfile
+
+from cryptography.hazmat.primitives import padding, serialization
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+try:
+    from cryptography.hazmat.decrepit.ciphers.algorithms import TripleDES
+except ImportError:
+    from cryptography.hazmat.primitives.ciphers.algorithms import TripleDES
+
+from django.conf import settings
+from django.utils.encoding import force_bytes, force_text, DjangoUnicodeDecodeError
+
+import debug                            # pyflakes:ignore
+
+from ietf.nomcom.utils import retrieve_nomcom_private_key
+from ietf.utils.log import log
+from ietf.utils.pipe import pipe
+
+
+class DecryptionError(Exception):
+    pass
+
+
+# DER encoded object identifiers of the content encryption algorithms
+# openssl smime uses, and the matching ciphers
+CONTENT_CIPHERS = {
+    b'\x2a\x86\x48\x86\xf7\x0d\x03\x07': TripleDES,                # des-ede3-cbc
+    b'\x60\x86\x48\x01\x65\x03\x04\x01\x02': algorithms.AES,        # aes-128-cbc
+    b'\x60\x86\x48\x01\x65\x03\x04\x01\x16': algorithms.AES,        # aes-192-cbc
+    b'\x60\x86\x48\x01\x65\x03\x04\x01\x2a': algorithms.AES,        # aes-256-cbc
+}
+
+ENVELOPED_DATA = b'\x2a\x86\x48\x86\xf7\x0d\x01\x07\x03'
+
+
+def _der_items(data, start=0, end=None):
+    """Yields (tag, content) for the DER encoded items in data[start:end]"""
+    pos = start
+    end = len(data) if end is None else end
+    while pos < end:
+        tag = data[pos]
+        length = data[pos + 1]
+        pos += 2
+        if length == 0x80:
+            raise DecryptionError('Indefinite length encoding is not supported')
+        if length & 0x80:
+            size = length & 0x7f
+            length = int.from_bytes(data[pos:pos + size], 'big')
+            pos += size
+        if pos + length > end:
+            raise DecryptionError('Truncated DER item')
+        yield tag, data[pos:pos + length]
+        pos += length
+
+def _der_children(content):
+    return list(_der_items(content))
+
+def parse_enveloped_data(der):
+    """
+    Get the encrypted keys of the recipients, the content encryption
+    algorithm and its IV, and the encrypted content from a CMS
+    EnvelopedData structure.
+    """
+    try:
+        (__, content_info), = _der_items(der)
+        content_type, explicit = _der_children(content_info)[:2]
+        if content_type[1] != ENVELOPED_DATA or explicit[0] != 0xa0:
+            raise DecryptionError('Not enveloped data')
+        (__, enveloped), = _der_children(explicit[1])
+        items = _der_children(enveloped)
+        # skip the version and the optional originatorInfo
+        items = [ i for i in items[1:] if i[0] != 0xa0 ]
+        recipient_infos, encrypted_content_info = items[0][1], items[1][1]
+        keys = []
+        for tag, recipient in _der_children(recipient_infos):
+            fields = _der_children(recipient)
+            # only key transport recipients (a SEQUENCE tag) have the key
+            # encrypted with the recipient's RSA key
+            if tag == 0x30 and fields[-1][0] == 0x04:
+                keys.append(fields[-1][1])
+        fields = _der_children(encrypted_content_info)
+        algorithm = _der_children(fields[1][1])
+        oid, iv = algorithm[0][1], algorithm[1][1]
+        tag, encrypted = fields[2]
+        if tag == 0xa0:
+            # constructed, the content is split in octet strings
+            encrypted = b''.join(c for __, c in _der_items(encrypted))
+    except (IndexError, ValueError):
+        raise DecryptionError('Malformed enveloped data')
+    if oid not in CONTENT_CIPHERS:
+        raise DecryptionError('Unsupported content encryption algorithm')
+    return keys, CONTENT_CIPHERS[oid], iv, encrypted
+
+def smime_decrypt(smime, private_key):
+    """Decrypt an S/MIME message, as written by openssl smime -encrypt, with
+    a private key loaded by the cryptography package"""
+    message = email.message_from_bytes(smime)
+    der = message.get_payload(decode=True)
+    if not der:
+        raise DecryptionError('No S/MIME payload')
+    keys, cipher_class, iv, encrypted = parse_enveloped_data(der)
+    for encrypted_key in keys:
+        try:
+            key = private_key.decrypt(encrypted_key, PKCS1v15())
+            break
+        except ValueError:
+            continue
+    else:
+        raise DecryptionError('The content was not encrypted to this key')
+    try:
+        decryptor = Cipher(cipher_class(key), modes.CBC(iv)).decryptor()
+        padded = decryptor.update(encrypted) + decryptor.finalize()
+        unpadder = padding.PKCS7(cipher_class.block_size).unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+    except ValueError:
+        raise DecryptionError('The content could not be decrypted')
+
+def openssl_decrypt(smime, key):
+    """Decrypt an S/MIME message with the openssl command and a PEM key"""
+    encrypted_file = tempfile.NamedTemporaryFile(delete=False)
+    encrypted_file.write(smime)
+    encrypted_file.close()
+
+    command = "%s smime -decrypt -in %s -inkey /dev/stdin"
+    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
+                            encrypted_file.name), key)
+    if code != 0:
+        log("openssl error: %s:\n  Error %s: %s" %(command, code, error))
+
+    os.unlink(encrypted_file.name)
+
+    if error:
+        raise DecryptionError(error)
+    return out
+
+
+class FeedbackDecryptor(object):
+    """Decrypts the feedback of one NomCom with the private key of the
+    current session, remembering the plaintexts"""
+
+    def __init__(self, key):
+        self.key = key
+        self.plaintexts = {}
+        try:
+            self.private_key = serialization.load_pem_private_key(force_bytes(key), password=None)
+        except (ValueError, TypeError):
+            # leave it to openssl to make sense of the key, or complain
+            self.private_key = None
+
+    def decrypt(self, comments):
+        """Get the plaintext of comments, or None if it can't be decrypted"""
+        comments = force_bytes(comments)
+        if comments not in self.plaintexts:
+            out = None
+            if self.private_key is not None:
+                try:
+                    out = smime_decrypt(comments, self.private_key)
+                except DecryptionError:
+                    pass
+            if out is None:
+                try:
+                    out = openssl_decrypt(comments, self.key)
+                except DecryptionError:
+                    pass
+            if out is not None:
+                try:
+                    out = force_text(out)
+                except DjangoUnicodeDecodeError:
+                    pass
+            self.plaintexts[comments] = out
+        return self.plaintexts[comments]
+
+    def decrypt_all(self, comments_list):
+        return [ self.decrypt(comments) for comments in comments_list ]
+
+
+def get_feedback_decryptor(request, year):
+    """
+    Get the feedback decryptor for the NomCom of year for this request, or
+    None if no private key has been entered in the session.  The decryptor,
+    and so the plaintexts, only live as long as the request.
+    """
+    decryptors = getattr(request, '_nomcom_feedback_decryptors', None)
+    if decryptors is None:
+        decryptors = request._nomcom_feedback_decryptors = {}
+    year = str(year)
+    if year not in decryptors:
+        key = retrieve_nomcom_private_key(request, year)
+        decryptors[year] = FeedbackDecryptor(key) if key else None
+    return decryptors[year]
+
+def decrypt_feedback(request, year, feedback_list):
+    """Decrypt the comments of a page's feedback in one go, ahead of
+    rendering them with the decrypt template tag"""
+    decryptor = get_feedback_decryptor(request, year)
+    if decryptor is not None:
+        decryptor.decrypt_all(f.comments for f in feedback_list)
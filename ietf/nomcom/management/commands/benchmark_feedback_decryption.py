@@ -0,0 +1,72 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures the time taken to decrypt a page of NomCom feedback comments with
+# one openssl process per comment, as the decrypt template tag used to, and
+# in one batch with the in-process decryptor.  The plaintexts are compared,
+# but never written out.
+
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import Http404
+
+import debug                            # pyflakes:ignore
+
+from ietf.nomcom.decrypt import FeedbackDecryptor, openssl_decrypt, DecryptionError
+from ietf.nomcom.models import Feedback
+from ietf.nomcom.utils import get_nomcom_by_year
+
+
+class Command(BaseCommand):
+    help = 'Benchmark decrypting pages of NomCom feedback with openssl processes and in process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', help='NomCom year')
+        parser.add_argument('private_key', help='file with the private key of the NomCom, in PEM format')
+        parser.add_argument('--page-size', type=int, default=20,
+                            help='number of comments per page (default 20)')
+        parser.add_argument('--pages', type=int, default=5,
+                            help='number of pages to decrypt (default 5)')
+
+    def handle(self, year, private_key, page_size, pages, *args, **options):
+        try:
+            nomcom = get_nomcom_by_year(year)
+        except Http404:
+            raise CommandError('There is no NomCom for %s' % year)
+        with io.open(private_key, 'rb') as file:
+            key = file.read()
+
+        comments = list(Feedback.objects.filter(nomcom=nomcom).order_by('-time')
+                        .values_list('comments', flat=True)[:page_size * pages])
+        if not comments:
+            raise CommandError('There is no feedback for %s' % nomcom.group.acronym)
+        page_list = [ comments[i:i+page_size] for i in range(0, len(comments), page_size) ]
+
+        openssl_times, batch_times = [], []
+        differences = 0
+        for page in page_list:
+            start = time.time()
+            expected = []
+            for c in page:
+                try:
+                    expected.append(openssl_decrypt(bytes(c), key))
+                except DecryptionError:
+                    expected.append(None)
+            openssl_times.append((time.time() - start) * 1000)
+
+            start = time.time()
+            # a new decryptor for each page, as for each request
+            plaintexts = FeedbackDecryptor(key).decrypt_all(page)
+            batch_times.append((time.time() - start) * 1000)
+
+            differences += sum(1 for a, b in zip(expected, plaintexts) if (a and a.decode('utf-8', 'replace')) != b)
+
+        self.stdout.write('%d pages of up to %d comments' % (len(page_list), page_size))
+        self.stdout.write('openssl per comment: median %8.1f ms per page, mean %8.1f ms per page' % (
+            statistics.median(openssl_times), statistics.mean(openssl_times)))
+        self.stdout.write('batch in process:    median %8.1f ms per page, mean %8.1f ms per page' % (
+            statistics.median(batch_times), statistics.mean(batch_times)))
+        self.stdout.write('%d comments decrypted differently' % differences)
@@ -5,7 +5,7 @@
 import os
 
 from django.db import models
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.template.loader import render_to_string
@@ -27,6 +27,7 @@ from ietf.nomcom.utils import (initialize_templates_for_group,
                                delete_nomcom_templates,
                                EncryptedException,
                               )
+from ietf.utils.cache import bump_generation
 from ietf.utils.log import log
 from ietf.utils.models import ForeignKey
 from ietf.utils.pipe import pipe
@@ -330,3 +331,32 @@ class Volunteer(models.Model):
     def __str__(self):
         return f'{self.person} for {self.nomcom}'
     
+
+
+# === Feedback count invalidation ==============================================
+
+def feedback_generation_name(nomcom_id):
+    """Name of the generation counter for cached feedback counts of a nomcom, see ietf.utils.cache"""
+    return 'nomcom:feedback:%s' % nomcom_id
+
+def feedback_last_seen_generation_name(reviewer_id):
+    """Name of the generation counter for cached feedback new flags of a reviewer"""
+    return 'nomcom:feedback-last-seen:%s' % reviewer_id
+
+def invalidate_feedback_counts(sender, instance, **kwargs):
+    if kwargs.get('raw') or kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    if isinstance(instance, (FeedbackLastSeen, TopicFeedbackLastSeen)):
+        bump_generation(feedback_last_seen_generation_name(instance.reviewer_id))
+    else:
+        # a Feedback, or on the reverse side of its many-to-many relations,
+        # a Nominee or Topic
+        bump_generation(feedback_generation_name(instance.nomcom_id))
+
+post_save.connect(invalidate_feedback_counts, sender=Feedback)
+post_delete.connect(invalidate_feedback_counts, sender=Feedback)
+m2m_changed.connect(invalidate_feedback_counts, sender=Feedback.nominees.through)
+m2m_changed.connect(invalidate_feedback_counts, sender=Feedback.topics.through)
+for last_seen_model in (FeedbackLastSeen, TopicFeedbackLastSeen):
+    post_save.connect(invalidate_feedback_counts, sender=last_seen_model)
+    post_delete.connect(invalidate_feedback_counts, sender=last_seen_model)
@@ -1,20 +1,15 @@
 # Copyright The IETF Trust 2013-2019, All Rights Reserved
-import os
-import tempfile
 import re
 
 from django import template
-from django.conf import settings
 from django.template.defaultfilters import linebreaksbr, force_escape
-from django.utils.encoding import force_text, DjangoUnicodeDecodeError
 from django.utils.safestring import mark_safe
 
 import debug           # pyflakes:ignore
 
-from ietf.nomcom.utils import get_nomcom_by_year, retrieve_nomcom_private_key
+from ietf.nomcom.decrypt import get_feedback_decryptor
+from ietf.nomcom.utils import get_nomcom_by_year
 from ietf.person.models import Person
-from ietf.utils.log import log
-from ietf.utils.pipe import pipe
 
 
 register = template.Library()
@@ -55,28 +50,16 @@ def formatted_email(address):
 
 @register.simple_tag
 def decrypt(string, request, year, plain=False):
-    key = retrieve_nomcom_private_key(request, year)
+    decryptor = get_feedback_decryptor(request, year)
 
-    if not key:
+    if not decryptor:
         return '-*- Encrypted text [No private key provided] -*-'
 
-    encrypted_file = tempfile.NamedTemporaryFile(delete=False)
-    encrypted_file.write(string)
-    encrypted_file.close()
+    # views decrypt a page's feedback in advance with decrypt_feedback(),
+    # which leaves the plaintexts with the decryptor
+    out = decryptor.decrypt(string)
 
-    command = "%s smime -decrypt -in %s -inkey /dev/stdin"
-    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
-                            encrypted_file.name), key)
-    try:
-        out = force_text(out)
-    except DjangoUnicodeDecodeError:
-        pass
-    if code != 0:
-        log("openssl error: %s:\n  Error %s: %s" %(command, code, error))
-
-    os.unlink(encrypted_file.name)
-
-    if error:
+    if out is None:
         return '-*- Encrypted text [Your private key is invalid] -*-'
 
     if not plain:
@@ -11,11 +11,16 @@ from pyquery import PyQuery
 from urllib.parse import urlparse
 from itertools import combinations
 
-from django.db import IntegrityError
+from mock import patch
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection
 from django.db.models import Max
 from django.conf import settings
 from django.core.files import File
 from django.contrib.auth.models import User
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.encoding import force_str
 
@@ -36,13 +41,15 @@ from ietf.nomcom.models import NomineePosition, Position, Nominee, \
                                NomineePositionStateName, Feedback, FeedbackTypeName, \
                                Nomination, FeedbackLastSeen, TopicFeedbackLastSeen, ReminderDates
 from ietf.nomcom.management.commands.send_reminders import Command, is_time_to_send
-from ietf.nomcom.factories import NomComFactory, FeedbackFactory, TopicFactory, \
+from ietf.nomcom.decrypt import FeedbackDecryptor, decrypt_feedback, get_feedback_decryptor, openssl_decrypt
+from ietf.nomcom.templatetags.nomcom_tags import decrypt
+from ietf.nomcom.factories import NomComFactory, FeedbackFactory, TopicFactory, NomineePositionFactory, \
                                   nomcom_kwargs_for_year, provide_private_key_to_test_client, \
                                   key
 from ietf.nomcom.utils import get_nomcom_by_year, make_nomineeposition, \
                               get_hash_nominee_position, is_eligible, list_eligible, \
                               get_eligibility_date, suggest_affiliation, \
-                              decorate_volunteers_with_qualifications
+                              decorate_volunteers_with_qualifications, get_feedback_counts
 from ietf.person.factories import PersonFactory, EmailFactory
 from ietf.person.models import Email, Person
 from ietf.stats.models import MeetingRegistration
@@ -1430,6 +1437,58 @@ class FeedbackLastSeenTests(TestCase):
         q = PyQuery(response.content)
         self.assertEqual( len(q('.bg-success')), 0 )
 
+    def test_feedback_index_query_count(self):
+        url = reverse('ietf.nomcom.views.view_feedback',kwargs={'year':self.nc.year()})
+        login_testing_unauthorized(self, self.member.user.username, url)
+        provide_private_key_to_test_client(self)
+
+        def add_nominees(count):
+            for i in range(count):
+                nominee_position = NomineePositionFactory(position=self.position, nominee__nomcom=self.nc)
+                for type_id in ['comment','nomina','questio']:
+                    f = FeedbackFactory.create(author=self.author,nomcom=self.nc,type_id=type_id)
+                    f.nominees.add(nominee_position.nominee)
+                FeedbackLastSeen.objects.create(reviewer=self.member,nominee=nominee_position.nominee)
+
+        add_nominees(1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code,200)
+        query_count = len(queries)
+
+        add_nominees(5)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code,200)
+        self.assertEqual(len(queries), query_count)
+        q = PyQuery(response.content)
+        self.assertEqual( len(q('.bg-success')), 4 )
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_feedback_counts_cache(self):
+        cache.clear()
+        counts = get_feedback_counts(self.nc, self.member)
+        self.assertEqual(counts['nominees'][self.nominee.pk], {'comment': (1, True), 'nomina': (1, True), 'questio': (1, True)})
+        self.assertEqual(counts['topics'][self.topic.pk], {'comment': (1, True)})
+        self.assertEqual(counts['independent'], {'comment': 2, 'nomina': 1, 'questio': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_feedback_counts(self.nc, self.member), counts)
+        self.assertEqual(len(queries), 0)
+
+        # seeing the feedback clears the new flags of the reviewer only
+        FeedbackLastSeen.objects.create(reviewer=self.member,nominee=self.nominee)
+        self.assertEqual(get_feedback_counts(self.nc, self.member)['nominees'][self.nominee.pk]['comment'], (1, False))
+        other = self.nc.group.role_set.filter(name='chair').first().person
+        self.assertEqual(get_feedback_counts(self.nc, other)['nominees'][self.nominee.pk]['comment'], (1, True))
+
+        # new feedback is counted
+        f = FeedbackFactory.create(author=self.author,nomcom=self.nc,type_id='comment')
+        f.nominees.add(self.nominee)
+        self.assertEqual(get_feedback_counts(self.nc, self.member)['nominees'][self.nominee.pk]['comment'], (2, True))
+        f.delete()
+        self.assertEqual(get_feedback_counts(self.nc, self.member)['nominees'][self.nominee.pk]['comment'], (1, False))
+
     def test_feedback_nominee_badges(self):
         url = reverse('ietf.nomcom.views.view_feedback_nominee', kwargs={'year':self.nc.year(), 'nominee_id':self.nominee.id})
         login_testing_unauthorized(self, self.member.user.username, url)
@@ -1480,6 +1539,51 @@ class FeedbackLastSeenTests(TestCase):
         q = PyQuery(response.content)
         self.assertEqual( len(q('.bg-success')), 0 )
 
+class FeedbackDecryptionTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        setup_test_public_keys_dir(self)
+        self.nc = NomComFactory.create(**nomcom_kwargs_for_year())
+
+    def tearDown(self):
+        teardown_test_public_keys_dir(self)
+        super().tearDown()
+
+    def test_batch_decryption(self):
+        texts = ['First comment', 'Second comment,\nwith two lines', 'Dritter Kommentar, f\u00fcr sp\u00e4ter']
+        comments = [ self.nc.encrypt(t) for t in texts ]
+
+        # the comments are decrypted in process, without openssl
+        with patch('ietf.nomcom.decrypt.openssl_decrypt') as mock_openssl_decrypt:
+            decryptor = FeedbackDecryptor(key)
+            plaintexts = decryptor.decrypt_all(comments)
+            self.assertFalse(mock_openssl_decrypt.called)
+        self.assertEqual([ p.replace('\r\n', '\n') for p in plaintexts ], texts)
+        self.assertEqual([ p.encode('utf-8') for p in plaintexts ],
+                         [ openssl_decrypt(c, key) for c in comments ])
+
+        # with the wrong key, nothing is decrypted
+        __, other_key_file = get_cert_files()
+        with io.open(other_key_file.name, 'rb') as file:
+            other_key = file.read()
+        self.assertEqual(FeedbackDecryptor(other_key).decrypt_all(comments), [None] * len(comments))
+
+    def test_decryptor_lives_with_request(self):
+        request = RequestFactory().get('/')
+        with patch('ietf.nomcom.decrypt.retrieve_nomcom_private_key', return_value=key) as retrieve:
+            feedback = FeedbackFactory.create_batch(2, nomcom=self.nc)
+            decrypt_feedback(request, self.nc.year(), feedback)
+            decryptor = get_feedback_decryptor(request, self.nc.year())
+            self.assertEqual(len(decryptor.plaintexts), 2)
+            self.assertEqual(retrieve.call_count, 1)
+            self.assertIsNone(get_feedback_decryptor(RequestFactory().get('/'), self.nc.year() + 1))
+
+            # the template tag uses the plaintexts decrypted in advance
+            with patch('ietf.nomcom.decrypt.smime_decrypt') as smime_decrypt:
+                decrypt(feedback[0].comments, request, self.nc.year(), plain=True)
+                self.assertFalse(smime_decrypt.called)
+
 class NewActiveNomComTests(TestCase):
 
     def setUp(self):
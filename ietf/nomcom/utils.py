@@ -13,9 +13,10 @@ from email.header import decode_header
 from email.iterators import typed_subpart_iterator
 from email.utils import parseaddr
 
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Max
 from django.conf import settings
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
 from django.template.loader import render_to_string
@@ -27,6 +28,7 @@ from ietf.group.models import Group, Role
 from ietf.person.models import Email, Person
 from ietf.mailtrigger.utils import gather_address_lists
 from ietf.meeting.models import Meeting
+from ietf.utils.cache import get_generation
 from ietf.utils.pipe import pipe
 from ietf.utils.mail import send_mail_text, send_mail, get_payload_text
 from ietf.utils.log import log
@@ -465,6 +467,54 @@ def parse_email(text):
     return addr.lower(), subject, body
 
 
+FEEDBACK_COUNTS_TIMEOUT = 24 * 60 * 60
+
+def get_feedback_counts(nomcom, reviewer):
+    """
+    Get the feedback counts shown on the feedback overview of a nomcom, with
+    flags for whether reviewer has feedback they haven't seen yet, as a dict:
+
+      'nominees':    {nominee id: {feedback type slug: (count, new)}}
+      'topics':      {topic id: {feedback type slug: (count, new)}}
+      'independent': {feedback type slug: count}
+
+    The counts are computed with a few grouped queries, and cached until
+    feedback of the nomcom, or the reviewer's record of what they have
+    seen, changes (see ietf.nomcom.models).
+    """
+    from ietf.nomcom.models import (Feedback, FeedbackLastSeen, TopicFeedbackLastSeen,
+        feedback_generation_name, feedback_last_seen_generation_name)
+
+    cache_key = 'nomcom:feedback-counts:%s:%s:%s:%s' % (
+        nomcom.pk, reviewer.pk,
+        get_generation(feedback_generation_name(nomcom.pk)),
+        get_generation(feedback_last_seen_generation_name(reviewer.pk)),
+    )
+    counts = cache.get(cache_key)
+    if counts is None:
+        def count_by_type(through, related, last_seen_model):
+            # the first last seen record is the one the feedback views update
+            last_seen = dict(last_seen_model.objects.filter(**{'reviewer': reviewer, related + '__nomcom': nomcom})
+                             .order_by('-pk').values_list(related + '_id', 'time'))
+            rows = (through.objects.filter(**{related + '__nomcom': nomcom, 'feedback__type__isnull': False})
+                    .values_list(related + '_id', 'feedback__type_id')
+                    .annotate(count=Count('feedback_id'), latest=Max('feedback__time')).order_by())
+            result = {}
+            for obj_id, type_id, count, latest in rows:
+                seen = last_seen.get(obj_id)
+                result.setdefault(obj_id, {})[type_id] = (count, seen is None or latest > seen)
+            return result
+
+        counts = {
+            'nominees': count_by_type(Feedback.nominees.through, 'nominee', FeedbackLastSeen),
+            'topics': count_by_type(Feedback.topics.through, 'topic', TopicFeedbackLastSeen),
+            'independent': dict(Feedback.objects.filter(nomcom=nomcom, type__isnull=False)
+                                .values_list('type_id').annotate(count=Count('id')).order_by()),
+        }
+        cache.set(cache_key, counts, FEEDBACK_COUNTS_TIMEOUT)
+    return counts
+
+
 def create_feedback_email(nomcom, msg):
     from ietf.nomcom.models import Feedback
     by, subject, body = parse_email(msg)
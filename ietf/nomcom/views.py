@@ -3,6 +3,7 @@
 
 
 import datetime
+import itertools
 import re
 from collections import OrderedDict, Counter
 
@@ -27,6 +28,7 @@ from ietf.group.utils import update_role_set
 from ietf.message.models import Message
 
 from ietf.nomcom.decorators import nomcom_private_key_required
+from ietf.nomcom.decrypt import decrypt_feedback
 from ietf.nomcom.forms import (NominateForm, NominateNewPersonForm, FeedbackForm, QuestionnaireForm,
                                MergeNomineeForm, MergePersonForm, NomComTemplateForm, PositionForm,
                                PrivateKeyForm, EditNomcomForm, EditNomineeForm,
@@ -37,7 +39,7 @@ from ietf.nomcom.models import (Position, NomineePosition, Nominee, Feedback, No
                                 FeedbackLastSeen, Topic, TopicFeedbackLastSeen, )
 from ietf.nomcom.utils import (get_nomcom_by_year, store_nomcom_private_key, suggest_affiliation,
                                get_hash_nominee_position, send_reminder_to_nominees, list_eligible,
-                               decorate_volunteers_with_qualifications,
+                               decorate_volunteers_with_qualifications, get_feedback_counts,
                                HOME_TEMPLATE, NOMINEE_ACCEPT_REMINDER_TEMPLATE,NOMINEE_QUESTIONNAIRE_REMINDER_TEMPLATE, )
 
 from ietf.ietfauth.utils import role_required
@@ -752,7 +754,7 @@ def process_nomination_status(request, year, nominee_position_id, state, date, h
 @nomcom_private_key_required
 def view_feedback(request, year):
     nomcom = get_nomcom_by_year(year)
-    nominees = Nominee.objects.get_by_nomcom(nomcom).not_duplicated().distinct()
+    nominees = Nominee.objects.get_by_nomcom(nomcom).not_duplicated().distinct().select_related('person', 'email')
     independent_feedback_types = []
     nominee_feedback_types = []
     for ft in FeedbackTypeName.objects.all():
@@ -763,9 +765,14 @@ def view_feedback(request, year):
     topic_feedback_types=FeedbackTypeName.objects.filter(slug='comment')
     nominees_feedback = []
     topics_feedback = []
+    counts = get_feedback_counts(nomcom, request.user.person)
+
+    nominee_states = {}
+    for nominee_id, state_id in NomineePosition.objects.filter(nominee__in=nominees).values_list('nominee_id', 'state_id'):
+        nominee_states.setdefault(nominee_id, set()).add(state_id)
 
     def nominee_staterank(nominee):
-        states=nominee.nomineeposition_set.values_list('state_id',flat=True)
+        states = nominee_states.get(nominee.pk, ())
         if 'accepted' in states:
             return 0
         elif 'pending' in states:
@@ -779,32 +786,18 @@ def view_feedback(request, year):
     sorted_nominees = sorted(nominees,key=lambda x:x.staterank)
 
     for nominee in sorted_nominees:
-        last_seen = FeedbackLastSeen.objects.filter(reviewer=request.user.person,nominee=nominee).first()
+        nominee_counts = counts['nominees'].get(nominee.pk, {})
         nominee_feedback = []
         for ft in nominee_feedback_types:
-            qs = nominee.feedback_set.by_type(ft.slug)
-            count = qs.count()
-            if not count:
-                newflag = False
-            elif not last_seen:
-                newflag = True
-            else:
-                newflag = qs.filter(time__gt=last_seen.time).exists()
+            count, newflag = nominee_counts.get(ft.slug, (0, False))
             nominee_feedback.append( (ft.name,count,newflag) )
         nominees_feedback.append( {'nominee':nominee, 'feedback':nominee_feedback} )
-    independent_feedback = [ft.feedback_set.get_by_nomcom(nomcom).count() for ft in independent_feedback_types]
+    independent_feedback = [counts['independent'].get(ft.slug, 0) for ft in independent_feedback_types]
     for topic in nomcom.topic_set.all():
-        last_seen = TopicFeedbackLastSeen.objects.filter(reviewer=request.user.person,topic=topic).first()
+        topic_counts = counts['topics'].get(topic.pk, {})
         topic_feedback = []
         for ft in topic_feedback_types:
-            qs = topic.feedback_set.by_type(ft.slug)
-            count = qs.count()
-            if not count: 
-                newflag = False
-            elif not last_seen:
-                newflag = True
-            else:
-                newflag = qs.filter(time__gt=last_seen.time).exists()
+            count, newflag = topic_counts.get(ft.slug, (0, False))
             topic_feedback.append( (ft.name,count,newflag) )
         topics_feedback.append ( {'topic':topic, 'feedback':topic_feedback} )
 
@@ -913,6 +906,7 @@ def view_feedback_pending(request, year):
             slug = rest[0]
             rest = rest[1]
         type_dict[slug] = t
+    decrypt_feedback(request, year, [ form.instance for form in formset.forms ])
     return render(request, 'nomcom/view_feedback_pending.html',
                               {'year': year,
                                'selected': 'feedback_pending',
@@ -935,6 +929,7 @@ def view_feedback_unrelated(request, year):
     for ft in FeedbackTypeName.objects.exclude(slug__in=settings.NOMINEE_FEEDBACK_TYPES):
         feedback_types.append({'ft': ft,
                                'feedback': ft.feedback_set.get_by_nomcom(nomcom)})
+    decrypt_feedback(request, year, itertools.chain.from_iterable(t['feedback'] for t in feedback_types))
 
     return render(request, 'nomcom/view_feedback_unrelated.html',
                               {'year': year,
@@ -955,6 +950,7 @@ def view_feedback_topic(request, year, topic_id):
         last_seen.save()
     else:
         TopicFeedbackLastSeen.objects.create(reviewer=request.user.person,topic=topic)
+    decrypt_feedback(request, year, topic.feedback_set.filter(type__in=feedback_types))
 
     return render(request, 'nomcom/view_feedback_topic.html',
                               {'year': year,
@@ -977,6 +973,7 @@ def view_feedback_nominee(request, year, nominee_id):
         last_seen.save()
     else:
         FeedbackLastSeen.objects.create(reviewer=request.user.person,nominee=nominee)
+    decrypt_feedback(request, year, nominee.feedback_set.filter(type__in=feedback_types))
 
     return render(request, 'nomcom/view_feedback_nominee.html',
                               {'year': year,
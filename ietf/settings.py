@@ -723,34 +723,39 @@ CACHES = {
         # No release-specific VERSION setting.
         'KEY_PREFIX': 'ietf:dt',
     },
-    'htmlized': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/a/cache/datatracker/htmlized',
-        'OPTIONS': {
-            'MAX_ENTRIES': 100000,      # 100,000
-        },
-    },
-    'pdfized': {
+    'slowpages': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/a/cache/datatracker/pdfized',
+        'LOCATION': '/a/cache/datatracker/slowpages',
         'OPTIONS': {
-            'MAX_ENTRIES': 100000,      # 100,000
+            'MAX_ENTRIES': 5000,
         },
     },
-    'slowpages': {
+    'submitchecks': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/a/cache/datatracker/slowpages',
+        'LOCATION': '/a/cache/datatracker/submitchecks',
+        'TIMEOUT': 60*60*24*30,         # 30 days
         'OPTIONS': {
-            'MAX_ENTRIES': 5000,
+            'MAX_ENTRIES': 20000,
         },
     },
 }
 
 HTMLIZER_VERSION = 1
 HTMLIZER_URL_PREFIX = "/doc/html"
-HTMLIZER_CACHE_TIME = 60*60*24*14       # 14 days
-PDFIZER_CACHE_TIME = HTMLIZER_CACHE_TIME
 PDFIZER_URL_PREFIX = IDTRACKER_BASE_URL+"/doc/pdf"
+# Stored htmlized and pdfized renderings, see ietf/doc/rendering.py
+RENDERED_DOCUMENT_PATH = '/a/ietfdata/derived/rendered'
+# Stored group dependency graphs, see ietf/group/dependency_graphs.py
+DEPENDENCY_GRAPH_PATH = '/a/ietfdata/derived/dependencies'
+# The in-memory index of document names, see ietf/doc/name_index.py, is
+# built again when it is older than this many seconds, to drop removed
+# aliases (added aliases are added to it as they come), and not kept if it
+# would use more than this many bytes
+DOC_NAME_INDEX_MAX_AGE = 24 * 60 * 60
+DOC_NAME_INDEX_MEMORY_LIMIT = 64 * 1024 * 1024
+# Build the document name index in a background thread, rather than in the
+# request which finds it missing or out of date
+DOC_NAME_INDEX_REFRESH_IN_BACKGROUND = True
 
 # Email settings
 IPR_EMAIL_FROM = 'ietf-ipr@ietf.org'
@@ -762,6 +767,24 @@ SECRETARIAT_SUPPORT_EMAIL = "support@ietf.org"
 SECRETARIAT_ACTION_EMAIL = "ietf-action@ietf.org"
 SECRETARIAT_INFO_EMAIL = "ietf-info@ietf.org"
 
+# Leave outgoing email in the queue for the deliver_mail worker, instead of
+# sending it in the request, see ietf/message/utils.py.  Only turn this on
+# where the deliver_mail management command runs as a service, or queued
+# email is never sent.
+EMAIL_QUEUE_OUTBOUND = False
+# Give up on an email after this many attempts, waiting EMAIL_QUEUE_RETRY_DELAY
+# seconds after the first, and twice as long after each following one
+EMAIL_QUEUE_MAX_ATTEMPTS = 8
+EMAIL_QUEUE_RETRY_DELAY = 60
+# Close a reused SMTP connection after this many messages, and send to at
+# most this many recipients in one SMTP transaction
+EMAIL_SMTP_CONNECTION_MAX_MESSAGES = 100
+EMAIL_SMTP_MAX_RECIPIENTS = 100
+# The in-process registry of mail triggers and recipients, see
+# ietf/mailtrigger/registry.py, is loaded again when it is older than this
+# many seconds, even if no trigger or recipient has been changed
+MAILTRIGGER_REGISTRY_MAX_AGE = 3600
+
 # Put real password in settings_local.py
 IANA_SYNC_PASSWORD = "secret"
 IANA_SYNC_CHANGES_URL = "https://datatracker.iana.org:4443/data-tracker/changes"
@@ -838,6 +861,12 @@ IDSUBMIT_CHECKER_CLASSES = (
 #    "ietf.submit.checkers.DraftYangvalidatorChecker",    
 )
 
+# Queue the submission checks of uploads for the process_submission_jobs
+# worker, instead of running them in the upload request.  Only turn this on
+# where process_submission_jobs runs as a service, or the checks of uploads
+# are never run.
+IDSUBMIT_QUEUE_CHECKS = False
+
 
 IDSUBMIT_MANUAL_STAGING_DIR = '/tmp/'
 
@@ -1221,30 +1250,22 @@ if SERVER_MODE != 'production':
         'sessions': {
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         },
-        'htmlized': {
+        'slowpages': {
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
             #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-            'LOCATION': '/var/cache/datatracker/htmlized',
+            'LOCATION': '/var/cache/datatracker/',
             'OPTIONS': {
-                'MAX_ENTRIES': 1000,
+                'MAX_ENTRIES': 5000,
             },
         },
-        'pdfized': {
+        'submitchecks': {
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
             #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-            'LOCATION': '/var/cache/datatracker/pdfized',
+            'LOCATION': '/var/cache/datatracker/submitchecks',
             'OPTIONS': {
                 'MAX_ENTRIES': 1000,
             },
         },
-        'slowpages': {
-            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-            'LOCATION': '/var/cache/datatracker/',
-            'OPTIONS': {
-                'MAX_ENTRIES': 5000,
-            },
-        },
     }
     SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
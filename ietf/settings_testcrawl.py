@@ -31,28 +31,20 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         # No version-specific VERSION setting.
     },
-    'htmlized': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-        #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/var/cache/datatracker/htmlized',
-        'OPTIONS': {
-            'MAX_ENTRIES': 100000,
-        },
-    },
-    'pdfized': {
+    'slowpages': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
         #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/var/cache/datatracker/pdfized',
+        'LOCATION': '/var/cache/datatracker/slowpages',
         'OPTIONS': {
-            'MAX_ENTRIES': 100000,
+            'MAX_ENTRIES': 5000,
         },
     },
-    'slowpages': {
+    'submitchecks': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
         #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/var/cache/datatracker/slowpages',
+        'LOCATION': '/var/cache/datatracker/submitchecks',
         'OPTIONS': {
-            'MAX_ENTRIES': 5000,
+            'MAX_ENTRIES': 1000,
         },
     },
 }
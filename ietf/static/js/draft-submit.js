@@ -1,5 +1,21 @@
 $(document)
     .ready(function () {
+        // while the submission checks run, poll for them to be done and
+        // reload the page to show the results
+        var pending = $("#submission-checks-pending");
+        if (pending.length) {
+            var poll = function () {
+                $.getJSON(pending.data("status-url"), function (data) {
+                    if (data.pending) {
+                        setTimeout(poll, 5000);
+                    } else {
+                        window.location.reload();
+                    }
+                });
+            };
+            setTimeout(poll, 5000);
+        }
+
         // fill in submitter info when an author button is clicked
         $("form.idsubmit button.author")
             .on("click", function () {
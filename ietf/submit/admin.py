@@ -5,7 +5,7 @@ from django.conf import settings
 from django import forms
 
 from ietf.submit.models import (Preapproval, Submission, SubmissionEvent, 
-    SubmissionCheck, SubmissionEmailEvent, SubmissionExtResource)
+    SubmissionCheck, SubmissionEmailEvent, SubmissionExtResource, SubmissionJob)
 from ietf.utils.validators import validate_external_resource_value
 
 
@@ -45,6 +45,13 @@ class SubmissionCheckAdmin(admin.ModelAdmin):
     search_fields = ['submission__name']
 admin.site.register(SubmissionCheck, SubmissionCheckAdmin)
 
+class SubmissionJobAdmin(admin.ModelAdmin):
+    list_display = ['submission', 'time', 'state', 'worker', 'started', 'finished']
+    list_filter = ['state']
+    raw_id_fields = ['submission']
+    search_fields = ['submission__name']
+admin.site.register(SubmissionJob, SubmissionJobAdmin)
+
 class PreapprovalAdmin(admin.ModelAdmin):
     pass
 admin.site.register(Preapproval, PreapprovalAdmin)
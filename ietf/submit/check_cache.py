@@ -0,0 +1,102 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of submission checker results.
+
+Running idnits or the yang checkers on a draft takes seconds, and the same
+file is often checked again: an author uploads an identical draft after
+cancelling a submission, and run_yang_model_checks checks active drafts
+again.  The result of a check is cached under a hash of the file checked,
+the checker name, the method used and the checker version, so that an
+identical check returns the stored result.
+
+The results are kept in the 'submitchecks' cache.  Entries expire after the
+cache TIMEOUT and are culled when the cache holds MAX_ENTRIES; the cached
+results of one checker can also be dropped at once by bumping its
+generation.  Hits and misses are counted per checker, for the
+submission_check_cache command to report.
+"""
+
+import hashlib
+
+from django.core.cache import caches
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils.cache import bump_generation, get_generation
+from ietf.utils.log import log
+
+
+CHECK_CACHE = 'submitchecks'
+
+
+def _cache():
+    return caches[CHECK_CACHE]
+
+def checker_version(checker):
+    version = getattr(checker, 'version', None)
+    return version() if callable(version) else ''
+
+def check_generation(checker_name):
+    """Get the generation of the cached results of a checker"""
+    return get_generation(checker_name, CHECK_CACHE)
+
+def invalidate_cached_checks(checker_name):
+    """Drop the cached results of a checker"""
+    bump_generation(checker_name, CHECK_CACHE)
+
+def check_cache_key(checker, method, content):
+    digest = hashlib.sha256()
+    for part in (checker.name, method, checker_version(checker), str(check_generation(checker.name))):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(content)
+    return 'check:%s' % digest.hexdigest()
+
+def _count(checker_name, outcome):
+    cache = _cache()
+    key = 'stats:%s:%s' % (checker_name, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+def cached_check(checker, method, path, refresh=False):
+    """
+    Run checker.<method>(path), or get its result from the cache if the
+    same file has been checked before by the same version of the checker.
+    With refresh, the checker is always run, and the result cached.
+    """
+    func = getattr(checker, method)
+    try:
+        with open(path, 'rb') as file:
+            content = file.read()
+    except IOError:
+        # let the checker report the missing file
+        return func(path)
+    cache = _cache()
+    key = check_cache_key(checker, method, content)
+    if not refresh:
+        result = cache.get(key)
+        if result is not None:
+            _count(checker.name, 'hits')
+            log(f"using cached {checker.name} result for {path}")
+            return result
+        _count(checker.name, 'misses')
+    result = func(path)
+    cacheable = getattr(checker, 'cacheable', None)
+    if cacheable is None or cacheable(result):
+        cache.set(key, result)
+    return result
+
+def check_cache_stats(checker_names):
+    """Get (hits, misses) for each of the given checkers"""
+    values = _cache().get_many([ 'stats:%s:%s' % (name, outcome)
+                                 for name in checker_names for outcome in ('hits', 'misses') ])
+    return dict( (name, (values.get('stats:%s:hits' % name, 0), values.get('stats:%s:misses' % name, 0)))
+                 for name in checker_names )
+
+def reset_check_cache_stats(checker_names):
+    _cache().delete_many([ 'stats:%s:%s' % (name, outcome)
+                           for name in checker_names for outcome in ('hits', 'misses') ])
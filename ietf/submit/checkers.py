@@ -2,12 +2,15 @@
 # -*- coding: utf-8 -*-
 
 
+import datetime
+import hashlib
 import io
 import os
 import re
 import shutil
 import sys
 import tempfile
+import time
 
 from xym import xym
 from django.conf import settings
@@ -64,6 +67,21 @@ class DraftIdnitsChecker(object):
             options.append("--nitcount")
         self.options = ' '.join(options)
 
+    def version(self):
+        """Identify the idnits binary and options, for the check result cache.
+        The date is included, as idnits warns about the document date and
+        expiry relative to the current date."""
+        try:
+            mtime = os.stat(settings.IDSUBMIT_IDNITS_BINARY).st_mtime
+        except OSError:
+            mtime = None
+        return "%s %s %s %s" % (settings.IDSUBMIT_IDNITS_BINARY, mtime, self.options, datetime.date.today().isoformat())
+
+    def cacheable(self, result):
+        "Don't cache the result of an idnits run which failed"
+        passed, message, errors, warnings, info = result
+        return not message.startswith("idnits error")
+
     def check_file_txt(self, path):
         """
         Run an idnits check, and return a passed/failed indication, a message,
@@ -117,11 +135,72 @@ class DraftIdnitsChecker(object):
 
         return passed, message, errors, warnings, info
 
+def file_fingerprint(path):
+    """Identify the version of a file by its path, size and modification time"""
+    if not path:
+        return ''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path
+    return '%s:%s:%s' % (path, stat.st_size, stat.st_mtime_ns)
+
+def directory_fingerprint(path):
+    """Hash of the names, sizes and modification times of the files in a
+    directory, which changes when a file is added, removed or replaced"""
+    digest = hashlib.sha256()
+    try:
+        entries = sorted(os.scandir(path), key=lambda e: e.name)
+    except OSError:
+        return ''
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        digest.update(('%s:%s:%s\n' % (entry.name, stat.st_size, stat.st_mtime_ns)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+# Seconds to reuse the fingerprint of a module library for, as scanning the
+# larger ones for every check takes longer than a cache hit saves
+DIRECTORY_FINGERPRINT_MAX_AGE = 60
+
+_directory_fingerprints = {}
+
+def cached_directory_fingerprint(path):
+    """directory_fingerprint(path), computed at most once per
+    DIRECTORY_FINGERPRINT_MAX_AGE seconds"""
+    now = time.monotonic()
+    computed, fingerprint = _directory_fingerprints.get(path, (None, None))
+    if computed is None or now - computed > DIRECTORY_FINGERPRINT_MAX_AGE:
+        fingerprint = directory_fingerprint(path)
+        _directory_fingerprints[path] = (now, fingerprint)
+    return fingerprint
+
 class DraftYangChecker(object):
 
     name = "yang validation"
     symbol = '<i class="bi bi-yin-yang"></i>'
 
+    def version(self):
+        """
+        Identify the tools and module libraries used, for the check result
+        cache: the recorded and installed versions of the validators, and
+        the modules in the rfc, iana and catalog module libraries.  The
+        draft module library is left out, as the check of a draft stores
+        the draft's own modules there, and would change its own key.
+        """
+        versions = VersionInfo.objects.filter(command__in=['xym', 'pyang', 'yanglint']).order_by('command')
+        parts = [ '%s=%s' % (v.command, v.version) for v in versions ]
+        parts.append('xym=%s' % getattr(xym, '__version__', ''))
+        parts += [ settings.SUBMIT_PYANG_COMMAND, settings.SUBMIT_YANGLINT_COMMAND ]
+        for command in ('pyang', 'yanglint'):
+            parts.append(file_fingerprint(shutil.which(command)))
+        for path in (settings.SUBMIT_YANG_RFC_MODEL_DIR, settings.SUBMIT_YANG_IANA_MODEL_DIR,
+                     settings.SUBMIT_YANG_CATALOG_MODEL_DIR):
+            parts.append('%s@%s' % (path, cached_directory_fingerprint(path)))
+        return ' '.join(parts)
+
     def check_file_txt(self, path):
         name = os.path.basename(path)
         workdir = tempfile.mkdtemp()
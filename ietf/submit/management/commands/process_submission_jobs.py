@@ -0,0 +1,75 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+import datetime
+import multiprocessing
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import debug                            # pyflakes:ignore
+
+from ietf.submit.utils import next_submission_job, requeue_stalled_submission_jobs, run_submission_job
+
+
+# Seconds between the looks for stalled jobs while working
+REQUEUE_INTERVAL = 60
+
+class Command(BaseCommand):
+    help = ('Run the submission checkers for the uploaded drafts waiting in the submission job queue.  '
+            'By default, keep polling the queue for new jobs; with --once, stop when it is empty.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', default=False, help="Exit when the queue is empty")
+        parser.add_argument('-p', '--processes', type=int, default=1, help="Number of worker processes to run the checks in (default 1)")
+        parser.add_argument('--interval', type=float, default=2, help="Seconds to wait before looking at an empty queue again (default 2)")
+        parser.add_argument('--requeue-after', type=int, default=30, help="Put jobs which have been running for more than this many minutes back in the queue (default 30)")
+
+    def handle(self, *args, **options):
+        self.verbosity = options.get("verbosity", 1)
+        self.requeue_after = datetime.timedelta(minutes=options['requeue_after'])
+        self.requeue_stalled()
+
+        processes = max(1, options['processes'])
+        if processes > 1:
+            # each worker opens its own database connection
+            connections.close_all()
+            workers = [ multiprocessing.Process(target=self.work_in_process, args=(options['once'], options['interval']))
+                        for __ in range(processes) ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        else:
+            self.work(options['once'], options['interval'])
+
+    def work_in_process(self, once, interval):
+        self.work(once, interval)
+        connections.close_all()
+
+    def requeue_stalled(self):
+        requeued = requeue_stalled_submission_jobs(self.requeue_after)
+        if requeued and self.verbosity > 0:
+            self.stdout.write('Put %d stalled jobs back in the queue' % requeued)
+        self.last_requeue = time.monotonic()
+
+    def work(self, once, interval):
+        worker = '%s:%s' % (socket.gethostname(), os.getpid())
+        while True:
+            # pick up the jobs of workers which died while we run, instead
+            # of leaving them until the next start
+            if time.monotonic() - self.last_requeue > REQUEUE_INTERVAL:
+                self.requeue_stalled()
+            job = next_submission_job(worker)
+            if job is None:
+                if once:
+                    break
+                time.sleep(interval)
+                continue
+            job = run_submission_job(job)
+            if self.verbosity > 1 or (job.state == 'failed' and self.verbosity > 0):
+                self.stdout.write('%s: %s-%s %s %s' % (worker, job.submission.name, job.submission.rev, job.state, job.message))
@@ -4,11 +4,17 @@ from tqdm import tqdm
 
 from django.core.management.base import BaseCommand
 
+from ietf.submit.check_cache import invalidate_cached_checks
+from ietf.submit.checkers import DraftYangChecker
 from ietf.submit.models import Submission, SubmissionCheck
 
 class Command(BaseCommand):
     help = ("Remove all but the first and last yangchecks for each Submission")
 
+    def add_arguments(self, parser):
+        parser.add_argument('--clear-cache', action='store_true', default=False,
+                            help="Also drop the cached yang check results")
+
     def handle(self, *args, **options):
         print("Identifying purgeable SubmissionChecks")
         keep = set()
@@ -26,3 +32,6 @@ class Command(BaseCommand):
             .exclude(pk__in=list(keep))
             .delete()
         )
+        if options['clear_cache']:
+            print("Dropping cached yang check results")
+            invalidate_cached_checks(DraftYangChecker.name)
@@ -0,0 +1,40 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+import debug                            # pyflakes:ignore
+
+from ietf.submit.check_cache import check_cache_stats, invalidate_cached_checks, reset_check_cache_stats
+
+
+class Command(BaseCommand):
+    help = ('Report the hit rate of the submission check result cache for each checker in '
+            'settings.IDSUBMIT_CHECKER_CLASSES, counted since the last reset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', default=False, help="Reset the hit and miss counts after reporting them")
+        parser.add_argument('--clear', action='store_true', default=False, help="Drop the cached results of all checkers")
+
+    def handle(self, *args, **options):
+        names = [ import_string(path).name for path in settings.IDSUBMIT_CHECKER_CLASSES ]
+        total_hits = total_misses = 0
+        for name, (hits, misses) in check_cache_stats(names).items():
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(self.line(name, hits, misses))
+        self.stdout.write(self.line('all checkers', total_hits, total_misses))
+
+        if options['reset']:
+            reset_check_cache_stats(names)
+        if options['clear']:
+            for name in names:
+                invalidate_cached_checks(name)
+
+    def line(self, name, hits, misses):
+        lookups = hits + misses
+        rate = '%5.1f%%' % (100.0 * hits / lookups) if lookups else '    -'
+        return '%-16s %8d hits %8d misses  hit rate %s' % (name + ':', hits, misses, rate)
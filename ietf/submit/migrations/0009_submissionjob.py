@@ -0,0 +1,40 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+
+# Generated by Django 2.2.28 on 2022-06-20 09:31
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0008_submissionextresource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissioncheck',
+            name='duration',
+            field=models.FloatField(blank=True, help_text='Time taken by the checker, in seconds', null=True),
+        ),
+        migrations.CreateModel(
+            name='SubmissionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField(default=datetime.datetime.now)),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=8)),
+                ('worker', models.CharField(blank=True, max_length=255)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('message', models.TextField(blank=True)),
+                ('submission', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='submit.Submission')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='submissionjob',
+            index=models.Index(fields=['state', 'time'], name='submit_subm_state_a705da_idx'),
+        ),
+    ]
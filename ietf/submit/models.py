@@ -124,6 +124,7 @@ class SubmissionCheck(models.Model):
     warnings = models.IntegerField(null=True, blank=True, default=None)
     items = jsonfield.JSONField(null=True, blank=True, default='{}')
     symbol = models.CharField(max_length=64, default='')
+    duration = models.FloatField(null=True, blank=True, help_text="Time taken by the checker, in seconds")
     #
     def __str__(self):
         return "%s submission check: %s: %s" % (self.checker, 'Passed' if self.passed else 'Failed', self.message[:48]+'...')
@@ -132,6 +133,32 @@ class SubmissionCheck(models.Model):
     def has_errors(self):
         return self.errors != '[]'
 
+SUBMISSION_JOB_STATES = (
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+)
+
+class SubmissionJob(models.Model):
+    """The submission checks of a submission, waiting for or being run by
+    the process_submission_jobs worker"""
+    submission = ForeignKey(Submission, related_name='jobs')
+    time = models.DateTimeField(default=datetime.datetime.now)
+    state = models.CharField(max_length=8, choices=SUBMISSION_JOB_STATES, default='queued')
+    worker = models.CharField(max_length=255, blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    message = models.TextField(blank=True)
+
+    def __str__(self):
+        return "%s-%s submission job: %s" % (self.submission.name, self.submission.rev, self.state)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'time']),
+        ]
+
 class SubmissionEvent(models.Model):
     submission = ForeignKey(Submission)
     time = models.DateTimeField(default=datetime.datetime.now)
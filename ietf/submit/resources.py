@@ -10,7 +10,7 @@ from tastypie.cache import SimpleCache
 
 from ietf import api
 from ietf.submit.models import ( Preapproval, SubmissionCheck, Submission,
-    SubmissionEmailEvent, SubmissionEvent, SubmissionExtResource )
+    SubmissionEmailEvent, SubmissionEvent, SubmissionExtResource, SubmissionJob )
 from ietf.person.resources import PersonResource
 
 
@@ -106,10 +106,31 @@ class SubmissionCheckResource(ModelResource):
             "errors": ALL,
             "warnings": ALL,
             "items": ALL,
+            "duration": ALL,
             "submission": ALL_WITH_RELATIONS,
         }
 api.submit.register(SubmissionCheckResource())
 
+class SubmissionJobResource(ModelResource):
+    submission       = ToOneField(SubmissionResource, 'submission')
+    class Meta:
+        cache = SimpleCache()
+        queryset = SubmissionJob.objects.all()
+        serializer = api.Serializer()
+        #resource_name = 'submissionjob'
+        ordering = ['id', ]
+        filtering = { 
+            "id": ALL,
+            "time": ALL,
+            "state": ALL,
+            "worker": ALL,
+            "started": ALL,
+            "finished": ALL,
+            "message": ALL,
+            "submission": ALL_WITH_RELATIONS,
+        }
+api.submit.register(SubmissionJobResource())
+
 
 
 from ietf.person.resources import PersonResource
@@ -16,6 +16,7 @@ from pyquery import PyQuery
 from pathlib import Path
 
 from django.conf import settings
+from django.core.management import call_command
 from django.test import override_settings
 from django.test.client import RequestFactory
 from django.urls import reverse as urlreverse
@@ -38,8 +39,10 @@ from ietf.message.models import Message
 from ietf.name.models import FormalLanguageName
 from ietf.person.models import Person
 from ietf.person.factories import UserFactory, PersonFactory, EmailFactory
+from ietf.submit.check_cache import cached_check, check_cache_stats, invalidate_cached_checks
+from ietf.submit.checkers import DraftIdnitsChecker, DraftYangChecker, _directory_fingerprints
 from ietf.submit.factories import SubmissionFactory, SubmissionExtResourceFactory
-from ietf.submit.models import Submission, Preapproval, SubmissionExtResource
+from ietf.submit.models import Submission, Preapproval, SubmissionExtResource, SubmissionJob
 from ietf.submit.mail import add_submission_email, process_response_email
 from ietf.utils.accesstoken import generate_access_token
 from ietf.utils.mail import outbox, empty_outbox, get_payload_text
@@ -397,6 +400,107 @@ class SubmitTests(BaseSubmitTestCase):
     def test_submit_new_wg_txt_xml(self):
         self.submit_new_wg(["txt", "xml"])
 
+    @override_settings(IDSUBMIT_QUEUE_CHECKS=True)
+    def test_submit_queued_checks(self):
+        name = "draft-ietf-mars-testing-queued-checks"
+        status_url, author = self.do_submission(name, "00", formats=["txt"])
+        submission = Submission.objects.get(name=name)
+        self.assertEqual(submission.checks.count(), 0)
+        job = SubmissionJob.objects.get(submission=submission)
+        self.assertEqual(job.state, 'queued')
+
+        checks_url = urlreverse('ietf.submit.views.submission_checks_status', kwargs=dict(submission_id=submission.pk))
+        r = self.client.get(checks_url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {'pending': True})
+
+        # the status page waits for the checks before offering to post
+        r = self.client.get(status_url)
+        q = PyQuery(r.content)
+        self.assertEqual(len(q('#submission-checks-pending')), 1)
+        self.assertEqual(len(q('[type=submit]:contains("Post")')), 0)
+
+        # the upload page shows the queue
+        r = self.client.get(urlreverse('ietf.submit.views.upload_submission'))
+        self.assertContains(r, 'waiting for the submission checks')
+
+        call_command('process_submission_jobs', '--once', stdout=StringIO())
+        job = SubmissionJob.objects.get(pk=job.pk)
+        self.assertEqual(job.state, 'done')
+        self.assertTrue(job.worker)
+        self.assertTrue(submission.checks.exists())
+        self.assertTrue(all(c.duration is not None for c in submission.checks.all()))
+
+        r = self.client.get(checks_url)
+        self.assertEqual(r.json(), {'pending': False})
+        r = self.client.get(status_url)
+        q = PyQuery(r.content)
+        self.assertEqual(len(q('#submission-checks-pending')), 0)
+        self.assertEqual(len(q('[type=submit]:contains("Post")')), 1)
+
+    @override_settings(IDSUBMIT_QUEUE_CHECKS=True)
+    def test_submit_queued_checks_then_post(self):
+        mars = GroupFactory(type_id='wg', acronym='mars')
+        RoleFactory(name_id='chair', group=mars, person__user__username='marschairman')
+        name = "draft-ietf-mars-testing-queued-post"
+        status_url, author = self.do_submission(name, "00", "mars", formats=["txt"])
+        submission = Submission.objects.get(name=name)
+        self.assertEqual(submission.jobs.get().state, 'queued')
+
+        # the submission can't be posted while its checks are waiting
+        r = self.client.post(status_url, {
+            "action": "autopost",
+            "submitter-name": author.ascii,
+            "submitter-email": author.email().address.lower(),
+            "replaces": [],
+        })
+        self.assertEqual(Submission.objects.get(pk=submission.pk).state_id, 'uploaded')
+
+        call_command('process_submission_jobs', '--once', stdout=StringIO())
+        self.assertEqual(submission.jobs.get().state, 'done')
+        self.assertTrue(submission.checks.exists())
+
+        mailbox_before = len(outbox)
+        r = self.supply_extra_metadata(name, status_url, author.ascii, author.email().address.lower(), replaces=[])
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(Submission.objects.get(pk=submission.pk).state_id, 'grp-appr')
+        self.assertEqual(len(outbox), mailbox_before + 1)
+        self.assertIn("New draft waiting for approval", outbox[-1]["Subject"])
+
+    @override_settings(IDSUBMIT_QUEUE_CHECKS=True)
+    def test_submit_failed_checks(self):
+        name = "draft-ietf-mars-testing-failed-checks"
+        status_url, author = self.do_submission(name, "00", formats=["txt"])
+        submission = Submission.objects.get(name=name)
+
+        checks_url = urlreverse('ietf.submit.views.submission_checks_status',
+                                kwargs=dict(submission_id=submission.pk, access_token=submission.access_token()))
+        self.assertEqual(self.client.get(checks_url).json(), {'pending': True})
+        r = self.client.get(urlreverse('ietf.submit.views.submission_checks_status',
+                                       kwargs=dict(submission_id=submission.pk, access_token='abcdef')))
+        self.assertEqual(r.status_code, 404)
+
+        with mock.patch('ietf.submit.utils.apply_checkers', side_effect=OSError("checker went away")):
+            call_command('process_submission_jobs', '--once', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(SubmissionJob.objects.get(submission=submission).state, 'failed')
+        self.assertFalse(submission.checks.exists())
+
+        # a job which didn't run the checks doesn't pass them
+        r = self.client.get(status_url)
+        q = PyQuery(r.content)
+        self.assertEqual(len(q('#submission-checks-failed')), 1)
+        self.assertEqual(len(q('[type=submit]:contains("Post")')), 0)
+
+        r = self.client.post(status_url, {'action': 'retrychecks'})
+        self.assertEqual(r.status_code, 302)
+        self.assertEqual(submission.jobs.filter(state='queued').count(), 1)
+        call_command('process_submission_jobs', '--once', stdout=StringIO())
+
+        r = self.client.get(status_url)
+        q = PyQuery(r.content)
+        self.assertEqual(len(q('#submission-checks-failed')), 0)
+        self.assertEqual(len(q('[type=submit]:contains("Post")')), 1)
+
     def test_submit_new_wg_as_author(self):
         """A new WG submission by a logged-in author needs chair approval"""
         # submit new -> supply submitter info -> approve
@@ -2922,6 +3026,102 @@ class PostSubmissionTests(BaseSubmitTestCase):
         self.assertEqual(args[1], mock_find_filenames.return_value)
 
 
+class CountingChecker(object):
+    name = "counting check"
+    symbol = ""
+
+    def __init__(self):
+        self.runs = 0
+
+    def version(self):
+        return "1.0"
+
+    def check_file_txt(self, path):
+        self.runs += 1
+        return True, "checked %s" % os.path.basename(path), 0, 0, {'checker': self.name, 'items': [], 'code': {}}
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'submitchecks': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class CheckCacheTests(BaseSubmitTestCase):
+    def test_cached_check(self):
+        checker = CountingChecker()
+        first = Path(self.staging_dir) / 'draft-ietf-mars-cached-00.txt'
+        first.write_text('The same content')
+        second = Path(self.staging_dir) / 'draft-ietf-mars-cached-01.txt'
+        second.write_text('The same content')
+
+        result = cached_check(checker, 'check_file_txt', str(first))
+        self.assertEqual(result[1], 'checked draft-ietf-mars-cached-00.txt')
+        self.assertEqual(checker.runs, 1)
+        # identical content gives the cached result
+        self.assertEqual(cached_check(checker, 'check_file_txt', str(second)), result)
+        self.assertEqual(checker.runs, 1)
+        self.assertEqual(check_cache_stats([checker.name]), {checker.name: (1, 1)})
+
+        # changed content, a new checker version, or a refresh runs the check
+        second.write_text('Other content')
+        cached_check(checker, 'check_file_txt', str(second))
+        self.assertEqual(checker.runs, 2)
+        checker.version = lambda: "1.1"
+        cached_check(checker, 'check_file_txt', str(first))
+        self.assertEqual(checker.runs, 3)
+        cached_check(checker, 'check_file_txt', str(first), refresh=True)
+        self.assertEqual(checker.runs, 4)
+        cached_check(checker, 'check_file_txt', str(first))
+        self.assertEqual(checker.runs, 4)
+        invalidate_cached_checks(checker.name)
+        cached_check(checker, 'check_file_txt', str(first))
+        self.assertEqual(checker.runs, 5)
+        self.assertEqual(check_cache_stats([checker.name]), {checker.name: (2, 4)})
+
+    def test_yang_checker_version(self):
+        checker = DraftYangChecker()
+        version = checker.version()
+        self.assertEqual(checker.version(), version)
+        # the modules stored by the draft checks don't change the version
+        module = Path(settings.SUBMIT_YANG_DRAFT_MODEL_DIR) / 'ietf-mars@2022-01-01.yang'
+        module.write_text('module ietf-mars { }')
+        _directory_fingerprints.clear()
+        self.assertEqual(checker.version(), version)
+        # the library fingerprints are reused for a while
+        module = Path(settings.SUBMIT_YANG_RFC_MODEL_DIR) / 'ietf-mars@2022-01-01.yang'
+        module.write_text('module ietf-mars { }')
+        self.assertEqual(checker.version(), version)
+        # after which a new or updated module in the libraries changes the version
+        _directory_fingerprints.clear()
+        changed = checker.version()
+        self.assertNotEqual(changed, version)
+        module.write_text('module ietf-mars { namespace "urn:ietf:mars"; }')
+        _directory_fingerprints.clear()
+        self.assertNotEqual(checker.version(), changed)
+        # and so does a new validator version
+        changed = checker.version()
+        VersionInfo.objects.create(command='pyang', switch='--version', version='pyang 99.0')
+        self.assertNotEqual(checker.version(), changed)
+
+    def test_idnits_checker_version(self):
+        checker = DraftIdnitsChecker()
+        version = checker.version()
+        # idnits results depend on the date, through the expiry warnings
+        with mock.patch('ietf.submit.checkers.datetime') as mock_datetime:
+            mock_datetime.date.today.return_value = datetime.date.today() + datetime.timedelta(days=1)
+            self.assertNotEqual(checker.version(), version)
+
+    @override_settings(IDSUBMIT_CHECKER_CLASSES=('ietf.submit.tests.CountingChecker',))
+    def test_check_cache_command(self):
+        checker = CountingChecker()
+        path = Path(self.staging_dir) / 'draft-ietf-mars-cached-00.txt'
+        path.write_text('Some content')
+        for i in range(4):
+            cached_check(checker, 'check_file_txt', str(path))
+        out = StringIO()
+        call_command('submission_check_cache', '--reset', stdout=out)
+        self.assertRegex(out.getvalue(), r'counting check:\s+3 hits\s+1 misses\s+hit rate\s+75.0%')
+        self.assertEqual(check_cache_stats([checker.name]), {checker.name: (0, 0)})
+
+
 class ValidateSubmissionFilenameTests(BaseSubmitTestCase):
     def test_validate_submission_name(self):
         # This test does not need BaseSubmitTestCase, it could use TestCase
@@ -7,6 +7,8 @@ urlpatterns = [
     url(r'^status/$', views.search_submission),
     url(r'^status/(?P<submission_id>\d+)/$', views.submission_status),
     url(r'^status/(?P<submission_id>\d+)/(?P<access_token>[a-f\d]*)/$', views.submission_status),
+    url(r'^status/(?P<submission_id>\d+)/checks/$', views.submission_checks_status),
+    url(r'^status/(?P<submission_id>\d+)/(?P<access_token>[a-f\d]+)/checks/$', views.submission_checks_status),
     url(r'^status/(?P<submission_id>\d+)/confirm/(?P<auth_token>[a-f\d]+)/$', views.confirm_submission),
     url(r'^status/(?P<submission_id>\d+)/edit/$', views.edit_submission),
     url(r'^status/(?P<submission_id>\d+)/(?P<access_token>[a-f\d]+)/edit/$', views.edit_submission),
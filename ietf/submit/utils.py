@@ -15,6 +15,7 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email 
 from django.db import transaction
+from django.db.models import Avg
 from django.http import HttpRequest     # pyflakes:ignore
 from django.utils.module_loading import import_string
 from django.template.loader import render_to_string
@@ -30,15 +31,17 @@ from ietf.doc.utils import add_state_change_event, rebuild_reference_relations
 from ietf.doc.utils import ( set_replaces_for_document, prettify_std_name,
     update_doc_extresources, can_edit_docextresources, update_documentauthors, update_action_holders )
 from ietf.doc.mails import send_review_possibly_replaces_request, send_external_resource_change_request
+from ietf.doc.rendering import queue_rendering
 from ietf.group.models import Group
 from ietf.ietfauth.utils import has_role
 from ietf.name.models import StreamName, FormalLanguageName
 from ietf.person.models import Person, Email
 from ietf.community.utils import update_name_contains_indexes_with_new_doc
+from ietf.submit.check_cache import cached_check
 from ietf.submit.mail import ( announce_to_lists, announce_new_version, announce_to_authors,
     send_approval_request, send_submission_confirmation, announce_new_wg_00 )
 from ietf.submit.models import ( Submission, SubmissionEvent, Preapproval, DraftSubmissionStateName,
-    SubmissionCheck, SubmissionExtResource )
+    SubmissionCheck, SubmissionExtResource, SubmissionJob )
 from ietf.utils import log
 from ietf.utils.accesstoken import generate_random_key
 from ietf.utils.draft import PlaintextDraft
@@ -492,6 +495,10 @@ def post_submission(request, submission, approved_doc_desc, approved_subm_desc):
     with io.open(ref_rev_file_name, "w", encoding='utf-8') as f:
         f.write(ref_text)
 
+    # Render the htmlized and pdfized versions ahead of the first view
+    rendering_key = "%s-%s" % (draft.name, draft.rev)
+    queue_rendering(rendering_key, os.path.join(settings.IDSUBMIT_REPOSITORY_PATH, rendering_key + ".txt"))
+
     log.log(f"{submission.name}: done")
     
 
@@ -851,14 +858,17 @@ def fill_in_submission(form, submission, authors, abstract, file_size):
     submission.formal_languages.set(FormalLanguageName.objects.filter(slug__in=form.parsed_draft.get_formal_languages()))
     set_extresources_from_existing_draft(submission)
 
+# ordered list of checker methods to try
+CHECKER_METHODS = ("check_fragment_xml", "check_file_xml", "check_fragment_txt", "check_file_txt", )
+
 def apply_checkers(submission, file_name):
     # run submission checkers
     def apply_check(submission, checker, method, fn):
-        func = getattr(checker, method)
-        passed, message, errors, warnings, info = func(fn)
+        lap = time.time()
+        passed, message, errors, warnings, info = cached_check(checker, method, fn)
         check = SubmissionCheck(submission=submission, checker=checker.name, passed=passed,
                                 message=message, errors=errors, warnings=warnings, items=info,
-                                symbol=checker.symbol)
+                                symbol=checker.symbol, duration=time.time() - lap)
         check.save()
 
     mark = time.time()
@@ -866,8 +876,7 @@ def apply_checkers(submission, file_name):
         lap = time.time()
         checker_class = import_string(checker_path)
         checker = checker_class()
-        # ordered list of methods to try
-        for method in ("check_fragment_xml", "check_file_xml", "check_fragment_txt", "check_file_txt", ):
+        for method in CHECKER_METHODS:
             ext = method[-3:]
             if hasattr(checker, method) and ext in file_name:
                 apply_check(submission, checker, method, file_name[ext])
@@ -877,6 +886,104 @@ def apply_checkers(submission, file_name):
     tau = time.time() - mark
     log.log(f"ran submission checks ({tau:.3}s) for {file_name}")
 
+def submission_file_names(submission):
+    """Get the paths of the staged files of a submission which the checkers
+    look at, by extension, as get_draft_meta() gives them"""
+    file_types = submission.file_types.split(',')
+    file_name = {}
+    for ext in ('xml', 'txt'):
+        path = os.path.join(settings.IDSUBMIT_STAGING_PATH, '%s-%s.%s' % (submission.name, submission.rev, ext))
+        # the text file is generated from the xml file if it wasn't uploaded
+        if '.%s' % ext in file_types or (ext == 'txt' and '.xml' in file_types):
+            file_name[ext] = path
+    return file_name
+
+def queue_submission_checks(submission):
+    """
+    Queue a job to run the submission checkers on a submission, for the
+    process_submission_jobs worker.  If settings.IDSUBMIT_QUEUE_CHECKS is
+    False, the checkers are run right away instead.
+    """
+    job = SubmissionJob.objects.create(submission=submission)
+    if not settings.IDSUBMIT_QUEUE_CHECKS:
+        if claim_submission_job(job, 'request'):
+            run_submission_job(job)
+    return job
+
+def claim_submission_job(job, worker):
+    """Mark a queued job as running, returning False if some other worker has
+    already taken it"""
+    now = datetime.datetime.now()
+    claimed = SubmissionJob.objects.filter(pk=job.pk, state='queued').update(state='running', worker=worker, started=now)
+    if claimed:
+        job.state, job.worker, job.started = 'running', worker, now
+    return bool(claimed)
+
+def next_submission_job(worker):
+    """Claim the oldest queued job, or return None if there are none"""
+    while True:
+        job = SubmissionJob.objects.filter(state='queued').order_by('time', 'pk').first()
+        if job is None:
+            return None
+        if claim_submission_job(job, worker):
+            return job
+
+def requeue_stalled_submission_jobs(timeout):
+    """Put jobs which have been running for longer than timeout, presumably
+    because their worker died, back in the queue"""
+    return SubmissionJob.objects.filter(state='running', started__lt=datetime.datetime.now() - timeout).update(
+        state='queued', worker='', started=None)
+
+def run_submission_job(job):
+    try:
+        apply_checkers(job.submission, submission_file_names(job.submission))
+        job.state = 'done'
+    except Exception as e:
+        log.log(f"submission job {job.pk} for {job.submission.name}-{job.submission.rev} failed: {e}")
+        job.state = 'failed'
+        job.message = str(e)
+    job.finished = datetime.datetime.now()
+    job.save()
+    return job
+
+def submission_checks_pending(submission):
+    return submission.jobs.filter(state__in=['queued', 'running']).exists()
+
+def expected_submission_checkers(submission):
+    """Get the names of the checkers which apply to the files of a submission"""
+    file_name = submission_file_names(submission)
+    names = set()
+    for checker_path in settings.IDSUBMIT_CHECKER_CLASSES:
+        checker_class = import_string(checker_path)
+        if any(hasattr(checker_class, method) and method[-3:] in file_name for method in CHECKER_METHODS):
+            names.add(checker_class.name)
+    return names
+
+def submission_checks_failed(submission):
+    """Whether the latest job running the checks of a submission failed, or
+    the checks of some of the checkers which apply to it are missing"""
+    job = submission.jobs.order_by('-time', '-pk').first()
+    if job is not None and job.state in ('queued', 'running'):
+        return False
+    if job is not None and job.state == 'failed':
+        return True
+    return not expected_submission_checkers(submission) <= set(submission.checks.values_list('checker', flat=True))
+
+def submission_passes_checks(submission):
+    """Whether all the checks of a submission have been run, and passed"""
+    return (not submission_checks_pending(submission)
+            and not submission_checks_failed(submission)
+            and all([ c.passed!=False for c in submission.latest_checks() ]))
+
+def submission_queue_status(days=7):
+    """Get the number of submissions waiting for their checks, and the mean
+    time taken by each checker recently, for display on the upload page"""
+    depth = SubmissionJob.objects.filter(state__in=['queued', 'running']).count()
+    since = datetime.datetime.now() - datetime.timedelta(days=days)
+    timings = (SubmissionCheck.objects.filter(time__gte=since, duration__isnull=False)
+               .values_list('checker').annotate(mean=Avg('duration')).order_by('checker'))
+    return depth, list(timings)
+
 def accept_submission_requires_prev_auth_approval(submission):
     """Does acceptance process require approval of previous authors?"""
     return Document.objects.filter(name=submission.name).exists()
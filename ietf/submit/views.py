@@ -14,7 +14,7 @@ from django.contrib.auth.models import User
 from django.db import DataError
 from django.urls import reverse as urlreverse
 from django.core.exceptions import ValidationError
-from django.http import HttpResponseRedirect, Http404, HttpResponseForbidden, HttpResponse
+from django.http import HttpResponseRedirect, Http404, HttpResponseForbidden, HttpResponse, JsonResponse
 from django.http import HttpRequest     # pyflakes:ignore
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.csrf import csrf_exempt
@@ -39,7 +39,9 @@ from ietf.submit.utils import ( approvable_submissions_for_user, preapprovals_fo
     post_submission, cancel_submission, rename_submission_files, remove_submission_files, get_draft_meta,
     get_submission, fill_in_submission, apply_checkers, save_files, 
     check_submission_revision_consistency, accept_submission, accept_submission_requires_group_approval,
-    accept_submission_requires_prev_auth_approval, update_submission_external_resources, remote_ip )
+    accept_submission_requires_prev_auth_approval, update_submission_external_resources, remote_ip,
+    queue_submission_checks, submission_checks_pending, submission_checks_failed, submission_passes_checks,
+    submission_queue_status )
 from ietf.stats.utils import clean_country_name
 from ietf.utils.accesstoken import generate_access_token
 from ietf.utils.log import log
@@ -64,7 +66,7 @@ def upload_submission(request):
                         submission.delete()
                     raise
 
-                apply_checkers(submission, file_name)
+                queue_submission_checks(submission)
 
                 consistency_error = check_submission_revision_consistency(submission)
                 if consistency_error:
@@ -102,9 +104,12 @@ def upload_submission(request):
     else:
         form = SubmissionManualUploadForm(request=request)
 
+    queue_depth, checker_timings = submission_queue_status()
     return render(request, 'submit/upload_submission.html',
                               {'selected': 'index',
-                               'form': form})
+                               'form': form,
+                               'queue_depth': queue_depth,
+                               'checker_timings': checker_timings})
 
 @csrf_exempt
 def api_submit(request):
@@ -236,7 +241,9 @@ def submission_status(request, submission_id, access_token=None):
         raise Http404
 
     errors = validate_submission(submission)
-    passes_checks = all([ c.passed!=False for c in submission.checks.all() ])
+    checks_pending = submission_checks_pending(submission)
+    checks_failed = not checks_pending and submission_checks_failed(submission)
+    passes_checks = submission_passes_checks(submission)
 
     is_secretariat = has_role(request.user, "Secretariat")
     is_chair = submission.group and submission.group.has_role(request.user, "chair")
@@ -332,7 +339,7 @@ def submission_status(request, submission_id, access_token=None):
 
     if request.method == 'POST':
         action = request.POST.get('action')
-        if action == "autopost" and submission.state_id == "uploaded":
+        if action == "autopost" and submission.state_id == "uploaded" and not checks_pending and not checks_failed:
             if not can_edit:
                 permission_denied(request, "You do not have permission to perform this action")
 
@@ -378,6 +385,19 @@ def submission_status(request, submission_id, access_token=None):
                 else:
                     return redirect("ietf.submit.views.submission_status", submission_id=submission.pk)
 
+        elif action == "retrychecks" and submission.state_id == "uploaded" and checks_failed:
+            if not can_edit:
+                permission_denied(request, "You do not have permission to perform this action")
+
+            queue_submission_checks(submission)
+
+            create_submission_event(request, submission, "Queued the submission checks again")
+
+            if access_token:
+                return redirect("ietf.submit.views.submission_status", submission_id=submission.pk, access_token=access_token)
+            else:
+                return redirect("ietf.submit.views.submission_status", submission_id=submission.pk)
+
         elif action == "edit" and submission.state_id == "uploaded":
             if access_token:
                 return redirect("ietf.submit.views.edit_submission", submission_id=submission.pk, access_token=access_token)
@@ -445,6 +465,9 @@ def submission_status(request, submission_id, access_token=None):
         'submission': submission,
         'errors': errors,
         'passes_checks': passes_checks,
+        'checks_pending': checks_pending,
+        'checks_failed': checks_failed,
+        'access_token': access_token,
         'submitter_form': submitter_form,
         'replaces_form': replaces_form,
         'extresources_form': extresources_form,
@@ -466,6 +489,18 @@ def submission_status(request, submission_id, access_token=None):
     })
 
 
+def submission_checks_status(request, submission_id, access_token=None):
+    """Tell the submission status page whether the checks are still running"""
+    submission = get_object_or_404(Submission, pk=submission_id)
+
+    key_matched = access_token and submission.access_token() == access_token
+    if not key_matched: key_matched = submission.access_key == access_token # backwards-compat
+    if access_token and not key_matched:
+        raise Http404
+
+    return JsonResponse({'pending': submission_checks_pending(submission)})
+
+
 def edit_submission(request, submission_id, access_token=None):
     submission = get_object_or_404(Submission, pk=submission_id, state="uploaded")
 
@@ -671,7 +706,7 @@ def manualpost(request):
     manual = Submission.objects.filter(state_id = "manual").distinct()
     
     for s in manual:
-        s.passes_checks = all([ c.passed!=False for c in s.checks.all() ])
+        s.passes_checks = submission_passes_checks(s)
         s.errors = validate_submission(s)
 
     waiting_for_draft = Submission.objects.filter(state_id = "waiting-for-draft").distinct()
@@ -0,0 +1,70 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures the time and number of queries taken by the RFC index sync
+# handling each index entry with its own lookups and writes, and by the
+# bulk mode which reads the state of all RFCs up front and only syncs the
+# entries which differ from it, and checks that both report the same
+# changes.  Each run is rolled back, so both see the same database, but
+# draft files moved to the archive by the first run stay moved.
+
+import datetime
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+import debug                            # pyflakes:ignore
+
+from ietf.sync.rfceditor import parse_index, update_docs_from_rfc_index
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the RFC index sync one entry at a time against the bulk mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument('index', help='path to a copy of rfc-index.xml')
+        parser.add_argument('errata', nargs='?', help='path to a copy of the errata JSON (default no errata)')
+        parser.add_argument('--days', type=int, default=None,
+                            help='skip RFCs published more than DAYS days ago (default sync the whole index)')
+
+    def handle(self, index, errata, days, *args, **options):
+        with io.open(index, encoding='utf-8') as f:
+            index_data = parse_index(f)
+        errata_data = []
+        if errata:
+            with io.open(errata, encoding='utf-8') as f:
+                errata_data = json.load(f)
+        if not index_data:
+            raise CommandError('No entries found in %s' % index)
+        skip_date = datetime.date.today() - datetime.timedelta(days=days) if days is not None else None
+
+        results = {}
+        for label, bulk in (('per entry', False), ('bulk', True)):
+            changes, queries, elapsed = self.run(index_data, errata_data, skip_date, bulk)
+            results[label] = changes
+            self.stdout.write('%-10s %5d entries in %7.2f s, %7d queries, %5d documents changed' % (
+                label + ':', len(index_data), elapsed, queries, len(changes)))
+        if results['per entry'] != results['bulk']:
+            self.stderr.write('The two modes reported different changes')
+
+    def run(self, index_data, errata_data, skip_date, bulk):
+        changes = []
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                with transaction.atomic():
+                    for doc_changes, doc, __ in update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=skip_date, bulk=bulk):
+                        changes.append((doc.name, doc_changes))
+                    elapsed = time.time() - start
+                    raise Rollback()
+        except Rollback:
+            pass
+        return changes, len(queries), elapsed
@@ -4,20 +4,27 @@
 
 import base64
 import datetime
+import itertools
+import os
 import re
 import requests
 
+from collections import defaultdict
 from urllib.parse import urlencode
 from xml.dom import pulldom, Node
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.utils.encoding import smart_bytes, force_str, force_text
 
 import debug                            # pyflakes:ignore
 
+from ietf.api.serializer import batched_cache_invalidation
 from ietf.doc.models import ( Document, DocAlias, State, StateType, DocEvent, DocRelationshipName,
     DocTagName, DocTypeName, RelatedDocument )
 from ietf.doc.expire import move_draft_files_to_archive
+from ietf.doc.rendering import queue_rendering
 from ietf.doc.utils import add_state_change_event, prettify_std_name, update_action_holders
 from ietf.group.models import Group
 from ietf.name.models import StdLevelName, StreamName
@@ -33,6 +40,9 @@ MIN_ERRATA_RESULTS = 5000
 MIN_INDEX_RESULTS = 8000
 MIN_QUEUE_RESULTS = 10
 
+# the state types which are set to published when a draft becomes an RFC
+STREAM_STATE_TYPES = ("draft-iesg", "draft-stream-iab", "draft-stream-irtf", "draft-stream-ise")
+
 def get_child_text(parent_node, tag_name):
     text = []
     for node in parent_node.childNodes:
@@ -330,11 +340,147 @@ def parse_index(response):
     return data
 
 
-def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=None):
+RELATION_PREFIXES = ("NIC", "IEN", "STD", "RTR")
+
+class RfcIndexSnapshot(object):
+    """
+    The RFC documents as the index sync sees them, read with a handful of
+    queries up front.  Used by the bulk mode of the sync to tell which
+    index entries would change something without querying the database
+    for each of them.
+    """
+    def __init__(self):
+        prefixes = ("rfc", "bcp", "fyi") + tuple(p.lower() for p in RELATION_PREFIXES)
+        q = Q()
+        for prefix in prefixes:
+            q |= Q(name__startswith=prefix)
+        self.alias_pks = {}
+        self.alias_docs = defaultdict(set)
+        self.doc_rfc_aliases = defaultdict(set)
+        for name, pk, doc_id in DocAlias.objects.filter(q).values_list("name", "pk", "docs"):
+            self.alias_pks[name] = pk
+            if doc_id is not None:
+                self.alias_docs[name].add(doc_id)
+                if name.startswith("rfc"):
+                    self.doc_rfc_aliases[doc_id].add(name)
+
+        rfc_docs = Document.objects.filter(docalias__name__startswith="rfc")
+        self.docs = dict( (d["pk"], d) for d in rfc_docs.values("pk", "title", "abstract", "pages", "std_level_id", "stream_id", "group_id") )
+
+        self.states = defaultdict(dict)
+        for doc_id, type_id, slug in Document.states.through.objects.filter(
+                document__in=rfc_docs, state__type__in=("draft",) + STREAM_STATE_TYPES).values_list(
+                "document_id", "state__type_id", "state__slug"):
+            self.states[doc_id][type_id] = slug
+
+        self.tags = set(Document.tags.through.objects.filter(
+            document__in=rfc_docs, doctagname__in=("errata", "verified-errata")).values_list("document_id", "doctagname_id"))
+
+        self.relations = set(RelatedDocument.objects.filter(
+            source__in=rfc_docs, relationship__in=("obs", "updates")).values_list("source_id", "target_id", "relationship_id"))
+
+        self.published = set(DocEvent.objects.filter(
+            doc__in=rfc_docs, type="published_rfc").order_by().values_list("doc_id", flat=True).distinct())
+
+    def relation_targets(self, names):
+        """The pks of the aliases the sync relates a document to for the
+        names in the index, as parse_relation_list() below finds them"""
+        targets = set()
+        for x in names:
+            if x[:3] in RELATION_PREFIXES:
+                for doc_id in self.alias_docs.get(x.lower(), ()):
+                    targets.update(self.alias_pks[name] for name in self.doc_rfc_aliases[doc_id])
+            elif x.lower() in self.alias_pks:
+                targets.add(self.alias_pks[x.lower()])
+        return targets
+
+    def is_up_to_date(self, rfc_number, title, current_status, updates, obsoletes, also, has_errata,
+                      all_rejected, has_verified_errata, stream, wg, pages, abstract):
+        """Check whether syncing an index entry would leave the document
+        as it is.  Anything which isn't clear cut is left to the sync."""
+        doc_ids = self.alias_docs.get("rfc%s" % rfc_number)
+        if not doc_ids or len(doc_ids) > 1:
+            return False
+        doc_id, = doc_ids
+        doc = self.docs.get(doc_id)
+        if doc is None:
+            return False
+
+        if title != doc["title"]:
+            return False
+        if abstract and abstract != doc["abstract"]:
+            return False
+        if pages and int(pages) != doc["pages"]:
+            return False
+        if current_status != doc["std_level_id"] or stream != doc["stream_id"]:
+            return False
+        if not doc["group_id"] and wg:
+            return False
+        if doc_id not in self.published:
+            return False
+
+        states = self.states[doc_id]
+        if states.get("draft") != "rfc":
+            return False
+        for t in STREAM_STATE_TYPES:
+            slug = states.get(t)
+            if slug is None and t == "draft-iesg":
+                return False
+            if slug is not None and slug not in ("pub", "idexists"):
+                return False
+
+        for relationship, names in (("obs", obsoletes), ("updates", updates)):
+            for target in self.relation_targets(names):
+                if (doc_id, target, relationship) not in self.relations:
+                    return False
+
+        for a in also:
+            if a.lower() not in self.alias_pks:
+                return False
+
+        errata_tag = (doc_id, "errata") in self.tags
+        verified_errata_tag = (doc_id, "verified-errata") in self.tags
+        if has_errata and not all_rejected:
+            if not errata_tag or (has_verified_errata and not verified_errata_tag):
+                return False
+        elif errata_tag or verified_errata_tag:
+            return False
+
+        return True
+
+
+def in_batched_transactions(results, batch_size):
+    """Run a generator of database updates in transactions, each one
+    covering the work done for batch_size results"""
+    results = iter(results)
+    while True:
+        with transaction.atomic():
+            batch = list(itertools.islice(results, batch_size))
+        if not batch:
+            break
+        yield from batch
+
+def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=None, bulk=False, batch_size=100):
     """Given parsed data from the RFC Editor index, update the documents
     in the database. Yields a list of change descriptions for each
-    document, if any."""
+    document, if any.
+
+    In bulk mode, the current state of all RFCs is read up front, and only
+    the index entries which differ from it are synced, batch_size changed
+    documents to a transaction.  This takes seconds rather than minutes
+    when most of the index is unchanged."""
+
+    # the sync writes to thousands of documents, invalidate the caches
+    # for the models written to once, at the end
+    with batched_cache_invalidation():
+        if bulk:
+            yield from in_batched_transactions(
+                _update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date, RfcIndexSnapshot()),
+                batch_size)
+        else:
+            yield from _update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date)
 
+def _update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date, snapshot=None):
     errata = {}
     for item in errata_data:
         name = item['doc-id']
@@ -375,6 +521,15 @@ def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=Non
             # speed up the process by skipping old entries
             continue
 
+        doc_errata = errata.get('RFC%04d'%rfc_number, [])
+        all_rejected = doc_errata and all( er['errata_status_code']=='Rejected' for er in doc_errata )
+        has_verified_errata = any([ er['errata_status_code']=='Verified' for er in doc_errata ])
+
+        if snapshot is not None and snapshot.is_up_to_date(
+                rfc_number, title, std_level_mapping[current_status].pk, updates, obsoletes, also,
+                has_errata, all_rejected, has_verified_errata, stream_mapping[stream].pk, wg, pages, abstract):
+            continue
+
         # we assume two things can happen: we get a new RFC, or an
         # attribute has been updated at the RFC Editor (RFC Editor
         # attributes take precedence over our local attributes)
@@ -459,7 +614,7 @@ def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=Non
             changes.append("added RFC published event at %s" % e.time.strftime("%Y-%m-%d"))
             rfc_published = True
 
-        for t in ("draft-iesg", "draft-stream-iab", "draft-stream-irtf", "draft-stream-ise"):
+        for t in STREAM_STATE_TYPES:
             prev_state = doc.get_state(t)
             if prev_state is not None:
                 if prev_state.slug not in ("pub", "idexists"):
@@ -475,7 +630,7 @@ def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=Non
         def parse_relation_list(l):
             res = []
             for x in l:
-                if x[:3] in ("NIC", "IEN", "STD", "RTR"):
+                if x[:3] in RELATION_PREFIXES:
                     # try translating this to RFCs that we can handle
                     # sensibly; otherwise we'll have to ignore them
                     l = DocAlias.objects.filter(name__startswith="rfc", docs__docalias__name=x.lower())
@@ -504,13 +659,10 @@ def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=Non
                     DocAlias.objects.create(name=a).docs.add(doc)
                     changes.append("created alias %s" % prettify_std_name(a))
 
-        doc_errata = errata.get('RFC%04d'%rfc_number, [])
-        all_rejected = doc_errata and all( er['errata_status_code']=='Rejected' for er in doc_errata )
         if has_errata and not all_rejected:
             if not doc.tags.filter(pk=tag_has_errata.pk).exists():
                 doc.tags.add(tag_has_errata)
                 changes.append("added Errata tag")
-            has_verified_errata = any([ er['errata_status_code']=='Verified' for er in doc_errata ])
             if has_verified_errata and not doc.tags.filter(pk=tag_has_verified_errata.pk).exists():
                 doc.tags.add(tag_has_verified_errata)
                 changes.append("added Verified Errata tag")
@@ -536,6 +688,9 @@ def update_docs_from_rfc_index(index_data, errata_data, skip_older_than_date=Non
 
             doc.save_with_history(events)
 
+        if rfc_published:
+            queue_rendering(name, os.path.join(settings.RFC_PATH, name + ".txt"))
+
         if changes:
             yield changes, doc, rfc_published
 
@@ -9,6 +9,8 @@ import datetime
 import quopri
 
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse as urlreverse
 
 import debug                            # pyflakes:ignore
@@ -223,6 +225,12 @@ class RFCSyncTests(TestCase):
             f.write("a" * size)
 
     def test_rfc_index(self):
+        self.do_rfc_index_test(bulk=False)
+
+    def test_rfc_index_bulk(self):
+        self.do_rfc_index_test(bulk=True)
+
+    def do_rfc_index_test(self, bulk):
         area = GroupFactory(type_id='area')
         doc = WgDraftFactory(
             group__parent=area,
@@ -343,8 +351,10 @@ class RFCSyncTests(TestCase):
         self.write_draft_file(draft_filename, 5000)
 
         changes = []
-        for cs, d, rfc_published in rfceditor.update_docs_from_rfc_index(data, errata, today - datetime.timedelta(days=30)):
+        for cs, d, rfc_published in rfceditor.update_docs_from_rfc_index(data, errata, today - datetime.timedelta(days=30), bulk=bulk):
             changes.append(cs)
+        self.assertEqual(len(changes), 1)
+        self.assertIn("created alias RFC 1234", changes[0])
 
         doc = Document.objects.get(name=doc.name)
 
@@ -371,8 +381,16 @@ class RFCSyncTests(TestCase):
         self.assertTrue(os.path.exists(os.path.join(settings.INTERNET_DRAFT_ARCHIVE_DIR, draft_filename)))
 
         # make sure we can apply it again with no changes
-        changed = list(rfceditor.update_docs_from_rfc_index(data, errata, today - datetime.timedelta(days=30)))
+        with CaptureQueriesContext(connection) as queries:
+            changed = list(rfceditor.update_docs_from_rfc_index(data, errata, today - datetime.timedelta(days=30), bulk=bulk))
         self.assertEqual(len(changed), 0)
+        if bulk:
+            # unchanged entries are recognized from the prefetched state,
+            # without queries of their own
+            with CaptureQueriesContext(connection) as more_queries:
+                changed = list(rfceditor.update_docs_from_rfc_index(data * 5, errata, today - datetime.timedelta(days=30), bulk=bulk))
+            self.assertEqual(len(changed), 0)
+            self.assertEqual(len(more_queries), len(queries))
 
     def _generate_rfc_queue_xml(self, draft, state, auth48_url=None):
         """Generate an RFC queue xml string for a draft"""
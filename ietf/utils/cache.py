@@ -0,0 +1,62 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""
+Generation counters for cache invalidation.
+
+A value cached under a key which includes the current generation of some
+name is invalidated by bumping that generation, without having to know the
+keys of the cached values.
+
+With a cache which doesn't keep anything, like the DummyCache of the
+development and test settings, the generations are kept in the process
+instead, so that they only change when they are bumped.
+"""
+
+import threading
+import time
+
+from django.core.cache import caches, DEFAULT_CACHE_ALIAS
+
+import debug                            # pyflakes:ignore
+
+
+def generation_cache_key(name):
+    return 'generation:%s' % name
+
+def _initial_generation():
+    # Start from the current time, so that a counter which has been evicted
+    # from the cache doesn't repeat the generations it had before
+    return int(time.time() * 1000)
+
+# Generations of the caches which didn't keep them, by (cache alias, key)
+_local_generations = {}
+_local_lock = threading.Lock()
+
+def get_generation(name, cache_alias=DEFAULT_CACHE_ALIAS):
+    """Get the current generation number for name"""
+    cache = caches[cache_alias]
+    key = generation_cache_key(name)
+    generation = cache.get(key)
+    if generation is None:
+        generation = _initial_generation()
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+        elif cache.get(key) is None:
+            # the cache doesn't keep the counter
+            with _local_lock:
+                generation = _local_generations.setdefault((cache_alias, key), generation)
+    return generation
+
+def bump_generation(name, cache_alias=DEFAULT_CACHE_ALIAS):
+    """Invalidate everything cached under the current generation of name"""
+    cache = caches[cache_alias]
+    key = generation_cache_key(name)
+    with _local_lock:
+        if (cache_alias, key) in _local_generations:
+            _local_generations[(cache_alias, key)] += 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = _initial_generation()
+        cache.set(key, generation, None)
+        return generation
@@ -10,6 +10,7 @@ NAME
 
 SYNOPSIS
         %(program)s [OPTIONS] DRAFTLIST_FILE
+        %(program)s [OPTIONS] --batch DIR
 
 DESCRIPTION
         Extract information about authors' names and email addresses,
@@ -17,6 +18,9 @@ DESCRIPTION
         The information is emitted in the form of a line containing
         xml-style attributes, prefixed with the name of the draft.
 
+        With --batch, the drafts in DIR are processed by a pool of
+        worker processes, and the information is emitted as JSON lines.
+
 %(options)s
 
 AUTHOR
@@ -41,6 +45,8 @@ import debug     # pyflakes: ignore
 import datetime
 import getopt
 import io
+import json
+import multiprocessing
 import os
 import os.path
 import re
@@ -90,6 +96,109 @@ month_names = [ 'january', 'february', 'march', 'april', 'may', 'june', 'july',
 month_names_abbrev3 = [ n[:3] for n in month_names ]
 month_names_abbrev4 = [ n[:4] for n in month_names ]
 
+# Patterns used for every line of a draft are compiled once, here
+
+# page footers and headers, looked for by _stripheaders()
+page_footer_re = re.compile(r"\[?page [0-9ivx]+\]?[ \t\f]*$", re.I)
+formfeed_re = re.compile(r"\f")
+internet_draft_header_re = re.compile(r"^ *Internet.Draft.+  .+[12][0-9][0-9][0-9] *$", re.I)
+draft_header_re = re.compile(r"^ *Draft.+[12][0-9][0-9][0-9] *$", re.I)
+rfc_header_re = re.compile(r"^RFC[ -]?[0-9]+.*(  +)[12][0-9][0-9][0-9]$", re.I)
+draftname_footer_re = re.compile(r"^draft-[-a-z0-9_.]+.*[0-9][0-9][0-9][0-9]$", re.I)
+dated_header_re = re.compile(r".{58,}(Jan|Feb|Mar|March|Apr|April|May|Jun|June|Jul|July|Aug|Sep|Oct|Nov|Dec) (19[89][0-9]|20[0-9][0-9]) *$", re.I)
+draftname_header_re = re.compile(r"^ *draft-[-a-z0-9_.]+ *$", re.I)
+sentence_start_re = re.compile(r"^[^ \t]+")
+nonblank_re = re.compile(r"[^ \t]")
+sentence_end_re = re.compile(r"[.:]$")
+blank_re = re.compile(r"^[ \t]*$")
+
+# formal languages, looked for by get_formal_languages()
+language_regexps = [
+    ("abnf", [re.compile(r"\bABNF"), re.compile(r" +[a-zA-Z][a-zA-Z0-9_-]* +=[/ ]")]),
+    ("asn1", [re.compile(r'DEFINITIONS +::= +BEGIN')]),
+    ("cbor", [re.compile(r'\b(?:CBOR|CDDL)\b'), re.compile(r" +[a-zA-Z][a-zA-Z0-9_-]* += +[\{\[\(]")]),
+    ("ccode", [re.compile(r"(?:\+\+\))|(?:for \(i)|(?: [!=]= 0\) \{)|(?: struct [a-zA-Z_0-9]+ \{)")]),
+    ("json", [re.compile(r'\bJSON\b'), re.compile(r" \"[^\"]+\" ?: [a-zA-Z0-9\.\"\{\[]")]),
+    ("xml", [re.compile(r"<\?xml")]),
+]
+
+# author information, looked for by extract_authors()
+author_aux = {
+    "honor" : r"(?:[A-Z]\.|Dr\.?|Dr\.-Ing\.|Prof(?:\.?|essor)|Sir|Lady|Dame|Sri)",
+    "prefix": r"([Dd]e|Hadi|van|van de|van der|Ver|von|[Ee]l)",
+    "suffix": r"(jr.?|Jr.?|II|2nd|III|3rd|IV|4th)",
+    "first" : r"([A-Z][-A-Za-z'`~]*)(( ?\([A-Z][-A-Za-z'`~]*\))?(\.?[- ]{1,2}[A-Za-z'`~]+)*)",
+    "last"  : r"([-A-Za-z'`~]{2,})",
+    "months": r"(January|February|March|April|May|June|July|August|September|October|November|December)",
+    "mabbr" : r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\.?",
+    }
+authcompanyformats = [ re.compile(f % author_aux) for f in [
+    r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?), (?P<company>[^.]+\.?)$",
+    r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?) *\((?P<company>[^.]+\.?)\)$",
+] ]
+authformats = [ re.compile(f % author_aux) for f in [
+    r" {6}((%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ([^.]+\.?|\([^.]+\.?|\)))?,?$",
+    r" {6}(((%(prefix)s )?%(last)s)( %(suffix)s)?, %(first)s)?$",
+    r" {6}(%(last)s)$",
+] ]
+multiauthformats = [
+    (
+        re.compile(r" {6}(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ?%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)+$" % author_aux),
+        re.compile(r"(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)" % author_aux),
+    ),
+]
+editorformats = [
+    re.compile(r"(?:, | )([Ee]d\.?|\([Ee]d\.?\)|[Ee]ditor)$"),
+]
+companyformats = [ re.compile(f) for f in [
+    r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(,? ?(Inc|Ltd|AB|S\.A)\.?))$",
+    r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(/([A-Za-z'][-A-Za-z0-9.& ']+))+)$",
+    r" {6}([a-z0-9.-]+)$",
+    r" {6}(([A-Za-z'][-A-Za-z0-9.&']+)( [A-Za-z'][-A-Za-z0-9.&']+)*)$",
+    r" {6}(([A-Za-z'][-A-Za-z0-9.']+)( & [A-Za-z'][-A-Za-z0-9.']+)*)$",
+    r" {6}\((.+)\)$",
+    r" {6}(\w+\s?\(.+\))$",
+] ]
+author_dateformat_re = re.compile(r"(((%(months)s|%(mabbr)s) \d+, |\d+ (%(months)s|%(mabbr)s),? |\d+/\d+/)\d\d\d\d|\d\d\d\d-\d\d-\d\d)$" % author_aux)
+address_section_re = re.compile(r"^ *([0-9]+\.)? *(Author|Editor)('s|s'|s|\(s\)) (Address|Addresses|Information)")
+author_suffix_re = re.compile(" %(suffix)s$" % author_aux)
+author_prefix_re = re.compile(" %(prefix)s$" % author_aux)
+# Usually, the contact info lines will look like this: "Email:
+# someone@example.com" or "Tel: +1 (412)-2390 23123", but sometimes the :
+# is left out.  That's okay for things we can't misinterpret, but "tel"
+# may match "Tel Aviv 69710, Israel" so match
+# - misc contact info
+# - tel/fax [number]
+# - [phone number]
+# - [email]
+other_contact_info_regex = re.compile(r'^(((contact )?e|\(e|e-|m|electronic )?mail|email_id|mailto|e-main|(tele)?phone|voice|mobile|work|uri|url|tel:)\b|^((ph|tel\.?|telefax|fax) *[:.]? *\(?( ?\+ ?)?[0-9]+)|^(\++[0-9]+|\(\+*[0-9]+\)|\(dsn\)|[0-9]+)([ -.]*\b|\b[ -.]*)(([0-9]{2,}|\([0-9]{2,}\)|(\([0-9]\)|[0-9])[ -][0-9]{2,}|\([0-9]\)[0-9]+)([ -.]+([0-9]+|\([0-9]+\)))+|([0-9]{7,}|\([0-9]{7,}\)))|^(<?[-a-z0-9._+]+|{([-a-z0-9._+]+, ?)+[-a-z0-9._+]+})@[-a-z0-9._]+>?|^https?://|^www\.')
+email_re = re.compile("[-A-Za-z0-9_.+]+@[-A-Za-z0-9_.]+")
+
+# references, looked for by get_refs().  Bill's horrible "references
+# section" regexps, built up over lots of years of fine tuning for
+# different formats.
+# Examples:
+# Appendix A. References:
+# A.1. Informative References:
+ref_sectionre = re.compile( r'(?i)(?:Appendix\s+)?(?:(?:[A-Z]\.)?[0-9.]*\s+)?(?:(\S+)\s*)?references:?$' )
+# 9.1 Normative
+ref_sectionre2 = re.compile( r'(?i)(?:(?:[A-Z]\.)?[0-9.]*\s+)?(\S+ormative)$' )
+# One other reference section type seen:
+ref_sectionre3 = re.compile( r'(?i)References \((\S+ormative)\)$' )
+# An Internet-Draft reference.
+ref_idref = re.compile( r'(?i)\b(draft-(?:[-\w]+(?=-\d\d)|[-\w]+))(-\d\d)?\b' )
+# An RFC-and-other-series reference.
+ref_rfcref = re.compile( r'(?i)\b(rfc|std|bcp|fyi)[- ]?(\d+)\b' )
+# False positives for std
+ref_not_our_std_ref = re.compile( r'(?i)((\b(n?csc|fed|mil|is-j)-std\b)|(\bieee\s*std\d*\b)|(\bstd\s+802\b))' )
+# An Internet-Draft or series reference hyphenated by a well-meaning line break.
+ref_eol = re.compile( r'(?i)\b(draft[-\w]*-|rfc|std|bcp|fyi)$' )
+# std at the front of a line can hide things like IEEE STD or MIL-STD
+ref_std_start = re.compile( r'(?i)std\n*\b' )
+ref_not_starting_regexes = [
+    re.compile( r'(?i) uri references:?$' ),
+]
+
 # ----------------------------------------------------------------------
 # Functions
 # ----------------------------------------------------------------------
@@ -197,16 +306,12 @@ class PlaintextDraft(Draft):
         self.errors = {}
 
         self.rawlines = self.text.split("\n")
-        self.lines, self.pages = self._stripheaders()
-        # Some things (such as the filename) has to be on the first page.  If
-        # we didn't get back a set of pages, only one single page with the
-        # whole document, then we need to do an enforced page split in order
-        # to limit later searches to the first page.
-        if len(self.pages) <= 1:
-            self.pages = []
-            for pagestart in range(0, len(self.lines), 56):
-                self.pages += [ "\n".join(self.lines[pagestart:pagestart+56]) ]
-
+        # The page headers and footers are stripped as the parsing gets to
+        # them, so that fields found on the first pages don't need the whole
+        # document to be processed
+        self._lines = []
+        self._pages = []
+        self._stripper = self._stripheaders()
 
         self.filename, self.revision = self._parse_draftname()
 
@@ -224,14 +329,68 @@ class PlaintextDraft(Draft):
         with open(source, 'r', encoding='utf8') as f:
             return cls(text=f.read(), source=source, *args, **kwargs)
 
+    # ------------------------------------------------------------------
+    @property
+    def lines(self):
+        """The lines of the draft, without page headers and footers"""
+        self._strip()
+        return self._lines
+
+    @property
+    def pages(self):
+        """The pages of the draft, without page headers and footers"""
+        self._strip()
+        return self._pages
+
+    def _strip(self, lines=None, pages=None):
+        """Strip page headers and footers until there are at least the given
+        number of lines and pages, or all of the draft if none are given"""
+        while self._stripper is not None:
+            if lines is not None and len(self._lines) >= lines:
+                break
+            if pages is not None and len(self._pages) >= pages:
+                break
+            try:
+                next(self._stripper)
+            except StopIteration:
+                self._stripper = None
+                # Some things (such as the filename) has to be on the first
+                # page.  If we didn't get back a set of pages, only one
+                # single page with the whole document, then we need to do an
+                # enforced page split in order to limit later searches to
+                # the first page.
+                if len(self._pages) <= 1:
+                    self._pages[:] = [ "\n".join(self._lines[pagestart:pagestart+56]) for pagestart in range(0, len(self._lines), 56) ]
+
+    def _first_page(self):
+        # once there is a second page, the first one won't change
+        self._strip(pages=2)
+        return self._pages[0] if self._stripper is not None else self.pages[0]
+
+    def _first_lines(self, count):
+        self._strip(lines=count)
+        return self._lines[:count]
+
+    def _iter_lines(self):
+        """Iterate over the lines of the draft, stripping page headers and
+        footers only as far as the iteration gets"""
+        i = 0
+        while True:
+            self._strip(lines=i+1)
+            if i >= len(self._lines):
+                break
+            yield self._lines[i]
+            i += 1
+
     # ------------------------------------------------------------------
     def _parse_draftname(self):
+        first_page = self._first_page()
         draftname_regex = r"(draft-[a-z0-9-]*)-(\d\d)(\w|\.txt|\n|$)"
-        draftname_match = re.search(draftname_regex, self.pages[0])
+        draftname_match = re.search(draftname_regex, first_page)
         if not draftname_match and self.name_from_source:
             draftname_match = re.search(draftname_regex, self.source)
         rfcnum_regex = r"(Re[qg]uests? [Ff]or Commm?ents?:? +|Request for Comments: RFC |RFC-|RFC )((# ?)?[0-9]+)( |,|\n|$)"
-        rfcnum_match = re.search(rfcnum_regex, self.pages[0])
+        rfcnum_match = re.search(rfcnum_regex, first_page)
         if not rfcnum_match and self.name_from_source:
             rfcnum_match = re.search(rfcnum_regex, self.source)
         if draftname_match:
@@ -261,8 +420,10 @@ class PlaintextDraft(Draft):
 
     # ----------------------------------------------------------------------
     def _stripheaders(self):
-        stripped = []
-        pages = []
+        """Strip page headers and footers into self._lines and self._pages,
+        yielding after each line of the draft"""
+        stripped = self._lines
+        pages = self._pages
         page = []
         line = ""
         newpage = False
@@ -301,38 +462,39 @@ class PlaintextDraft(Draft):
                 page += [ line ]
             return pages, page, newpage
         for line in self.rawlines:
+            yield
             linecount += 1
             line = line.rstrip()
-            if re.search(r"\[?page [0-9ivx]+\]?[ \t\f]*$", line, re.I):
+            if page_footer_re.search(line):
                 pages, page, newpage = endpage(pages, page, newpage, line)
                 continue
-            if re.search(r"\f", line, re.I):
+            if formfeed_re.search(line):
                 pages, page, newpage = begpage(pages, page, newpage)
                 continue
-            if re.search(r"^ *Internet.Draft.+  .+[12][0-9][0-9][0-9] *$", line, re.I):
+            if internet_draft_header_re.search(line):
                 pages, page, newpage = begpage(pages, page, newpage, line)
                 continue
     #        if re.search("^ *Internet.Draft  +", line, re.I):
     #            newpage = True
     #            continue
-            if re.search(r"^ *Draft.+[12][0-9][0-9][0-9] *$", line, re.I):
+            if draft_header_re.search(line):
                 pages, page, newpage = begpage(pages, page, newpage, line)
                 continue
-            if re.search(r"^RFC[ -]?[0-9]+.*(  +)[12][0-9][0-9][0-9]$", line, re.I):
+            if rfc_header_re.search(line):
                 pages, page, newpage = begpage(pages, page, newpage, line)
                 continue
-            if re.search(r"^draft-[-a-z0-9_.]+.*[0-9][0-9][0-9][0-9]$", line, re.I):
+            if draftname_footer_re.search(line):
                 pages, page, newpage = endpage(pages, page, newpage, line)
                 continue
-            if linecount > 15 and re.search(r".{58,}(Jan|Feb|Mar|March|Apr|April|May|Jun|June|Jul|July|Aug|Sep|Oct|Nov|Dec) (19[89][0-9]|20[0-9][0-9]) *$", line, re.I):
+            if linecount > 15 and dated_header_re.search(line):
                 pages, page, newpage = begpage(pages, page, newpage, line)
                 continue
-            if newpage and re.search(r"^ *draft-[-a-z0-9_.]+ *$", line, re.I):
+            if newpage and draftname_header_re.search(line):
                 pages, page, newpage = begpage(pages, page, newpage, line)
                 continue
-            if re.search(r"^[^ \t]+", line):
+            if sentence_start_re.search(line):
                 sentence = True
-            if re.search(r"[^ \t]", line):
+            if nonblank_re.search(line):
                 if newpage:
                     # 36 is a somewhat arbitrary count for a 'short' line
                     shortthis = len(line.strip()) < 36 # 36 is a somewhat arbitrary count for a 'short' line
@@ -345,9 +507,9 @@ class PlaintextDraft(Draft):
                 sentence = False
                 newpage = False
                 shortprev = len(line.strip()) < 36 # 36 is a somewhat arbitrary count for a 'short' line
-            if re.search("[.:]$", line):
+            if sentence_end_re.search(line):
                 sentence = True
-            if re.search("^[ \t]*$", line):
+            if blank_re.search(line):
                 blankcount += 1
                 page += [ line ]
                 continue
@@ -355,7 +517,6 @@ class PlaintextDraft(Draft):
             stripped += [ line ]
         pages, page, newpage = begpage(pages, page, newpage)
         _debug('pages: %s' % len(pages))
-        return stripped, pages
 
     # ----------------------------------------------------------------------
     def get_pagecount(self):
@@ -379,14 +540,6 @@ class PlaintextDraft(Draft):
 
     # ------------------------------------------------------------------
     def get_formal_languages(self):
-        language_regexps = [
-            ("abnf", [re.compile(r"\bABNF"), re.compile(r" +[a-zA-Z][a-zA-Z0-9_-]* +=[/ ]")]),
-            ("asn1", [re.compile(r'DEFINITIONS +::= +BEGIN')]),
-            ("cbor", [re.compile(r'\b(?:CBOR|CDDL)\b'), re.compile(r" +[a-zA-Z][a-zA-Z0-9_-]* += +[\{\[\(]")]),
-            ("ccode", [re.compile(r"(?:\+\+\))|(?:for \(i)|(?: [!=]= 0\) \{)|(?: struct [a-zA-Z_0-9]+ \{)")]),
-            ("json", [re.compile(r'\bJSON\b'), re.compile(r" \"[^\"]+\" ?: [a-zA-Z0-9\.\"\{\[]")]),
-            ("xml", [re.compile(r"<\?xml")]),
-        ]
         already_matched = set()
         for l in self.lines:
             for lang_name, patterns in language_regexps:
@@ -402,7 +555,7 @@ class PlaintextDraft(Draft):
     # ----------------------------------------------------------------------
     def get_status(self):
         if self._status == None:
-            for line in self.lines[:10]:
+            for line in self._first_lines(10):
                 status_match = re.search(r"^\s*Intended [Ss]tatus:\s*(.*?)   ", line)
                 if status_match:
                     self._status = status_match.group(1)
@@ -428,7 +581,7 @@ class PlaintextDraft(Draft):
         ]
 
         dates = []
-        text = self.pages[0]
+        text = self._first_page()
         for regex in date_regexes:
             match = re.search(regex, text, re.MULTILINE)
             if match:
@@ -482,7 +635,7 @@ class PlaintextDraft(Draft):
         abstract = []
         abstract_indent = 0
         look_for_header = False
-        for line in self.lines:
+        for line in self._iter_lines():
             if not begin:
                 if abstract_re.match(line):
                     begin=True
@@ -568,46 +721,7 @@ class PlaintextDraft(Draft):
         """Extract author information from draft text.
 
         """
-        aux = {
-            "honor" : r"(?:[A-Z]\.|Dr\.?|Dr\.-Ing\.|Prof(?:\.?|essor)|Sir|Lady|Dame|Sri)",
-            "prefix": r"([Dd]e|Hadi|van|van de|van der|Ver|von|[Ee]l)",
-            "suffix": r"(jr.?|Jr.?|II|2nd|III|3rd|IV|4th)",
-            "first" : r"([A-Z][-A-Za-z'`~]*)(( ?\([A-Z][-A-Za-z'`~]*\))?(\.?[- ]{1,2}[A-Za-z'`~]+)*)",
-            "last"  : r"([-A-Za-z'`~]{2,})",
-            "months": r"(January|February|March|April|May|June|July|August|September|October|November|December)",
-            "mabbr" : r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\.?",
-            }
-        authcompanyformats = [
-            r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?), (?P<company>[^.]+\.?)$" % aux,
-            r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?) *\((?P<company>[^.]+\.?)\)$" % aux,
-        ]
-        authformats = [
-            r" {6}((%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ([^.]+\.?|\([^.]+\.?|\)))?,?$" % aux,
-            r" {6}(((%(prefix)s )?%(last)s)( %(suffix)s)?, %(first)s)?$" % aux,
-            r" {6}(%(last)s)$" % aux,
-        ]
-        multiauthformats = [
-            (
-                r" {6}(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ?%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)+$" % aux,
-                r"(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)" % aux
-            ),
-        ]
-        editorformats = [
-            r"(?:, | )([Ee]d\.?|\([Ee]d\.?\)|[Ee]ditor)$",
-        ]
-        companyformats = [
-            r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(,? ?(Inc|Ltd|AB|S\.A)\.?))$",
-            r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(/([A-Za-z'][-A-Za-z0-9.& ']+))+)$",
-            r" {6}([a-z0-9.-]+)$",
-            r" {6}(([A-Za-z'][-A-Za-z0-9.&']+)( [A-Za-z'][-A-Za-z0-9.&']+)*)$",
-            r" {6}(([A-Za-z'][-A-Za-z0-9.']+)( & [A-Za-z'][-A-Za-z0-9.']+)*)$",
-            r" {6}\((.+)\)$",
-            r" {6}(\w+\s?\(.+\))$",
-        ]
-
-        dateformat = r"(((%(months)s|%(mabbr)s) \d+, |\d+ (%(months)s|%(mabbr)s),? |\d+/\d+/)\d\d\d\d|\d\d\d\d-\d\d-\d\d)$" % aux
-
-        address_section = r"^ *([0-9]+\.)? *(Author|Editor)('s|s'|s|\(s\)) (Address|Addresses|Information)"
+        aux = author_aux
 
         ignore = [
             "Standards Track", "Current Practice", "Internet Draft", "Working Group",
@@ -667,18 +781,18 @@ class PlaintextDraft(Draft):
                 if (leading_space > 5 and abs(leading_space - trailing_space) < 5):
                     _debug("Breaking for centered line")
                     break
-                if re.search(dateformat, line):
+                if author_dateformat_re.search(line):
                     if authors:
                         _debug("Breaking for dateformat after author name")
                 for editorformat in editorformats:
-                    if re.search(editorformat, line):
-                        line = re.sub(editorformat, "", line)
+                    if editorformat.search(line):
+                        line = editorformat.sub("", line)
                         break
                 for lineformat, authformat in multiauthformats:
-                    match = re.search(lineformat, line)
+                    match = lineformat.search(line)
                     if match:
-                        _debug("a. Multiauth format: '%s'" % lineformat)
-                        author_list = re.findall(authformat, line)
+                        _debug("a. Multiauth format: '%s'" % lineformat.pattern)
+                        author_list = authformat.findall(line)
                         authors += [ a[0] for a in author_list ]
                         companies += [ None for a in author_list ]
                         author_on_line = True
@@ -689,9 +803,9 @@ class PlaintextDraft(Draft):
                         break
                 if not author_on_line:
                     for lineformat in authcompanyformats:
-                        match = re.search(lineformat, line)
+                        match = lineformat.search(line)
                         if match:
-                            _debug("b. Line format: '%s'" % lineformat)
+                            _debug("b. Line format: '%s'" % lineformat.pattern)
                             maybe_company = match.group("company").strip(" ,.")
                             # is the putative company name just a partial name, i.e., a part
                             # that commonly occurs after a comma as part of a company name,
@@ -710,9 +824,9 @@ class PlaintextDraft(Draft):
                                 break
                 if not author_on_line:
                     for authformat in authformats:
-                        match = re.search(authformat, line)
+                        match = authformat.search(line)
                         if match:
-                            _debug("c. Auth format: '%s'" % authformat)
+                            _debug("c. Auth format: '%s'" % authformat.pattern)
                             author = match.group(1)
                             authors += [ author ]
                             companies += [ None ]
@@ -723,9 +837,9 @@ class PlaintextDraft(Draft):
                             break
                 if not author_on_line:
                     for authformat in companyformats:
-                        match = re.search(authformat, line)
+                        match = authformat.search(line)
                         if match:
-                            _debug("d. Company format: '%s'" % authformat)
+                            _debug("d. Company format: '%s'" % authformat.pattern)
                             company = match.group(1)
                             authors += [ "" ]
                             companies += [ company ]
@@ -770,7 +884,7 @@ class PlaintextDraft(Draft):
         address_section_pos = last_line//2
         for i in range(last_line//2,last_line):
             line = self.lines[i]
-            if re.search(address_section, line):
+            if address_section_re.search(line):
                 address_section_pos = i
                 break
 
@@ -786,7 +900,7 @@ class PlaintextDraft(Draft):
                 company_or_author = None
             if author in [ None, '', ]:
                 continue
-            suffix_match = re.search(" %(suffix)s$" % aux, author)
+            suffix_match = author_suffix_re.search(author)
             if suffix_match:
                 suffix = suffix_match.group(1)
                 author = author[:-len(suffix)].strip()
@@ -812,7 +926,7 @@ class PlaintextDraft(Draft):
                         first = first.replace(".", ". ").strip()
             first = first.strip()
             last = last.strip()
-            prefix_match = re.search(" %(prefix)s$" % aux, first)
+            prefix_match = author_prefix_re.search(first)
             if prefix_match:
                 prefix = prefix_match.group(1)
                 first = first[:-len(prefix)].strip()
@@ -827,6 +941,7 @@ class PlaintextDraft(Draft):
                     # Pattern for full author information search, based on first page author name:
                     authpat = make_authpat(aux['honor'], left, right, aux['suffix'])
                     _debug("Authpat: " + authpat)
+                    authre = re.compile(authpat)
                     start = 0
                     col = None
                     # Find start of author info for this author (if any).
@@ -837,7 +952,7 @@ class PlaintextDraft(Draft):
                         forms = [ line ] + [ line.replace(short, longform[short]) for short in longform if short in line ]
                         for form in forms:
                             try:
-                                if re.search(authpat, form.strip()) and not j in found_pos:
+                                if authre.search(form.strip()) and not j in found_pos:
                                     _debug( "Match")
 
                                     start = j
@@ -865,7 +980,7 @@ class PlaintextDraft(Draft):
                                                 end = beg + len("".join(columns[col:col+2]))
                                                 _debug( "End2:  %d '%s'" % (end, "".join(columns[col:col+2])))
                                             _debug( "Cut:   '%s'" % form[beg:end])
-                                            author_match = re.search(authpat, columns[col].strip()).group(1)
+                                            author_match = authre.search(columns[col].strip()).group(1)
                                             _debug( "AuthMatch: '%s'" % (author_match,))
                                             if re.search(r'\(.*\)$', author_match.strip()):
                                                 author_match = author_match.rsplit('(',1)[0].strip()
@@ -993,18 +1108,6 @@ class PlaintextDraft(Draft):
 
                     #_debug( "  Column text :: " + column)
                     if nonblank_count >= 2 and blanklines == 0:
-                        # Usually, the contact info lines will look
-                        # like this: "Email: someone@example.com" or
-                        # "Tel: +1 (412)-2390 23123", but sometimes
-                        # the : is left out. That's okay for things we
-                        # can't misinterpret, but "tel" may match "Tel
-                        # Aviv 69710, Israel" so match
-                        # - misc contact info
-                        # - tel/fax [number]
-                        # - [phone number]
-                        # - [email]
-
-                        other_contact_info_regex = re.compile(r'^(((contact )?e|\(e|e-|m|electronic )?mail|email_id|mailto|e-main|(tele)?phone|voice|mobile|work|uri|url|tel:)\b|^((ph|tel\.?|telefax|fax) *[:.]? *\(?( ?\+ ?)?[0-9]+)|^(\++[0-9]+|\(\+*[0-9]+\)|\(dsn\)|[0-9]+)([ -.]*\b|\b[ -.]*)(([0-9]{2,}|\([0-9]{2,}\)|(\([0-9]\)|[0-9])[ -][0-9]{2,}|\([0-9]\)[0-9]+)([ -.]+([0-9]+|\([0-9]+\)))+|([0-9]{7,}|\([0-9]{7,}\)))|^(<?[-a-z0-9._+]+|{([-a-z0-9._+]+, ?)+[-a-z0-9._+]+})@[-a-z0-9._]+>?|^https?://|^www\.')
                         next_line_index = start + 1 + line_offset + 1
 
                         if (not country
@@ -1022,7 +1125,7 @@ class PlaintextDraft(Draft):
 
                     _debug("3: authors[%s]: %s" % (i, authors[i]))
 
-                    emailmatch = re.search("[-A-Za-z0-9_.+]+@[-A-Za-z0-9_.]+", column)
+                    emailmatch = email_re.search(column)
                     if emailmatch and not "@" in author:
                         email = emailmatch.group(0).lower()
                         break
@@ -1063,13 +1166,14 @@ class PlaintextDraft(Draft):
     def get_title(self):
         if self._title:
             return self._title
-        match = re.search(r'(?:\n\s*\n\s*)((.+\n){0,2}(.+\n*))(\s+<?draft-\S+\s*\n)\s*\n', self.pages[0])
+        first_page = self._first_page()
+        match = re.search(r'(?:\n\s*\n\s*)((.+\n){0,2}(.+\n*))(\s+<?draft-\S+\s*\n)\s*\n', first_page)
         if not match:
-            match = re.search(r'(?:\n\s*\n\s*)<?draft-\S+\s*\n*((.+\n){1,3})\s*\n', self.pages[0])
+            match = re.search(r'(?:\n\s*\n\s*)<?draft-\S+\s*\n*((.+\n){1,3})\s*\n', first_page)
         if not match:
-            match = re.search(r'(?:\n\s*\n\s*)((.+\n){0,2}(.+\n*))(\s*\n){2}', self.pages[0])
+            match = re.search(r'(?:\n\s*\n\s*)((.+\n){0,2}(.+\n*))(\s*\n){2}', first_page)
         if not match:
-            match = re.search(r'(?i)(.+\n|.+\n.+\n)(\s*status of this memo\s*\n)', self.pages[0])
+            match = re.search(r'(?i)(.+\n|.+\n.+\n)(\s*status of this memo\s*\n)', first_page)
         if match:
             title = match.group(1)
             title = title.strip()
@@ -1082,30 +1186,9 @@ class PlaintextDraft(Draft):
 
     # ------------------------------------------------------------------
     def get_refs(self):
-        # Bill's horrible "references section" regexps, built up over lots of years
-        # of fine tuning for different formats.
-        # Examples:
-        # Appendix A. References:
-        # A.1. Informative References:
-        sectionre = re.compile( r'(?i)(?:Appendix\s+)?(?:(?:[A-Z]\.)?[0-9.]*\s+)?(?:(\S+)\s*)?references:?$' )
-        # 9.1 Normative
-        sectionre2 = re.compile( r'(?i)(?:(?:[A-Z]\.)?[0-9.]*\s+)?(\S+ormative)$' )
-        # One other reference section type seen:
-        sectionre3 = re.compile( r'(?i)References \((\S+ormative)\)$' )
-        # An Internet-Draft reference.
-        idref = re.compile( r'(?i)\b(draft-(?:[-\w]+(?=-\d\d)|[-\w]+))(-\d\d)?\b' )
-        # An RFC-and-other-series reference.
-        rfcref = re.compile( r'(?i)\b(rfc|std|bcp|fyi)[- ]?(\d+)\b' )
-        # False positives for std
-        not_our_std_ref = re.compile( r'(?i)((\b(n?csc|fed|mil|is-j)-std\b)|(\bieee\s*std\d*\b)|(\bstd\s+802\b))' )
-        # An Internet-Draft or series reference hyphenated by a well-meaning line break.
-        eol = re.compile( r'(?i)\b(draft[-\w]*-|rfc|std|bcp|fyi)$' )
-        # std at the front of a line can hide things like IEEE STD or MIL-STD
-        std_start = re.compile( r'(?i)std\n*\b' )
-
-        not_starting_regexes = [
-            re.compile( r'(?i) uri references:?$' ),
-        ]
+        sectionre, sectionre2, sectionre3 = ref_sectionre, ref_sectionre2, ref_sectionre3
+        idref, rfcref, not_our_std_ref = ref_idref, ref_rfcref, ref_not_our_std_ref
+        eol, std_start, not_starting_regexes = ref_eol, ref_std_start, ref_not_starting_regexes
 
         refs = {}
         in_ref_sect = False
@@ -1270,10 +1353,11 @@ def getmeta(fn):
 
     timestamp = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(os.stat(filename)[stat.ST_MTIME]))
     with io.open(filename, 'rb') as file:
-        try:
-            draft = PlaintextDraft(file.read().decode('utf8'), filename)
-        except UnicodeDecodeError:
-            draft = PlaintextDraft(file.read().decode('latin1'), filename)
+        data = file.read()
+    try:
+        draft = PlaintextDraft(data.decode('utf8'), filename)
+    except UnicodeDecodeError:
+        draft = PlaintextDraft(data.decode('latin1'), filename)
     #_debug("\n".join(draft.lines))
 
     fields["eventdate"] = timestamp
@@ -1302,6 +1386,44 @@ def getmeta(fn):
     return fields
 
 
+# ----------------------------------------------------------------------
+def _getmeta_job(fn):
+    # process pool entry point, returns (fn, fields or error message)
+    try:
+        return fn, getmeta(fn)
+    except Exception as e:
+        return fn, "%s: %s" % (e.__class__.__name__, e)
+
+def getmeta_batch(fns, processes=1, outfile=sys.stdout):
+    """
+    Extract the meta-information of the drafts in fns, using a pool of
+    worker processes, and write it to outfile as JSON lines, one object
+    per draft, in the order given.  Returns the number of drafts written.
+    """
+    fns = list(fns)
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_getmeta_job, fns, chunksize=8)
+    else:
+        pool = None
+        results = map(_getmeta_job, fns)
+    count = 0
+    try:
+        for fn, fields in results:
+            if isinstance(fields, str):
+                _warn("Failed to process '%s': %s" % (fn, fields))
+            elif fields:
+                record = { "filename": os.path.basename(fn) }
+                record.update((k.lstrip("_"), v) for k, v in fields.items())
+                outfile.write(json.dumps(record, sort_keys=True))
+                outfile.write("\n")
+                count += 1
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return count
+
 # ----------------------------------------------------------------------
 def _output(docname, fields, outfile=sys.stdout):
     global company_domain
@@ -1373,6 +1495,8 @@ company_domain = {}                     # type: Dict[str, str]
 def _main(outfile=sys.stdout):
     global opt_debug, opt_timestamp, opt_trace, opt_authorinfo, opt_getauthors, files, company_domain, opt_attributes
     # set default values, if any
+    batch_dir = None
+    processes = 1
     # ----------------------------------------------------------------------
     # Option processing
     # ----------------------------------------------------------------------
@@ -1391,7 +1515,7 @@ def _main(outfile=sys.stdout):
         sys.exit(1)
 
     try:
-        opts, files = getopt.gnu_getopt(sys.argv[1:], "dhatTv", ["debug", "getauthors", "attribs", "attributes", "help", "timestamp", "notimestamp", "trace", "version",])
+        opts, files = getopt.gnu_getopt(sys.argv[1:], "b:dhap:tTv", ["batch=", "debug", "getauthors", "attribs", "attributes", "help", "processes=", "timestamp", "notimestamp", "trace", "version",])
     except Exception as e:
         print("%s: %s" % (program, e))
         sys.exit(1)
@@ -1420,6 +1544,13 @@ def _main(outfile=sys.stdout):
             opt_timestamp = False
         elif opt in ["-T", "--trace"]: # Emit trace information while working
             opt_trace = True
+        elif opt in ["-b", "--batch"]: # Process the .txt drafts in DIR, emitting JSON lines
+            batch_dir = value
+        elif opt in ["-p", "--processes"]: # Number of worker processes in batch mode
+            try:
+                processes = max(1, int(value))
+            except ValueError:
+                _err("Expected a number of processes, got '%s'" % value)
 
     company_domain = {}
     if opt_getauthors:
@@ -1431,6 +1562,12 @@ def _main(outfile=sys.stdout):
                     company_domain[name] = abbrev
                 except ValueError:
                     pass
+    if batch_dir:
+        fns = sorted( os.path.join(batch_dir, fn) for fn in os.listdir(batch_dir)
+                      if fn.endswith(".txt") and not " " in fn )
+        getmeta_batch(fns, processes, outfile)
+        return
+
     if not files:
         files = [ "-" ]
 
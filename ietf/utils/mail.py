@@ -9,6 +9,7 @@ import re
 import smtplib
 import sys
 import textwrap
+import threading
 import time
 import traceback
 
@@ -80,13 +81,136 @@ class SMTPSomeRefusedRecipients(smtplib.SMTPException):
     def summary_refusals(self):
         return ", ".join(["%s (%s)"%(x,self.refusals[x][0]) for x in self.refusals])
 
-def send_smtp(msg, bcc=None):
+def smtp_connect():
+    """Open an SMTP connection to the configured server, with STARTTLS and
+    login if a password has been configured"""
+    server = smtplib.SMTP()
+    #log("SMTP server: %s" % repr(server))
+    #if settings.DEBUG:
+    #    server.set_debuglevel(1)
+    conn_code, conn_msg = server.connect(SMTP_ADDR['ip4'], SMTP_ADDR['port'])
+    #log("SMTP connect: code: %s; msg: %s" % (conn_code, conn_msg))
+    if settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD:
+        server.ehlo()
+        if 'starttls' not in server.esmtp_features:
+            raise ImproperlyConfigured('password configured but starttls not supported')
+        (retval, retmsg) = server.starttls()
+        if retval != 220:
+            raise ImproperlyConfigured('password configured but tls failed: %d %s' % ( retval, retmsg ))
+        # Send a new EHLO, since without TLS the server might not
+        # advertise the AUTH capability.
+        server.ehlo()
+        server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+    return server
+
+def smtp_quit(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+class SMTPConnectionPool(object):
+    """
+    SMTP connections which are kept open and reused for many messages,
+    instead of a connection and handshake for each.  Up to size connections
+    are open at a time, for use from as many threads.  A connection is
+    closed when it has sent max_messages messages or has been idle for
+    max_idle seconds, as servers drop idle clients.  Recipient lists are
+    sent in batches of at most max_recipients, which servers also limit.
+    """
+    def __init__(self, size=1, max_messages=None, max_idle=30, max_recipients=None):
+        self.max_messages = max_messages or settings.EMAIL_SMTP_CONNECTION_MAX_MESSAGES
+        self.max_idle = max_idle
+        self.max_recipients = max_recipients or settings.EMAIL_SMTP_MAX_RECIPIENTS
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []                 # (server, messages sent, time idle since)
+        self.connects = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                server, sent, since = self._idle.pop()
+                if time.time() - since < self.max_idle:
+                    return server, sent
+                smtp_quit(server)
+        self.connects += 1
+        return smtp_connect(), 0
+
+    def _checkin(self, server, sent):
+        if sent >= self.max_messages:
+            smtp_quit(server)
+        else:
+            with self._lock:
+                self._idle.append((server, sent, time.time()))
+
+    def sendmail(self, frm, to, data):
+        """Send data to the recipients to, returning the refused recipients
+        like smtplib.SMTP.sendmail().  If sending fails, the recipients of
+        the batches which the server has already taken are given in the
+        delivered attribute of the exception, so that they can be left out
+        when the message is sent again."""
+        delivered = []
+        refused = {}
+        with self._slots:
+            server, sent = self._checkout()
+            try:
+                try:
+                    self._sendmail(server, frm, to, data, delivered, refused)
+                except smtplib.SMTPServerDisconnected:
+                    if not sent:
+                        raise
+                    # the server closed a connection we kept open; send the
+                    # batches it didn't take over a new one
+                    smtp_quit(server)
+                    self.connects += 1
+                    server, sent = smtp_connect(), 0
+                    self._sendmail(server, frm, to, data, delivered, refused)
+            except BaseException as e:
+                smtp_quit(server)
+                e.delivered = delivered
+                raise
+            self._checkin(server, sent + 1)
+        if to and len(refused) >= len(set(to)):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        return refused
+
+    def _sendmail(self, server, frm, to, data, delivered, refused):
+        # send to the recipients which aren't in delivered yet, adding the
+        # recipients of each batch the server is done with to it
+        done = set(delivered)
+        to = [ addr for addr in to if addr not in done ]
+        for i in range(0, len(to), self.max_recipients):
+            batch = to[i:i+self.max_recipients]
+            try:
+                refused.update(server.sendmail(frm, batch, data))
+            except smtplib.SMTPRecipientsRefused as e:
+                refused.update(e.recipients)
+            delivered.extend(batch)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, __, __ in idle:
+            smtp_quit(server)
+
+def send_smtp(msg, bcc=None, pool=None, delivered=()):
     '''
     Send a Message via SMTP, based on the django email server settings.
     The destination list will be taken from the To:/Cc: headers in the
     Message.  The From address will be used if present or will default
     to the django setting DEFAULT_FROM_EMAIL
 
+    The message is sent over a connection from pool, if given, or else
+    over a new connection.  The recipients in delivered, which an earlier
+    attempt has sent the message to, are left out.
+
     If someone has set test_mode=True, then append the msg to
     the outbox.
     '''
@@ -96,32 +220,18 @@ def send_smtp(msg, bcc=None):
     addrlist = msg.get_all('To') + msg.get_all('Cc', [])
     if bcc:
         addrlist += [bcc]
-    to = [addr for name, addr in getaddresses(addrlist) if ( addr != '' and not addr.startswith('unknown-email-') )]
+    to = [addr for name, addr in getaddresses(addrlist) if ( addr != '' and not addr.startswith('unknown-email-') and addr not in delivered )]
     if not to:
         log("No addressees for email from '%s', subject '%s'.  Nothing sent." % (frm, msg.get('Subject', '[no subject]')))
     else:
         if test_mode:
             outbox.append(msg)
-        server = None
         try:
-            server = smtplib.SMTP()
-            #log("SMTP server: %s" % repr(server))
-            #if settings.DEBUG:
-            #    server.set_debuglevel(1)
-            conn_code, conn_msg = server.connect(SMTP_ADDR['ip4'], SMTP_ADDR['port'])
-            #log("SMTP connect: code: %s; msg: %s" % (conn_code, conn_msg))
-            if settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD:
-                server.ehlo()
-                if 'starttls' not in server.esmtp_features:
-                    raise ImproperlyConfigured('password configured but starttls not supported')
-                (retval, retmsg) = server.starttls()
-                if retval != 220:
-                    raise ImproperlyConfigured('password configured but tls failed: %d %s' % ( retval, retmsg ))
-                # Send a new EHLO, since without TLS the server might not
-                # advertise the AUTH capability.
-                server.ehlo()
-                server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
-            unhandled = server.sendmail(frm, to, force_bytes(msg.as_string()))
+            if pool is None:
+                with SMTPConnectionPool() as connection:
+                    unhandled = connection.sendmail(frm, to, force_bytes(msg.as_string()))
+            else:
+                unhandled = pool.sendmail(frm, to, force_bytes(msg.as_string()))
             if unhandled != {}:
                 raise SMTPSomeRefusedRecipients(message="%d addresses were refused"%len(unhandled),original_msg=msg,refusals=unhandled)
         except Exception as e:
@@ -131,15 +241,24 @@ def send_smtp(msg, bcc=None):
                 e.original_msg=msg
                 raise 
             else:
-                raise smtplib.SMTPException({'really': sys.exc_info()[0], 'value': sys.exc_info()[1], 'tb': traceback.format_tb(sys.exc_info()[2])})
-        finally:
-            try:
-                server.quit()
-            except smtplib.SMTPServerDisconnected:
-                pass
+                error = smtplib.SMTPException({'really': sys.exc_info()[0], 'value': sys.exc_info()[1], 'tb': traceback.format_tb(sys.exc_info()[2])})
+                error.delivered = getattr(e, 'delivered', [])
+                raise error
         subj = force_text(msg.get('Subject', '[no subject]'))
         tau = time.time() - mark
         log("sent email (%.3fs) from '%s' to %s id %s subject '%s'" % (tau, frm, to, msg.get('Message-ID', ''), subj))
+
+def queue_smtp(msg, bcc=None, message=None):
+    '''
+    Put a Message in the outbound mail queue, for the deliver_mail worker
+    to send with send_smtp().  The saved Message object, if given, is marked
+    as sent when it has been.
+    '''
+    from ietf.message.utils import queue_mail
+    add_headers(msg)
+    queued = queue_mail(msg, bcc, message)
+    log("queued email from '%s' to %s id %s subject '%s' as QueuedMail[%s]" % (msg.get('From'), msg.get('To'), msg.get('Message-ID', ''), force_text(msg.get('Subject', '[no subject]')), queued.pk))
+    return queued
     
 def copy_email(msg, to, toUser=False, originalBcc=None):
     '''
@@ -370,7 +489,12 @@ def send_mail_mime(request, to, frm, subject, msg, cc=None, extra=None, toUser=F
     else:
         message = None
 
-    if test_mode or debugging or production:
+    if (test_mode or production) and settings.EMAIL_QUEUE_OUTBOUND:
+        # leave the delivery to the deliver_mail worker
+        queue_smtp(msg, bcc, message)
+        if settings.SERVER_MODE != 'development':
+            show_that_mail_was_sent(request,'Email was queued for sending',msg,bcc)
+    elif test_mode or debugging or production:
         try:
             send_smtp(msg, bcc)
             if save:
@@ -502,11 +626,27 @@ def exception_components(e):
         tb = orig['tb']
         value = orig['value']
     else:
-        extype = sys.exc_info()[0]
-        value = sys.exc_info()[1]
-        tb = traceback.format_tb(sys.exc_info()[2])
+        extype, value, tb = sys.exc_info()
+        if value is None:
+            # not called while handling e
+            extype, value, tb = type(e), e, e.__traceback__
+        tb = traceback.format_tb(tb)
     return (extype, value, tb)
         
+def smtp_error_is_temporary(e):
+    """Whether sending may succeed if tried again later: the connection
+    failed, or the server replied with a 4xx code"""
+    if isinstance(e, SMTPSomeRefusedRecipients):
+        return False
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, __ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    extype, value, tb = exception_components(e)
+    return isinstance(extype, type) and issubclass(extype, OSError)
+
 def log_smtp_exception(e):
     (extype, value, tb) = exception_components(e)
     log("SMTP Exception: %s : %s" % (extype,value), e)
@@ -0,0 +1,121 @@
+# Copyright The IETF Trust 2022, All Rights Reserved
+# -*- coding: utf-8 -*-
+#
+# Measures how many drafts per second PlaintextDraft gets through: for the
+# full meta-information getmeta extracts, for the first page fields only
+# (which only strips the headers and footers of the first pages), and for
+# the getmeta batch mode with a pool of worker processes.  The corpus is the
+# .txt drafts in a directory, or by default the submission test drafts,
+# filled in with a few sample authors.
+
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils.draft import PlaintextDraft, getmeta, getmeta_batch
+
+
+SAMPLE_TEMPLATES = (
+    'test_submission.txt',
+    'test_submission_invalid_yang.txt',
+    'test_submission_no_org_or_address.txt',
+)
+
+SAMPLE_AUTHORS = (
+    ('Jane Doe', 'J.', 'Doe'),
+    ('Hans-Peter van der Berg', 'H-P.', 'van der Berg'),
+    ('Li Wei', 'L.', 'Wei'),
+    ('Robert Smith', 'R.', 'Smith'),
+)
+
+def write_sample_drafts(path, repeat):
+    today = datetime.date.today()
+    count = 0
+    for templatename in SAMPLE_TEMPLATES:
+        with io.open(os.path.join(settings.BASE_DIR, 'submit', templatename)) as file:
+            template = file.read()
+        for author, initials, surname in SAMPLE_AUTHORS:
+            for i in range(repeat):
+                name = 'draft-sample-%s-%02d' % (surname.lower().replace(' ', ''), count)
+                text = template % dict(
+                    date=today.strftime("%d %B %Y"),
+                    expiration=(today + datetime.timedelta(days=100)).strftime("%d %B, %Y"),
+                    year=today.strftime("%Y"),
+                    month=today.strftime("%B"),
+                    day=today.strftime("%d"),
+                    name=name + '-00',
+                    group='',
+                    author=author,
+                    asciiAuthor=author,
+                    initials=initials,
+                    surname=surname,
+                    asciiSurname=surname,
+                    email='%s@example.com' % surname.lower().replace(' ', ''),
+                    title='Sample Document %d' % count,
+                )
+                with io.open(os.path.join(path, name + '-00.txt'), 'w') as file:
+                    file.write(text)
+                count += 1
+
+def read_draft(fn):
+    with io.open(fn, 'rb') as file:
+        data = file.read()
+    try:
+        return data.decode('utf8')
+    except UnicodeDecodeError:
+        return data.decode('latin1')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the plain text draft parser on a corpus of drafts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', nargs='?',
+                            help='directory of .txt drafts (default the submission test drafts)')
+        parser.add_argument('--repeat', type=int, default=25,
+                            help='number of copies of each sample draft, without a directory (default 25)')
+        parser.add_argument('-p', '--processes', type=int, default=os.cpu_count() or 1,
+                            help='number of worker processes for the batch mode (default the number of CPUs)')
+
+    def handle(self, directory, repeat, processes, *args, **options):
+        tempdir = None
+        if not directory:
+            directory = tempdir = tempfile.mkdtemp()
+            write_sample_drafts(directory, max(1, repeat))
+        try:
+            fns = sorted( os.path.join(directory, fn) for fn in os.listdir(directory) if fn.endswith('.txt') )
+            if not fns:
+                raise CommandError('No .txt drafts found in %s' % directory)
+            texts = [ read_draft(fn) for fn in fns ]
+
+            self.report('full metadata', len(fns), self.run(getmeta, fns))
+            self.report('first page', len(fns), self.run(self.first_page_fields, texts))
+            with io.open(os.devnull, 'w') as devnull:
+                start = time.time()
+                getmeta_batch(fns, max(1, processes), devnull)
+                self.report('batch (%d processes)' % max(1, processes), len(fns), time.time() - start)
+        finally:
+            if tempdir:
+                shutil.rmtree(tempdir)
+
+    def first_page_fields(self, text):
+        draft = PlaintextDraft(text, 'draft.txt')
+        return draft.filename, draft.get_title(), draft.get_status(), draft.get_creation_date()
+
+    def run(self, func, items):
+        start = time.time()
+        for item in items:
+            func(item)
+        return time.time() - start
+
+    def report(self, label, count, elapsed):
+        self.stdout.write('%-22s %6d drafts in %7.2f s, %8.1f drafts/s' % (
+            label + ':', count, elapsed, count / elapsed if elapsed else 0))
@@ -12,6 +12,7 @@ import debug                            # pyflakes:ignore
 
 from ietf.doc.models import Document, State, DocAlias
 from ietf.submit.models import Submission
+from ietf.submit.check_cache import cached_check
 from ietf.submit.checkers import DraftYangChecker
 
 
@@ -43,7 +44,8 @@ class Command(BaseCommand):
         if submission or force:
             check = submission.checks.filter(checker=checker.name).order_by('-id').first()
             if check or force:
-                result = checker.check_file_txt(draft.get_file_name())
+                # check again, and put the new result in the check result cache
+                result = cached_check(checker, 'check_file_txt', draft.get_file_name(), refresh=True)
                 passed, message, errors, warnings, items = result
                 if self.verbosity > 2:
                     self.stdout.write("  Errors: %s\n"
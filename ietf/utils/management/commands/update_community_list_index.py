@@ -7,12 +7,13 @@ from django.core.management.base import BaseCommand
 
 import debug                            # pyflakes:ignore
 
-from ietf.community.models import SearchRule
-from ietf.community.utils import reset_name_contains_index_for_rule
+from ietf.community.models import CommunityList, SearchRule
+from ietf.community.utils import reset_name_contains_indexes, reset_tracked_documents_for_community_list
 
 class Command(BaseCommand):
     help = ("""
-        Update the index tables for stored regex-based document search rules.
+        Update the index tables for stored regex-based document search rules,
+        and rebuild the index of documents tracked by each community list.
         """)
 
     def add_arguments(self, parser):
@@ -22,10 +23,13 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         verbosity = options.get('verbosity', 1)
-        for rule in tqdm(SearchRule.objects.filter(rule_type='name_contains'), disable=(verbosity!=1)):
-            count1 = rule.name_contains_index.count()
-            if not options['dry_run']:
-                reset_name_contains_index_for_rule(rule)
+        rules = list(SearchRule.objects.filter(rule_type='name_contains'))
+        counts = dict( (rule.pk, rule.name_contains_index.count()) for rule in rules )
+        if not options['dry_run']:
+            # match all rules in a single pass over the document names
+            reset_name_contains_indexes(rules)
+        for rule in rules:
+            count1 = counts[rule.pk]
             count2 = rule.name_contains_index.count()
             if int(options['verbosity']) > 1:
                 group = rule.group or rule.community_list.group
@@ -37,4 +41,11 @@ class Command(BaseCommand):
                         pass
                 name = ((group and group.acronym) or (person and person.email_address())) or '?'
                 self.stdout.write("%-24s %-24s  %3d -->%3d\n" % (name[:24], rule.text[:24], count1, count2 ))
-            
+
+        for clist in tqdm(CommunityList.objects.all(), disable=(verbosity!=1)):
+            count1 = clist.trackeddocument_set.count()
+            if not options['dry_run']:
+                reset_tracked_documents_for_community_list(clist)
+            count2 = clist.trackeddocument_set.count()
+            if int(options['verbosity']) > 1:
+                self.stdout.write("%-50s %5d -->%5d\n" % (str(clist)[:50], count1, count2))
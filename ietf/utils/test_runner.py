@@ -734,6 +734,13 @@ class IetfTestRunner(DiscoverRunner):
         # switch to a much faster hasher
         settings.PASSWORD_HASHERS = ( 'django.contrib.auth.hashers.MD5PasswordHasher', )
         settings.SERVER_MODE = 'test'
+        # run submission checks in the request, rather than leave them for a worker
+        settings.IDSUBMIT_QUEUE_CHECKS = False
+        # send email in the request, rather than leave it for a worker
+        settings.EMAIL_QUEUE_OUTBOUND = False
+        # build the document name index in the request, as a background
+        # thread doesn't see the data of the test transaction
+        settings.DOC_NAME_INDEX_REFRESH_IN_BACKGROUND = False
         #
         print("     Datatracker %s test suite, %s:" % (ietf.__version__, time.strftime("%d %B %Y %H:%M:%S %Z")))
         print("     Python %s." % sys.version.replace('\n', ' '))
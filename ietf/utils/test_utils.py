@@ -181,6 +181,8 @@ class TestCase(django.test.TestCase):
         'INTERNET_ALL_DRAFTS_ARCHIVE_DIR',
         'INTERNET_DRAFT_ARCHIVE_DIR',
         'INTERNET_DRAFT_PATH',
+        'RENDERED_DOCUMENT_PATH',
+        'DEPENDENCY_GRAPH_PATH',
     ]
 
     parser = html5lib.HTMLParser(strict=True)
@@ -26,6 +26,7 @@ from django.template import Context
 from django.template import Template    # pyflakes:ignore
 from django.template.defaulttags import URLNode
 from django.template.loader import get_template, render_to_string
+from django.test import override_settings
 from django.templatetags.static import StaticNode
 from django.urls import reverse as urlreverse
 
@@ -33,7 +34,8 @@ import debug                            # pyflakes:ignore
 
 from ietf.person.name import name_parts, unidecode_name
 from ietf.submit.tests import submission_file
-from ietf.utils.draft import PlaintextDraft, getmeta
+from ietf.utils.cache import bump_generation, get_generation
+from ietf.utils.draft import PlaintextDraft, getmeta, getmeta_batch
 from ietf.utils.log import unreachable, assertion
 from ietf.utils.mail import send_mail_preformatted, send_mail_text, send_mail_mime, outbox, get_payload_text
 from ietf.utils.test_runner import get_template_paths, set_coverage_checking
@@ -360,6 +362,36 @@ class PlaintextDraftTests(TestCase):
         self.assertEqual(getmeta(filename)['docdeststatus'],'Informational')
         shutil.rmtree(tempdir)
 
+    def test_lazy_parsing(self):
+        # a draft long enough to have pages after the first two
+        text = self.draft.text + "\n\f\n" + self.draft.text
+        full = PlaintextDraft(text=text, source='draft-test-draft-class-00.txt', name_from_source=False)
+        full.lines
+        draft = PlaintextDraft(text=text, source='draft-test-draft-class-00.txt', name_from_source=False)
+        self.assertEqual(draft.get_status(),'Informational')
+        # only the first pages have been looked at
+        self.assertIsNotNone(draft._stripper)
+        self.assertLess(len(draft._pages), len(full.pages))
+        self.assertEqual(draft.get_title(), full.get_title())
+        self.assertEqual(draft.get_abstract(), full.get_abstract())
+        self.assertEqual(draft.get_author_list(), full.get_author_list())
+        self.assertEqual(draft.lines, full.lines)
+        self.assertEqual(draft.pages, full.pages)
+        self.assertIsNone(draft._stripper)
+
+    def test_get_meta_batch(self):
+        tempdir = mkdtemp()
+        filename = os.path.join(tempdir,self.draft.source)
+        with io.open(filename,'w') as file:
+            file.write(self.draft.text)
+        out = io.StringIO()
+        self.assertEqual(getmeta_batch([filename, os.path.join(tempdir, 'draft-missing-00.txt')], outfile=out), 1)
+        fields = json.loads(out.getvalue())
+        self.assertEqual(fields['filename'], self.draft.source)
+        self.assertEqual(fields['docdeststatus'],'Informational')
+        self.assertEqual(fields['authorlist'], [ list(a) for a in self.draft.get_author_list() ])
+        shutil.rmtree(tempdir)
+
 
 class XMLDraftTests(TestCase):
     def test_get_refs_v3(self):
@@ -451,6 +483,23 @@ class LogUtilTests(TestCase):
         assertion('False')
         settings.SERVER_MODE = 'test'
 
+class GenerationTests(TestCase):
+    def check_generations(self):
+        generation = get_generation('test:generation')
+        self.assertEqual(get_generation('test:generation'), generation)
+        bump_generation('test:generation')
+        bumped = get_generation('test:generation')
+        self.assertNotEqual(bumped, generation)
+        self.assertEqual(get_generation('test:generation'), bumped)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_generation_without_cache(self):
+        self.check_generations()
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_generation_with_cache(self):
+        self.check_generations()
+
 class TestRFC2047Strings(TestCase):
     def test_parse_unicode(self):
         names = (